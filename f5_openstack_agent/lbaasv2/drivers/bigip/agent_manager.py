@@ -36,7 +36,9 @@ from neutron_lib import constants as plugin_const
 from neutron_lib import exceptions as q_exception
 
 from f5_openstack_agent.lbaasv2.drivers.bigip import constants_v2
+from f5_openstack_agent.lbaasv2.drivers.bigip import event_coalescer
 from f5_openstack_agent.lbaasv2.drivers.bigip import plugin_rpc
+from f5_openstack_agent.lbaasv2.drivers.bigip import resync_engine
 from f5_openstack_agent.lbaasv2.drivers.bigip import utils
 from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5_ex
 
@@ -142,6 +144,51 @@ OPTS = [
         'ccloud_orphans_cleanup_testrun',
         default=True,
         help='Simulate orphan cleaning without real deletion if set to True'
+    ),
+    cfg.IntOpt(
+        'ccloud_resync_concurrency',
+        default=1,
+        help=('Number of loadbalancers validated and refreshed in parallel '
+              'during a resync')
+    ),
+    cfg.BoolOpt(
+        'ccloud_incremental_resync',
+        default=False,
+        help=('Only validate loadbalancers whose definition or device '
+              'objects changed, or whose last validation is older than '
+              'ccloud_resync_max_age, instead of flushing the service '
+              'cache on every resync interval')
+    ),
+    cfg.IntOpt(
+        'ccloud_resync_max_age',
+        default=86400,
+        help=('Maximum age in seconds of the last validation of a '
+              'loadbalancer with incremental resync')
+    ),
+    cfg.IntOpt(
+        'ccloud_resync_spread_cycles',
+        default=4,
+        help=('Number of resync cycles over which the definition checks '
+              'of unchanged loadbalancers are spread with incremental '
+              'resync')
+    ),
+    cfg.FloatOpt(
+        'ccloud_event_coalesce_window',
+        default=0.5,
+        help=('Seconds member, pool and health monitor events of a '
+              'loadbalancer are collected before they are applied with '
+              'one service assurance. 0 applies every event right away.')
+    ),
+    cfg.IntOpt(
+        'ccloud_port_cache_ttl',
+        default=300,
+        help=('Seconds neutron ports found or created by the agent are '
+              'cached in memory, 0 disables the cache.')
+    ),
+    cfg.IntOpt(
+        'ccloud_port_cache_size',
+        default=1000,
+        help='Maximum number of neutron ports cached in memory.'
     )
 ]
 
@@ -303,6 +350,24 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
         self.l2_pop_rpc = None
         self.state_rpc = None
         self.pending_services = {}
+        self.resync_engine = resync_engine.ResyncEngine(
+            self.conf.ccloud_resync_concurrency)
+        LOG.info('ccloud: Resync concurrency = %s',
+                 self.resync_engine.concurrency)
+        self.event_coalescer = event_coalescer.EventCoalescer(
+            self.conf.ccloud_event_coalesce_window,
+            lambda service, delete_event: self.lbdriver.update_service(
+                service, delete_event=delete_event),
+            lambda lb_id: self.plugin_rpc.get_service_by_loadbalancer_id(
+                lb_id))
+        self.resync_tracker = None
+        if self.conf.ccloud_incremental_resync:
+            self.resync_tracker = resync_engine.ResyncTracker(
+                self.conf.ccloud_resync_max_age,
+                self.conf.ccloud_resync_spread_cycles,
+                self.service_resync_interval)
+            LOG.info('ccloud: Incremental resync with max age = %s',
+                     self.resync_tracker.max_age)
 
 
         # Set the agent ID
@@ -409,7 +474,9 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
             self.context,
             self.conf.environment_prefix,
             self.conf.environment_group_number,
-            self.agent_host
+            self.agent_host,
+            port_cache_ttl=self.conf.ccloud_port_cache_ttl,
+            port_cache_size=self.conf.ccloud_port_cache_size
         )
 
         #
@@ -587,18 +654,26 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
 
         active_loadbalancers = \
             self.plugin_rpc.get_active_loadbalancers(host=self.agent_host)
-        for loadbalancer in active_loadbalancers:
-            if self.agent_host == loadbalancer['agent_host']:
-                try:
-                    lb_id = loadbalancer['lb_id']
-                    LOG.debug(
-                        'getting operating status for loadbalancer %s.', lb_id)
-                    svc = self.plugin_rpc.get_service_by_loadbalancer_id(
-                        lb_id)
-                    self.lbdriver.update_operating_status(svc)
+        lb_ids = [loadbalancer['lb_id']
+                  for loadbalancer in active_loadbalancers
+                  if self.agent_host == loadbalancer['agent_host']]
+        services = self.resync_engine.run(
+            'operating status', lb_ids,
+            self.plugin_rpc.get_service_by_loadbalancer_id)
+        try:
+            # member status of all loadbalancers is read with one request
+            self.lbdriver.update_operating_statuses(
+                [svc for svc in services.values() if svc])
+        except Exception as e:
+            LOG.exception('Error updating status %s.', e.message)
 
-                except Exception as e:
-                    LOG.exception('Error updating status %s.', e.message)
+    @periodic_task.periodic_task(spacing=PERIODIC_TASK_INTERVAL)
+    def reload_esd(self, context):
+        """Pick up changed Enhanced Service Definition files."""
+        if self.cli_sync:
+            return
+
+        self.lbdriver.reload_esd()
 
     # setup a period task to decide if it is time empty the local service
     # cache and resync service definitions form the controller
@@ -620,10 +695,17 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
                 self.needs_resync = True
                 self.cache.services = {}
                 self.lbdriver.flush_cache()
+                if self.resync_tracker:
+                    self.resync_tracker.reset()
                 self.last_resync = self.last_resync + datetime.timedelta(seconds=self.service_resync_interval)
                 LOG.debug("ccloud - periodic_resync: Forcing resync of ALL services because of a recovered F5 device")
             elif (now - self.last_resync).seconds > self.service_resync_interval:
-                if not self.needs_resync:
+                if not self.needs_resync and self.resync_tracker:
+                    # changed services are picked by _validate_services
+                    self.needs_resync = True
+                    self.last_resync = self.last_resync + datetime.timedelta(seconds=self.service_resync_interval)
+                    LOG.debug('ccloud - periodic_resync: Starting incremental resync on resync timer (%d seconds).' % self.service_resync_interval)
+                elif not self.needs_resync:
                     self.needs_resync = True
                     self.cache.services = {}
                     self.lbdriver.flush_cache()
@@ -669,6 +751,7 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
                 LOG.debug("ccloud - periodic_resync - orphans: No orphan cleaning enabled. Only SNAT pool orphan handling will be done")
 
             LOG.info("ccloud - periodic_resync: Resync took {0} seconds".format((datetime.datetime.now() - now).seconds))
+            LOG.debug("ccloud - periodic_resync: Driver request metrics {0}".format(self.lbdriver.scheduler.get_metrics()))
 
         except Exception as e:
             LOG.exception("ccloud - periodic_resync: Exception in periodic resync happend: " + str(e.message))
@@ -742,6 +825,7 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
             # lb will be added again with next sync
             for deleted_lb in owned_services - all_loadbalancer_ids:
                 self.cache.remove_by_loadbalancer_id(deleted_lb)
+                self.lbdriver.forget_loadbalancer(deleted_lb)
                 LOG.info("ccloud: Cached service not found in neutron database. Clearing cache for LB_id %s" % deleted_lb)
                 # self.destroy_service(deleted_lb)
 
@@ -784,8 +868,9 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
             "plugin produced the list of pending loadbalancer ids: %s"
             % list(pending_lb_ids))
 
-        for lb_id in list(pending_lb_ids):
-            lb_pending = self.refresh_service(lb_id)
+        refreshed = self.resync_engine.run('refresh', list(pending_lb_ids),
+                                           self.refresh_service)
+        for lb_id, lb_pending in refreshed.iteritems():
             if lb_pending:
                 if lb_id not in self.pending_services:
                     self.pending_services[lb_id] = now
@@ -819,9 +904,19 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
         return tuple(loadbalancers), set(lb_ids)
 
     def _validate_services(self, lb_ids):
-        for lb_id in lb_ids:
-            if not self.cache.get_by_loadbalancer_id(lb_id):
-                self.validate_service(lb_id)
+        if self.resync_tracker:
+            try:
+                self.resync_tracker.update_device_fingerprints(
+                    self.lbdriver.get_tenant_fingerprints())
+            except Exception as exc:
+                LOG.warning("ccloud: Unable to fingerprint device objects: "
+                            "%s" % exc.message)
+            # the cache isn't flushed, the tracker decides what to validate
+            lb_ids = self.resync_tracker.select(lb_ids)
+        else:
+            lb_ids = [lb_id for lb_id in lb_ids
+                      if not self.cache.get_by_loadbalancer_id(lb_id)]
+        self.resync_engine.run('validate', lb_ids, self.validate_service)
 
     @log_helpers.log_method_call
     @utils.instrument_execution_time
@@ -830,11 +925,26 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
             service = self.plugin_rpc.get_service_by_loadbalancer_id(
                 lb_id
             )
+            if self.resync_tracker and service and \
+                    not self.resync_tracker.needs_validation(lb_id, service):
+                LOG.debug("ccloud: Service definition of '{}' unchanged, "
+                          "skipping validation".format(lb_id))
+                self.resync_tracker.checked(lb_id)
+                return
+            diff = None
             try:
                 found = True
-                if (not self.lbdriver.service_exists(service)) or self.has_provisioning_status_of_error(service):
-                    LOG.warning("Active loadbalancer '{}' is not on BIG-IP"
-                             " or has error state".format(lb_id))
+                if service['loadbalancer']:
+                    diff = self.lbdriver.service_diff(service)
+                if self.has_provisioning_status_of_error(service):
+                    LOG.warning("Active loadbalancer '{}' has error "
+                                "state".format(lb_id))
+                    # errored objects are only fixed by a full sync
+                    diff = None
+                    found = False
+                elif (not service['loadbalancer']) or diff:
+                    LOG.warning("Active loadbalancer '{}' is not on "
+                                "BIG-IP".format(lb_id))
                     found = False
                 else:
                     LOG.debug("Found service definition for '{}', state is ACTIVE"
@@ -845,11 +955,14 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
                 found = False
             # really not found or Exception happend: Try to fix it
             if not found:
-                LOG.info("ccloud: Start syncing loadbalancer '{}'".format(lb_id))
-                self.lbdriver.sync(service)
+                LOG.info("ccloud: Start syncing loadbalancer '{}', missing "
+                         "objects: {}".format(lb_id, diff))
+                self.lbdriver.sync(service, diff=diff)
                 LOG.info("ccloud: Finished syncing loadbalancer '{}'".format(lb_id))
                 if service:
                     self.cache.put(service, self.agent_host)
+            if self.resync_tracker and service:
+                self.resync_tracker.verified(lb_id, service)
         except f5_ex.InvalidNetworkType as exc:
             LOG.warning(exc.msg)
         except q_exception.NeutronException as exc:
@@ -955,6 +1068,9 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
         cleaned = False
 
         try:
+            # all device queries of this cleanup share one inventory
+            # snapshot instead of querying every tenant folder again
+            self.lbdriver.open_inventory()
 
             unbound_loadbalancers = self.plugin_rpc.get_loadbalancers_without_agent_binding()
 
@@ -1054,6 +1170,8 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
         except Exception as e:
             LOG.error("Unable to clean_orphaned_objects_and_save_device_config: %s" % e.message)
             cleaned = True
+        finally:
+            self.lbdriver.close_inventory()
 
         return cleaned
 
@@ -1307,7 +1425,8 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
     def create_pool(self, context, pool, service):
         """Handle RPC cast from plugin to create_pool."""
         try:
-            service_pending = self.lbdriver.create_pool(pool, service)
+            service_pending, service = self.event_coalescer.dispatch(
+                service, lambda: self.lbdriver.create_pool(pool, service))
             self.cache.put(service, self.agent_host)
             if service_pending:
                 self.needs_resync = True
@@ -1320,8 +1439,9 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
     def update_pool(self, context, old_pool, pool, service):
         """Handle RPC cast from plugin to update_pool."""
         try:
-            service_pending = \
-                self.lbdriver.update_pool(old_pool, pool, service)
+            service_pending, service = self.event_coalescer.dispatch(
+                service, lambda: self.lbdriver.update_pool(
+                    old_pool, pool, service))
             self.cache.put(service, self.agent_host)
             if service_pending:
                 self.needs_resync = True
@@ -1334,7 +1454,9 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
     def delete_pool(self, context, pool, service):
         """Handle RPC cast from plugin to delete_pool."""
         try:
-            service_pending = self.lbdriver.delete_pool(pool, service)
+            service_pending, service = self.event_coalescer.dispatch(
+                service, lambda: self.lbdriver.delete_pool(pool, service),
+                delete_event=True)
             self.cache.put(service, self.agent_host)
             if service_pending:
                 self.needs_resync = True
@@ -1347,8 +1469,8 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
     def create_member(self, context, member, service):
         """Handle RPC cast from plugin to create_member."""
         try:
-            service_pending = \
-                self.lbdriver.create_member(member, service)
+            service_pending, service = self.event_coalescer.dispatch(
+                service, lambda: self.lbdriver.create_member(member, service))
             self.cache.put(service, self.agent_host)
             if service_pending:
                 self.needs_resync = True
@@ -1361,8 +1483,9 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
     def update_member(self, context, old_member, member, service):
         """Handle RPC cast from plugin to update_member."""
         try:
-            service_pending = \
-                self.lbdriver.update_member(old_member, member, service)
+            service_pending, service = self.event_coalescer.dispatch(
+                service, lambda: self.lbdriver.update_member(
+                    old_member, member, service))
             self.cache.put(service, self.agent_host)
             if service_pending:
                 self.needs_resync = True
@@ -1375,7 +1498,9 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
     def delete_member(self, context, member, service):
         """Handle RPC cast from plugin to delete_member."""
         try:
-            service_pending = self.lbdriver.delete_member(member, service)
+            service_pending, service = self.event_coalescer.dispatch(
+                service, lambda: self.lbdriver.delete_member(member, service),
+                delete_event=True)
             self.cache.put(service, self.agent_host)
             if service_pending:
                 self.needs_resync = True
@@ -1388,8 +1513,9 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
     def create_health_monitor(self, context, health_monitor, service):
         """Handle RPC cast from plugin to create_pool_health_monitor."""
         try:
-            service_pending = \
-                self.lbdriver.create_health_monitor(health_monitor, service)
+            service_pending, service = self.event_coalescer.dispatch(
+                service, lambda: self.lbdriver.create_health_monitor(
+                    health_monitor, service))
             self.cache.put(service, self.agent_host)
             if service_pending:
                 self.needs_resync = True
@@ -1405,10 +1531,9 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
                               health_monitor, service):
         """Handle RPC cast from plugin to update_health_monitor."""
         try:
-            service_pending = \
-                self.lbdriver.update_health_monitor(old_health_monitor,
-                                                    health_monitor,
-                                                    service)
+            service_pending, service = self.event_coalescer.dispatch(
+                service, lambda: self.lbdriver.update_health_monitor(
+                    old_health_monitor, health_monitor, service))
             self.cache.put(service, self.agent_host)
             if service_pending:
                 self.needs_resync = True
@@ -1421,8 +1546,10 @@ class LbaasAgentManager(periodic_task.PeriodicTasks):  # b --> B
     def delete_health_monitor(self, context, health_monitor, service):
         """Handle RPC cast from plugin to delete_health_monitor."""
         try:
-            service_pending = \
-                self.lbdriver.delete_health_monitor(health_monitor, service)
+            service_pending, service = self.event_coalescer.dispatch(
+                service, lambda: self.lbdriver.delete_health_monitor(
+                    health_monitor, service),
+                delete_event=True)
             self.cache.put(service, self.agent_host)
             if service_pending:
                 self.needs_resync = True
@@ -40,6 +40,9 @@ except ImportError:
 from oslo_log import log as logging
 import time
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.container_cache import \
+    ContainerCache
+
 
 LOG = logging.getLogger(__name__)
 
@@ -69,6 +72,8 @@ class BarbicanCertManager(object):
         else:
             self.tenant_name = conf.os_tenant_name
 
+        self.cache = ContainerCache(conf.ccloud_cert_cache_ttl,
+                                    conf.ccloud_cert_cache_size)
         self._init_barbican_client()
 
     def _init_barbican_client(self):
@@ -133,7 +138,7 @@ class BarbicanCertManager(object):
         :returns string: Certificate data.
         This method MUST be implemented, in agent-compliant cert managers.
         """
-        container = self.barbican.containers.get(container_ref)
+        container = self._get_container(container_ref)
         return container.certificate.payload
 
     def get_private_key(self, container_ref):
@@ -144,7 +149,7 @@ class BarbicanCertManager(object):
         :returns string: Key data.
         This method MUST be implemented, in agent-compliant cert managers.
         """
-        container = self.barbican.containers.get(container_ref)
+        container = self._get_container(container_ref)
         return container.private_key.payload
 
     def get_private_key_passphrase(self, container_ref):
@@ -155,7 +160,7 @@ class BarbicanCertManager(object):
         :returns string: passphrase.
         This method MUST be implemented, in agent-compliant cert managers.
         """
-        container = self.barbican.containers.get(container_ref)
+        container = self._get_container(container_ref)
         return container.private_key_passphrase.payload
 
     def get_name(self, container_ref, prefix):
@@ -184,7 +189,18 @@ class BarbicanCertManager(object):
         certificate manager.
         :returns string: Container Object
         """
-        return self.barbican.containers.get(container_ref)
+        return self._get_container(container_ref)
+
+    def invalidate(self, container_ref=None):
+        """Drops a container from the cache.
+
+        :param string container_ref: Reference to container stored in a
+        certificate manager, all containers are dropped if None.
+        """
+        self.cache.invalidate(container_ref)
+
+    def _get_container(self, container_ref):
+        return self.cache.get(container_ref, self.barbican.containers.get)
 
     def get_intermediates(self, container_ref):
         """Retrieves intermediates from barbican certificate.
@@ -193,7 +209,7 @@ class BarbicanCertManager(object):
         certificate manager.
         :returns string: Intermediate payload data.
         """
-        container = self.barbican.containers.get(container_ref)
+        container = self._get_container(container_ref)
         if (container.intermediates and container.intermediates.payload):
             return container.intermediates.payload
         else:
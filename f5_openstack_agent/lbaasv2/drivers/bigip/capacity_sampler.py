@@ -0,0 +1,106 @@
+"""Cached samples of the BIG-IP metrics used for the capacity score."""
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from time import time
+
+from oslo_log import log as logging
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
+    import BigIPResourceHelper
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
+    import ResourceType
+from f5_openstack_agent.lbaasv2.drivers.bigip.stat_helper import StatHelper
+
+LOG = logging.getLogger(__name__)
+
+
+def _is_tenant_folder(item):
+    return item.get('name') not in ['/', 'Common']
+
+
+def _is_overlay_tunnel(item):
+    profile = item.get('profile') or ''
+    return profile.find('vxlan') > 0 or profile.find('gre') > 0
+
+
+def _is_not_default_route_domain(item):
+    return item.get('id') != 0
+
+
+class CapacitySampler(object):
+    """Global statistics and object counts of bigips, cached for max_age.
+
+    The performance statistics are downloaded at most once per bigip
+    within max_age seconds, no matter how many throughput or connection
+    metrics the capacity policy contains, and only the rows of those
+    metrics are parsed.  Objects are counted on collections limited to
+    the attributes the count needs.
+    """
+
+    # count name -> (resource type, $select, partition, item filter)
+    COUNTS = {
+        'node': (ResourceType.node, ['name'], None, None),
+        'virtual_address': (ResourceType.virtual_address, ['name'], None,
+                            None),
+        'virtual_server': (ResourceType.virtual, ['name'], None, None),
+        'clientssl_profile': (ResourceType.client_ssl_profile, ['name'],
+                              'Common', None),
+        'tenant': (ResourceType.folder, ['name'], None, _is_tenant_folder),
+        'tunnel': (ResourceType.tunnel, ['name', 'profile'], None,
+                   _is_overlay_tunnel),
+        'vlan': (ResourceType.vlan, ['name'], None, None),
+        'route_domain': (ResourceType.route_domain, ['name', 'id'], None,
+                         _is_not_default_route_domain),
+    }
+
+    def __init__(self, max_age=0, stat_helper=None):
+        self.max_age = max(0, max_age or 0)
+        self.stat_helper = stat_helper or StatHelper()
+        # (hostname, sample name) -> (timestamp, value)
+        self.samples = {}
+        self.requests = 0
+
+    def get_global_statistics(self, bigip):
+        """Return the CapacityStatistics of a bigip."""
+        return self._sample(bigip, 'global_statistics',
+                            self.stat_helper.get_capacity_statistics)
+
+    def get_count(self, bigip, name):
+        """Return the number of objects of a COUNTS entry on a bigip."""
+        return self._sample(bigip, name, lambda bigip: self._count(bigip,
+                                                                   name))
+
+    def clear(self):
+        self.samples = {}
+
+    def _sample(self, bigip, name, fetch):
+        key = (bigip.hostname, name)
+        sample = self.samples.get(key)
+        if sample and time() - sample[0] < self.max_age:
+            return sample[1]
+
+        value = fetch(bigip)
+        self.requests += 1
+        self.samples[key] = (time(), value)
+        return value
+
+    def _count(self, bigip, name):
+        resource_type, select, partition, item_filter = self.COUNTS[name]
+        items = BigIPResourceHelper(resource_type).get_selected_resources(
+            bigip, select, partition=partition)
+        if item_filter is None:
+            return len(items)
+        return len([item for item in items if item_filter(
+            item if isinstance(item, dict) else item.__dict__)])
@@ -67,6 +67,12 @@ class BaseAction(object):
         self.manager.lbdriver.make_bigips_operational()
         self.driver = self.manager.lbdriver
 
+    def print_plan(self, svc):
+        lb_id = svc['loadbalancer']['id']
+        diff = self.driver.service_diff(svc)
+        plan = self.driver.lbaas_builder.plan_service(svc, diff)
+        print("Objects missing on bigips for load balancer {}: {}".format(lb_id, diff or "none"))
+        print("Plan for load balancer {}: {}".format(lb_id, self.driver.lbaas_builder.format_plan(plan)))
 
     def replace_dict_value(self,obj,key,new_value):
         if isinstance(obj,dict):
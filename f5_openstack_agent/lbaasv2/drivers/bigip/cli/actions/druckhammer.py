@@ -12,6 +12,7 @@ class Druckhammer(base_action.BaseAction):
         self.exempt_folders = ['/', 'Common', 'Drafts']
         self.sure = namespace.sure
         self.sync = namespace.sync
+        self.workers = namespace.workers
         self.project_id = None
         self.sh = system_helper.SystemHelper()
         self.rd_manager = resource_helper.BigIPResourceHelper(
@@ -12,6 +12,7 @@ class Sync(base_action.BaseAction):
 
     def __init__(self, namespace):
         self.lb_id = namespace.lb_id
+        self.dry_run = namespace.dry_run
         super(Sync, self).__init__(namespace)
 
     def execute(self):
@@ -29,6 +30,10 @@ class Sync(base_action.BaseAction):
             print("Loadbalancer {} not found".format(self.lb_id))
             exit(1)
 
+        if self.dry_run:
+            self.print_plan(service)
+            return
+
         service = self.replace_dict_value(service, 'provisioning_status', plugin_const.PENDING_CREATE)
 
         self.driver._common_service_handler(service)
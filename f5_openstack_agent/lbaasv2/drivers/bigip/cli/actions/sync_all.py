@@ -1,17 +1,39 @@
 
+import os
+from time import time
+
 import base_action
 
 from neutron.plugins.common import constants as plugin_const
 
 from oslo_log import log as logging
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.resync_engine import \
+    ResyncEngine
+from f5_openstack_agent.lbaasv2.drivers.bigip.utils import serialized
+
 LOG = logging.getLogger(__name__)
 
 
+@serialized('sync_all')
+def sync_service(driver, service):
+    # serialized per tenant like the driver's own requests, so load
+    # balancers of one tenant don't race creating its shared network objects
+    return driver._common_service_handler(service)
+
+
 class SyncAll(base_action.BaseAction):
 
+    # defaults for actions which execute SyncAll with their own namespace
+    dry_run = False
+    workers = None
+    checkpoint_file = None
+
     def __init__(self, namespace):
         self.project_id = namespace.project_id
+        self.dry_run = namespace.dry_run
+        self.workers = namespace.workers
+        self.checkpoint_file = namespace.checkpoint_file
         super(SyncAll, self).__init__(namespace)
 
     def execute(self):
@@ -23,18 +45,68 @@ class SyncAll(base_action.BaseAction):
         else:
             print("Syncing all LBs hosted on agent {}".format(self.manager.agent_host))
 
-        for service in services:
-
-            if self.project_id is None or service['tenant_id'] == self.project_id :
-
-                detailed_service = self.manager.plugin_rpc.get_service_by_loadbalancer_id(service['lb_id'])
-
-                print("Starting sync attempt for load balancer {}".format(service['lb_id']))
-
-
-                detailed_service = self.replace_dict_value(detailed_service, 'provisioning_status', plugin_const.PENDING_CREATE)
-                self.driver._common_service_handler(detailed_service)
-
-                print("The device state of loadbalancer {} has been synced with Neutron".format(service['lb_id']))
-
-
+        lb_ids = [service['lb_id'] for service in services
+                  if self.project_id is None or service['tenant_id'] == self.project_id]
+
+        if self.dry_run:
+            for lb_id in lb_ids:
+                self.print_plan(self.manager.plugin_rpc.get_service_by_loadbalancer_id(lb_id))
+            return
+
+        synced = self.load_checkpoint()
+        if synced:
+            print("Skipping {} load balancers already synced according to checkpoint {}".format(
+                len(synced & set(lb_ids)), self.checkpoint_file))
+            lb_ids = [lb_id for lb_id in lb_ids if lb_id not in synced]
+
+        engine = ResyncEngine(self.workers or self.conf.ccloud_resync_concurrency)
+        print("Syncing {} load balancers with {} workers".format(len(lb_ids), engine.concurrency))
+
+        started = time()
+        results = engine.run('sync-all', lb_ids, self.sync_loadbalancer, progress=self.print_progress)
+
+        failed = [lb_id for lb_id in lb_ids if not results.get(lb_id)]
+        print("Synced {} of {} load balancers in {:.1f} sec".format(
+            len(lb_ids) - len(failed), len(lb_ids), time() - started))
+        if failed:
+            print("Failed load balancers: {}".format(", ".join(failed)))
+            if self.checkpoint_file:
+                print("Run again with --checkpoint-file {} to retry only these".format(self.checkpoint_file))
+        elif self.checkpoint_file and os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
+
+    def sync_loadbalancer(self, lb_id):
+        detailed_service = self.manager.plugin_rpc.get_service_by_loadbalancer_id(lb_id)
+        if not detailed_service or not detailed_service.get('loadbalancer'):
+            print("Loadbalancer {} not found".format(lb_id))
+            return False
+
+        print("Starting sync attempt for load balancer {}".format(lb_id))
+
+        detailed_service = self.replace_dict_value(detailed_service, 'provisioning_status', plugin_const.PENDING_CREATE)
+        sync_service(self.driver, detailed_service)
+
+        if detailed_service['loadbalancer'].get('provisioning_status') == plugin_const.ERROR:
+            print("Sync of loadbalancer {} failed".format(lb_id))
+            return False
+
+        self.record_checkpoint(lb_id)
+        print("The device state of loadbalancer {} has been synced with Neutron".format(lb_id))
+        return True
+
+    def print_progress(self, lb_id, result, seconds, done, total, eta):
+        print("[{}/{}] {} {} in {:.1f} sec, ETA {:.0f} sec".format(
+            done, total, lb_id, "synced" if result else "FAILED", seconds, eta))
+
+    def load_checkpoint(self):
+        """Return the ids of the load balancers synced by an earlier run."""
+        if not self.checkpoint_file or not os.path.exists(self.checkpoint_file):
+            return set()
+        with open(self.checkpoint_file) as checkpoint:
+            return set(line.strip() for line in checkpoint if line.strip())
+
+    def record_checkpoint(self, lb_id):
+        if not self.checkpoint_file:
+            return
+        with open(self.checkpoint_file, 'a') as checkpoint:
+            checkpoint.write(lb_id + '\n')
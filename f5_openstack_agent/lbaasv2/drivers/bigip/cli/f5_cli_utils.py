@@ -50,10 +50,20 @@ def main():
     parser_sync = subparsers.add_parser('sync', help='sync a specific load balancer')
     parser_sync.add_argument('--lb-id',dest='lb_id',
                        help='router id',action='store')
+    parser_sync.add_argument('--dry-run', action='store_true', dest='dry_run',
+                       help='only print the objects a sync would apply')
 
     parser_sync_all = subparsers.add_parser('sync-all', help='sync all load balancer')
     parser_sync_all.add_argument('--project-id',dest='project_id',
                        help='project id',action='store')
+    parser_sync_all.add_argument('--dry-run', action='store_true', dest='dry_run',
+                       help='only print the objects a sync would apply')
+    parser_sync_all.add_argument('--workers', dest='workers', type=int,
+                       help='number of load balancers synced in parallel, '
+                            'defaults to ccloud_resync_concurrency')
+    parser_sync_all.add_argument('--checkpoint-file', dest='checkpoint_file',
+                       help='file recording synced load balancers, an '
+                            'interrupted run resumes where it stopped')
 
 
     parser_delete = subparsers.add_parser('delete', help='delete a specific load balancer')
@@ -74,6 +84,8 @@ def main():
                                    help='declaration of liability')
     parser_druckhammer.add_argument('--sync', action='store_true', dest='sync',
                                    help='resync all LB from agent/neutron')
+    parser_druckhammer.add_argument('--workers', dest='workers', type=int,
+                                   help='number of load balancers resynced in parallel')
 
     parser.parse_args()
 
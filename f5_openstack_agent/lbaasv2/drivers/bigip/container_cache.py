@@ -0,0 +1,72 @@
+"""Bounded in-memory cache of certificate containers."""
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import collections
+import time
+
+import eventlet.event
+
+
+class ContainerCache(object):
+    """Bounded in-memory cache of Barbican containers.
+
+    Certificates, keys and passphrases are loaded lazily through the
+    cached container objects, so they never leave the agent's memory.
+    Entries expire after ttl seconds, at most max_size containers are
+    kept and the least recently used ones are evicted first. Concurrent
+    lookups of the same container wait for a single fetch.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.containers = collections.OrderedDict()
+        self.loading = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, container_ref, load):
+        """Return a cached container or fetch it with load(container_ref)."""
+        while True:
+            entry = self.containers.pop(container_ref, None)
+            if entry is not None and entry[1] > time.time():
+                # re-insert as most recently used
+                self.containers[container_ref] = entry
+                self.hits += 1
+                return entry[0]
+            loading = self.loading.get(container_ref)
+            if loading is None:
+                break
+            loading.wait()
+
+        self.misses += 1
+        self.loading[container_ref] = eventlet.event.Event()
+        try:
+            container = load(container_ref)
+            if self.ttl > 0 and self.max_size > 0:
+                self.containers[container_ref] = \
+                    (container, time.time() + self.ttl)
+                while len(self.containers) > self.max_size:
+                    self.containers.popitem(last=False)
+        finally:
+            self.loading.pop(container_ref).send(True)
+        return container
+
+    def invalidate(self, container_ref=None):
+        """Drop one container or, without reference, all containers."""
+        if container_ref is None:
+            self.containers.clear()
+        else:
+            self.containers.pop(container_ref, None)
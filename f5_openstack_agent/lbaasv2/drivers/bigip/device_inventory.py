@@ -0,0 +1,123 @@
+"""Snapshot of LBaaS objects deployed on BIG-IPs."""
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import hashlib
+import json
+
+from oslo_log import log as logging
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
+    import BigIPResourceHelper
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
+    import ResourceType
+from f5_openstack_agent.lbaasv2.drivers.bigip.system_helper import SystemHelper
+
+LOG = logging.getLogger(__name__)
+
+
+class DeviceInventory(object):
+    """Snapshot of the objects deployed on BIG-IPs for orphan cleanup.
+
+    Every resource collection is fetched at most once per BIG-IP across
+    all partitions, limited with $select to the attributes the cleanup
+    needs, and indexed by partition and object name. Objects deleted
+    while the snapshot is in use have to be discarded by the caller.
+    """
+
+    SELECT = {
+        ResourceType.virtual_address: ['name', 'partition'],
+        ResourceType.virtual: ['name', 'partition', 'destination', 'pool',
+                               'policiesReference'],
+        ResourceType.pool: ['name', 'partition', 'monitor'],
+        ResourceType.http_monitor: ['name', 'partition'],
+        ResourceType.https_monitor: ['name', 'partition'],
+        ResourceType.tcp_monitor: ['name', 'partition'],
+        ResourceType.ping_monitor: ['name', 'partition'],
+        ResourceType.l7policy: ['name', 'partition'],
+        ResourceType.node: ['name', 'partition', 'address'],
+    }
+
+    EXPAND_SUBCOLLECTIONS = [ResourceType.virtual]
+
+    def __init__(self):
+        self.system_helper = SystemHelper()
+        self.folders = {}
+        self.resources = {}
+        self.requests = 0
+
+    def get_folders(self, bigip):
+        """Return the names of all folders on a BIG-IP."""
+        if bigip.hostname not in self.folders:
+            self.folders[bigip.hostname] = \
+                self.system_helper.get_folders(bigip)
+            self.requests += 1
+        return self.folders[bigip.hostname]
+
+    def get_resources(self, bigip, resource_type, partition):
+        """Return all objects of a type within a partition as dicts."""
+        return self._index(bigip, resource_type).get(partition, {}).values()
+
+    def get_resource(self, bigip, resource_type, partition, name):
+        """Return a single object as dict or None if it is not deployed."""
+        return self._index(bigip, resource_type).get(
+            partition, {}).get(name)
+
+    def discard(self, bigip, resource_type, partition, name):
+        """Remove a deleted object from the snapshot."""
+        key = (bigip.hostname, resource_type)
+        if key in self.resources:
+            self.resources[key].get(partition, {}).pop(name, None)
+
+    def discard_folder(self, bigip, folder):
+        """Remove a deleted folder and its objects from the snapshot."""
+        folders = self.folders.get(bigip.hostname)
+        if folders and folder in folders:
+            folders.remove(folder)
+        for (hostname, resource_type), index in self.resources.items():
+            if hostname == bigip.hostname:
+                index.pop(folder, None)
+
+    def get_fingerprints(self, bigip, resource_types):
+        """Return a hash of the selected objects for every partition."""
+        items = {}
+        for resource_type in resource_types:
+            for partition, objects in self._index(
+                    bigip, resource_type).items():
+                items.setdefault(partition, []).append(
+                    (resource_type.name, sorted(objects.items())))
+        return dict(
+            (partition, hashlib.sha1(json.dumps(
+                value, sort_keys=True, default=str).encode('utf-8')
+            ).hexdigest())
+            for partition, value in items.items())
+
+    def _index(self, bigip, resource_type):
+        key = (bigip.hostname, resource_type)
+        if key not in self.resources:
+            items = BigIPResourceHelper(resource_type).get_selected_resources(
+                bigip, self.SELECT[resource_type],
+                resource_type in self.EXPAND_SUBCOLLECTIONS)
+            self.requests += 1
+            index = {}
+            for item in items:
+                if not isinstance(item, dict):
+                    item = item.__dict__
+                index.setdefault(item.get('partition'), {})[
+                    item.get('name')] = item
+            LOG.debug("inventory: fetched %d %s objects from %s"
+                      % (len(items), resource_type.name, bigip.hostname))
+            self.resources[key] = index
+        return self.resources[key]
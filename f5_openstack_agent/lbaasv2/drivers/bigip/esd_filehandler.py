@@ -15,6 +15,7 @@
 #
 
 import glob
+import hashlib
 import json
 import os
 import types
@@ -37,24 +38,70 @@ class EsdJSONValidation(object):
     It checks and parses the content of json file(s) to a dictionary
     """
     def __init__(self, esddir):
+        self.esddir = esddir
         self.esdJSONFileList = glob.glob(os.path.join(esddir, '*.json'))
         self.esdJSONDict = {}
+        # modification time and digest of every file read
+        self.file_state = {}
+        # content of every file read
+        self.file_dicts = {}
 
     def read_json(self):
         for fileList in self.esdJSONFileList:
-            try:
-                with open(fileList) as json_file:
-                    # Reading each file to a dictionary
-                    fileJSONDict = json.load(json_file)
-                    # Combine all dictionaries to one
-                    self.esdJSONDict.update(fileJSONDict)
-
-            except ValueError as err:
-                    LOG.error('ESD JSON File is invalid: %s', err)
-                    raise f5_ex.esdJSONFileInvalidException()
+            # Combine all dictionaries to one
+            self.esdJSONDict.update(self.read_json_file(fileList))
 
         return self.esdJSONDict
 
+    def read_json_file(self, path):
+        """Read a single json file and remember its state.
+
+        The state of invalid files is remembered as well, so they are
+        only read again once they changed.
+        """
+        with open(path) as json_file:
+            content = json_file.read()
+        self.file_state[path] = (os.path.getmtime(path),
+                                 hashlib.sha1(content).hexdigest())
+        try:
+            # Reading each file to a dictionary
+            fileJSONDict = json.loads(content)
+        except ValueError as err:
+            LOG.error('ESD JSON File is invalid: %s', err)
+            raise f5_ex.esdJSONFileInvalidException()
+
+        self.file_dicts[path] = fileJSONDict
+        return fileJSONDict
+
+    def changed_files(self):
+        """Return the json files changed and removed since they were read.
+
+        Files are compared by modification time first, only files with a
+        new modification time are hashed. Files which were touched but
+        not changed just get their modification time updated.
+        """
+        self.esdJSONFileList = glob.glob(os.path.join(self.esddir, '*.json'))
+        changed = []
+        for path in self.esdJSONFileList:
+            state = self.file_state.get(path)
+            try:
+                mtime = os.path.getmtime(path)
+                if state and state[0] == mtime:
+                    continue
+                with open(path) as json_file:
+                    digest = hashlib.sha1(json_file.read()).hexdigest()
+            except (IOError, OSError) as err:
+                LOG.warning('ESD JSON File %s not readable: %s', path, err)
+                continue
+            if state and state[1] == digest:
+                self.file_state[path] = (mtime, digest)
+            else:
+                changed.append(path)
+
+        removed = [path for path in self.file_state
+                   if path not in self.esdJSONFileList]
+        return changed, removed
+
 
 class EsdTagProcessor(EsdJSONValidation):
     """Class processes json dictionary
@@ -63,6 +110,11 @@ class EsdTagProcessor(EsdJSONValidation):
     """
     def __init__(self, esddir):
         super(EsdTagProcessor, self).__init__(esddir)
+        self.esd_dict = {}
+        # valid ESDs of every file
+        self.file_esds = {}
+        # names of /Common objects per bigip and resource type
+        self.resource_names = {}
 
     # this function will return intersection of known valid esd tags
     # and the ones that user provided
@@ -76,25 +128,101 @@ class EsdTagProcessor(EsdJSONValidation):
             LOG.error("invalid tags in the user esd tags")
 
     def process_esd(self, bigips):
-        try:
-            dict = self.read_json()
-            self.esd_dict = self.verify_esd_dict(bigips, dict)
-        except f5_ex.esdJSONFileInvalidException:
-            self.esd_dict = {}
-            raise
+        """Read and validate the ESDs of all json files.
+
+        Every file is read on its own, so the ESDs of valid files are
+        kept if another file is invalid. esdJSONFileInvalidException is
+        raised after all valid files are processed.
+        """
+        invalid = []
+        for path in self.esdJSONFileList:
+            try:
+                self.read_json_file(path)
+            except f5_ex.esdJSONFileInvalidException:
+                invalid.append(path)
+        self._verify_files(bigips)
+
+        if invalid:
+            raise f5_ex.esdJSONFileInvalidException(
+                'invalid ESD files: %s' % ', '.join(invalid))
+
+    def reload_esd(self, bigips):
+        """Re-validate the ESDs once json files changed since the last read.
+
+        Returns True if the ESDs of any file changed. The /Common
+        collections are fetched again because referenced objects may have
+        changed too, so the ESDs of all files are validated again. Files
+        which are not valid json keep their previous ESDs.
+        """
+        changed, removed = self.changed_files()
+        if not changed and not removed:
+            return False
+
+        reloaded = False
+        for path in changed:
+            try:
+                esd_dict = self.read_json_file(path)
+            except f5_ex.esdJSONFileInvalidException:
+                continue
+            LOG.info("ESD file %s changed, %d ESDs", path, len(esd_dict))
+            reloaded = True
+        if not reloaded and not removed:
+            return False
+        for path in removed:
+            LOG.info("ESD file %s removed", path)
+            self.file_state.pop(path, None)
+            self.file_dicts.pop(path, None)
+
+        self._verify_files(bigips)
+        return True
+
+    def _verify_files(self, bigips):
+        # validate against fresh /Common collections
+        self.resource_names = {}
+        self.file_esds = dict(
+            (path, self.verify_esd_dict(bigips, esd_dict))
+            for path, esd_dict in self.file_dicts.items())
+        self._merge_esds()
+
+    def _merge_esds(self):
+        # like read_json, an ESD of a later file replaces the earlier one
+        owners = {}
+        for path in self.esdJSONFileList:
+            for name in self.file_dicts.get(path, {}):
+                owners[name] = path
+        self.esdJSONDict = {}
+        for path in self.esdJSONFileList:
+            self.esdJSONDict.update(self.file_dicts.get(path, {}))
+        self.esd_dict = dict(
+            (name, self.file_esds[path][name])
+            for name, path in owners.items()
+            if name in self.file_esds.get(path, {}))
 
     def get_esd(self, name):
         return self.esd_dict.get(name, None)
 
     def resource_exists(self, bigip, tag_name, resource_type):
-        helper = BigIPResourceHelper(resource_type)
         name = tag_name
 
         # allow user to define chain cert name with or without '.crt'
         if resource_type == ResourceType.ssl_cert_file and not \
                 name.endswith('.crt'):
             name += '.crt'
-        return helper.exists_in_collection(bigip, name)
+        return name in self.get_resource_names(bigip, resource_type)
+
+    def get_resource_names(self, bigip, resource_type):
+        """Return the names of all /Common objects of a type on a bigip.
+
+        Every collection is fetched only once per validation pass.
+        """
+        key = (bigip.hostname, resource_type)
+        if key not in self.resource_names:
+            helper = BigIPResourceHelper(resource_type)
+            self.resource_names[key] = set(
+                item['name'] if isinstance(item, dict) else item.name
+                for item in helper.get_selected_resources(
+                    bigip, ['name'], partition='Common'))
+        return self.resource_names[key]
 
     def get_resource_type(self, bigip, resource_type, value):
         if resource_type == ResourceType.persistence:
@@ -0,0 +1,102 @@
+"""Coalescing of loadbalancer change events received via RPC."""
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import eventlet
+import eventlet.event
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class EventCoalescer(object):
+    """Apply a burst of events for one loadbalancer with one assurance.
+
+    Every driver call for a member, pool or health monitor event assures
+    the complete service of the loadbalancer.  The events of a
+    loadbalancer are therefore buffered for window seconds.  A single
+    event is then handled by its own driver call.  For several events the
+    latest service definition is fetched once and applied by one call of
+    apply_service(service, delete_event) per kind of event: creates and
+    updates with delete_event False, then deletes with delete_event True,
+    as the driver only runs its delete stages for a delete event.  Every
+    buffered event returns the result of the last call together with the
+    service that was applied, or raises its exception.
+    """
+
+    def __init__(self, window, apply_service, fetch_service):
+        self.window = max(0.0, float(window or 0.0))
+        self.apply_service = apply_service
+        self.fetch_service = fetch_service
+        # lb id -> batch of buffered events
+        self.batches = {}
+        self.coalesced = 0
+
+    def dispatch(self, service, call, delete_event=False):
+        """Handle an event, call() applies it on its own.
+
+        Returns a tuple of the result and the service which was applied,
+        i.e. the latest service if the event was coalesced with others.
+        """
+        lb_id = service['loadbalancer']['id']
+        if not self.window:
+            return call(), service
+
+        batch = self.batches.get(lb_id)
+        if batch is None:
+            batch = {'calls': [], 'services': [], 'delete_event': False,
+                     'update_event': False, 'done': eventlet.event.Event()}
+            self.batches[lb_id] = batch
+            eventlet.spawn_after(self.window, self._flush, lb_id)
+        batch['calls'].append(call)
+        batch['services'].append(service)
+        if delete_event:
+            batch['delete_event'] = True
+        else:
+            batch['update_event'] = True
+        return batch['done'].wait()
+
+    def _flush(self, lb_id):
+        batch = self.batches.pop(lb_id)
+        try:
+            if len(batch['calls']) == 1:
+                result = batch['calls'][0](), batch['services'][0]
+            else:
+                result = self._apply_latest(lb_id, batch)
+        except Exception as exc:
+            batch['done'].send_exception(exc)
+        else:
+            batch['done'].send(result)
+
+    def _apply_latest(self, lb_id, batch):
+        service = self.fetch_service(lb_id)
+        if not service or not service.get('loadbalancer'):
+            # the loadbalancer is gone, let the events apply themselves
+            LOG.debug("ccloud: loadbalancer %s not found, applying %d "
+                      "events one by one" % (lb_id, len(batch['calls'])))
+            result = None
+            for call in batch['calls']:
+                result = call()
+            return result, batch['services'][-1]
+
+        self.coalesced += len(batch['calls']) - 1
+        LOG.info("ccloud: applying %d events of loadbalancer %s at once"
+                 % (len(batch['calls']), lb_id))
+        result = None
+        if batch['update_event']:
+            result = self.apply_service(service, delete_event=False)
+        if batch['delete_event']:
+            result = self.apply_service(service, delete_event=True)
+        return result, service
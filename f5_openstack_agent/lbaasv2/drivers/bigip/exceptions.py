@@ -399,6 +399,10 @@ class L7PolicyDeleteException(F5AgentException):
     pass
 
 
+class TransactionCommitException(F5AgentException):
+    pass
+
+
 class esdJSONFileEmptyException(F5AgentException):
     pass
 
@@ -0,0 +1,175 @@
+"""Coalescing writer for vxlan/gre tunnel FDB records."""
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import collections
+import time
+
+import eventlet
+import eventlet.semaphore
+
+from oslo_log import log as logging
+
+from f5_openstack_agent.lbaasv2.drivers.bigip import utils
+
+LOG = logging.getLogger(__name__)
+
+
+class FdbEngine(object):
+    """Merge l2population FDB events and write each tunnel once.
+
+    Add and remove events are queued per bigip and tunnel and written
+    after window seconds, so a burst of port events ends up in a single
+    PATCH of the record list of every affected tunnel.  The records of
+    each tunnel are mirrored in memory after the first load, the events
+    are applied to the mirror in order and the tunnel is only written if
+    the resulting set of records differs from the mirror.  A mirrored
+    tunnel is loaded again after ttl seconds, so records changed on the
+    device behind the agent's back are picked up eventually.
+
+    A remove only deletes a record if it still points to the removed
+    endpoint, so a MAC which moved to another VTEP survives a late remove
+    for its old VTEP.
+    """
+
+    def __init__(self, window=0.0, ttl=0):
+        self.window = max(0.0, float(window or 0.0))
+        self.ttl = ttl
+        # (hostname, tunnel_name) -> list of (mac, endpoint, add)
+        self.pending = collections.OrderedDict()
+        # (hostname, tunnel_name) -> (tunnel, {mac: endpoint}, expires)
+        self.mirror = {}
+        # (hostname, tunnel_name) -> folder
+        self.folders = {}
+        self.bigips = {}
+        self.writes = 0
+        self.flush_thread = None
+        self.lock = eventlet.semaphore.Semaphore()
+
+    def add(self, bigip, fdbs):
+        """Queue records of {tunnel_name: {'records': {mac: {...}}}}."""
+        self._queue(bigip, fdbs, True)
+
+    def remove(self, bigip, fdbs):
+        """Queue removal of records of {tunnel_name: {'records': ...}}."""
+        self._queue(bigip, fdbs, False)
+
+    def _queue(self, bigip, fdbs, add):
+        if not fdbs:
+            return
+        self.bigips[bigip.hostname] = bigip
+        for tunnel_name, tunnel_fdbs in fdbs.items():
+            ops = self.pending.setdefault((bigip.hostname, tunnel_name), [])
+            for mac, record in tunnel_fdbs['records'].items():
+                ops.append((mac, record['endpoint'], add))
+
+        if not self.window:
+            self.flush()
+        elif self.flush_thread is None:
+            self.flush_thread = eventlet.spawn_after(self.window,
+                                                     self._scheduled_flush)
+
+    def _scheduled_flush(self):
+        self.flush_thread = None
+        self.flush()
+
+    def flush(self):
+        """Write all queued events to the bigips."""
+        with self.lock:
+            pending, self.pending = self.pending, collections.OrderedDict()
+            if not pending:
+                return
+            by_host = collections.OrderedDict()
+            for (hostname, tunnel_name), ops in pending.items():
+                by_host.setdefault(hostname, []).append((tunnel_name, ops))
+
+            def _write_bigip(bigip):
+                for tunnel_name, ops in by_host[bigip.hostname]:
+                    self._write_tunnel(bigip, tunnel_name, ops)
+
+            utils.fan_out([self.bigips[hostname] for hostname in by_host],
+                          _write_bigip)
+
+    def invalidate(self, bigip, tunnel_name):
+        """Drop the mirrored records after a tunnel was written directly."""
+        self.mirror.pop((bigip.hostname, tunnel_name), None)
+
+    def forget(self, bigip, tunnel_name):
+        """Drop everything known about a deleted tunnel."""
+        self.invalidate(bigip, tunnel_name)
+        self.folders.pop((bigip.hostname, tunnel_name), None)
+
+    def clear(self):
+        """Drop all mirrored records and folders, e.g. on a full resync."""
+        self.mirror = {}
+        self.folders = {}
+
+    def _write_tunnel(self, bigip, tunnel_name, ops):
+        key = (bigip.hostname, tunnel_name)
+        try:
+            tunnel, current = self._get_tunnel(bigip, tunnel_name)
+            if tunnel is None:
+                LOG.debug("ccloud: tunnel %s does not exist on %s, "
+                          "skipping %d fdb events"
+                          % (tunnel_name, bigip.hostname, len(ops)))
+                return
+
+            records = dict(current)
+            for mac, endpoint, add in ops:
+                if add:
+                    records[mac] = endpoint
+                elif records.get(mac) == endpoint:
+                    del records[mac]
+            if records == current:
+                return
+
+            tunnel.modify(records=[{'name': mac, 'endpoint': records[mac]}
+                                   for mac in sorted(records)] or None)
+            self.writes += 1
+            self._mirror(key, tunnel, records)
+            LOG.debug("ccloud: wrote %d fdb records of tunnel %s on %s "
+                      "for %d events" % (len(records), tunnel_name,
+                                         bigip.hostname, len(ops)))
+        except Exception as exc:
+            LOG.error("ccloud: failed to write fdb records of tunnel %s on "
+                      "%s: %s" % (tunnel_name, bigip.hostname, exc))
+            self.forget(bigip, tunnel_name)
+
+    def _get_tunnel(self, bigip, tunnel_name):
+        key = (bigip.hostname, tunnel_name)
+        if key in self.mirror:
+            tunnel, current, expires = self.mirror[key]
+            if expires is None or time.time() < expires:
+                return tunnel, current
+            del self.mirror[key]
+
+        if key not in self.folders:
+            # one collection fetch resolves the folders of all tunnels
+            for tunnel in bigip.tm.net.fdb.tunnels.get_collection():
+                self.folders[(bigip.hostname, tunnel.name)] = \
+                    tunnel.partition
+        folder = self.folders.get(key)
+        if folder is None:
+            return None, None
+
+        tunnel = bigip.tm.net.fdb.tunnels.tunnel.load(name=tunnel_name,
+                                                      partition=folder)
+        current = dict((record['name'], record['endpoint'])
+                       for record in getattr(tunnel, 'records', None) or [])
+        self._mirror(key, tunnel, current)
+        return tunnel, current
+
+    def _mirror(self, key, tunnel, records):
+        expires = time.time() + self.ttl if self.ttl > 0 else None
+        self.mirror[key] = (tunnel, records, expires)
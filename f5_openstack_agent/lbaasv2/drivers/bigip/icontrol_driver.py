@@ -15,12 +15,14 @@
 # limitations under the License.
 #
 
+import copy
 import datetime
 import hashlib
 import json
 import logging as std_logging
 import os
 import urllib
+from requests.adapters import DEFAULT_POOLSIZE
 from requests import HTTPError
 
 from eventlet import greenthread
@@ -37,12 +39,16 @@ from oslo_log import log as logging
 from oslo_utils import importutils
 
 from f5.bigip import ManagementRoot
+from f5_openstack_agent.lbaasv2.drivers.bigip.capacity_sampler import \
+    CapacitySampler
 from f5_openstack_agent.lbaasv2.drivers.bigip.cluster_manager import \
     ClusterManager
 from f5_openstack_agent.lbaasv2.drivers.bigip import constants_v2 as f5const
+from f5_openstack_agent.lbaasv2.drivers.bigip import device_inventory
 from f5_openstack_agent.lbaasv2.drivers.bigip.esd_filehandler import \
     EsdTagProcessor
 from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5ex
+from f5_openstack_agent.lbaasv2.drivers.bigip import icontrol_session
 from f5_openstack_agent.lbaasv2.drivers.bigip.lbaas_builder import \
     LBaaSBuilder
 from f5_openstack_agent.lbaasv2.drivers.bigip.lbaas_driver import \
@@ -53,18 +59,16 @@ from f5_openstack_agent.lbaasv2.drivers.bigip.network_service import \
 from f5_openstack_agent.lbaasv2.drivers.bigip import resource_helper
 from f5_openstack_agent.lbaasv2.drivers.bigip.service_adapter import \
     ServiceModelAdapter
-from f5_openstack_agent.lbaasv2.drivers.bigip import ssl_profile
 from f5_openstack_agent.lbaasv2.drivers.bigip import stat_helper
 from f5_openstack_agent.lbaasv2.drivers.bigip.system_helper import \
     SystemHelper
 from f5_openstack_agent.lbaasv2.drivers.bigip.tenants import \
     BigipTenantManager
+from f5_openstack_agent.lbaasv2.drivers.bigip import utils
 from f5_openstack_agent.lbaasv2.drivers.bigip.utils import serialized
 from f5_openstack_agent.lbaasv2.drivers.bigip.virtual_address import \
     VirtualAddress
 
-import re
-
 LOG = logging.getLogger(__name__)
 
 NS_PREFIX = 'qlbaas-'
@@ -263,6 +267,17 @@ OPTS = [  # XXX maybe we should make this a dictionary
         default=None,
         help='OpenStack user password for Keystone authentication.'
     ),
+    cfg.IntOpt(
+        'ccloud_cert_cache_ttl',
+        default=300,
+        help=('Seconds Barbican containers are cached in memory, 0 '
+              'disables the cache.')
+    ),
+    cfg.IntOpt(
+        'ccloud_cert_cache_size',
+        default=1000,
+        help='Maximum number of Barbican containers cached in memory.'
+    ),
     cfg.StrOpt(
         'f5_network_segment_physical_network', default=None,
         help='Name of physical network to use for discovery of segment ID'
@@ -320,6 +335,94 @@ OPTS = [  # XXX maybe we should make this a dictionary
         'trace_service_requests',
         default=False,
         help='Log service object.'
+    ),
+    cfg.StrOpt(
+        'ccloud_serialize_scope',
+        default='tenant',
+        choices=['global', 'tenant', 'loadbalancer'],
+        help=('Scope in which driver requests are serialized. Requests '
+              'of different scopes are processed in parallel.')
+    ),
+    cfg.BoolOpt(
+        'ccloud_operating_status_changes_only',
+        default=False,
+        help=('Only report member operating status to neutron if it '
+              'differs from the status known to neutron.')
+    ),
+    cfg.BoolOpt(
+        'ccloud_service_planning',
+        default=False,
+        help=('Compare services with the objects deployed on the bigips '
+              'before applying them and only create or update listeners, '
+              'pools, monitors and members which are missing or changed.')
+    ),
+    cfg.FloatOpt(
+        'ccloud_fdb_coalesce_window',
+        default=0.5,
+        help=('Seconds to collect l2population fdb events before the '
+              'records of each affected tunnel are written in one '
+              'request. 0 writes every event right away.')
+    ),
+    cfg.IntOpt(
+        'ccloud_fdb_mirror_ttl',
+        default=300,
+        help=('Seconds the fdb records of a tunnel are kept in memory '
+              'before they are read from the device again. 0 keeps them '
+              'until the next full resync.')
+    ),
+    cfg.StrOpt(
+        'ccloud_rds_cache_file',
+        default=None,
+        help=('Local file to persist the route domain cache in, so a '
+              'restarted agent does not have to read the route domains, '
+              'VLANs and selfips of all tenants from the bigips again.')
+    ),
+    cfg.IntOpt(
+        'ccloud_capacity_sample_max_age',
+        default=60,
+        help=('Seconds the statistics and object counts used for the '
+              'capacity score are reused before they are fetched from '
+              'the bigips again. 0 fetches them for every state report.')
+    ),
+    cfg.BoolOpt(
+        'ccloud_member_fast_path',
+        default=True,
+        help=('Apply a single member change to its pool only, if the '
+              'networking of the member subnet is already assured and '
+              'nothing else of the loadbalancer is pending.')
+    ),
+    cfg.BoolOpt(
+        'ccloud_rest_transactions',
+        default=False,
+        help=('Queue the monitor, member and pool writes of a service in '
+              'one iControl REST transaction per bigip and stage, so they '
+              'are committed at once or not at all. Stages whose commit '
+              'fails are applied again without transaction.')
+    ),
+    cfg.IntOpt(
+        'ccloud_icontrol_pool_size',
+        default=0,
+        help=('Connections kept alive per BIG-IP. 0 sizes the pool to '
+              'ccloud_resync_concurrency plus 10 for the RPC handlers.')
+    ),
+    cfg.IntOpt(
+        'ccloud_icontrol_retries',
+        default=3,
+        help=('Retries of idempotent iControl requests failing with a '
+              'transient 5xx status or connection error. 0 disables them.')
+    ),
+    cfg.FloatOpt(
+        'ccloud_icontrol_retry_backoff',
+        default=0.5,
+        help=('Backoff factor in seconds between iControl retries. Retry n '
+              'waits a random time up to backoff * 2^(n-1) seconds.')
+    ),
+    cfg.BoolOpt(
+        'ccloud_icontrol_token_auth',
+        default=True,
+        help=('Authenticate iControl requests with a token which is reused '
+              'until shortly before it expires, instead of sending the '
+              'credentials with every request.')
     )
 ]
 
@@ -345,6 +448,10 @@ def is_operational(method):
 class iControlDriver(LBaaSBaseDriver):
     '''gets rpc plugin from manager (which instantiates, via importutils'''
 
+    # capacity metrics read from the performance statistics
+    GLOBAL_STATISTICS_METRICS = ['inbound_throughput', 'outbound_throughput',
+                                 'throughput', 'active_connections', 'ssltps']
+
     def __init__(self, conf, registerOpts=True):
         # The registerOpts parameter allows a test to
         # turn off config option handling so that it can
@@ -385,6 +492,7 @@ class iControlDriver(LBaaSBaseDriver):
         self.cluster_manager = None
         self.system_helper = None
         self.lbaas_builder = None
+        self.esd_processor = None
         self.service_adapter = None
         self.vlan_binding = None
         self.l3_binding = None
@@ -392,6 +500,8 @@ class iControlDriver(LBaaSBaseDriver):
 
         # server helpers
         self.stat_helper = stat_helper.StatHelper()
+        self.capacity_sampler = CapacitySampler(
+            self.conf.ccloud_capacity_sample_max_age, self.stat_helper)
         self.network_helper = network_helper.NetworkHelper()
 
         # f5-sdk helpers
@@ -404,6 +514,8 @@ class iControlDriver(LBaaSBaseDriver):
 
         self.orphan_cache = {}
         self.orphan_cache_last_reset = datetime.datetime.now()
+        # device inventory snapshot shared during an orphan cleanup cycle
+        self.inventory = None
         self.orphan_cleanup_testrun = self.conf.ccloud_orphans_cleanup_testrun
 
         try:
@@ -682,6 +794,11 @@ class iControlDriver(LBaaSBaseDriver):
                                    self.conf.icontrol_username,
                                    self.conf.icontrol_password,
                                    timeout=f5const.DEVICE_CONNECTION_TIMEOUT)
+            icontrol_session.configure(
+                bigip, self._icontrol_pool_size(),
+                retries=self.conf.ccloud_icontrol_retries,
+                backoff_factor=self.conf.ccloud_icontrol_retry_backoff,
+                token_auth=self.conf.ccloud_icontrol_token_auth)
             bigip.status = 'connected'
             bigip.status_message = 'connected to BIG-IP'
             self.__bigips[hostname] = bigip
@@ -698,6 +815,12 @@ class iControlDriver(LBaaSBaseDriver):
             self.__bigips[hostname] = errbigip
             return errbigip
 
+    def _icontrol_pool_size(self):
+        if self.conf.ccloud_icontrol_pool_size > 0:
+            return self.conf.ccloud_icontrol_pool_size
+        return getattr(self.conf, 'ccloud_resync_concurrency', 1) + \
+            DEFAULT_POOLSIZE
+
     def _init_bigip(self, bigip, hostname, check_group_name=None):
         # Prepare a bigip for usage
         try:
@@ -825,12 +948,15 @@ class iControlDriver(LBaaSBaseDriver):
         # read enhanced services definitions
         esd_dir = os.path.join(self.get_config_dir(), 'esd')
         esd = EsdTagProcessor(esd_dir)
+        # keep the processor, a broken file can be fixed by reload_esd
+        self.esd_processor = esd
         try:
             esd.process_esd(self.get_all_bigips())
-            self.lbaas_builder.init_esd(esd)
-            #ccloud: self.service_adapter.init_esd(esd)
         except f5ex.esdJSONFileInvalidException as err:
             LOG.error("unable to initialize ESD. Error: %s.", err.message)
+        # the ESDs of valid files are used even if another file is invalid
+        self.lbaas_builder.init_esd(esd)
+        #ccloud: self.service_adapter.init_esd(esd)
         self._set_agent_status(False)
 
     def _validate_ha(self, bigip):
@@ -1004,6 +1130,8 @@ class iControlDriver(LBaaSBaseDriver):
             highest_metric_name = None
             my_methods = dir(self)
             bigips = self.get_all_bigips()
+            # statistics are fetched once per bigip and report
+            global_stats = {}
             for metric in capacity_policy:
                 func_name = 'get_' + metric
                 if func_name in my_methods:
@@ -1012,11 +1140,15 @@ class iControlDriver(LBaaSBaseDriver):
                     metric_value = 0
                     for bigip in bigips:
                         if bigip.status == 'active':
-                            global_stats = \
-                                self.stat_helper.get_global_statistics(bigip)
+                            if metric in self.GLOBAL_STATISTICS_METRICS and \
+                                    bigip.hostname not in global_stats:
+                                global_stats[bigip.hostname] = \
+                                    self.capacity_sampler.\
+                                    get_global_statistics(bigip)
                             value = int(
                                 metric_func(bigip=bigip,
-                                            global_statistics=global_stats)
+                                            global_statistics=global_stats.get(
+                                                bigip.hostname))
                             )
                             LOG.debug('calling capacity %s on %s returned: %s'
                                       % (func_name, bigip.hostname, value))
@@ -1069,30 +1201,100 @@ class iControlDriver(LBaaSBaseDriver):
             bigip.assured_networks = {}
             bigip.assured_tenant_snat_subnets = {}
             bigip.assured_gateway_subnets = []
+        if self.network_builder:
+            self.network_builder.network_index.clear()
+            self.network_builder.l2_service.fdb_engine.clear()
+            self.network_builder.rds_cache.invalidate()
+
+    def forget_loadbalancer(self, loadbalancer_id):
+        """Drop a loadbalancer which is no longer hosted by the agent."""
+        if self.network_builder:
+            self.network_builder.network_index.remove(loadbalancer_id)
 
     # method is only needed for f5-utils cli calls like druckhammer, ...
     @is_operational
     def make_bigips_operational(self):
         return
 
+    @is_operational
+    def reload_esd(self):
+        """Re-validate ESD files changed since they were read."""
+        if not self.esd_processor:
+            return
+        try:
+            if self.esd_processor.reload_esd(self.get_all_bigips()):
+                self.lbaas_builder.init_esd(self.esd_processor)
+                LOG.info("ccloud: ESDs reloaded, %d valid ESDs",
+                         len(self.esd_processor.esd_dict))
+        except Exception as err:
+            LOG.exception("ccloud: ESD reload failed: %s", err.message)
+
+
+    def open_inventory(self):
+        """Share one device inventory snapshot until close_inventory."""
+        self.inventory = device_inventory.DeviceInventory()
+
+    def close_inventory(self):
+        """Drop the shared device inventory snapshot."""
+        if self.inventory:
+            LOG.debug('device inventory was built with %d requests'
+                      % self.inventory.requests)
+        self.inventory = None
+
+    # object types whose changes make an incremental resync validate the
+    # loadbalancers of a tenant again
+    FINGERPRINT_TYPES = [resource_helper.ResourceType.virtual_address,
+                         resource_helper.ResourceType.virtual,
+                         resource_helper.ResourceType.pool]
+
+    @is_operational
+    def get_tenant_fingerprints(self):
+        """Return a hash of the deployed objects of every tenant."""
+        inventory = device_inventory.DeviceInventory()
+        digests = {}
+        for bigip in self.get_all_bigips():
+            fingerprints = inventory.get_fingerprints(
+                bigip, self.FINGERPRINT_TYPES)
+            for partition, digest in fingerprints.items():
+                if partition.startswith(self.service_adapter.prefix):
+                    tenant_id = partition[len(self.service_adapter.prefix):]
+                    digests.setdefault(tenant_id, []).append(
+                        (bigip.hostname, digest))
+        return dict((tenant_id, hashlib.sha1(
+            json.dumps(sorted(value))).hexdigest())
+            for tenant_id, value in digests.items())
+
+    def _get_inventory(self):
+        if self.inventory:
+            return self.inventory
+        return device_inventory.DeviceInventory()
+
+    def _discard_from_inventory(self, bigip, resource_type, partition, name):
+        if self.inventory:
+            self.inventory.discard(bigip, resource_type, partition, name)
 
     @serialized('get_all_deployed_loadbalancers')
     @is_operational
     def get_all_deployed_loadbalancers(self, purge_orphaned_folders=False):
         LOG.debug('getting all deployed loadbalancers on BIG-IPs')
         deployed_lb_dict = {}
+        inventory = self._get_inventory()
+        prefix = self.service_adapter.prefix
+        fdb_engine = None
+        if self.network_builder:
+            fdb_engine = self.network_builder.l2_service.fdb_engine
         for bigip in self.get_all_bigips():
-            folders = self.system_helper.get_folders(bigip)
-            for folder in folders:
-                tenant_id = folder[len(self.service_adapter.prefix):]
-                if str(folder).startswith(self.service_adapter.prefix):
-                    resource = resource_helper.BigIPResourceHelper(
-                        resource_helper.ResourceType.virtual_address)
-                    deployed_lbs = resource.get_resources(bigip, folder)
+            empty_folders = []
+            for folder in inventory.get_folders(bigip):
+                tenant_id = folder[len(prefix):]
+                if str(folder).startswith(prefix):
+                    deployed_lbs = inventory.get_resources(
+                        bigip, resource_helper.ResourceType.virtual_address,
+                        folder)
                     if deployed_lbs:
                         for lb in deployed_lbs:
-                            if lb.name.startswith(self.service_adapter.prefix):
-                                lb_id = lb.name[len(self.service_adapter.prefix):]
+                            if lb['name'].startswith(prefix):
+                                lb_id = lb['name'][len(prefix):]
                                 if lb_id in deployed_lb_dict:
                                     deployed_lb_dict[lb_id][
                                         'hostnames'].append(bigip.hostname)
@@ -1103,63 +1305,70 @@ class iControlDriver(LBaaSBaseDriver):
                                         'hostnames': [bigip.hostname]
                                     }
                     else:
-                        # delay to assure we are not in the tenant creation
-                        # process before a virtual address is created.
-                        greenthread.sleep(10)
-                        deployed_lbs = resource.get_resources(bigip, folder)
-                        if deployed_lbs:
-                            for lb in deployed_lbs:
-                                if lb.name.startswith(self.service_adapter.prefix):
-                                    lb_id = lb.name[len(self.service_adapter.prefix):]
-                                    deployed_lb_dict[lb_id] = \
-                                        {'id': lb_id, 'tenant_id': tenant_id}
-                        else:
-                            # Orphaned folder!
-                            if purge_orphaned_folders:
-                                try:
-                                    if self._is_orphan(bigip.device_name, folder):
-                                        self.system_helper.purge_folder_contents(bigip, folder)
-                                        self.system_helper.purge_folder(bigip, folder)
-                                        self._remove_from_orphan_cache(bigip.device_name, folder)
-                                        LOG.warning('ccloud: orphan folder purged %s on %s' % (folder, bigip.hostname))
-                                except Exception as exc:
-                                    LOG.error('Error purging folder %s: %s' % (folder, str(exc)))
+                        empty_folders.append(folder)
+
+            if not empty_folders:
+                continue
+
+            # delay to assure we are not in the tenant creation
+            # process before a virtual address is created.
+            greenthread.sleep(10)
+            resource = resource_helper.BigIPResourceHelper(
+                resource_helper.ResourceType.virtual_address)
+            for folder in empty_folders:
+                tenant_id = folder[len(prefix):]
+                deployed_lbs = resource.get_resources(bigip, folder)
+                if deployed_lbs:
+                    for lb in deployed_lbs:
+                        if lb.name.startswith(prefix):
+                            lb_id = lb.name[len(prefix):]
+                            deployed_lb_dict[lb_id] = \
+                                {'id': lb_id, 'tenant_id': tenant_id}
+                else:
+                    # Orphaned folder!
+                    if purge_orphaned_folders:
+                        try:
+                            if self._is_orphan(bigip.device_name, folder):
+                                self.system_helper.purge_folder_contents(
+                                    bigip, folder, fdb_engine=fdb_engine)
+                                self.system_helper.purge_folder(bigip, folder)
+                                self._remove_from_orphan_cache(bigip.device_name, folder)
+                                inventory.discard_folder(bigip, folder)
+                                LOG.warning('ccloud: orphan folder purged %s on %s' % (folder, bigip.hostname))
+                        except Exception as exc:
+                            LOG.error('Error purging folder %s: %s' % (folder, str(exc)))
         return deployed_lb_dict
 
     @serialized('get_all_deployed_listeners')
     @is_operational
     def get_all_deployed_listeners(self, expand_subcollections=False):
+        # the inventory always contains the expanded policy references
         LOG.debug('getting all deployed listeners on BIG-IPs')
         deployed_virtual_dict = {}
+        inventory = self._get_inventory()
+        prefix = self.service_adapter.prefix
         for bigip in self.get_all_bigips():
-            folders = self.system_helper.get_folders(bigip)
-            for folder in folders:
-                tenant_id = folder[len(self.service_adapter.prefix):]
-                if str(folder).startswith(self.service_adapter.prefix):
-                    resource = resource_helper.BigIPResourceHelper(
-                        resource_helper.ResourceType.virtual)
-                    deployed_listeners = resource.get_resources(
-                        bigip, folder, expand_subcollections)
-                    if deployed_listeners:
-                        for virtual in deployed_listeners:
-                            virtual_id = \
-                                virtual.name[len(self.service_adapter.prefix):]
-                            l7_policy = ''
-                            if hasattr(virtual, 'policiesReference') and \
-                                    'items' in virtual.policiesReference:
-                                l7_policy = \
-                                    virtual.policiesReference['items'][0]
-                                l7_policy = l7_policy['fullPath']
-                            if virtual_id in deployed_virtual_dict:
-                                deployed_virtual_dict[virtual_id][
-                                    'hostnames'].append(bigip.hostname)
-                            else:
-                                deployed_virtual_dict[virtual_id] = {
-                                    'id': virtual_id,
-                                    'tenant_id': tenant_id,
-                                    'hostnames': [bigip.hostname],
-                                    'l7_policy': l7_policy
-                                }
+            for folder in inventory.get_folders(bigip):
+                tenant_id = folder[len(prefix):]
+                if str(folder).startswith(prefix):
+                    deployed_listeners = inventory.get_resources(
+                        bigip, resource_helper.ResourceType.virtual, folder)
+                    for virtual in deployed_listeners:
+                        virtual_id = virtual['name'][len(prefix):]
+                        l7_policy = ''
+                        policies = virtual.get('policiesReference', {})
+                        if policies.get('items'):
+                            l7_policy = policies['items'][0]['fullPath']
+                        if virtual_id in deployed_virtual_dict:
+                            deployed_virtual_dict[virtual_id][
+                                'hostnames'].append(bigip.hostname)
+                        else:
+                            deployed_virtual_dict[virtual_id] = {
+                                'id': virtual_id,
+                                'tenant_id': tenant_id,
+                                'hostnames': [bigip.hostname],
+                                'l7_policy': l7_policy
+                            }
         return deployed_virtual_dict
 
     def _maintain_orphan_cache(self):
@@ -1221,73 +1430,71 @@ class iControlDriver(LBaaSBaseDriver):
     @is_operational
     @log_helpers.log_method_call
     def purge_orphaned_nodes(self, tenant_members):
-        # This algotithm is not able to determine nodes and members with an rd which isn't right fot the tenant, but
-        # it detects at least nodes and members without rd in case of a non global routed scenario
+        # Members and nodes are orphan if they are not known to neutron or
+        # if their route domain doesn't fit the routing mode: without rd in
+        # a non global routed scenario, with rd in a global routed one.
         node_helper = resource_helper.BigIPResourceHelper(
             resource_helper.ResourceType.node)
         pool_helper = resource_helper.BigIPResourceHelper(resource_helper.ResourceType.pool)
+        rd_expected = not self.conf.f5_global_routed_mode
         for bigip in self.get_all_bigips():
             for tenant_id, members in tenant_members.iteritems():
 
                 partition = self.service_adapter.prefix + tenant_id
                 try:
                     nodes = node_helper.get_resources(bigip, partition=partition)
-                    pools = pool_helper.get_resources(bigip, partition=partition)
+                    # members of all pools with one request
+                    pools = pool_helper.get_resources(
+                        bigip, partition=partition, expand_subcollections=True)
                 except Exception as err:
                     LOG.info('ccloud: Error in node or pool retrieval for partition %s: %s', (partition, err.response))
                     continue
 
-                allf5members = []
+                os_member_keys = set(
+                    utils.member_key(member['address'],
+                                     member['protocol_port'])
+                    for member in members)
+
+                # addresses of all f5 members across all pools to verify
+                # if a node is used somewhere as member
+                f5member_addresses = set()
                 orphan_members = []
-                orphan_nodes = []
-                # All f5 members without rd or which are not part of os members are orphan
                 for pool in pools:
-                    f5members = pool.members_s.get_collection()
-                    # create cross pool membership list for verifying if node is used somewhere as member
-                    allf5members.extend(f5members)
-                    for f5member in f5members:
-                        orphan_members.append(f5member)
-                        for member in members:
-                            # check with or without rd
-                            if (not self.conf.f5_global_routed_mode):
-                                if re.match(r"({0})(%\d+)(:{1})".format(member['address'], member['protocol_port']), f5member.name):
-                                   orphan_members.remove(f5member)
-                                   break
-                            else:
-                                if re.match(r"({0})(:{1})".format(member['address'], member['protocol_port']), f5member.name):
-                                    orphan_members.remove(f5member)
-                                    break
-                # All f5 nodes without rd or which are not used inside any membership are orphan
+                    members_ref = getattr(pool, 'membersReference', {})
+                    for f5member in members_ref.get('items', []):
+                        f5member_addresses.add(f5member.get('address'))
+                        address, rd, port = utils.split_member_name(
+                            f5member['name'])
+                        if (rd is not None) != rd_expected or \
+                                utils.member_key(address, port) not in \
+                                os_member_keys:
+                            orphan_members.append((pool, f5member['name']))
+
+                orphan_nodes = []
                 for node in nodes:
-                    orphan_nodes.append(node.address)
                     # Node with no route id is orphan
-                    if (not self.conf.f5_global_routed_mode) and ('%' not in node.address):
-                        continue
-                    for f5member in allf5members:
-                        if node.address == f5member.address:
-                            orphan_nodes.remove(node.address)
-                            break
+                    if (rd_expected and '%' not in node.address) or \
+                            node.address not in f5member_addresses:
+                        orphan_nodes.append(node.address)
 
                 # Log the determined orphans
-                orphan_member_names = []
-                for omember in orphan_members:
-                    orphan_member_names.append(omember.name)
                 if len(orphan_nodes) > 0:
                     LOG.debug('ccloud: Deleting orphan nodes   --> {0}'.format(orphan_nodes))
-                if len(orphan_member_names) > 0:
-                    LOG.debug('ccloud: Deleting orphan members --> {0}'.format(orphan_member_names))
+                if len(orphan_members) > 0:
+                    LOG.debug('ccloud: Deleting orphan members --> {0}'.format(
+                        [member_name for _, member_name in orphan_members]))
 
                 # Delete orphan members
-                for member in orphan_members:
-                    member_name = member.name
+                for pool, member_name in orphan_members:
                     if self._is_orphan(bigip.device_name, member_name):
                         try:
-                            member.delete()
+                            pool.members_s.members.load(
+                                name=member_name, partition=partition).delete()
                             self._remove_from_orphan_cache(bigip.device_name, member_name)
                         except HTTPError as error:
                             LOG.warning("ccloud: Failed to delete orphan member %s: %s", (member_name, error.response))
                         except Exception as err:
-                            LOG.error("ccloud: Error - Failed to delete orphan member %s: %s", (member_name, err.response))
+                            LOG.error("ccloud: Error - Failed to delete orphan member %s: %s", (member_name, err.message))
                 # Delete orphan nodes
                 for node in orphan_nodes:
                     if self._is_orphan(bigip.device_name, node):
@@ -1297,7 +1504,7 @@ class iControlDriver(LBaaSBaseDriver):
                         except HTTPError as error:
                             LOG.warning("ccloud: Failed to delete orphan node %s: %s", (node, error.response))
                         except Exception as err:
-                            LOG.error("ccloud: Error - Failed to delete orphan member %s: %s", (node, err.response))
+                            LOG.error("ccloud: Error - Failed to delete orphan member %s: %s", (node, err.message))
         return True
 
     @serialized('get_all_deployed_pools')
@@ -1305,40 +1512,37 @@ class iControlDriver(LBaaSBaseDriver):
     def get_all_deployed_pools(self):
         LOG.debug('getting all deployed pools on BIG-IPs')
         deployed_pool_dict = {}
+        inventory = self._get_inventory()
+        prefix = self.service_adapter.prefix
         for bigip in self.get_all_bigips():
-            folders = self.system_helper.get_folders(bigip)
-            for folder in folders:
-                tenant_id = folder[len(self.service_adapter.prefix):]
-                if str(folder).startswith(self.service_adapter.prefix):
-                    resource = resource_helper.BigIPResourceHelper(
-                        resource_helper.ResourceType.pool)
-                    deployed_pools = resource.get_resources(bigip, folder)
-                    if deployed_pools:
-                        for pool in deployed_pools:
-                            pool_id = \
-                                pool.name[len(self.service_adapter.prefix):]
-                            monitor_id = ''
-                            if hasattr(pool, 'monitor'):
-                                monitor = pool.monitor.split('/')[2].strip()
-                                monitor_id = \
-                                    monitor[len(self.service_adapter.prefix):]
-                                LOG.debug(
-                                    'pool {} has monitor {}'.format(
-                                        pool.name, monitor))
-                            else:
-                                LOG.debug(
-                                    'pool {} has no healthmonitors'.format(
-                                        pool.name))
-                            if pool_id in deployed_pool_dict:
-                                deployed_pool_dict[pool_id][
-                                    'hostnames'].append(bigip.hostname)
-                            else:
-                                deployed_pool_dict[pool_id] = {
-                                    'id': pool_id,
-                                    'tenant_id': tenant_id,
-                                    'hostnames': [bigip.hostname],
-                                    'monitors': monitor_id
-                                }
+            for folder in inventory.get_folders(bigip):
+                tenant_id = folder[len(prefix):]
+                if str(folder).startswith(prefix):
+                    deployed_pools = inventory.get_resources(
+                        bigip, resource_helper.ResourceType.pool, folder)
+                    for pool in deployed_pools:
+                        pool_id = pool['name'][len(prefix):]
+                        monitor_id = ''
+                        if pool.get('monitor'):
+                            monitor = pool['monitor'].split('/')[2].strip()
+                            monitor_id = monitor[len(prefix):]
+                            LOG.debug(
+                                'pool {} has monitor {}'.format(
+                                    pool['name'], monitor))
+                        else:
+                            LOG.debug(
+                                'pool {} has no healthmonitors'.format(
+                                    pool['name']))
+                        if pool_id in deployed_pool_dict:
+                            deployed_pool_dict[pool_id][
+                                'hostnames'].append(bigip.hostname)
+                        else:
+                            deployed_pool_dict[pool_id] = {
+                                'id': pool_id,
+                                'tenant_id': tenant_id,
+                                'hostnames': [bigip.hostname],
+                                'monitors': monitor_id
+                            }
         return deployed_pool_dict
 
     @serialized('purge_orphaned_pool')
@@ -1360,6 +1564,9 @@ class iControlDriver(LBaaSBaseDriver):
                     if self._is_orphan(bigip.device_name, pool_id):
                         pool.delete()
                         self._remove_from_orphan_cache(bigip.device_name, pool_id)
+                        self._discard_from_inventory(
+                            bigip, resource_helper.ResourceType.pool,
+                            partition, pool_name)
                     for member in members:
                         node_name = member.address
                         try:
@@ -1391,30 +1598,28 @@ class iControlDriver(LBaaSBaseDriver):
                          'ping_monitor']
         deployed_monitor_dict = {}
         adapter_prefix = self.service_adapter.prefix
+        inventory = self._get_inventory()
         for bigip in self.get_all_bigips():
-            folders = self.system_helper.get_folders(bigip)
-            for folder in folders:
+            for folder in inventory.get_folders(bigip):
                 tenant_id = folder[len(adapter_prefix):]
                 if str(folder).startswith(adapter_prefix):
-                    resources = map(
-                        lambda x: resource_helper.BigIPResourceHelper(
-                            getattr(resource_helper.ResourceType, x)),
-                        monitor_types)
-                    for resource in resources:
-                        deployed_monitors = resource.get_resources(
-                            bigip, folder)
-                        if deployed_monitors:
-                            for monitor in deployed_monitors:
-                                monitor_id = monitor.name[len(adapter_prefix):]
-                                if monitor_id in deployed_monitor_dict:
-                                    deployed_monitor_dict[monitor_id][
-                                        'hostnames'].append(bigip.hostname)
-                                else:
-                                    deployed_monitor_dict[monitor_id] = {
-                                        'id': monitor_id,
-                                        'tenant_id': tenant_id,
-                                        'hostnames': [bigip.hostname]
-                                    }
+                    for monitor_type in monitor_types:
+                        deployed_monitors = inventory.get_resources(
+                            bigip,
+                            getattr(resource_helper.ResourceType,
+                                    monitor_type),
+                            folder)
+                        for monitor in deployed_monitors:
+                            monitor_id = monitor['name'][len(adapter_prefix):]
+                            if monitor_id in deployed_monitor_dict:
+                                deployed_monitor_dict[monitor_id][
+                                    'hostnames'].append(bigip.hostname)
+                            else:
+                                deployed_monitor_dict[monitor_id] = {
+                                    'id': monitor_id,
+                                    'tenant_id': tenant_id,
+                                    'hostnames': [bigip.hostname]
+                                }
         return deployed_monitor_dict
 
     @serialized('purge_orphaned_health_monitor')
@@ -1435,7 +1640,15 @@ class iControlDriver(LBaaSBaseDriver):
                     monitor_name = self.service_adapter.prefix + monitor_id
                     partition = self.service_adapter.prefix + tenant_id
                     monitor = None
-                    for monitor_type in resource_types:
+                    monitor_types = resource_types
+                    if self.inventory:
+                        # only load the monitor type which is deployed
+                        monitor_types = [
+                            t for t in resource_types
+                            if self.inventory.get_resource(
+                                bigip, t.resource_type, partition,
+                                monitor_name)]
+                    for monitor_type in monitor_types:
                         try:
                             monitor = monitor_type.load(bigip, monitor_name,
                                                         partition)
@@ -1443,9 +1656,16 @@ class iControlDriver(LBaaSBaseDriver):
                         except HTTPError as err:
                             if err.response.status_code == 404:
                                 continue
+                    if monitor is None:
+                        LOG.debug('monitor %s not on BIG-IP %s.'
+                                  % (monitor_id, bigip.hostname))
+                        continue
                     if self._is_orphan(bigip.device_name, monitor_id):
                         monitor.delete()
                         self._remove_from_orphan_cache(bigip.device_name, monitor_id)
+                        self._discard_from_inventory(
+                            bigip, monitor_type.resource_type,
+                            partition, monitor_name)
                 except TypeError as err:
                     if 'NoneType' in err:
                         LOG.exception("Could not find monitor {}".format(
@@ -1469,30 +1689,27 @@ class iControlDriver(LBaaSBaseDriver):
         """
         LOG.debug('getting all deployed l7_policys on BIG-IP\'s')
         deployed_l7_policys_dict = {}
+        inventory = self._get_inventory()
         for bigip in self.get_all_bigips():
-            folders = self.system_helper.get_folders(bigip)
-            for folder in folders:
+            for folder in inventory.get_folders(bigip):
                 tenant_id = folder[len(self.service_adapter.prefix):]
                 if str(folder).startswith(self.service_adapter.prefix):
-                    resource = resource_helper.BigIPResourceHelper(
-                        resource_helper.ResourceType.l7policy)
-                    deployed_l7_policys = resource.get_resources(
-                        bigip, folder)
-                    if deployed_l7_policys:
-                        for l7_policy in deployed_l7_policys:
-                            l7_policy_id = l7_policy.name
-                            if l7_policy_id in deployed_l7_policys_dict:
-                                my_dict = \
-                                    deployed_l7_policys_dict[l7_policy_id]
-                                my_dict['hostnames'].append(bigip.hostname)
-                            else:
-                                po_id = l7_policy_id.replace(
-                                    'wrapper_policy_', '')
-                                deployed_l7_policys_dict[l7_policy_id] = {
-                                    'id': po_id,
-                                    'tenant_id': tenant_id,
-                                    'hostnames': [bigip.hostname]
-                                }
+                    deployed_l7_policys = inventory.get_resources(
+                        bigip, resource_helper.ResourceType.l7policy, folder)
+                    for l7_policy in deployed_l7_policys:
+                        l7_policy_id = l7_policy['name']
+                        if l7_policy_id in deployed_l7_policys_dict:
+                            my_dict = \
+                                deployed_l7_policys_dict[l7_policy_id]
+                            my_dict['hostnames'].append(bigip.hostname)
+                        else:
+                            po_id = l7_policy_id.replace(
+                                'wrapper_policy_', '')
+                            deployed_l7_policys_dict[l7_policy_id] = {
+                                'id': po_id,
+                                'tenant_id': tenant_id,
+                                'hostnames': [bigip.hostname]
+                            }
         return deployed_l7_policys_dict
 
     @serialized('purge_orphaned_l7_policy')
@@ -1521,6 +1738,9 @@ class iControlDriver(LBaaSBaseDriver):
                     if self._is_orphan(bigip.device_name, l7_policy_id):
                         l7_policy.delete()
                         self._remove_from_orphan_cache(bigip.device_name, l7_policy_id)
+                        self._discard_from_inventory(
+                            bigip, resource_helper.ResourceType.l7policy,
+                            partition, l7_policy_name)
                 except HTTPError as err:
                     if err.response.status_code == 404:
                         LOG.debug('l7_policy %s not on BIG-IP %s.'
@@ -1551,35 +1771,45 @@ class iControlDriver(LBaaSBaseDriver):
                             bigip, va_name, partition)
                     # get virtual services (listeners)
                     # referencing this virtual address
-                    vses = resource_helper.BigIPResourceHelper(
-                        resource_helper.ResourceType.virtual).get_resources(
-                            bigip, partition)
+                    vs_helper = resource_helper.BigIPResourceHelper(
+                        resource_helper.ResourceType.virtual)
+                    pool_helper = resource_helper.BigIPResourceHelper(
+                        resource_helper.ResourceType.pool)
+                    if self.inventory:
+                        vses = self.inventory.get_resources(
+                            bigip, resource_helper.ResourceType.virtual,
+                            partition)
+                    else:
+                        vses = [vs.__dict__ for vs in
+                                vs_helper.get_resources(bigip, partition)]
                     vs_dest_compare = '/' + partition + '/' + va.name
-                    for vs in vses:
-                        if str(vs.destination).startswith(vs_dest_compare):
-                            if hasattr(vs, 'pool'):
-                                pool = resource_helper.BigIPResourceHelper(
-                                    resource_helper.ResourceType.pool).load(
-                                        bigip, os.path.basename(vs.pool),
-                                        partition)
-                                vs_name = vs.name
-                                if self._is_orphan(bigip.device_name, vs_name):
-                                    vs.delete()
-                                    self._remove_from_orphan_cache(bigip.device_name, vs_name)
-                                pool_name = pool.name
+                    for vs in list(vses):
+                        if str(vs.get('destination')).startswith(
+                                vs_dest_compare):
+                            vs_name = vs['name']
+                            if self._is_orphan(bigip.device_name, vs_name):
+                                vs_helper.delete(bigip, vs_name, partition)
+                                self._remove_from_orphan_cache(bigip.device_name, vs_name)
+                                self._discard_from_inventory(
+                                    bigip, resource_helper.ResourceType.virtual,
+                                    partition, vs_name)
+                            if vs.get('pool'):
+                                pool_name = os.path.basename(vs['pool'])
                                 if self._is_orphan(bigip.device_name, pool_name):
-                                        pool.delete()
-                                        self._remove_from_orphan_cache(bigip.device_name, pool_name)
-                            else:
-                                vs_name = vs.name
-                                if self._is_orphan(bigip.device_name, vs_name):
-                                    vs.delete()
-                                    self._remove_from_orphan_cache(bigip.device_name, vs_name)
+                                    pool_helper.delete(bigip, pool_name,
+                                                       partition)
+                                    self._remove_from_orphan_cache(bigip.device_name, pool_name)
+                                    self._discard_from_inventory(
+                                        bigip, resource_helper.ResourceType.pool,
+                                        partition, pool_name)
                     if self._is_orphan(bigip.device_name, va_name):
                         resource_helper.BigIPResourceHelper(
                             resource_helper.ResourceType.virtual_address).delete(
                                 bigip, va_name, partition)
                         self._remove_from_orphan_cache(bigip.device_name, va_name)
+                        self._discard_from_inventory(
+                            bigip, resource_helper.ResourceType.virtual_address,
+                            partition, va_name)
                 except HTTPError as err:
                     if err.response.status_code == 404:
                         LOG.debug('loadbalancer %s not on BIG-IP %s.'
@@ -1604,6 +1834,9 @@ class iControlDriver(LBaaSBaseDriver):
                     if self._is_orphan(bigip.device_name, listener_id):
                         listener.delete()
                         self._remove_from_orphan_cache(bigip.device_name, listener_id)
+                        self._discard_from_inventory(
+                            bigip, resource_helper.ResourceType.virtual,
+                            partition, listener_name)
                 except HTTPError as err:
                     if err.response.status_code == 404:
                         LOG.debug('listener %s not on BIG-IP %s.'
@@ -1682,6 +1915,9 @@ class iControlDriver(LBaaSBaseDriver):
     def create_member(self, member, service):
         """Create pool member"""
         LOG.debug("Creating member")
+        lb_pending = self._assure_member_delta(member, service)
+        if lb_pending is not None:
+            return lb_pending
         return self._common_service_handler(service)
 
     @serialized('update_member')
@@ -1689,6 +1925,9 @@ class iControlDriver(LBaaSBaseDriver):
     def update_member(self, old_member, member, service):
         """Update pool member"""
         LOG.debug("Updating member")
+        lb_pending = self._assure_member_delta(member, service)
+        if lb_pending is not None:
+            return lb_pending
         return self._common_service_handler(service)
 
     @serialized('delete_member')
@@ -1696,6 +1935,9 @@ class iControlDriver(LBaaSBaseDriver):
     def delete_member(self, member, service):
         """Delete pool member"""
         LOG.debug("Deleting member")
+        lb_pending = self._assure_member_delta(member, service)
+        if lb_pending is not None:
+            return lb_pending
         return self._common_service_handler(service, delete_event=True)
 
     @serialized('create_health_monitor')
@@ -1719,6 +1961,53 @@ class iControlDriver(LBaaSBaseDriver):
         LOG.debug("Deleting health monitor")
         return self._common_service_handler(service, delete_event=True)
 
+    def _assure_member_delta(self, member, service):
+        """Apply a single member change without the full service handler.
+
+        Only the pool member and its fdb entries are changed and the
+        statuses are updated. Returns None if the change needs the full
+        handler, because something else of the service is pending, the
+        member networking is not assured yet or the change failed.
+        """
+        if not self.conf.ccloud_member_fast_path:
+            return None
+        delta = self.lbaas_builder.get_member_delta(service, member['id'])
+        if not delta:
+            return None
+        service_member, pool = delta
+
+        address = service_member['address']
+        if self.network_builder:
+            address = self.network_builder.get_assured_member_address(
+                service, service_member)
+            if address is None:
+                return None
+
+        try:
+            device_member = self.lbaas_builder.assure_member(
+                service, service_member, pool, address)
+            if self.network_builder:
+                self.network_builder.assure_member_networking(
+                    service, device_member)
+        except Exception as err:
+            LOG.warning("ccloud: Changing member %s on its own failed, "
+                        "applying complete service: %s",
+                        member['id'], err.message)
+            return None
+
+        LOG.debug("ccloud: member %s changed on its own" % member['id'])
+        self.update_service_status(service)
+        return service['loadbalancer']['provisioning_status'] in \
+            [plugin_const.PENDING_CREATE, plugin_const.PENDING_UPDATE]
+
+    @serialized('update_service')
+    @is_operational
+    def update_service(self, service, delete_event=False):
+        """Apply all pending changes of a loadbalancer at once"""
+        LOG.debug("Updating service")
+        return self._common_service_handler(service,
+                                            delete_event=delete_event)
+
     # sapcc: get all snat pools
     @serialized('get_all_snat_pools')
     @is_operational
@@ -1802,6 +2091,8 @@ class iControlDriver(LBaaSBaseDriver):
     def remove_ips_from_fdb_update(self, fdb):
         for network_id in fdb:
             network = fdb[network_id]
+            if 'ports' not in network:
+                continue
             mac_ips_by_vtep = network['ports']
             for vtep in mac_ips_by_vtep:
                 mac_ips = mac_ips_by_vtep[vtep]
@@ -1830,8 +2121,12 @@ class iControlDriver(LBaaSBaseDriver):
 
     @serialized('sync')
     @is_operational
-    def sync(self, service):
-        """Sync service defintion to device"""
+    def sync(self, service, diff=None):
+        """Sync service defintion to device
+
+        diff is a result of service_diff. Only the objects which are
+        missing or changed according to diff are applied.
+        """
 
         load_balancer = service.get('loadbalancer',None)
 
@@ -1843,7 +2138,7 @@ class iControlDriver(LBaaSBaseDriver):
             )
 
         if service.get('loadbalancer',None):
-            return self._common_service_handler(service)
+            return self._common_service_handler(service, diff=diff)
         else:
             LOG.debug("Attempted sync of deleted load balancer")
 
@@ -1916,13 +2211,11 @@ class iControlDriver(LBaaSBaseDriver):
                            "listener": listener}
                     vip = self.service_adapter.get_virtual(svc)
                     l_name = vip['name']
-                if v.exists(name=l_name, partition=folder_name):
-                    # Found a virtual that is named by the OS object,
-                    # delete it.
-                    l_obj = v.load(name=l_name, partition=folder_name)
-                    LOG.warn("Deleting listener: /%s/%s" %
+                # Delete a virtual that is named by the OS object
+                if resource_helper.try_delete(v, name=l_name,
+                                              partition=folder_name):
+                    LOG.warn("Deleted listener: /%s/%s" %
                              (folder_name, l_name))
-                    l_obj.delete(name=l_name, partition=folder_name)
 
             # Delete all pools
             p = bigip.tm.ltm.pools.pool
@@ -1934,10 +2227,9 @@ class iControlDriver(LBaaSBaseDriver):
                     pool = self.service_adapter.get_pool(svc)
                     p_name = pool['name']
 
-                if p.exists(name=p_name, partition=folder_name):
-                    p_obj = p.load(name=p_name, partition=folder_name)
-                    LOG.warn("Deleting pool: /%s/%s" % (folder_name, p_name))
-                    p_obj.delete(name=p_name, partition=folder_name)
+                if resource_helper.try_delete(p, name=p_name,
+                                              partition=folder_name):
+                    LOG.warn("Deleted pool: /%s/%s" % (folder_name, p_name))
 
             # Delete all healthmonitors
             for healthmonitor in service['healthmonitors']:
@@ -1950,115 +2242,129 @@ class iControlDriver(LBaaSBaseDriver):
                     hm = self.service_adapter.get_healthmonitor(svc)
                     m_name = hm['name']
 
-                if monitor_ep.exists(name=m_name, partition=folder_name):
-                    m_obj = monitor_ep.load(name=m_name, partition=folder_name)
-                    LOG.warn("Deleting monitor: /%s/%s" % (
+                if resource_helper.try_delete(monitor_ep, name=m_name,
+                                              partition=folder_name):
+                    LOG.warn("Deleted monitor: /%s/%s" % (
                         folder_name, m_name))
-                    m_obj.delete()
 
     def _service_exists(self, service):
         # Returns whether the bigip has the service defined
         if not service['loadbalancer']:
             return False
+        diff = self.service_diff(service)
+        if diff:
+            LOG.warning("ccloud: Service %s incomplete on bigips: %s" %
+                        (service['loadbalancer']['id'], diff))
+        return not diff
+
+    # monitor type of neutron healthmonitors to BIG-IP resource type
+    MONITOR_TYPES = {
+        'HTTPS': resource_helper.ResourceType.https_monitor,
+        'TCP': resource_helper.ResourceType.tcp_monitor,
+        'PING': resource_helper.ResourceType.ping_monitor,
+    }
+
+    def service_diff(self, service):
+        """Return the objects of a service which are missing on bigips.
+
+        The partition of the service is verified with one collection
+        request per object type and bigip. The result maps object types
+        (loadbalancer, listener, pool, member, healthmonitor) to dicts of
+        neutron ids and the hostnames of the bigips the object is missing
+        on. Member names deployed on a bigip but unknown to the service
+        are reported as unexpected_member per pool id. An empty result
+        means the service is completely deployed.
+        """
+        diff = {}
         loadbalancer = service['loadbalancer']
-
         folder_name = self.service_adapter.get_folder_name(
             loadbalancer['tenant_id']
         )
 
+        def missing(obj_type, obj_id, bigip, name):
+            LOG.debug("%s /%s/%s not found on bigip: %s" %
+                      (obj_type, folder_name, name, bigip.hostname))
+            diff.setdefault(obj_type, {}).setdefault(
+                obj_id, []).append(bigip.hostname)
+
         if self.network_builder:
-            # append route domain to member address
+            # append route domain to member address, the service itself
+            # is annotated again when it is applied
+            service = copy.deepcopy(service)
             self.network_builder._annotate_service_route_domains(service)
 
-        # Foreach bigip in the cluster:
         for bigip in self.get_config_bigips():
-            # Does the tenant folder exist?
             if not self.system_helper.folder_exists(bigip, folder_name):
-                LOG.warning("Folder %s does not exists on bigip: %s" %
-                          (folder_name, bigip.hostname))
-                return False
+                missing('loadbalancer', loadbalancer['id'], bigip,
+                        folder_name)
+                continue
+
+            def deployed(resource_type):
+                helper = resource_helper.BigIPResourceHelper(resource_type)
+                return set(item['name'] for item in
+                           helper.get_selected_resources(
+                               bigip, ['name'], partition=folder_name))
 
-            # Get the virtual address
             virtual_address = VirtualAddress(self.service_adapter,
                                              loadbalancer)
-            if not virtual_address.exists(bigip):
-                LOG.warning("Virtual address %s(%s) does not "
-                          "exists on bigip: %s" % (virtual_address.name,
-                                                   virtual_address.address,
-                                                   bigip.hostname))
-                return False
-
-            # Ensure that each virtual service exists.
-            for listener in service['listeners']:
-
-                svc = {"loadbalancer": loadbalancer,
-                       "listener": listener}
-                virtual_server = self.service_adapter.get_virtual_name(svc)
-                if not self.vs_manager.exists(bigip,
-                                              name=virtual_server['name'],
-                                              partition=folder_name):
-                    LOG.warning("Virtual /%s/%s not found on bigip: %s" %
-                              (virtual_server['name'], folder_name,
-                               bigip.hostname))
-                    return False
-
-            # Ensure that each pool exists.
-            for pool in service['pools']:
-                svc = {"loadbalancer": loadbalancer,
-                       "pool": pool}
-                bigip_pool = self.service_adapter.get_pool(svc)
-                if not self.pool_manager.exists(
-                        bigip,
-                        name=bigip_pool['name'],
-                        partition=folder_name):
-                    LOG.warning("Pool /%s/%s not found on bigip: %s" %
-                              (bigip_pool['name'], folder_name,
-                               bigip.hostname))
-                    return False
-                else:
-                    deployed_pool = self.pool_manager.load(
-                        bigip,
-                        name=bigip_pool['name'],
-                        partition=folder_name)
-                    deployed_members = \
-                        deployed_pool.members_s.get_collection()
-
-                    # First check that number of members deployed
-                    # is equal to the number in the service.
-                    if len(deployed_members) != len(pool['members']):
-                        LOG.warning("Pool %s members member count mismatch "
-                                  "match: deployed %d != service %d" %
-                                  (bigip_pool['name'], len(deployed_members),
-                                   len(pool['members'])))
-                        return False
-
-                    # Ensure each pool member exists
-                    for member in service['members']:
-                        if member['pool_id'] == pool['id']:
-                            lb = self.lbaas_builder
-                            pool = lb.get_pool_by_id(
-                                service, member["pool_id"])
-                            svc = {"loadbalancer": loadbalancer,
-                                   "member": member,
-                                   "pool": pool}
-                            if not lb.pool_builder.member_exists(svc, bigip):
-                                LOG.warning("Pool member not found: %s" %
-                                          svc['member'])
-                                return False
-
-            # Ensure that each health monitor exists.
-            for healthmonitor in service['healthmonitors']:
+            if virtual_address.name not in deployed(
+                    resource_helper.ResourceType.virtual_address):
+                missing('loadbalancer', loadbalancer['id'], bigip,
+                        virtual_address.name)
+
+            if service.get('listeners'):
+                virtuals = deployed(resource_helper.ResourceType.virtual)
+            for listener in service.get('listeners', []):
+                name = self.service_adapter.get_virtual_name(
+                    {"loadbalancer": loadbalancer,
+                     "listener": listener})['name']
+                if name not in virtuals:
+                    missing('listener', listener['id'], bigip, name)
+
+            if service.get('pools'):
+                pools = {}
+                for pool in self.pool_manager.get_resources(
+                        bigip, partition=folder_name,
+                        expand_subcollections=True):
+                    members_ref = getattr(pool, 'membersReference', {})
+                    pools[pool.name] = set(
+                        member['name']
+                        for member in members_ref.get('items', []))
+            for pool in service.get('pools', []):
+                name = self.service_adapter.init_pool_name(
+                    loadbalancer, pool)['name']
+                if name not in pools:
+                    missing('pool', pool['id'], bigip, name)
+                    continue
+                expected = set()
+                for member in service.get('members', []):
+                    if member['pool_id'] != pool['id']:
+                        continue
+                    member_name = self.service_adapter.get_member(
+                        {"loadbalancer": loadbalancer,
+                         "member": member})['name']
+                    expected.add(member_name)
+                    if member_name not in pools[name]:
+                        missing('member', member['id'], bigip, member_name)
+                for member_name in pools[name] - expected:
+                    missing('unexpected_member', pool['id'], bigip,
+                            member_name)
+
+            monitors = {}
+            for healthmonitor in service.get('healthmonitors', []):
                 svc = {"loadbalancer": loadbalancer,
                        "healthmonitor": healthmonitor}
-                monitor = self.service_adapter.get_healthmonitor(svc)
-                monitor_ep = self._get_monitor_endpoint(bigip, svc)
-                if not monitor_ep.exists(name=monitor['name'],
-                                         partition=folder_name):
-                    LOG.warning("Monitor /%s/%s not found on bigip: %s" %
-                              (monitor['name'], folder_name, bigip.hostname))
-                    return False
-
-        return True
+                name = self.service_adapter.get_healthmonitor(svc)['name']
+                resource_type = self.MONITOR_TYPES.get(
+                    self.service_adapter.get_monitor_type(svc),
+                    resource_helper.ResourceType.http_monitor)
+                if resource_type not in monitors:
+                    monitors[resource_type] = deployed(resource_type)
+                if name not in monitors[resource_type]:
+                    missing('healthmonitor', healthmonitor['id'], bigip,
+                            name)
+
+        return diff
 
     def get_loadbalancers_in_tenant(self, tenant_id):
         loadbalancers = self.plugin_rpc.get_all_loadbalancers()
@@ -2068,7 +2374,8 @@ class iControlDriver(LBaaSBaseDriver):
 
     def _common_service_handler(self, service,
                                 delete_partition=False,
-                                delete_event=False,cli_sync=False):
+                                delete_event=False,cli_sync=False,
+                                diff=None):
 
         # Assure that the service is configured on bigip(s)
         start_time = time()
@@ -2099,6 +2406,15 @@ class iControlDriver(LBaaSBaseDriver):
                         plugin_const.ERROR
                 raise e
 
+            # compare with the bigips before route domains are annotated
+            if diff is None and not delete_event and \
+                    self.conf.ccloud_service_planning:
+                try:
+                    diff = self.service_diff(service)
+                except Exception as error:
+                    LOG.warning("ccloud: Service planning failed, applying "
+                                "complete service: %s", error.message)
+
             traffic_group = self.service_to_traffic_group(service)
             loadbalancer['traffic_group'] = traffic_group
 
@@ -2142,7 +2458,8 @@ class iControlDriver(LBaaSBaseDriver):
             self.lbaas_builder.assure_service(service,
                                               traffic_group,
                                               all_subnet_hints,
-                                              delete_event)
+                                              delete_event,
+                                              diff=diff)
             LOG.debug("ccloud: Post assure service **********************************************")
 
             if self.network_builder:
@@ -2195,30 +2512,52 @@ class iControlDriver(LBaaSBaseDriver):
                       "RPC handler.")
             return
 
+        # collect all status changes and send them with one message
+        statuses = []
         if 'members' in service:
             # Call update_members_status
-            self._update_member_status(service['members'], timed_out)
+            self._update_member_status(statuses, service['members'],
+                                       timed_out)
         if 'healthmonitors' in service:
             # Call update_monitor_status
             self._update_health_monitor_status(
+                statuses,
                 service['healthmonitors']
             )
         if 'pools' in service:
             # Call update_pool_status
             self._update_pool_status(
+                statuses,
                 service['pools']
             )
         if 'listeners' in service:
             # Call update_listener_status
-            self._update_listener_status(service)
+            self._update_listener_status(statuses, service)
         if 'l7policy_rules' in service:
-            self._update_l7rule_status(service['l7policy_rules'])
+            self._update_l7rule_status(statuses, service['l7policy_rules'])
         if 'l7policies' in service:
-            self._update_l7policy_status(service['l7policies'])
-
-        self._update_loadbalancer_status(service, timed_out)
-
-    def _update_member_status(self, members, timed_out):
+            self._update_l7policy_status(statuses, service['l7policies'])
+
+        self._update_loadbalancer_status(statuses, service, timed_out)
+
+        self.plugin_rpc.update_statuses(statuses)
+
+    @staticmethod
+    def _status(obj_type, obj, provisioning_status=plugin_const.ERROR,
+                operating_status=lb_const.OFFLINE, destroyed=False):
+        """Return a status update of an object for update_statuses."""
+        return {'type': obj_type,
+                'id': obj['id'],
+                'provisioning_status': provisioning_status,
+                'operating_status': operating_status,
+                'destroyed': destroyed,
+                # objects without operating status (e.g. monitors) are
+                # compared by provisioning status only
+                'current_status': (obj.get('provisioning_status'),
+                                   obj.get('operating_status',
+                                           operating_status))}
+
+    def _update_member_status(self, statuses, members, timed_out):
         """Update member status in OpenStack."""
         for member in members:
             if 'provisioning_status' in member:
@@ -2228,69 +2567,60 @@ class iControlDriver(LBaaSBaseDriver):
                         provisioning_status == plugin_const.PENDING_UPDATE or provisioning_status == plugin_const.ACTIVE):
 
                     if timed_out:
+                        statuses.append(self._status(
+                            'member', member, plugin_const.ERROR,
+                            lb_const.OFFLINE))
                         member['provisioning_status'] = plugin_const.ERROR
-                        operating_status = lb_const.OFFLINE
                     else:
+                        statuses.append(self._status(
+                            'member', member, plugin_const.ACTIVE,
+                            lb_const.ONLINE))
                         member['provisioning_status'] = plugin_const.ACTIVE
-                        operating_status = lb_const.ONLINE
-
-                    self.plugin_rpc.update_member_status(
-                        member['id'],
-                        member['provisioning_status'],
-                        operating_status
-                    )
                 elif provisioning_status == plugin_const.PENDING_DELETE:
-                    self.plugin_rpc.member_destroyed(
-                        member['id'])
+                    statuses.append(self._status(
+                        'member', member, destroyed=True))
                 elif provisioning_status == plugin_const.ERROR:
-                    self.plugin_rpc.update_member_status(
-                        member['id'],
-                        plugin_const.ERROR,
-                        lb_const.OFFLINE)
+                    statuses.append(self._status('member', member))
 
-    def _update_health_monitor_status(self, health_monitors):
+    def _update_health_monitor_status(self, statuses, health_monitors):
         """Update pool monitor status in OpenStack """
         for health_monitor in health_monitors:
             if 'provisioning_status' in health_monitor:
                 provisioning_status = health_monitor['provisioning_status']
                 if (provisioning_status == plugin_const.PENDING_CREATE or
                         provisioning_status == plugin_const.PENDING_UPDATE or provisioning_status == plugin_const.ACTIVE):
-                        self.plugin_rpc.update_health_monitor_status(
-                            health_monitor['id'],
-                            plugin_const.ACTIVE,
-                            lb_const.ONLINE
-                        )
+                        statuses.append(self._status(
+                            'healthmonitor', health_monitor,
+                            plugin_const.ACTIVE, lb_const.ONLINE))
                         health_monitor['provisioning_status'] = \
                             plugin_const.ACTIVE
                 elif provisioning_status == plugin_const.PENDING_DELETE:
-                    self.plugin_rpc.health_monitor_destroyed(
-                        health_monitor['id'])
+                    statuses.append(self._status(
+                        'healthmonitor', health_monitor, destroyed=True))
                 elif provisioning_status == plugin_const.ERROR:
-                    self.plugin_rpc.update_health_monitor_status(
-                        health_monitor['id'])
+                    statuses.append(self._status(
+                        'healthmonitor', health_monitor))
 
    
-    def _update_pool_status(self, pools):
+    def _update_pool_status(self, statuses, pools):
         """Update pool status in OpenStack """
         for pool in pools:
             if 'provisioning_status' in pool:
                 provisioning_status = pool['provisioning_status']
                 if (provisioning_status == plugin_const.PENDING_CREATE or
                         provisioning_status == plugin_const.PENDING_UPDATE or provisioning_status == plugin_const.ACTIVE):
-                        self.plugin_rpc.update_pool_status(
-                            pool['id'],
-                            plugin_const.ACTIVE,
-                            lb_const.ONLINE
-                        )
+                        statuses.append(self._status(
+                            'pool', pool, plugin_const.ACTIVE,
+                            lb_const.ONLINE))
                         pool['provisioning_status'] = plugin_const.ACTIVE
                 elif provisioning_status == plugin_const.PENDING_DELETE:
-                    self.plugin_rpc.pool_destroyed(
-                        pool['id'])
+                    statuses.append(self._status(
+                        'pool', pool, destroyed=True))
                 elif provisioning_status == plugin_const.ERROR:
-                    self.plugin_rpc.update_pool_status(pool['id'])
+                    statuses.append(self._status('pool', pool))
 
    
-    def _update_listener_status(self, service):
+    def _update_listener_status(self, statuses, service):
         """Update listener status in OpenStack """
         listeners = service['listeners']
         for listener in listeners:
@@ -2298,45 +2628,41 @@ class iControlDriver(LBaaSBaseDriver):
                 provisioning_status = listener['provisioning_status']
                 if (provisioning_status == plugin_const.PENDING_CREATE or
                         provisioning_status == plugin_const.PENDING_UPDATE or provisioning_status == plugin_const.ACTIVE):
-                        self.plugin_rpc.update_listener_status(
-                            listener['id'],
-                            plugin_const.ACTIVE,
-                            listener['operating_status']
-                        )
+                        statuses.append(self._status(
+                            'listener', listener, plugin_const.ACTIVE,
+                            listener['operating_status']))
                         listener['provisioning_status'] = \
                             plugin_const.ACTIVE
                 elif provisioning_status == plugin_const.PENDING_DELETE:
-                    self.plugin_rpc.listener_destroyed(
-                        listener['id'])
+                    statuses.append(self._status(
+                        'listener', listener, destroyed=True))
                 elif provisioning_status == plugin_const.ERROR:
-                    self.plugin_rpc.update_listener_status(
-                        listener['id'],
-                        provisioning_status,
-                        lb_const.OFFLINE)
+                    statuses.append(self._status(
+                        'listener', listener, provisioning_status,
+                        lb_const.OFFLINE))
 
    
-    def _update_l7rule_status(self, l7rules):
+    def _update_l7rule_status(self, statuses, l7rules):
         """Update l7rule status in OpenStack """
         for l7rule in l7rules:
             if 'provisioning_status' in l7rule:
                 provisioning_status = l7rule['provisioning_status']
                 if (provisioning_status == plugin_const.PENDING_CREATE or
                         provisioning_status == plugin_const.PENDING_UPDATE or provisioning_status == plugin_const.ACTIVE):
-                        self.plugin_rpc.update_l7rule_status(
-                            l7rule['id'],
-                            l7rule['policy_id'],
-                            plugin_const.ACTIVE,
-                            lb_const.ONLINE
-                        )
+                        status = self._status(
+                            'l7rule', l7rule, plugin_const.ACTIVE,
+                            lb_const.ONLINE)
                 elif provisioning_status == plugin_const.PENDING_DELETE:
-                    self.plugin_rpc.l7rule_destroyed(
-                        l7rule['id'])
+                    status = self._status('l7rule', l7rule, destroyed=True)
                 elif provisioning_status == plugin_const.ERROR:
-                    self.plugin_rpc.update_l7rule_status(
-                        l7rule['id'], l7rule['policy_id'])
+                    status = self._status('l7rule', l7rule)
+                else:
+                    continue
+                status['l7policy_id'] = l7rule['policy_id']
+                statuses.append(status)
 
    
-    def _update_l7policy_status(self, l7policies):
+    def _update_l7policy_status(self, statuses, l7policies):
         LOG.debug("_update_l7policy_status")
         """Update l7policy status in OpenStack """
         for l7policy in l7policies:
@@ -2344,20 +2670,19 @@ class iControlDriver(LBaaSBaseDriver):
                 provisioning_status = l7policy['provisioning_status']
                 if (provisioning_status == plugin_const.PENDING_CREATE or
                         provisioning_status == plugin_const.PENDING_UPDATE or provisioning_status == plugin_const.ACTIVE):
-                        self.plugin_rpc.update_l7policy_status(
-                            l7policy['id'],
-                            plugin_const.ACTIVE,
-                            lb_const.ONLINE
-                        )
+                        statuses.append(self._status(
+                            'l7policy', l7policy, plugin_const.ACTIVE,
+                            lb_const.ONLINE))
                 elif provisioning_status == plugin_const.PENDING_DELETE:
                     LOG.debug("calling l7policy_destroyed")
-                    self.plugin_rpc.l7policy_destroyed(
-                        l7policy['id'])
+                    statuses.append(self._status(
+                        'l7policy', l7policy, destroyed=True))
                 elif provisioning_status == plugin_const.ERROR:
-                    self.plugin_rpc.update_l7policy_status(l7policy['id'])
+                    statuses.append(self._status('l7policy', l7policy))
 
    
-    def _update_loadbalancer_status(self, service, timed_out=False):
+    def _update_loadbalancer_status(self, statuses, service,
+                                    timed_out=False):
         """Update loadbalancer status in OpenStack """
         loadbalancer = service.get('loadbalancer', {})
         provisioning_status = loadbalancer.get('provisioning_status',
@@ -2368,57 +2693,65 @@ class iControlDriver(LBaaSBaseDriver):
             if timed_out:
                 operating_status = (lb_const.OFFLINE)
                 if provisioning_status == plugin_const.PENDING_CREATE:
-                    loadbalancer['provisioning_status'] = \
-                        plugin_const.ERROR
+                    new_status = plugin_const.ERROR
                 else:
-                    loadbalancer['provisioning_status'] = \
-                        plugin_const.ACTIVE
+                    new_status = plugin_const.ACTIVE
             else:
                 operating_status = (lb_const.ONLINE)
-                loadbalancer['provisioning_status'] = \
-                    plugin_const.ACTIVE
+                new_status = plugin_const.ACTIVE
 
-            self.plugin_rpc.update_loadbalancer_status(
-                loadbalancer['id'],
-                loadbalancer['provisioning_status'],
-                operating_status)
+            statuses.append(self._status(
+                'loadbalancer', loadbalancer, new_status, operating_status))
+            loadbalancer['provisioning_status'] = new_status
 
         elif provisioning_status == plugin_const.PENDING_DELETE:
-            self.plugin_rpc.loadbalancer_destroyed(
-                loadbalancer['id'])
+            statuses.append(self._status(
+                'loadbalancer', loadbalancer, destroyed=True))
         elif provisioning_status == plugin_const.ERROR:
-            self.plugin_rpc.update_loadbalancer_status(
-                loadbalancer['id'],
-                provisioning_status,
-                lb_const.OFFLINE)
-        elif provisioning_status == plugin_const.ACTIVE:
-            LOG.debug('Loadbalancer provisioning status is active')
+            statuses.append(self._status(
+                'loadbalancer', loadbalancer, provisioning_status,
+                lb_const.OFFLINE))
         else:
             LOG.error('Loadbalancer provisioning status is invalid')
 
     @is_operational
     def update_operating_status(self, service):
-        if 'members' in service:
-            if self.network_builder:
-                # append route domain to member address
-                try:
-                    self.network_builder._annotate_service_route_domains(
-                        service)
-                except f5ex.InvalidNetworkType as exc:
-                    LOG.warning(exc.msg)
-                    return
+        self.update_operating_statuses([service])
+
+    @is_operational
+    def update_operating_statuses(self, services):
+        services = [service for service in services
+                    if service and service.get('members')]
+        if not services:
+            return
 
-            # get currrent member status
-            self.lbaas_builder.update_operating_status(service)
+        neutron_status = {}
+        for service in services:
+            for member in service['members']:
+                neutron_status[member['id']] = member.get('operating_status')
+
+        # get current member status of all services at once
+        self.lbaas_builder.update_operating_statuses(services)
 
-            # udpate Neutron
+        # update Neutron
+        statuses = []
+        for service in services:
             for member in service['members']:
-                if member['provisioning_status'] == plugin_const.ACTIVE:
-                    operating_status = member.get('operating_status', None)
-                    self.plugin_rpc.update_member_status(
-                        member['id'],
-                        provisioning_status=None,
-                        operating_status=operating_status)
+                if member['provisioning_status'] != plugin_const.ACTIVE:
+                    continue
+                operating_status = member.get('operating_status')
+                if operating_status is None:
+                    continue
+                status = self._status('member', member,
+                                      provisioning_status=None,
+                                      operating_status=operating_status)
+                if self.conf.ccloud_operating_status_changes_only:
+                    status['current_status'] = \
+                        (None, neutron_status[member['id']])
+                else:
+                    status['current_status'] = None
+                statuses.append(status)
+        self.plugin_rpc.update_statuses(statuses)
 
     def get_active_bigip(self):
         bigips = self.get_all_bigips()
@@ -2507,28 +2840,28 @@ class iControlDriver(LBaaSBaseDriver):
             bigip, global_stats=global_statistics)
 
     def get_node_count(self, bigip=None, global_statistics=None):
-        return len(bigip.tm.ltm.nodes.get_collection())
+        return self.capacity_sampler.get_count(bigip, 'node')
 
     def get_virtual_address_count(self, bigip=None, global_statistics=None):
-        return len(bigip.tm.ltm.virtual_address_s.get_collection())
+        return self.capacity_sampler.get_count(bigip, 'virtual_address')
 
     def get_virtual_server_count(self, bigip=None, global_statistics=None):
-        return len(bigip.tm.ltm.virtuals.get_collection())
+        return self.capacity_sampler.get_count(bigip, 'virtual_server')
 
     def get_clientssl_profile_count(self, bigip=None, global_statistics=None):
-        return ssl_profile.SSLProfileHelper.get_client_ssl_profile_count(bigip)
+        return self.capacity_sampler.get_count(bigip, 'clientssl_profile')
 
     def get_tenant_count(self, bigip=None, global_statistics=None):
-        return self.system_helper.get_tenant_folder_count(bigip)
+        return self.capacity_sampler.get_count(bigip, 'tenant')
 
     def get_tunnel_count(self, bigip=None, global_statistics=None):
-        return self.network_helper.get_tunnel_count(bigip)
+        return self.capacity_sampler.get_count(bigip, 'tunnel')
 
     def get_vlan_count(self, bigip=None, global_statistics=None):
-        return self.network_helper.get_vlan_count(bigip)
+        return self.capacity_sampler.get_count(bigip, 'vlan')
 
     def get_route_domain_count(self, bigip=None, global_statistics=None):
-        return self.network_helper.get_route_domain_count(bigip)
+        return self.capacity_sampler.get_count(bigip, 'route_domain')
 
     def _init_traffic_groups(self, bigip):
         try:
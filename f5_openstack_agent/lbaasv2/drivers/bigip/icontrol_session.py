@@ -0,0 +1,158 @@
+"""Pooled, token authenticated iControl REST sessions with retries."""
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import random
+import time
+import urlparse
+
+import eventlet.semaphore
+
+from icontrol.authtoken import iControlRESTTokenAuth
+from oslo_log import log as logging
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from requests.packages.urllib3.util.retry import Retry
+
+LOG = logging.getLogger(__name__)
+
+TOKEN_HEADER = 'X-F5-Auth-Token'
+LOGIN_PATH = '/mgmt/shared/authn/login'
+
+# Statuses retried per method.  Only idempotent methods are retried, a
+# DELETE only if the BIG-IP did not process it at all, since repeating a
+# processed one fails with 404.  503 is also what restjavad answers while
+# mcpd is busy or restarting.
+RETRY_STATUSES = {
+    'GET': frozenset([502, 503, 504]),
+    'HEAD': frozenset([502, 503, 504]),
+    'OPTIONS': frozenset([502, 503, 504]),
+    'PUT': frozenset([502, 503, 504]),
+    'DELETE': frozenset([503]),
+}
+
+MAX_BACKOFF = 10.0
+
+
+class IdempotentRetry(Retry):
+    """Bounded retry of idempotent requests with jittered backoff.
+
+    Statuses are retried per method as listed in RETRY_STATUSES, POST and
+    PATCH are never retried once sent.  Connection errors are retried for
+    all methods, as the request did not reach the BIG-IP.  Retry n waits
+    between half and all of backoff_factor * 2 ** (n - 1) seconds, so
+    greenthreads failing together do not retry together.
+    """
+
+    def _is_method_retryable(self, method):
+        return method.upper() in RETRY_STATUSES
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if not self.total:
+            return False
+        return status_code in RETRY_STATUSES.get(method.upper(), ())
+
+    def get_backoff_time(self):
+        if not self.history:
+            return 0
+        backoff = min(MAX_BACKOFF,
+                      self.backoff_factor * (2 ** (len(self.history) - 1)))
+        return random.uniform(backoff / 2, backoff)
+
+
+class TokenAuth(iControlRESTTokenAuth):
+    """Token authentication with one login shared by all greenthreads.
+
+    The token is reused until a minute before it expires on the BIG-IP.
+    Logins are sent through the session, so they use its pooled
+    connections, and only one greenthread logs in at a time.  A request
+    rejected with 401 because the BIG-IP dropped the token, e.g. when
+    restjavad restarted, logs in again and is sent once more.
+    """
+
+    def __init__(self, session, username, password):
+        super(TokenAuth, self).__init__(username, password,
+                                        verify=session.verify)
+        self.session = session
+        self.lock = eventlet.semaphore.Semaphore()
+
+    def get_new_token(self, netloc, scheme='https'):
+        response = self.session.post(
+            '%s://%s%s' % (scheme, netloc, LOGIN_PATH),
+            json={'username': self.username, 'password': self.password,
+                  'loginProviderName': self.login_provider_name},
+            auth=HTTPBasicAuth(self.username, self.password),
+            timeout=getattr(self.session, 'timeout', None))
+        self.attempts += 1
+        response.raise_for_status()
+        token = self._get_token_from_response(response.json())
+        created = self._get_last_update_micros(token)
+        self.expiration = self._get_token_expiration_time(
+            created, self._get_expiration_micros(token, created))
+        LOG.debug("ccloud: new iControl token for %s valid for %d seconds"
+                  % (netloc, self.expiration - time.time()))
+
+    def _valid_token(self, url, rejected=None):
+        with self.lock:
+            if rejected is not None and self.token == rejected:
+                self.token = None
+            if not self._check_token_validity():
+                scheme, netloc = urlparse.urlsplit(url)[:2]
+                self.get_new_token(netloc, scheme)
+            return self.token
+
+    def __call__(self, request):
+        request.headers[TOKEN_HEADER] = self._valid_token(request.url)
+        request.register_hook('response', self.handle_401)
+        return request
+
+    def handle_401(self, response, **kwargs):
+        if response.status_code != 401:
+            return response
+        rejected = response.request.headers.get(TOKEN_HEADER)
+        # release the connection before sending the request again
+        response.content
+        response.close()
+        request = response.request.copy()
+        request.headers[TOKEN_HEADER] = self._valid_token(request.url,
+                                                          rejected)
+        retried = response.connection.send(request, **kwargs)
+        retried.history.append(response)
+        retried.request = request
+        return retried
+
+
+def configure(bigip, pool_size, retries=3, backoff_factor=0.5,
+              token_auth=True):
+    """Mount the connection pool and retries on the session of a bigip.
+
+    pool_size connections are kept alive per bigip, which should match
+    the number of greenthreads talking to it concurrently, more would be
+    opened and closed for every request.
+    """
+    session = bigip._meta_data['icr_session'].session
+    retry = IdempotentRetry(total=retries, backoff_factor=backoff_factor,
+                            raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                          max_retries=retry)
+    for prefix in ['https://', 'http://']:
+        session.mount(prefix, adapter)
+
+    if token_auth and not isinstance(session.auth, TokenAuth):
+        session.auth = TokenAuth(session, bigip._meta_data['username'],
+                                 bigip._meta_data['password'])
+    LOG.info("ccloud: iControl session to %s pooled %d connections, "
+             "%d retries, token auth %s" %
+             (bigip._meta_data['hostname'], pool_size, retries, token_auth))
+    return session
@@ -23,6 +23,7 @@ from oslo_utils import importutils
 from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5_ex
 from f5_openstack_agent.lbaasv2.drivers.bigip.fdb_connector_ml2 \
     import FDBConnectorML2
+from f5_openstack_agent.lbaasv2.drivers.bigip.fdb_engine import FdbEngine
 from f5_openstack_agent.lbaasv2.drivers.bigip.network_helper import \
     NetworkHelper
 from f5_openstack_agent.lbaasv2.drivers.bigip.service_adapter import \
@@ -75,6 +76,8 @@ class L2ServiceBuilder(object):
         self.system_helper = SystemHelper()
         self.network_helper = NetworkHelper()
         self.service_adapter = ServiceModelAdapter(self.conf)
+        self.fdb_engine = FdbEngine(self.conf.ccloud_fdb_coalesce_window,
+                                    self.conf.ccloud_fdb_mirror_ttl)
 
         if not f5_global_routed_mode:
             self.fdb_connector = FDBConnectorML2(self.conf)
@@ -532,6 +535,7 @@ class L2ServiceBuilder(object):
             LOG.exception(err)
             LOG.error(
                 "Failed to delete vxlan tunnel: %s" % tunnel_name)
+        self.fdb_engine.forget(bigip, tunnel_name)
 
         if self.fdb_connector:
             self.fdb_connector.notify_vtep_removed(network, bigip.local_ip)
@@ -556,6 +560,7 @@ class L2ServiceBuilder(object):
             LOG.exception(err)
             LOG.error(
                 "Failed to delete gre tunnel: %s" % tunnel_name)
+        self.fdb_engine.forget(bigip, tunnel_name)
 
         if self.fdb_connector:
             self.fdb_connector.notify_vtep_removed(network, bigip.local_ip)
@@ -604,6 +609,8 @@ class L2ServiceBuilder(object):
                 mac_address=mac_addr,
                 vtep_ip_address=vtep,
                 arp_ip_address=ip_address)
+        # records were written directly, reload them on the next event
+        self.fdb_engine.invalidate(bigip, tunnel_name)
 
     def add_vxlan_fdbs(self, bigip, net_folder, fdb_info, vteps):
         # Add vxlan fdb records
@@ -624,6 +631,7 @@ class L2ServiceBuilder(object):
                 mac_address=mac_addr,
                 vtep_ip_address=vtep,
                 arp_ip_address=ip_address)
+        self.fdb_engine.invalidate(bigip, tunnel_name)
 
     def delete_bigip_fdbs(self, bigip, net_folder, fdb_info, vteps_by_type):
         # Delete fdb records for a mac/ip with specified vteps
@@ -655,6 +663,7 @@ class L2ServiceBuilder(object):
                 mac_address=mac_addr,
                 arp_ip_address=ip_address,
                 partition=net_folder)
+        self.fdb_engine.invalidate(bigip, tunnel_name)
 
     def delete_vxlan_fdbs(self, bigip, net_folder, fdb_info, vteps):
         # delete vxlan fdb records
@@ -673,21 +682,14 @@ class L2ServiceBuilder(object):
                 mac_address=mac_addr,
                 arp_ip_address=ip_address,
                 partition=net_folder)
+        self.fdb_engine.invalidate(bigip, tunnel_name)
 
     def add_bigip_fdb(self, bigip, fdb):
         # Add entries from the fdb relevant to the bigip
-        for fdb_operation in \
-            [{'network_type': 'vxlan',
-              'get_tunnel_folder': self.network_helper.get_tunnel_folder,
-              'fdb_method': self.network_helper.add_fdb_entries},
+        self.fdb_engine.add(bigip, self._get_bigip_fdbs(bigip, fdb))
 
-             {'network_type': 'gre',
-              'get_tunnel_folder': self.network_helper.get_tunnel_folder,
-              'fdb_method': self.network_helper.add_fdb_entries}]:
-            self._operate_bigip_fdb(bigip, fdb, fdb_operation)
-
-    def _operate_bigip_fdb(self, bigip, fdb, fdb_operation):
-        """Add L2 records for MAC addresses behind tunnel endpoints.
+    def _get_bigip_fdbs(self, bigip, fdb):
+        """Get L2 records for MAC addresses behind tunnel endpoints.
 
             Description of fdb structure:
             {'<network_id>':
@@ -705,30 +707,21 @@ class L2ServiceBuilder(object):
                                       [u'fa:16:3e:3d:7b:7f', u'10.10.1.4']]},
                  u'network_type': u'vxlan'}}
         """
-        network_type = fdb_operation['network_type']
-        get_tunnel_folder = fdb_operation['get_tunnel_folder']
-        fdb_method = fdb_operation['fdb_method']
-
+        fdbs = {}
         for network in fdb:
             net_fdb = fdb[network]
-            if net_fdb['network_type'] == network_type:
+            if net_fdb.get('network_type') in ['vxlan', 'gre']:
                 net = {'name': network,
                        'provider:network_type': net_fdb['network_type'],
                        'provider:segmentation_id': net_fdb['segment_id']}
-                tunnel_name = _get_tunnel_name(net)
-                folder = get_tunnel_folder(bigip, tunnel_name=tunnel_name)
                 net_info = {'network': network,
-                            'folder': folder,
-                            'tunnel_name': tunnel_name,
+                            'tunnel_name': _get_tunnel_name(net),
                             'net_fdb': net_fdb}
-                fdbs = self._get_bigip_network_fdbs(bigip, net_info)
-                if len(fdbs) > 0:
-                    fdb_method(fdb_entries=fdbs)
+                fdbs.update(self._get_bigip_network_fdbs(bigip, net_info))
+        return fdbs
 
     def _get_bigip_network_fdbs(self, bigip, net_info):
         # Get network fdb entries to add to a bigip
-        if not net_info['folder']:
-            return {}
         net_fdb = net_info['net_fdb']
         fdbs = {}
         for vtep in net_fdb['ports']:
@@ -749,7 +742,6 @@ class L2ServiceBuilder(object):
 
     def _merge_vtep_fdbs(self, vtep_info, fdbs):
         # Add L2 records for a specific network+vtep
-        folder = vtep_info['folder']
         tunnel_name = vtep_info['tunnel_name']
         for entry in vtep_info['fdb_entries']:
             mac_address = entry[0]
@@ -761,8 +753,6 @@ class L2ServiceBuilder(object):
             if tunnel_name not in fdbs:
                 fdbs[tunnel_name] = {}
             tunnel_fdbs = fdbs[tunnel_name]
-            # update tunnel folder
-            tunnel_fdbs['folder'] = folder
 
             # maybe create records for tunnel
             if 'records' not in tunnel_fdbs:
@@ -773,19 +763,15 @@ class L2ServiceBuilder(object):
                 {'endpoint': vtep_info['vtep'], 'ip_address': ip_address}
 
     def update_bigip_fdb(self, bigip, fdb):
-        # Update l2 records
+        # Update l2 records, ip changes ('chg_ip') do not touch the
+        # mac and vtep of a record, so there is nothing to write for them
+        fdb = dict((network, net_fdb) for network, net_fdb in fdb.items()
+                   if network != 'chg_ip')
         self.add_bigip_fdb(bigip, fdb)
 
     def remove_bigip_fdb(self, bigip, fdb):
-        # Add L2 records for MAC addresses behind tunnel endpoints
-        for fdb_operation in \
-            [{'network_type': 'vxlan',
-              'get_tunnel_folder': self.network_helper.get_tunnel_folder,
-              'fdb_method': self.network_helper.delete_fdb_entries},
-             {'network_type': 'gre',
-              'get_tunnel_folder': self.network_helper.get_tunnel_folder,
-              'fdb_method': self.network_helper.delete_fdb_entries}]:
-            self._operate_bigip_fdb(bigip, fdb, fdb_operation)
+        # Remove L2 records for MAC addresses behind tunnel endpoints
+        self.fdb_engine.remove(bigip, self._get_bigip_fdbs(bigip, fdb))
 
     # Utilities
     def get_network_name(self, bigip, network):
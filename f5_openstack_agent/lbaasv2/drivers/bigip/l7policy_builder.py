@@ -46,10 +46,11 @@ class L7PolicyBuilder(object):
 
     def create(self, bigip):
         LOG.debug("L7PolicyBuilder: create")
-        if self.helper.exists(bigip,
-                              name=self.f5_l7policy['name'],
-                              partition=self.f5_l7policy['partition']):
-            self.helper.update(bigip, self.f5_l7policy)
+        policy = self.helper.try_load(bigip,
+                                      name=self.f5_l7policy['name'],
+                                      partition=self.f5_l7policy['partition'])
+        if policy:
+            self.helper.update(bigip, self.f5_l7policy, resource=policy)
         else:
             self.helper.create(bigip, self.f5_l7policy)
 
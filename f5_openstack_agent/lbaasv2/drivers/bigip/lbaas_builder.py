@@ -25,6 +25,7 @@ from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5_ex
 from f5_openstack_agent.lbaasv2.drivers.bigip import l7policy_service
 from f5_openstack_agent.lbaasv2.drivers.bigip import listener_service
 from f5_openstack_agent.lbaasv2.drivers.bigip import pool_service
+from f5_openstack_agent.lbaasv2.drivers.bigip import resource_helper
 from f5_openstack_agent.lbaasv2.drivers.bigip import virtual_address
 
 from f5_openstack_agent.lbaasv2.drivers.bigip import utils
@@ -40,6 +41,13 @@ class LBaaSBuilder(object):
     # F5 LBaaS Driver using iControl for BIG-IP to
     # create objects (vips, pools) - not using an iApp."""
 
+    PLANNED_TYPES = [('pool', 'pools'),
+                     ('listener', 'listeners'),
+                     ('healthmonitor', 'healthmonitors'),
+                     ('member', 'members')]
+
+    PLAN_OPERATIONS = ['create', 'update', 'delete', 'skip']
+
     def __init__(self, conf, driver, l2_service=None):
         self.conf = conf
         self.driver = driver
@@ -56,24 +64,41 @@ class LBaaSBuilder(object):
         self.esd = None
 
     @utils.instrument_execution_time
-    def assure_service(self, service, traffic_group, all_subnet_hints, delete_event=False):
-        """Assure that a service is configured on the BIGIP."""
+    def assure_service(self, service, traffic_group, all_subnet_hints, delete_event=False,
+                       diff=None):
+        """Assure that a service is configured on the BIGIP.
+
+        diff is an optional result of iControlDriver.service_diff. With
+        a diff only the operations of plan_service are executed for
+        listeners, pools, monitors and members, objects which are ACTIVE
+        and deployed on all bigips are skipped.
+        """
         start_time = time()
         LOG.debug("Starting assure_service")
 
+        plan = None
+        if diff is not None and not delete_event:
+            plan = self.plan_service(service, diff)
+            LOG.debug("ccloud: service plan for loadbalancer %s: %s" %
+                      (service['loadbalancer']['id'],
+                       self.format_plan(plan)))
+
         # Needed also for delete events because of subnet hints
         self._assure_loadbalancer_created(service, all_subnet_hints)
         # Create and update
         if not delete_event:
-            self._assure_pools_created(service)
+            self._assure_pools_created(service, plan)
 
-            self._assure_listeners_created(service)
+            self._assure_listeners_created(service, plan)
 
-            self._assure_monitors_created(service)
+            self._assure_in_transaction(self._assure_monitors_created,
+                                        service, plan)
 
-            self._assure_members_created(service, all_subnet_hints)
+            self._assure_in_transaction(self._assure_members_created,
+                                        service, all_subnet_hints, plan)
 
-            self._assure_pools_configured(service)
+            self._assure_in_transaction(self._assure_pools_configured,
+                                        service, plan)
 
             self._assure_l7policies_created(service)
 
@@ -97,6 +122,94 @@ class LBaaSBuilder(object):
                   (time() - start_time))
         return all_subnet_hints
 
+    def _assure_in_transaction(self, stage, *args):
+        """Run a stage of assure_service with one transaction per bigip.
+
+        The writes of the stage are committed at once. If the stage
+        raises, none of them is applied. If a commit fails, e.g. because
+        an object to be created exists already, the bigip has rolled it
+        back and the stage is run again with immediate REST calls, which
+        handle such conflicts object by object.
+        """
+        if not self.conf.ccloud_rest_transactions:
+            return stage(*args)
+
+        try:
+            with resource_helper.transaction(self.driver.get_config_bigips()):
+                result = stage(*args)
+        except f5_ex.TransactionCommitException as err:
+            LOG.info("ccloud: %s transaction failed, applying it again "
+                     "without transaction: %s" % (stage.__name__, err))
+            return stage(*args)
+        return result
+
+    def plan_service(self, service, diff):
+        """Return the operations needed to configure a service.
+
+        diff is a result of iControlDriver.service_diff. The plan maps
+        the object types listener, pool, healthmonitor and member to
+        dicts of neutron ids and one of the operations create, update,
+        delete or skip. Objects missing on any bigip are created, ACTIVE
+        objects deployed on all bigips are skipped.
+        """
+        plan = {}
+        for obj_type, key in self.PLANNED_TYPES:
+            plan[obj_type] = dict(
+                (obj['id'], self._planned_operation(obj_type, obj, diff))
+                for obj in service.get(key, []))
+        return plan
+
+    @staticmethod
+    def format_plan(plan):
+        """Return a plan as text, grouped by object type and operation."""
+        lines = []
+        for obj_type, _ in LBaaSBuilder.PLANNED_TYPES:
+            for operation in LBaaSBuilder.PLAN_OPERATIONS:
+                ids = sorted(obj_id for obj_id, op in
+                             plan.get(obj_type, {}).items()
+                             if op == operation)
+                if ids:
+                    lines.append("%s %s: %s" %
+                                 (operation, obj_type, ", ".join(ids)))
+        return "; ".join(lines) or "nothing to do"
+
+    @staticmethod
+    def _planned_operation(obj_type, obj, diff):
+        deployed = ('loadbalancer' not in diff and
+                    obj['id'] not in diff.get(obj_type, {}))
+        if obj_type == 'member':
+            deployed = deployed and obj['pool_id'] not in diff.get('pool', {})
+
+        status = obj['provisioning_status']
+        if status == plugin_const.PENDING_DELETE:
+            return 'delete' if deployed else 'skip'
+        if not deployed:
+            return 'create'
+        if status == plugin_const.ACTIVE:
+            return 'skip'
+        return 'update'
+
+    @staticmethod
+    def _planned(plan, obj_type, obj):
+        """Return the planned operation for an object, None without plan."""
+        if plan is None:
+            return None
+        return plan[obj_type].get(obj['id'])
+
+    def _pool_unchanged(self, service, pool, plan):
+        """Check if a pool, its listeners, members and monitors are skipped."""
+        if self._planned(plan, 'pool', pool) != 'skip':
+            return False
+        related = [('listener', listener)
+                   for listener in pool.get('listeners', [])]
+        related.extend(('member', member) for member in
+                       self._get_pool_members(service, pool['id']))
+        related.extend(('healthmonitor', monitor)
+                       for monitor in service.get('healthmonitors', [])
+                       if monitor.get('pool_id') == pool['id'])
+        return all(self._planned(plan, obj_type, obj) == 'skip'
+                   for obj_type, obj in related)
+
     @utils.instrument_execution_time
     def _assure_loadbalancer_created(self, service, all_subnet_hints):
         if 'loadbalancer' not in service:
@@ -107,8 +220,7 @@ class LBaaSBuilder(object):
         vip_address = virtual_address.VirtualAddress(
             self.service_adapter,
             loadbalancer)
-        for bigip in bigips:
-            vip_address.assure(bigip)
+        utils.fan_out(bigips, vip_address.assure)
 
         if self.driver.l3_binding:
             loadbalancer = service["loadbalancer"]
@@ -125,7 +237,7 @@ class LBaaSBuilder(object):
             loadbalancer['provisioning_status'] = plugin_const.ACTIVE
 
     @utils.instrument_execution_time
-    def _assure_listeners_created(self, service):
+    def _assure_listeners_created(self, service, plan=None):
         if 'listeners' not in service:
             return
 
@@ -135,6 +247,10 @@ class LBaaSBuilder(object):
         bigips = self.driver.get_config_bigips()
         old_listener = service.get('old_listener')
         for listener in listeners:
+            operation = self._planned(plan, 'listener', listener)
+            if operation == 'skip':
+                continue
+
             if (old_listener != None and old_listener.get('id') == listener.get('id')):
                 svc = {"loadbalancer": loadbalancer,
                        "listener": listener,
@@ -151,7 +267,8 @@ class LBaaSBuilder(object):
                 if pool:
                     svc['pool'] = pool
 
-            if listener['provisioning_status'] == plugin_const.PENDING_UPDATE:
+            if listener['provisioning_status'] == \
+                    plugin_const.PENDING_UPDATE and operation != 'create':
                 try:
                     self.listener_builder.update_listener(svc, bigips)
                 except Exception as err:
@@ -176,7 +293,7 @@ class LBaaSBuilder(object):
                 listener['provisioning_status'] = plugin_const.ACTIVE
 
     @utils.instrument_execution_time
-    def _assure_pools_created(self, service):
+    def _assure_pools_created(self, service, plan=None):
         if "pools" not in service:
             return
 
@@ -186,6 +303,10 @@ class LBaaSBuilder(object):
         bigips = self.driver.get_config_bigips()
 
         for pool in pools:
+            operation = self._planned(plan, 'pool', pool)
+            if operation == 'skip':
+                continue
+
             if pool['provisioning_status'] != plugin_const.PENDING_DELETE:
                 svc = {"loadbalancer": loadbalancer, "pool": pool}
                 svc['members'] = self._get_pool_members(service, pool['id'])
@@ -193,7 +314,8 @@ class LBaaSBuilder(object):
                 try:
                     # create or update pool
                     if pool['provisioning_status'] == \
-                            plugin_const.PENDING_CREATE:
+                            plugin_const.PENDING_CREATE or \
+                            operation == 'create':
                         self.pool_builder.create_pool(svc, bigips)
                     else:
                         try:
@@ -217,7 +339,7 @@ class LBaaSBuilder(object):
                 pool['provisioning_status'] = plugin_const.ACTIVE
 
     @utils.instrument_execution_time
-    def _assure_pools_configured(self, service):
+    def _assure_pools_configured(self, service, plan=None):
         if "pools" not in service:
             return
 
@@ -227,6 +349,10 @@ class LBaaSBuilder(object):
         bigips = self.driver.get_config_bigips()
 
         for pool in pools:
+            if plan is not None and \
+                    self._pool_unchanged(service, pool, plan):
+                continue
+
             if pool['provisioning_status'] != plugin_const.PENDING_DELETE:
                 svc = {"loadbalancer": loadbalancer, "pool": pool}
                 svc['members'] = self._get_pool_members(service, pool['id'])
@@ -313,7 +439,7 @@ class LBaaSBuilder(object):
                     raise f5_ex.MonitorDeleteException(err.message)
 
     @utils.instrument_execution_time
-    def _assure_monitors_created(self, service):
+    def _assure_monitors_created(self, service, plan=None):
 
         if not (("pools" in service) and ("healthmonitors" in service)):
             return
@@ -323,6 +449,9 @@ class LBaaSBuilder(object):
         bigips = self.driver.get_config_bigips()
 
         for monitor in monitors:
+            if self._planned(plan, 'healthmonitor', monitor) == 'skip':
+                continue
+
             svc = {"loadbalancer": loadbalancer,
                    "healthmonitor": monitor,
                    "pool": self.get_pool_by_id(service, monitor["pool_id"])}
@@ -345,7 +474,7 @@ class LBaaSBuilder(object):
                 monitor['provisioning_status'] = plugin_const.ACTIVE
 
     @utils.instrument_execution_time
-    def _assure_members_created(self, service, all_subnet_hints):
+    def _assure_members_created(self, service, all_subnet_hints, plan=None):
         if not (("pools" in service) and ("members" in service)):
             return
 
@@ -363,9 +492,21 @@ class LBaaSBuilder(object):
                 member['provisioning_status'] != plugin_const.PENDING_DELETE:
                 LOG.warning("Member definition does not include Neutron port")
 
-            # delete member if pool is being deleted
-            if not (member['provisioning_status'] == plugin_const.PENDING_DELETE or \
-                pool['provisioning_status'] == plugin_const.PENDING_DELETE):
+            if member['provisioning_status'] == plugin_const.PENDING_DELETE or \
+                pool['provisioning_status'] == plugin_const.PENDING_DELETE:
+                continue
+
+            operation = self._planned(plan, 'member', member)
+            if operation == 'skip':
+                LOG.debug("member %s already deployed" % member['id'])
+            elif operation == 'update':
+                try:
+                    self.pool_builder.update_member(svc, bigips)
+                    member['provisioning_status'] = plugin_const.ACTIVE
+                except Exception as err:
+                    member['provisioning_status'] = plugin_const.ERROR
+                    raise f5_ex.MemberUpdateException(err.message)
+            else:
                 try:
                     self.pool_builder.create_member(svc, bigips)
                     member['provisioning_status'] = plugin_const.ACTIVE
@@ -389,11 +530,11 @@ class LBaaSBuilder(object):
                     member['provisioning_status'] = plugin_const.ERROR
                     raise f5_ex.MemberCreationException(err.message)
 
-                self._update_subnet_hints(member["provisioning_status"],
-                                          member["subnet_id"],
-                                          member["network_id"],
-                                          all_subnet_hints,
-                                          True)
+            self._update_subnet_hints(member["provisioning_status"],
+                                      member["subnet_id"],
+                                      member["network_id"],
+                                      all_subnet_hints,
+                                      True)
 
     @utils.instrument_execution_time
     def _assure_members_deleted(self, service, all_subnet_hints):
@@ -429,6 +570,70 @@ class LBaaSBuilder(object):
                                           all_subnet_hints,
                                           True)
 
+    def get_member_delta(self, service, member_id):
+        """Return the member and pool if only this member is pending.
+
+        The member can then be changed on its own: the loadbalancer and
+        the pool of the member are deployed and all other objects of the
+        service are ACTIVE. Otherwise None is returned.
+        """
+        loadbalancer = service.get('loadbalancer') or {}
+        if loadbalancer.get('provisioning_status') not in \
+                [plugin_const.ACTIVE, plugin_const.PENDING_UPDATE]:
+            return None
+
+        member = None
+        for obj_type in ['listeners', 'pools', 'healthmonitors', 'members',
+                         'l7policies', 'l7policy_rules']:
+            for obj in service.get(obj_type, []):
+                if obj_type == 'members' and obj['id'] == member_id:
+                    member = obj
+                elif obj.get('provisioning_status') != plugin_const.ACTIVE:
+                    return None
+
+        if not member or member.get('provisioning_status') not in \
+                [plugin_const.PENDING_CREATE, plugin_const.PENDING_UPDATE,
+                 plugin_const.PENDING_DELETE]:
+            return None
+        pool = self.get_pool_by_id(service, member.get('pool_id'))
+        if not pool:
+            return None
+        return member, pool
+
+    @utils.instrument_execution_time
+    def assure_member(self, service, member, pool, address):
+        """Create, update or delete one member of a get_member_delta.
+
+        address is the member address with route domain. Only the pool
+        member (and its node on delete) is changed on the bigips.
+        """
+        bigips = self.driver.get_config_bigips()
+        svc = {"loadbalancer": service["loadbalancer"],
+               "member": dict(member, address=address),
+               "pool": pool}
+
+        status = member['provisioning_status']
+        if status == plugin_const.PENDING_DELETE:
+            try:
+                self.pool_builder.delete_member(svc, bigips)
+            except Exception as err:
+                raise f5_ex.MemberDeleteException(err.message)
+        elif status == plugin_const.PENDING_UPDATE:
+            try:
+                self.pool_builder.update_member(svc, bigips)
+            except Exception as err:
+                raise f5_ex.MemberUpdateException(err.message)
+        else:
+            try:
+                self.pool_builder.create_member(svc, bigips)
+            except HTTPError as err:
+                if err.response.status_code != 409:
+                    raise f5_ex.MemberCreationException(err.message)
+                try:
+                    self.pool_builder.update_member(svc, bigips)
+                except Exception as err:
+                    raise f5_ex.MemberUpdateException(err.message)
+        return svc["member"]
 
     @utils.instrument_execution_time
     def _assure_loadbalancer_deleted(self, service):
@@ -448,8 +653,7 @@ class LBaaSBuilder(object):
             self.service_adapter,
             loadbalancer)
 
-        for bigip in bigips:
-            vip_address.assure(bigip, delete=True)
+        utils.fan_out(bigips, vip_address.assure, delete=True)
 
     @utils.instrument_execution_time
     def _assure_pools_deleted(self, service):
@@ -710,20 +914,39 @@ class LBaaSBuilder(object):
         return collected_stats
     @utils.instrument_execution_time
     def update_operating_status(self, service):
-        bigip = self.driver.get_active_bigip()
-        loadbalancer = service["loadbalancer"]
-        status_keys = ['status.availabilityState',
-                       'status.enabledState']
+        self.update_operating_statuses([service])
 
-        members = service["members"]
-        for member in members:
-            if member['provisioning_status'] == plugin_const.ACTIVE:
-                pool = self.get_pool_by_id(service, member["pool_id"])
-                svc = {"loadbalancer": loadbalancer,
-                       "member": member,
-                       "pool": pool}
-                status = self.pool_builder.get_member_status(
-                    svc, bigip, status_keys)
+    @utils.instrument_execution_time
+    def update_operating_statuses(self, services):
+        """Set operating status of all ACTIVE members of services.
+
+        Member status is read with one request from the active BIG-IP,
+        restricted to the partition if all services belong to one tenant.
+        Members missing on the BIG-IP get an operating status of None.
+        """
+        bigip = self.driver.get_active_bigip()
+        partitions = set(
+            self.service_adapter.get_folder_name(
+                service['loadbalancer']['tenant_id'])
+            for service in services)
+        partition = partitions.pop() if len(partitions) == 1 else None
+        members_status = self.pool_builder.get_members_status(
+            bigip, partition=partition)
+
+        for service in services:
+            for member in service.get('members', []):
+                if member['provisioning_status'] != plugin_const.ACTIVE:
+                    continue
+                # address may carry the route domain already
+                address = member['address'].split('%')[0]
+                key = (self.service_adapter.prefix + member['pool_id'],
+                       utils.member_key(address, member['protocol_port']))
+                status = members_status.get(key)
+                if status is None:
+                    LOG.debug("member %s not found on %s",
+                              member['id'], bigip.hostname)
+                    member['operating_status'] = None
+                    continue
                 member['operating_status'] = self.convert_operating_status(
                     status)
 
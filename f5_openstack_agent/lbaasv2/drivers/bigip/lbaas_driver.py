@@ -13,6 +13,8 @@
 # limitations under the License.
 #
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.utils import RequestScheduler
+
 
 class LBaaSBaseDriver(object):
     """Abstract base LBaaS Driver class for interfacing with Agent Manager."""
@@ -25,8 +27,7 @@ class LBaaSBaseDriver(object):
         self.agent_id = None
         self.plugin_rpc = None  # XXX overridden in the only known subclass
         self.connected = False  # XXX overridden in the only known subclass
-        self.service_queue = []
-        self.queues = {}
+        self.scheduler = RequestScheduler()
         self.agent_configurations = {}  # XXX overridden in subclass
 
     def set_context(self, context):
@@ -52,6 +53,14 @@ class LBaaSBaseDriver(object):
         """Remove all cached items."""
         raise NotImplementedError()
 
+    def forget_loadbalancer(self, loadbalancer_id):
+        """Drop a loadbalancer which is no longer hosted by the agent."""
+        raise NotImplementedError()
+
+    def reload_esd(self):
+        """Re-validate changed Enhanced Service Definitions."""
+        raise NotImplementedError()
+
     def backend_integrity(self):
         """Return True, if the agent is be considered viable for services."""
         raise NotImplemented()
@@ -68,6 +77,14 @@ class LBaaSBaseDriver(object):
         """Update pool member operational status from devices to controller."""
         raise NotImplemented
 
+    def get_tenant_fingerprints(self):
+        """Return a hash of the deployed objects of every tenant."""
+        raise NotImplementedError()
+
+    def update_operating_statuses(self, services):
+        """Update member operational status of many services at once."""
+        raise NotImplementedError()
+
     def recover_errored_devices(self):
         """Trigger attempt to reconnect any errored devices."""
         raise NotImplemented
@@ -76,6 +93,14 @@ class LBaaSBaseDriver(object):
         """Get Stats for a loadbalancer Service."""
         raise NotImplementedError()
 
+    def open_inventory(self):
+        """Share one snapshot of deployed objects until close_inventory."""
+        raise NotImplementedError()
+
+    def close_inventory(self):
+        """Drop the shared snapshot of deployed objects."""
+        raise NotImplementedError()
+
     def get_all_deployed_loadbalancers(self, purge_orphaned_folders=True):
         """Get all Loadbalancers defined on devices."""
         raise NotImplemented
@@ -89,7 +114,11 @@ class LBaaSBaseDriver(object):
         """Check If LBaaS Service is Defined on Driver Target."""
         raise NotImplementedError()
 
-    def sync(self, service):
+    def service_diff(self, service):
+        """Return the objects of a Service missing on Driver Target."""
+        raise NotImplementedError()
+
+    def sync(self, service, diff=None):
         """Force Sync a Service on Driver Target."""
         raise NotImplementedError()
 
@@ -136,6 +165,10 @@ class LBaaSBaseDriver(object):
         """LBaaS Delete Health Monitor."""
         raise NotImplementedError()
 
+    def update_service(self, service, delete_event=False):
+        """Apply all pending changes of a loadbalancer at once."""
+        raise NotImplementedError()
+
     def get_all_deployed_health_monitors(self):
         """Get listing of all deployed Health Monitors"""
         raise NotImplementedError()
@@ -16,6 +16,8 @@
 
 #import pdb
 
+import copy
+
 from oslo_log import log as logging
 
 from neutron.plugins.common import constants as plugin_const
@@ -69,11 +71,14 @@ class ListenerServiceBuilder(object):
         service['listener']['operating_status'] = lb_const.ONLINE
 
         network_id = service['loadbalancer']['network_id']
-        error = None
-        for bigip in bigips:
-            self.service_adapter.get_vlan(vip, bigip, network_id)
+        errors = []
+
+        def _create_listener(bigip):
+            # every bigip gets its own vlan
+            device_vip = copy.deepcopy(vip)
+            self.service_adapter.get_vlan(device_vip, bigip, network_id)
             try:
-                self.vs_helper.create(bigip, vip)
+                self.vs_helper.create(bigip, device_vip)
             except HTTPError as err:
                 if err.response.status_code == 409:
                     LOG.debug("Virtual server already exists updating")
@@ -96,11 +101,13 @@ class ListenerServiceBuilder(object):
                     self.add_ssl_profile(tls, bigip)
                 except Exception as err:
                     LOG.error("Error adding SSL Profile to listener: {0}".format(err))
-                    error = err if error is None else error
+                    errors.append(err)
 
-        if error:
+        utils.fan_out(bigips, _create_listener)
+
+        if errors:
             service['listener']['provisioning_status'] = 'ERROR'
-            raise error
+            raise errors[0]
 
 
     def get_listener(self, service, bigip):
@@ -130,8 +137,14 @@ class ListenerServiceBuilder(object):
         if tls:
             tls['name'] = vip['name']
             tls['partition'] = vip['partition']
-        error = None
-        for bigip in bigips:
+        if tls:
+            self._invalidate_certificates(
+                [tls.get('default_tls_container_id')] +
+                [sni['tls_container_id']
+                 for sni in tls.get('sni_containers', [])])
+        errors = []
+
+        def _delete_listener(bigip):
             self.vs_helper.delete(bigip,
                                   name=vip["name"],
                                   partition=vip["partition"])
@@ -142,10 +155,12 @@ class ListenerServiceBuilder(object):
                 self.remove_ssl_profiles(tls, bigip)
             except Exception as err:
                 LOG.error("Error adding SSL Profile to listener: {0}".format(err))
-                error = err if error is None else error
+                errors.append(err)
 
-        if error:
-            raise error
+        utils.fan_out(bigips, _delete_listener)
+
+        if errors:
+            raise errors[0]
 
     def add_ssl_profile(self, tls, bigip, add_to_vip=True):
         # add profile to virtual server
@@ -288,6 +303,10 @@ class ListenerServiceBuilder(object):
                 for new in new_snis:
                     new_ids.append(new.get('tls_container_id'))
                 new_sni_containers = self._make_sni_tls(vip, list(set(new_ids) - set(old_ids)))
+                # changed tls references must not be served from the cache
+                self._invalidate_certificates(
+                    [old_default, new_default] +
+                    list(set(new_ids) ^ set(old_ids)))
                 old_sni_containers = self._make_sni_tls(vip, list(set(old_ids) - set(new_ids)))
 
             # create old and new tls listener configurations
@@ -318,15 +337,18 @@ class ListenerServiceBuilder(object):
         self.apply_esds(service, vip)
 
         # apply changes to listener AND remove not needed ssl profiles on F5
-        error = None
+        errors = []
         network_id = service['loadbalancer']['network_id']
-        for bigip in bigips:
-            self.service_adapter.get_vlan(vip, bigip, network_id)
+
+        def _update_listener(bigip):
+            # every bigip gets its own vlan
+            device_vip = copy.deepcopy(vip)
+            self.service_adapter.get_vlan(device_vip, bigip, network_id)
             try:
-                self.vs_helper.update(bigip, vip)
+                self.vs_helper.update(bigip, device_vip)
             except Exception as err:
                 LOG.error("Error changing listener: {0}".format(err))
-                error = err if error is None else error
+                errors.append(err)
             # delete ssl profiles
             if listener.get('protocol') == 'TERMINATED_HTTPS':
                 if old_tls != None:
@@ -340,8 +362,18 @@ class ListenerServiceBuilder(object):
                     except:
                         pass
 
-        if error:
-            raise error
+        utils.fan_out(bigips, _update_listener)
+
+        if errors:
+            raise errors[0]
+
+    def _invalidate_certificates(self, container_refs):
+        # cert managers without cache have nothing to invalidate
+        invalidate = getattr(self.cert_manager, 'invalidate', None)
+        if invalidate:
+            for container_ref in container_refs:
+                if container_ref:
+                    invalidate(container_ref)
 
     def _make_default_tls(self, vip, id):
         return {'name': vip['name'], 'partition': vip['partition'], 'default_tls_container_id': id}
@@ -367,11 +399,16 @@ class ListenerServiceBuilder(object):
         vip = self.service_adapter.get_virtual_name(service)
         if vip:
             vip["pool"] = name
-            for bigip in bigips:
-                v = bigip.tm.ltm.virtuals.virtual
-                if v.exists(name=vip["name"], partition=vip["partition"]):
-                    obj = v.load(name=vip["name"], partition=vip["partition"])
-                    obj.modify(**vip)
+
+            def _update_listener_pool(bigip):
+                obj = resource_helper.try_load(
+                    bigip.tm.ltm.virtuals.virtual, name=vip["name"],
+                    partition=vip["partition"])
+                if obj:
+                    obj.modify(**dict(
+                        vip, **resource_helper.transaction_params(bigip)))
+
+            utils.fan_out(bigips, _update_listener_pool)
 
     def update_session_persistence(self, service, bigips):
         """Update session persistence for virtual server.
@@ -615,11 +652,9 @@ class ListenerServiceBuilder(object):
         """
         try:
             ssl_client_profile = bigip.tm.ltm.profile.client_ssls.client_ssl
-            if ssl_client_profile.exists(name=name, partition='Common'):
-                obj = ssl_client_profile.load(name=name, partition='Common')
-                if obj:
-                    obj.delete()
-                    LOG.info("ccloud: SSL Profile deleted: %s" % name)
+            if resource_helper.try_delete(ssl_client_profile, name=name,
+                                          partition='Common'):
+                LOG.info("ccloud: SSL Profile deleted: %s" % name)
 
         except Exception as err:
             # Not necessarily an error -- profile might be referenced
@@ -664,15 +699,13 @@ class ListenerServiceBuilder(object):
         rule_name = 'app_cookie_' + vip['name']
 
         u = bigip.tm.ltm.persistence.universals.universal
-        if u.exists(name=rule_name, partition=vip["partition"]):
-            obj = u.load(name=rule_name, partition=vip["partition"])
-            obj.delete()
+        if resource_helper.try_delete(u, name=rule_name,
+                                      partition=vip["partition"]):
             LOG.debug("Deleted persistence universal %s" % rule_name)
 
         r = bigip.tm.ltm.rules.rule
-        if r.exists(name=rule_name, partition=vip["partition"]):
-            obj = r.load(name=rule_name, partition=vip["partition"])
-            obj.delete()
+        if resource_helper.try_delete(r, name=rule_name,
+                                      partition=vip["partition"]):
             LOG.debug("Deleted rule %s" % rule_name)
 
     def get_stats(self, service, bigips, stat_keys):
@@ -19,6 +19,10 @@ import netaddr
 import os
 import urllib
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    try_delete
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    try_load
 from f5_openstack_agent.lbaasv2.drivers.bigip.utils import get_filter
 from oslo_log import helpers as log_helpers
 from oslo_log import log as logging
@@ -69,9 +73,8 @@ class NetworkHelper(object):
     def create_l2gre_multipoint_profile(self, bigip, name,
                                         partition=const.DEFAULT_PARTITION):
         p = bigip.tm.net.tunnels.gres.gre
-        if p.exists(name=name, partition=partition):
-            obj = p.load(name=name, partition=partition)
-        else:
+        obj = try_load(p, name=name, partition=partition)
+        if obj is None:
             payload = NetworkHelper.l2gre_multipoint_profile_defaults
             payload['name'] = name
             payload['partition'] = partition
@@ -82,9 +85,8 @@ class NetworkHelper(object):
     def create_vxlan_multipoint_profile(self, bigip, name,
                                         partition=const.DEFAULT_PARTITION):
         p = bigip.tm.net.tunnels.vxlans.vxlan
-        if p.exists(name=name, partition=partition):
-            obj = p.load(name=name, partition=partition)
-        else:
+        obj = try_load(p, name=name, partition=partition)
+        if obj is None:
             payload = NetworkHelper.vxlan_multipoint_profile_defaults
             payload['name'] = name
             payload['partition'] = partition
@@ -95,9 +97,8 @@ class NetworkHelper(object):
     def create_ppp_profile(self, bigip, name,
                            partition=const.DEFAULT_PARTITION):
         pf = bigip.tm.net.tunnels.ppps.ppp
-        if pf.exists(name=name, partition=partition):
-            p = pf.load(name=name, partition=partition)
-        else:
+        p = try_load(pf, name=name, partition=partition)
+        if p is None:
             payload = NetworkHelper.ppp_profile_defaults
             payload['name'] = name
             payload['partition'] = partition
@@ -114,9 +115,9 @@ class NetworkHelper(object):
         if description:
             payload['description'] = description
         tf = bigip.tm.net.tunnels.tunnels.tunnel
-        if tf.exists(name=payload['name'], partition=payload['partition']):
-            t = tf.load(name=payload['name'], partition=payload['partition'])
-        else:
+        t = try_load(tf, name=payload['name'],
+                     partition=payload['partition'])
+        if t is None:
             t = tf.create(**payload)
         return t
 
@@ -135,9 +136,9 @@ class NetworkHelper(object):
         route_domain_id = model.pop('route_domain_id',
                                     const.DEFAULT_ROUTE_DOMAIN_ID)
         t = bigip.tm.net.tunnels.tunnels.tunnel
-        if t.exists(name=payload['name'], partition=payload['partition']):
-            obj = t.load(name=payload['name'], partition=payload['partition'])
-        else:
+        obj = try_load(t, name=payload['name'],
+                       partition=payload['partition'])
+        if obj is None:
             obj = t.create(**payload)
             if not payload['partition'] == const.DEFAULT_PARTITION:
                 self.add_vlan_to_domain_by_id(bigip, payload['name'],
@@ -169,8 +170,8 @@ class NetworkHelper(object):
     def get_selfip_addr(self, bigip, name, partition=const.DEFAULT_PARTITION):
         try:
             s = bigip.tm.net.selfips.selfip
-            if s.exists(name=name, partition=partition):
-                obj = s.load(name=name, partition=partition)
+            obj = try_load(s, name=name, partition=partition)
+            if obj:
                 return obj.address
         except HTTPError as err:
             LOG.error("Error getting selfip address for %s. "
@@ -193,10 +194,7 @@ class NetworkHelper(object):
         if domain_id:
             name += '_aux_' + str(domain_id)
 
-        if r.exists(name=name, partition=partition):
-            return r.load(name=name, partition=partition)
-        else:
-            return None
+        return try_load(r, name=name, partition=partition)
 
 
     @log_helpers.log_method_call
@@ -365,9 +363,9 @@ class NetworkHelper(object):
     @log_helpers.log_method_call
     def delete_route(self ,bigip, partition=const.DEFAULT_PARTITION, name=None):
 
-        if self.route_exists(bigip, partition=partition, name=name):
-            obj = self.get_route(bigip, partition, name)
-            obj.delete()
+        if name:
+            name = self._get_route_name(name)
+        try_delete(bigip.tm.net.routes.route, name=name, partition=partition)
 
     @log_helpers.log_method_call
     def get_vlans_in_route_domain(self,
@@ -404,9 +402,8 @@ class NetworkHelper(object):
         if not name:
             return None
         v = bigip.tm.net.vlans.vlan
-        if v.exists(name=name, partition=partition):
-            obj = v.load(name=name, partition=partition)
-        else:
+        obj = try_load(v, name=name, partition=partition)
+        if obj is None:
             # ccloud: Enable SYN Flood protection
             payload = {'name': name,
                        'partition': partition,
@@ -454,10 +451,7 @@ class NetworkHelper(object):
             name,
             partition=const.DEFAULT_PARTITION):
         """Delete VLAN from partition."""
-        v = bigip.tm.net.vlans.vlan
-        if v.exists(name=name, partition=partition):
-            obj = v.load(name=name, partition=partition)
-            obj.delete()
+        try_delete(bigip.tm.net.vlans.vlan, name=name, partition=partition)
 
     @log_helpers.log_method_call
     def add_vlan_to_domain(
@@ -530,9 +524,7 @@ class NetworkHelper(object):
             address = urllib.quote(self._remove_route_domain_zero(ip_address))
             arp = bigip.tm.net.arps.arp
             try:
-                if arp.exists(name=address, partition=partition):
-                    obj = arp.load(name=address, partition=partition)
-                    obj.delete()
+                try_delete(arp, name=address, partition=partition)
             except HTTPError as err:
                 LOG.error("Error deleting arp %s. "
                           "Repsponse status code: %s. Response "
@@ -787,8 +779,8 @@ class NetworkHelper(object):
 
         try:
             tunnel = bigip.tm.net.fdb.tunnels.tunnel
-            if tunnel.exists(name=tunnel_name, partition=partition):
-                obj = tunnel.load(name=tunnel_name, partition=partition)
+            obj = try_load(tunnel, name=tunnel_name, partition=partition)
+            if obj:
                 obj.modify(records=records)
                 if const.FDB_POPULATE_STATIC_ARP:
                     # arp_ip_address is typcially member address.
@@ -846,8 +838,8 @@ class NetworkHelper(object):
 
         try:
             tunnel = bigip.tm.net.fdb.tunnels.tunnel
-            if tunnel.exists(name=tunnel_name, partition=partition):
-                obj = tunnel.load(name=tunnel_name, partition=partition)
+            obj = try_load(tunnel, name=tunnel_name, partition=partition)
+            if obj:
                 obj.modify(records=records)
         except HTTPError as err:
             LOG.error("Error updating tunnel %s. "
@@ -856,82 +848,6 @@ class NetworkHelper(object):
                                         err.response.status_code,
                                         err.message))
 
-    @log_helpers.log_method_call
-    def add_fdb_entries(self, bigip, fdb_entries=None):
-        # Add vxlan fdb entries
-        for tunnel_name in fdb_entries:
-            folder = fdb_entries[tunnel_name]['folder']
-            existing_records = self.get_fdb_entry(bigip,
-                                                  tunnel_name=tunnel_name,
-                                                  mac=None,
-                                                  partition=folder)
-            new_records = []
-            new_mac_addresses = []
-            new_arp_addresses = {}
-
-            tunnel_records = fdb_entries[tunnel_name]['records']
-            for mac in tunnel_records:
-                fdb_entry = dict()
-                fdb_entry['name'] = mac
-                fdb_entry['endpoint'] = tunnel_records[mac]['endpoint']
-                new_records.append(fdb_entry)
-                new_mac_addresses.append(mac)
-                if tunnel_records[mac]['ip_address']:
-                    new_arp_addresses[mac] = tunnel_records[mac]['ip_address']
-
-            for record in existing_records:
-                if not record['name'] in new_mac_addresses:
-                    new_records.append(record)
-                else:
-                    # This fdb entry exists and is not being updated.
-                    # So, do not update the ARP record either.
-                    if record['name'] in new_arp_addresses:
-                        del new_arp_addresses[record['name']]
-
-            tunnel = bigip.tm.net.fdb.tunnels.tunnel
-            # IMPORTANT: v1 code specifies version 11.5.0. f5-sdk should
-            # default to 11.6.0, so we expect it to work in 12 and greater.
-            if tunnel.exists(name=tunnel_name, partition=folder):
-                obj = tunnel.load(name=tunnel_name, partition=folder)
-                obj.modify(records=new_records)
-
-    @log_helpers.log_method_call
-    def delete_fdb_entries(self, bigip, tunnel_name=None, fdb_entries=None):
-        for tunnel_name in fdb_entries:
-            folder = fdb_entries[tunnel_name]['folder']
-            existing_records = self.get_fdb_entry(bigip,
-                                                  tunnel_name=tunnel_name,
-                                                  mac=None,
-                                                  partition=folder)
-            arps_to_delete = {}
-            new_records = []
-
-            for record in existing_records:
-                for mac in fdb_entries[tunnel_name]['records']:
-                    if record['name'] == mac and mac['ip_address']:
-                        arps_to_delete[mac] = mac['ip_address']
-                        break
-                else:
-                    new_records.append(record)
-
-            if len(new_records) == 0:
-                new_records = None
-
-            tunnel = bigip.tm.net.fdb.tunnels.tunnel
-            # IMPORTANT: v1 code specifies version 11.5.0. f5-sdk should
-            # default to 11.6.0, so we expect it to work in 12 and greater.
-            if tunnel.exists(name=tunnel_name, partition=folder):
-                obj = tunnel.load(name=tunnel_name, partition=folder)
-                obj.modify(records=new_records)
-
-            if const.FDB_POPULATE_STATIC_ARP:
-                for mac in arps_to_delete:
-                    self.arp_delete(bigip,
-                                    ip_address=arps_to_delete[mac],
-                                    partition='Common')
-            return True
-        return False
-
     @log_helpers.log_method_call
     def get_fdb_entry(self,
                       bigip,
@@ -940,8 +856,8 @@ class NetworkHelper(object):
                       partition=const.DEFAULT_PARTITION):
         try:
             tunnel = bigip.tm.net.fdb.tunnels.tunnel
-            if tunnel.exists(name=tunnel_name, partition=partition):
-                obj = tunnel.load(name=tunnel_name, partition=partition)
+            obj = try_load(tunnel, name=tunnel_name, partition=partition)
+            if obj:
                 if hasattr(obj, "records"):
                     records = obj.records
                     if mac is None:
@@ -985,20 +901,21 @@ class NetworkHelper(object):
             tunnel_name,
             partition=const.DEFAULT_PARTITION):
         """Delete a vxlan or gre tunnel."""
+        # the fdb records are only loaded to delete their static arps
         t = bigip.tm.net.fdb.tunnels.tunnel
         try:
-            if t.exists(name=tunnel_name, partition=partition):
-                obj = t.load(name=tunnel_name, partition=partition)
-
-                if const.FDB_POPULATE_STATIC_ARP and hasattr(obj, "records"):
-                    for record in obj.records:
-                        self.arp_delete_by_mac(
-                            bigip,
-                            record['name'],
-                            partition=partition
-                        )
-
-                    obj.modify(records=[])
+            obj = None
+            if const.FDB_POPULATE_STATIC_ARP:
+                obj = try_load(t, name=tunnel_name, partition=partition)
+            if obj and hasattr(obj, "records"):
+                for record in obj.records:
+                    self.arp_delete_by_mac(
+                        bigip,
+                        record['name'],
+                        partition=partition
+                    )
+
+                obj.modify(records=[])
         except HTTPError as err:
             LOG.error("Error updating tunnel %s. "
                       "Repsponse status code: %s. Response "
@@ -1007,10 +924,8 @@ class NetworkHelper(object):
                                         err.message))
 
         try:
-            ts = bigip.tm.net.tunnels.tunnels.tunnel
-            if ts.exists(name=tunnel_name, partition=partition):
-                obj = ts.load(name=tunnel_name, partition=partition)
-                obj.delete()
+            try_delete(bigip.tm.net.tunnels.tunnels.tunnel, name=tunnel_name,
+                       partition=partition)
         except HTTPError as err:
             LOG.error("Error deleting tunnel %s. "
                       "Repsponse status code: %s. Response "
@@ -0,0 +1,158 @@
+"""Index of the loadbalancers and addresses hosted on networks."""
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import netaddr
+
+from neutron.plugins.common import constants as plugin_const
+from oslo_log import log as logging
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
+    import BigIPResourceHelper
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
+    import ResourceType
+
+LOG = logging.getLogger(__name__)
+
+
+def split_address(address):
+    """Split 'ip%rd' into the route domain string and the IP address."""
+    parts = address.split('%')
+    route_domain = parts[1] if len(parts) > 1 else '0'
+    return route_domain, netaddr.IPAddress(parts[0])
+
+
+class NetworkIndex(object):
+    """Occupancy of networks and subnets by the loadbalancers of the agent.
+
+    Every service handled by the agent updates the VIP network, the VIP
+    and the member addresses recorded for its loadbalancer, so deciding
+    whether a network or subnet is still in use does not need a query.
+
+    The index is cold after a restart.  The loadbalancers of a network
+    are seeded with one RPC the first time the network is checked and
+    kept current afterwards.  The loadbalancers deployed in the tenant
+    partitions are taken from one virtual address collection fetch per
+    bigip, and addresses of a partition are only answered from the index
+    once every loadbalancer deployed there has been recorded.
+    """
+
+    def __init__(self):
+        # lb id -> {'tenant_id', 'network_id', 'addresses'}
+        self.loadbalancers = {}
+        # network id -> set of lb ids, for seeded networks only
+        self.networks = {}
+        # tenant id -> set of lb ids deployed on the bigips
+        self.deployed = {}
+        self.loaded_hostnames = set()
+
+    def clear(self):
+        self.__init__()
+
+    def has_network(self, network_id):
+        return network_id in self.networks
+
+    def add_network(self, network_id, loadbalancer_ids):
+        """Seed the loadbalancers of a network."""
+        lb_ids = set(loadbalancer_ids)
+        for lb_id, entry in self.loadbalancers.items():
+            if entry['network_id'] == network_id:
+                lb_ids.add(lb_id)
+        self.networks[network_id] = lb_ids
+
+    def is_last_on_network(self, network_id, loadbalancer_id):
+        """True if no other loadbalancer is known on a seeded network."""
+        return not (self.networks.get(network_id, set()) -
+                    set([loadbalancer_id]))
+
+    def update(self, service):
+        """Record the loadbalancer of a service or drop it if deleted."""
+        loadbalancer = service['loadbalancer']
+        lb_id = loadbalancer['id']
+        if loadbalancer.get('provisioning_status') == \
+                plugin_const.PENDING_DELETE:
+            self.remove(lb_id)
+            return
+
+        addresses = set()
+        if loadbalancer.get('vip_address'):
+            addresses.add(split_address(loadbalancer['vip_address']))
+        for member in service.get('members', []):
+            if member.get('address') and member.get(
+                    'provisioning_status') != plugin_const.PENDING_DELETE:
+                addresses.add(split_address(member['address']))
+
+        self.remove(lb_id)
+        entry = {'tenant_id': loadbalancer['tenant_id'],
+                 'network_id': loadbalancer.get('network_id'),
+                 'addresses': addresses}
+        self.loadbalancers[lb_id] = entry
+        if entry['network_id'] in self.networks:
+            self.networks[entry['network_id']].add(lb_id)
+        self.deployed.setdefault(entry['tenant_id'], set()).add(lb_id)
+
+    def update_address(self, loadbalancer_id, address, present=True):
+        """Record or drop a member address of a recorded loadbalancer."""
+        entry = self.loadbalancers.get(loadbalancer_id)
+        if entry is None:
+            return
+        if present:
+            entry['addresses'].add(split_address(address))
+        else:
+            entry['addresses'].discard(split_address(address))
+
+    def remove(self, loadbalancer_id):
+        """Drop a loadbalancer which was deleted or left the agent."""
+        entry = self.loadbalancers.pop(loadbalancer_id, None)
+        for lb_ids in self.networks.values():
+            lb_ids.discard(loadbalancer_id)
+        for lb_ids in self.deployed.values():
+            lb_ids.discard(loadbalancer_id)
+        return entry
+
+    def load(self, bigip, prefix):
+        """Collect the loadbalancers deployed on a bigip once."""
+        if bigip.hostname in self.loaded_hostnames:
+            return
+        items = BigIPResourceHelper(
+            ResourceType.virtual_address).get_selected_resources(
+                bigip, ['name', 'partition'])
+        for item in items:
+            if not isinstance(item, dict):
+                item = item.__dict__
+            partition = item.get('partition') or ''
+            name = item.get('name') or ''
+            if partition.startswith(prefix) and name.startswith(prefix):
+                self.deployed.setdefault(partition[len(prefix):], set()).add(
+                    name[len(prefix):])
+        self.loaded_hostnames.add(bigip.hostname)
+        LOG.debug("ccloud: network index loaded %d virtual addresses from "
+                  "%s" % (len(items), bigip.hostname))
+
+    def is_complete(self, tenant_id):
+        """True if all loadbalancers deployed for a tenant are recorded."""
+        return all(lb_id in self.loadbalancers
+                   for lb_id in self.deployed.get(tenant_id, ()))
+
+    def ips_exist_on_subnet(self, tenant_id, cidr, route_domain):
+        """True if a recorded address of the tenant lies in the subnet."""
+        ipsubnet = netaddr.IPNetwork(cidr)
+        route_domain = str(route_domain)
+        for lb_id in self.deployed.get(tenant_id, ()):
+            for addr_route_domain, address in \
+                    self.loadbalancers[lb_id]['addresses']:
+                if addr_route_domain == route_domain and \
+                        address in ipsubnet:
+                    return True
+        return False
@@ -29,7 +29,11 @@ from f5_openstack_agent.lbaasv2.drivers.bigip.l2_service import \
     L2ServiceBuilder
 from f5_openstack_agent.lbaasv2.drivers.bigip.network_helper import \
     NetworkHelper
+from f5_openstack_agent.lbaasv2.drivers.bigip.network_index import \
+    NetworkIndex
 from f5_openstack_agent.lbaasv2.drivers.bigip import resource_helper
+from f5_openstack_agent.lbaasv2.drivers.bigip.route_domain_cache import \
+    RouteDomainCache
 from f5_openstack_agent.lbaasv2.drivers.bigip.selfips import BigipSelfIpManager
 from f5_openstack_agent.lbaasv2.drivers.bigip.snats import BigipSnatManager
 from f5_openstack_agent.lbaasv2.drivers.bigip.utils import strip_domain_address
@@ -53,7 +57,8 @@ class NetworkServiceBuilder(object):
 
         self.vlan_manager = resource_helper.BigIPResourceHelper(
             resource_helper.ResourceType.vlan)
-        self.rds_cache = {}
+        self.rds_cache = RouteDomainCache(conf.ccloud_rds_cache_file)
+        self.network_index = NetworkIndex()
         self.interface_mapping = self.l2_service.interface_mapping
         self.network_helper = NetworkHelper()
         self.service_adapter = self.driver.service_adapter
@@ -176,6 +181,7 @@ class NetworkServiceBuilder(object):
 
         # Per Device Network Connectivity (VLANs or Tunnels)
         subnetsinfo = self._get_subnets_to_assure(service)
+        self._prefetch_ports(service, subnetsinfo)
         for (assure_bigip, subnetinfo) in (
                 itertools.product(self.driver.get_all_bigips(), subnetsinfo)):
             LOG.debug("Assuring per device network connectivity "
@@ -207,18 +213,43 @@ class NetworkServiceBuilder(object):
                 except KeyError as err:
                     raise f5_ex.VirtualServerCreationException(err.message)
 
-                for assure_bigip in assure_bigips:
-                    # If we are not using SNATS, attempt to become
-                    # the subnet's default gateway.
-                    self.bigip_selfip_manager.assure_gateway_on_subnet(
-                        assure_bigip, subnetinfo, traffic_group)
+                # If we are not using SNATS, attempt to become
+                # the subnet's default gateway.
+                utils.fan_out(
+                    assure_bigips,
+                    self.bigip_selfip_manager.assure_gateway_on_subnet,
+                    subnetinfo, traffic_group)
 
         self._assure_subnet_gateway(service)
 
+    def _prefetch_ports(self, service, subnetsinfo):
+        # Query the neutron ports of all selfip, snat and gateway
+        # addresses of the service in one message, the managers
+        # then find them in the port cache of the plugin rpc
+        tenant_id = service['loadbalancer']['tenant_id']
+        snats_per_subnet = self.conf.f5_snat_addresses_per_subnet
+        port_names = []
+        for subnetinfo in subnetsinfo:
+            subnet = subnetinfo['subnet']
+            if not subnet:
+                continue
+            for bigip in self.driver.get_all_bigips():
+                port_names.append(
+                    self.bigip_selfip_manager.get_selfip_port_name(
+                        bigip, subnet))
+            if snats_per_subnet > 0:
+                port_names.extend(
+                    self.bigip_snat_manager.get_snat_port_names(
+                        subnetinfo, tenant_id, snats_per_subnet))
+            if subnetinfo['is_for_member'] and not self.conf.f5_snat_mode:
+                port_names.append("gw-" + subnet['id'])
+        if port_names:
+            self.driver.plugin_rpc.get_ports_by_names(port_names)
+
     def _assure_subnet_gateway(self,service):
         network_id = service['loadbalancer']['network_id']
 
-        for bigip in self.driver.get_all_bigips():
+        def _assure_bigip_subnet_gateway(bigip):
             rd = self.network_helper.get_route_domain(bigip, partition=const.DEFAULT_PARTITION, name=network_id)
 
             for subnet_id, subnet in service['subnets'].iteritems():
@@ -230,6 +261,9 @@ class NetworkServiceBuilder(object):
                         LOG.error("Failed to create default gateway route for network %s subnet %s" % (network_id, subnet_id))
                         LOG.exception(err)
 
+        utils.fan_out(self.driver.get_all_bigips(),
+                      _assure_bigip_subnet_gateway)
+
     def _annotate_service_route_domains(self, service):
         # wtn : subnet for member has to be subnet for vip
         # Add route domain notation to pool member and vip addresses.
@@ -316,64 +350,57 @@ class NetworkServiceBuilder(object):
                   (self.conf.max_namespaces_per_tenant == 1))
 
         if self.conf.max_namespaces_per_tenant == 1:
-            bigip = self.driver.get_bigip()
-            LOG.debug("bigip before get_domain: %s" % bigip)
-            # partition_id = self.service_adapter.get_folder_name(
-            #     tenant_id)
-
-            partition_id='Common'
-
-            tenant_rd = self.network_helper.get_route_domain(
-                bigip, partition=partition_id, name=network['id'])
-            network['route_domain_id'] = tenant_rd.id
+            route_domain_id = self.rds_cache.get_named_route_domain(
+                network['id'])
+            if route_domain_id is None:
+                bigip = self.driver.get_bigip()
+                LOG.debug("bigip before get_domain: %s" % bigip)
+                # partition_id = self.service_adapter.get_folder_name(
+                #     tenant_id)
+
+                partition_id='Common'
+
+                tenant_rd = self.network_helper.get_route_domain(
+                    bigip, partition=partition_id, name=network['id'])
+                route_domain_id = tenant_rd.id
+                self.rds_cache.set_named_route_domain(network['id'],
+                                                      route_domain_id)
+                self.rds_cache.save()
+            network['route_domain_id'] = route_domain_id
             return
 
         LOG.debug("assign route domain checking for available route domain")
 
         check_cidr = netaddr.IPNetwork(subnet['cidr'])
         placed_route_domain_id = None
-        for route_domain_id in self.rds_cache[tenant_id]:
+        for route_domain_id in self.rds_cache.route_domain_ids(tenant_id):
             LOG.debug("checking rd %s" % route_domain_id)
-            rd_entry = self.rds_cache[tenant_id][route_domain_id]
-            overlapping_subnet = None
-            for net_shortname in rd_entry:
-                LOG.debug("checking net %s" % net_shortname)
-                net_entry = rd_entry[net_shortname]
-                for exist_subnet_id in net_entry['subnets']:
-                    if exist_subnet_id == subnet['id']:
-                        continue
-                    exist_subnet = net_entry['subnets'][exist_subnet_id]
-                    exist_cidr = exist_subnet['cidr']
-                    if check_cidr in exist_cidr or exist_cidr in check_cidr:
-                        overlapping_subnet = exist_subnet
-                        LOG.debug('rd %s: overlaps with subnet %s id: %s' % (
-                            (route_domain_id, exist_subnet, exist_subnet_id)))
-                        break
-                if overlapping_subnet:
-                    # no need to keep looking
-                    break
-            if not overlapping_subnet:
+            overlapping_subnet_id = self.rds_cache.find_overlap(
+                tenant_id, route_domain_id, check_cidr, subnet['id'])
+            if overlapping_subnet_id:
+                LOG.debug('rd %s: overlaps with subnet id: %s' % (
+                    (route_domain_id, overlapping_subnet_id)))
+            else:
                 placed_route_domain_id = route_domain_id
                 break
 
         if placed_route_domain_id is None:
-            if (len(self.rds_cache[tenant_id]) <
+            if (len(self.rds_cache.route_domain_ids(tenant_id)) <
                     self.conf.max_namespaces_per_tenant):
                 placed_route_domain_id = self._create_aux_rd(tenant_id)
-                self.rds_cache[tenant_id][placed_route_domain_id] = {}
+                self.rds_cache.add_route_domain(tenant_id,
+                                                placed_route_domain_id)
                 LOG.debug("Tenant %s now has %d route domains" %
-                          (tenant_id, len(self.rds_cache[tenant_id])))
+                          (tenant_id,
+                           len(self.rds_cache.route_domain_ids(tenant_id))))
             else:
                 raise Exception("Cannot allocate route domain")
 
         LOG.debug("Placed in route domain %s" % placed_route_domain_id)
-        rd_entry = self.rds_cache[tenant_id][placed_route_domain_id]
-
         net_short_name = self.get_neutron_net_short_name(network)
-        if net_short_name not in rd_entry:
-            rd_entry[net_short_name] = {'subnets': {}}
-        net_subnets = rd_entry[net_short_name]['subnets']
-        net_subnets[subnet['id']] = {'cidr': check_cidr}
+        self.rds_cache.add_subnet(tenant_id, placed_route_domain_id,
+                                  net_short_name, subnet['id'], check_cidr)
+        self.rds_cache.save()
         network['route_domain_id'] = placed_route_domain_id
 
     def _create_aux_rd(self, tenant_id):
@@ -401,183 +428,32 @@ class NetworkServiceBuilder(object):
     # determine whether there is an existing bigip
     # subnet that conflicts with a new one being
     # assigned to the route domain.
-    """
-    # route domain subnet cache
-    rds_cache =
-        {'<tenant_id>': {
-            {'0': {
-                '<network type>-<segmentation id>': [
-                    'subnets': [
-                        '<subnet id>': {
-                            'cidr': '<cidr>'
-                        }
-                ],
-            '1': {}}}}
-    """
     def update_rds_cache(self, tenant_id):
-        # Update the route domain cache from bigips
-        if tenant_id not in self.rds_cache:
-            LOG.debug("rds_cache: adding tenant %s" % tenant_id)
-            self.rds_cache[tenant_id] = {}
-            for bigip in self.driver.get_all_bigips():
-                self.update_rds_cache_bigip(tenant_id, bigip)
-            LOG.debug("rds_cache updated: " + str(self.rds_cache))
-
-    def update_rds_cache_bigip(self, tenant_id, bigip):
-        # Update the route domain cache for this tenant
-        # with information from bigip's vlan and tunnels
-        LOG.debug("rds_cache: processing bigip %s" % bigip.device_name)
-
-        route_domain_ids = self.network_helper.get_route_domain_ids(
-            bigip,
-            partition=self.service_adapter.get_folder_name(tenant_id))
-        # LOG.debug("rds_cache: got bigip route domains: %s" % route_domains)
-        for route_domain_id in route_domain_ids:
-            self.update_rds_cache_bigip_rd_vlans(
-                tenant_id, bigip, route_domain_id)
-
-    def update_rds_cache_bigip_rd_vlans(
-            self, tenant_id, bigip, route_domain_id):
-        # Update the route domain cache with information
-        # from the bigip vlans and tunnels from
-        # this route domain
-        LOG.debug("rds_cache: processing bigip %s rd %s"
-                  % (bigip.device_name, route_domain_id))
-        # this gets tunnels too
-        partition_id = self.service_adapter.get_folder_name(tenant_id)
-        rd_vlans = self.network_helper.get_vlans_in_route_domain_by_id(
-            bigip,
-            partition=partition_id,
-            id=route_domain_id
-        )
-        LOG.debug("rds_cache: bigip %s rd %s vlans: %s"
-                  % (bigip.device_name, route_domain_id, rd_vlans))
-        if len(rd_vlans) == 0:
-            LOG.debug("No vlans found for route domain: %d" %
-                      (route_domain_id))
+        # Load the route domain cache of all tenants from the bigips,
+        # or from the local cache file if it is still valid for them
+        if self.rds_cache.loaded:
             return
-
-        # make sure this rd has a cache entry
-        tenant_entry = self.rds_cache[tenant_id]
-        if route_domain_id not in tenant_entry:
-            tenant_entry[route_domain_id] = {}
-
-        # for every VLAN or TUNNEL on this bigip...
-        for rd_vlan in rd_vlans:
-            self.update_rds_cache_bigip_vlan(
-                tenant_id, bigip, route_domain_id, rd_vlan)
-
-    def update_rds_cache_bigip_vlan(
-            self, tenant_id, bigip, route_domain_id, rd_vlan):
-        # Update the route domain cache with information
-        #    from the bigip vlan or tunnel
-        LOG.debug("rds_cache: processing bigip %s rd %d vlan %s"
-                  % (bigip.device_name, route_domain_id, rd_vlan))
-        net_short_name = self.get_bigip_net_short_name(
-            bigip, tenant_id, rd_vlan)
-
-        # make sure this net has a cache entry
-        tenant_entry = self.rds_cache[tenant_id]
-        rd_entry = tenant_entry[route_domain_id]
-        if net_short_name not in rd_entry:
-            rd_entry[net_short_name] = {'subnets': {}}
-        net_subnets = rd_entry[net_short_name]['subnets']
-
-        partition_id = self.service_adapter.get_folder_name(tenant_id)
-        LOG.debug("Calling get_selfips with: partition %s and vlan_name %s",
-                  partition_id, rd_vlan)
-        selfips = self.bigip_selfip_manager.get_selfips(
-            bigip,
-            partition=partition_id,
-            vlan_name=rd_vlan
-        )
-
-        LOG.debug("rds_cache: got selfips")
-        for selfip in selfips:
-            LOG.debug("rds_cache: processing bigip %s rd %s vlan %s self %s" %
-                      (bigip.device_name, route_domain_id, rd_vlan,
-                       selfip.name))
-            if bigip.device_name not in selfip.name:
-                LOG.error("rds_cache: Found unexpected selfip %s for tenant %s"
-                          % (selfip.name, tenant_id))
-                continue
-            subnet_id = selfip.name.split(bigip.device_name + '-')[1]
-
-            # convert 10.1.1.1%1/24 to 10.1.1.1/24
-            (addr, netbits) = selfip.address.split('/')
-            addr = addr.split('%')[0]
-            selfip.address = addr + '/' + netbits
-
-            # selfip addresses will have slash notation: 10.1.1.1/24
-            netip = netaddr.IPNetwork(selfip.address)
-            LOG.debug("rds_cache: updating subnet %s with %s"
-                      % (subnet_id, str(netip.cidr)))
-            net_subnets[subnet_id] = {'cidr': netip.cidr}
-            LOG.debug("rds_cache: now %s" % self.rds_cache)
+        bigips = self.driver.get_all_bigips()
+        if not self.rds_cache.restore(bigips, self.service_adapter.prefix):
+            self.rds_cache.load(bigips, self.service_adapter.prefix)
+            self.rds_cache.save()
 
     def get_route_domain_from_cache(self, network):
         # Get route domain from cache by network
-        route_domain_id = None
         net_short_name = self.get_neutron_net_short_name(network)
-        for tenant_id in self.rds_cache:
-            tenant_cache = self.rds_cache[tenant_id]
-            for route_domain_id in tenant_cache:
-                if net_short_name in tenant_cache[route_domain_id]:
-                    return route_domain_id
-        return route_domain_id
+        return self.rds_cache.get_route_domain(net_short_name)
 
     def remove_from_rds_cache(self, network, subnet):
-        # Get route domain from cache by network
+        # Remove subnet and its emptied network and route domain
         LOG.debug("remove_from_rds_cache")
         net_short_name = self.get_neutron_net_short_name(network)
-        for tenant_id in self.rds_cache:
-            LOG.debug("rds_cache: processing remove for %s" % tenant_id)
-            deleted_rds = []
-            tenant_cache = self.rds_cache[tenant_id]
-            for route_domain_id in tenant_cache:
-                if net_short_name in tenant_cache[route_domain_id]:
-                    net_entry = tenant_cache[route_domain_id][net_short_name]
-                    if subnet['id'] in net_entry['subnets']:
-                        del net_entry['subnets'][subnet['id']]
-                        if len(net_entry['subnets']) == 0:
-                            del net_entry['subnets']
-                    if len(tenant_cache[route_domain_id][net_short_name]) == 0:
-                        del tenant_cache[route_domain_id][net_short_name]
-                if len(self.rds_cache[tenant_id][route_domain_id]) == 0:
-                    deleted_rds.append(route_domain_id)
-            for rd in deleted_rds:
-                LOG.debug("removing route domain %d from tenant %s" %
-                          (rd, tenant_id))
-                del self.rds_cache[tenant_id][rd]
-
-    def get_bigip_net_short_name(self, bigip, tenant_id, network_name):
-        # Return <network_type>-<seg_id> for bigip network
-        LOG.debug("get_bigip_net_short_name: %s:%s" % (
-            tenant_id, network_name))
-        partition_id = self.service_adapter.get_folder_name(tenant_id)
-        LOG.debug("network_name %s", network_name.split('/'))
-        network_name = network_name.split("/")[-1]
-        if 'tunnel-gre-' in network_name:
-            tunnel_key = self.network_helper.get_tunnel_key(
-                bigip,
-                network_name,
-                partition=partition_id
-            )
-            return 'gre-%s' % tunnel_key
-        elif 'tunnel-vxlan-' in network_name:
-            LOG.debug("Getting tunnel key for VXLAN: %s", network_name)
-            tunnel_key = self.network_helper.get_tunnel_key(
-                bigip,
-                network_name,
-                partition=partition_id
-            )
-            return 'vxlan-%s' % tunnel_key
-        else:
-            LOG.debug("Getting tunnel key for VLAN: %s", network_name)
-            vlan_id = self.network_helper.get_vlan_id(bigip,
-                                                      name=network_name,
-                                                      partition=partition_id)
-            return 'vlan-%s' % vlan_id
+        self.rds_cache.remove_subnet(net_short_name, subnet['id'])
+        self.rds_cache.save()
+
+    def forget_route_domain(self, network_id):
+        # Drop the route domain of a network after it was deleted
+        self.rds_cache.discard_named_route_domain(network_id)
+        self.rds_cache.save()
 
     @staticmethod
     def get_neutron_net_short_name(network):
@@ -762,6 +638,89 @@ class NetworkServiceBuilder(object):
                 self.update_bigip_vip_l2(bigip, loadbalancer)
             LOG.debug("update_bigip_l2 complete")
 
+    def get_assured_member_address(self, service, member):
+        """Return the member address with route domain if nothing to do.
+
+        This is the case if the network, selfips, SNATs and gateway of
+        the member subnet are assured on the bigips since the last cache
+        flush and the route domain of the network is cached. A deleted
+        member must leave its subnet in use by the loadbalancer, so no
+        network objects have to be deleted. Otherwise None is returned.
+        """
+        loadbalancer = service['loadbalancer']
+        tenant_id = loadbalancer['tenant_id']
+        network = service.get('networks', {}).get(member.get('network_id'))
+        subnet = service.get('subnets', {}).get(member.get('subnet_id'))
+        if not network or not subnet:
+            return None
+
+        if member['provisioning_status'] == plugin_const.PENDING_DELETE:
+            in_use = subnet['id'] == loadbalancer.get('vip_subnet_id') or \
+                any(other['subnet_id'] == subnet['id'] and
+                    other['id'] != member['id'] and
+                    other['provisioning_status'] !=
+                    plugin_const.PENDING_DELETE
+                    for other in service.get('members', []))
+            if not in_use:
+                return None
+
+        for bigip in self.driver.get_all_bigips():
+            if network['id'] not in bigip.assured_networks:
+                return None
+
+        snat_key = None
+        if self.conf.f5_snat_addresses_per_subnet > 0:
+            snat_key = subnet['id']
+        elif self.conf.f5_snat_addresses_per_subnet == -1:
+            snat_key = loadbalancer['id']
+        for bigip in self.driver.get_config_bigips():
+            if snat_key and snat_key not in \
+                    bigip.assured_tenant_snat_subnets.get(tenant_id, []):
+                return None
+            if not self.conf.f5_snat_mode and \
+                    subnet['id'] not in bigip.assured_gateway_subnets:
+                return None
+
+        if not self.conf.use_namespaces:
+            return member['address']
+        try:
+            route_domain_id = self.get_route_domain_from_cache(network)
+        except f5_ex.InvalidNetworkType:
+            return None
+        if route_domain_id is None and \
+                self.conf.max_namespaces_per_tenant == 1:
+            route_domain_id = self.rds_cache.get_named_route_domain(
+                network['id'])
+        if not route_domain_id:
+            return None
+        return member['address'] + '%' + str(route_domain_id)
+
+    def assure_member_networking(self, service, member):
+        """Update the fdb entries and index of a single changed member.
+
+        member is the member with route domain returned by
+        LBaaSBuilder.assure_member.
+        """
+        loadbalancer = service['loadbalancer']
+        member['network'] = self.service_adapter.get_network_from_service(
+            service, member['network_id'])
+        # members on other ports share the address and its fdb entries
+        address = member['address'].split('%')[0]
+        present = member['provisioning_status'] != \
+            plugin_const.PENDING_DELETE or any(
+                other['address'] == address and
+                other['network_id'] == member['network_id'] and
+                other['id'] != member['id'] and
+                other['provisioning_status'] != plugin_const.PENDING_DELETE
+                for other in service.get('members', []))
+        for bigip in self.driver.get_all_bigips():
+            if present:
+                self.update_bigip_member_l2(bigip, loadbalancer, member)
+            else:
+                self.delete_bigip_member_l2(bigip, loadbalancer, member)
+        self.network_index.update_address(loadbalancer['id'],
+                                          member['address'], present)
+
     def update_bigip_member_l2(self, bigip, loadbalancer, member):
         # update pool member l2 records
         network = member['network']
@@ -962,13 +921,15 @@ class NetworkServiceBuilder(object):
 
         lb_id = service['loadbalancer']['id']
 
-        loadbalancers = self.driver.plugin_rpc.get_loadbalancers_by_network(network_id)
-
-        for lb in loadbalancers:
-            if lb['lb_id'] != lb_id:
-                return False
+        # seed the index once per network, later services keep it current
+        if not self.network_index.has_network(network_id):
+            loadbalancers = self.driver.plugin_rpc.get_loadbalancers_by_network(
+                network_id, host=self.driver.plugin_rpc.host)
+            self.network_index.add_network(
+                network_id, [lb['lb_id'] for lb in loadbalancers])
+        self.network_index.update(service)
 
-        return True
+        return self.network_index.is_last_on_network(network_id, lb_id)
 
     @utils.instrument_execution_time
     def _get_subnets_to_delete(self, bigip, service, subnet_hints, whole_subnet=True):
@@ -1002,6 +963,12 @@ class NetworkServiceBuilder(object):
         # Does the big-ip have any IP addresses on this subnet?
         LOG.debug("_ips_exist_on_subnet entry %s rd %s"
                   % (str(subnet['cidr']), route_domain))
+        tenant_id = service['loadbalancer']['tenant_id']
+        self.network_index.load(bigip, self.service_adapter.prefix)
+        if self.network_index.is_complete(tenant_id):
+            return self.network_index.ips_exist_on_subnet(
+                tenant_id, subnet['cidr'], route_domain)
+
         route_domain = str(route_domain)
         ipsubnet = netaddr.IPNetwork(subnet['cidr'])
 
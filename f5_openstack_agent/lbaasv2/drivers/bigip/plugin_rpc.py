@@ -14,6 +14,9 @@
 # limitations under the License.
 #
 
+import collections
+import time
+
 from oslo_log import helpers as log_helpers
 from oslo_log import log as logging
 import oslo_messaging as messaging
@@ -24,7 +27,50 @@ from neutron_lbaas.services.loadbalancer import constants as lb_const
 
 from f5_openstack_agent.lbaasv2.drivers.bigip import constants_v2 as constants
 from f5_openstack_agent.lbaasv2.drivers.bigip import utils
-LOG = logging.getLogger
+LOG = logging.getLogger(__name__)
+
+
+class PortCache(object):
+    """Ports found or created by this agent by port name.
+
+    Other agents and users may delete or change a port in neutron, so
+    entries expire after ttl seconds, and at most max_size ports are kept
+    with the least recently used ones evicted first.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        # port name -> (port, expiry time)
+        self.ports = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.ports)
+
+    def get(self, name):
+        """Return the cached port with the name or None."""
+        entry = self.ports.pop(name, None)
+        if entry is None or entry[1] <= time.time():
+            return None
+        # re-insert as most recently used
+        self.ports[name] = entry
+        return entry[0]
+
+    def add(self, name, port):
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        self.ports.pop(name, None)
+        self.ports[name] = (port, time.time() + self.ttl)
+        while len(self.ports) > self.max_size:
+            self.ports.popitem(last=False)
+
+    def remove(self, name=None, port_id=None, mac_address=None):
+        """Drop the port with the name, id or mac address."""
+        self.ports.pop(name, None)
+        for cached_name, (port, _) in list(self.ports.items()):
+            if (port_id and port.get('id') == port_id) or (
+                    mac_address and port.get('mac_address') == mac_address):
+                del self.ports[cached_name]
 
 
 class LBaaSv2PluginRPC(object):
@@ -32,7 +78,8 @@ class LBaaSv2PluginRPC(object):
 
     RPC_API_NAMESPACE = None
 
-    def __init__(self, topic, context, env, group, host):
+    def __init__(self, topic, context, env, group, host,
+                 port_cache_ttl=300, port_cache_size=1000):
         """Initialize LBaaSv2PluginRPC."""
         super(LBaaSv2PluginRPC, self).__init__()
 
@@ -49,6 +96,11 @@ class LBaaSv2PluginRPC(object):
         self.env = env
         self.group = group
         self.host = host
+        # None until the first bulk status update was answered, disabled
+        # if the plugin doesn't support it
+        self.bulk_status_updates = None
+        self.bulk_port_rpcs = True
+        self.port_cache = PortCache(port_cache_ttl, port_cache_size)
 
     def _make_msg(self, method, **kwargs):
         return {'method': method,
@@ -278,28 +330,122 @@ class LBaaSv2PluginRPC(object):
             topic=self.topic
         )
 
+    @log_helpers.log_method_call
+    def update_statuses(self, statuses):
+        """Update the database with the status of many objects at once.
+
+        statuses is an ordered list of dicts with the keys 'type'
+        (loadbalancer, listener, pool, member, healthmonitor, l7policy
+        or l7rule), 'id', 'provisioning_status', 'operating_status',
+        'destroyed' and for l7rules 'l7policy_id'. Updates which don't
+        change the status known to neutron are dropped. All remaining
+        updates are sent in one message, or with one message per object
+        if the plugin doesn't support bulk updates.
+
+        Like the single updates, bulk updates are cast once the plugin
+        answered the first one. Until then they are called to learn if
+        the plugin supports them, and a timeout of that call falls back
+        to single updates.
+        """
+        statuses = [s for s in statuses
+                    if s.get('destroyed') or
+                    (s['provisioning_status'],
+                     s['operating_status']) != s.get('current_status')]
+        if not statuses:
+            return
+
+        msg = self._make_msg('update_statuses',
+                             statuses=[self._bulk_status(s)
+                                       for s in statuses])
+        if self.bulk_status_updates:
+            self._cast(self.context, msg, topic=self.topic)
+            return
+        elif self.bulk_status_updates is None:
+            try:
+                self._call(self.context, msg, topic=self.topic)
+                self.bulk_status_updates = True
+                return
+            except messaging.MessagingTimeout:
+                LOG.warning("ccloud: bulk status update timed out, "
+                            "falling back to single updates")
+            except messaging.RemoteError as err:
+                if err.exc_type not in ('NoSuchMethod',
+                                        'UnsupportedVersion'):
+                    raise
+                LOG.info("ccloud: plugin doesn't support bulk status "
+                         "updates, falling back to single updates")
+                self.bulk_status_updates = False
+
+        for status in statuses:
+            self._update_single_status(status)
+
+    @staticmethod
+    def _bulk_status(status):
+        return dict((k, v) for k, v in status.items()
+                    if k != 'current_status')
+
+    def _update_single_status(self, status):
+        obj_type = status['type']
+        obj_id = status['id']
+        if status.get('destroyed'):
+            destroyed = {
+                'loadbalancer': self.loadbalancer_destroyed,
+                'listener': self.listener_destroyed,
+                'pool': self.pool_destroyed,
+                'member': self.member_destroyed,
+                'healthmonitor': self.health_monitor_destroyed,
+                'l7policy': self.l7policy_destroyed,
+                'l7rule': self.l7rule_destroyed}[obj_type]
+            destroyed(obj_id)
+        elif obj_type == 'l7rule':
+            self.update_l7rule_status(obj_id,
+                                      status['l7policy_id'],
+                                      status['provisioning_status'],
+                                      status['operating_status'])
+        else:
+            update = {
+                'loadbalancer': self.update_loadbalancer_status,
+                'listener': self.update_listener_status,
+                'pool': self.update_pool_status,
+                'member': self.update_member_status,
+                'healthmonitor': self.update_health_monitor_status,
+                'l7policy': self.update_l7policy_status}[obj_type]
+            update(obj_id,
+                   status['provisioning_status'],
+                   status['operating_status'])
+
     # for L3 binding
     @log_helpers.log_method_call
     def add_allowed_address(self, port_id=None, ip_address=None):
         """Add allowed address to the port."""
-        return self._call(
-            self.context,
-            self._make_msg('add_allowed_address',
-                           port_id=port_id,
-                           ip_address=ip_address),
-            topic=self.topic
-        )
+        try:
+            return self._call(
+                self.context,
+                self._make_msg('add_allowed_address',
+                               port_id=port_id,
+                               ip_address=ip_address),
+                topic=self.topic
+            )
+        except messaging.RemoteError as err:
+            if err.exc_type == 'PortNotFound':
+                self.port_cache.remove(port_id=port_id)
+            raise
 
     @log_helpers.log_method_call
     def remove_allowed_address(self, port_id=None, ip_address=None):
         """Remove allowed address on the port."""
-        return self._call(
-            self.context,
-            self._make_msg('remove_allowed_address',
-                           port_id=port_id,
-                           ip_address=ip_address),
-            topic=self.topic
-        )
+        try:
+            return self._call(
+                self.context,
+                self._make_msg('remove_allowed_address',
+                               port_id=port_id,
+                               ip_address=ip_address),
+                topic=self.topic
+            )
+        except messaging.RemoteError as err:
+            if err.exc_type == 'PortNotFound':
+                self.port_cache.remove(port_id=port_id)
+            raise
 
     @log_helpers.log_method_call
     def get_ports_for_mac_addresses(self, mac_addresses=None):
@@ -315,7 +461,12 @@ class LBaaSv2PluginRPC(object):
         except messaging.MessageDeliveryFailure:
             LOG.error("agent->plugin RPC exception caught: ",
                       "get_ports_for_mac_addresses")
+            return ports
 
+        found = set(port.get('mac_address') for port in ports or [])
+        for mac_address in mac_addresses or []:
+            if mac_address not in found:
+                self.port_cache.remove(mac_address=mac_address)
         return ports
 
     @log_helpers.log_method_call
@@ -331,6 +482,10 @@ class LBaaSv2PluginRPC(object):
     @log_helpers.log_method_call
     def get_port_by_name(self, port_name=None):
         """Get a list of ports that have the name port_name."""
+        port = self.port_cache.get(port_name)
+        if port:
+            return [port]
+
         ports = []
         try:
             ports = self._call(
@@ -343,6 +498,58 @@ class LBaaSv2PluginRPC(object):
             LOG.error("agent->plugin RPC exception caught: ",
                       "get_port_by_name")
 
+        if ports:
+            self.port_cache.add(port_name, ports[0])
+        return ports
+
+    @log_helpers.log_method_call
+    def get_ports_by_names(self, port_names):
+        """Get a dict with the list of ports for each of the port_names.
+
+        Cached ports are returned right away, all others are queried in
+        one message, or with one message per name if the plugin doesn't
+        support bulk port queries.
+        """
+        ports = {}
+        for name in port_names:
+            port = self.port_cache.get(name)
+            if port:
+                ports[name] = [port]
+        missing = [name for name in port_names if name not in ports]
+        if not missing:
+            return ports
+
+        if self.bulk_port_rpcs:
+            try:
+                found = self._call(
+                    self.context,
+                    self._make_msg('get_ports_by_names',
+                                   port_names=missing),
+                    topic=self.topic
+                )
+                for name in missing:
+                    ports[name] = []
+                for port in found or []:
+                    if port['name'] in ports:
+                        ports[port['name']].append(port)
+                for name in missing:
+                    if ports[name]:
+                        self.port_cache.add(name, ports[name][0])
+                return ports
+            except messaging.MessageDeliveryFailure:
+                LOG.error("agent->plugin RPC exception caught: "
+                          "get_ports_by_names")
+                return ports
+            except messaging.RemoteError as err:
+                if err.exc_type not in ('NoSuchMethod',
+                                        'UnsupportedVersion'):
+                    raise
+                LOG.info("ccloud: plugin doesn't support bulk port "
+                         "RPCs, falling back to single port RPCs")
+                self.bulk_port_rpcs = False
+
+        for name in missing:
+            ports[name] = self.get_port_by_name(port_name=name)
         return ports
 
     @log_helpers.log_method_call
@@ -366,8 +573,53 @@ class LBaaSv2PluginRPC(object):
             LOG.error("agent->plugin RPC exception caught: "
                       "create_port_on_subnet")
 
+        if port and name:
+            self.port_cache.add(name, port)
         return port
 
+    @log_helpers.log_method_call
+    def create_ports_on_subnet(self, subnet_id=None, names=None,
+                               fixed_address_count=1):
+        """Add a neutron port for each of the names to the subnet.
+
+        Returns the created ports in the order of names, None for ports
+        which could not be created.
+        """
+        names = names or []
+        if not names:
+            return []
+
+        if self.bulk_port_rpcs:
+            try:
+                ports = self._call(
+                    self.context,
+                    self._make_msg('create_ports_on_subnet',
+                                   subnet_id=subnet_id,
+                                   names=names,
+                                   fixed_address_count=fixed_address_count,
+                                   host=self.host),
+                    topic=self.topic
+                ) or []
+                by_name = dict((port['name'], port) for port in ports)
+                for name, port in by_name.items():
+                    self.port_cache.add(name, port)
+                return [by_name.get(name) for name in names]
+            except messaging.MessageDeliveryFailure:
+                LOG.error("agent->plugin RPC exception caught: "
+                          "create_ports_on_subnet")
+                return [None] * len(names)
+            except messaging.RemoteError as err:
+                if err.exc_type not in ('NoSuchMethod',
+                                        'UnsupportedVersion'):
+                    raise
+                LOG.info("ccloud: plugin doesn't support bulk port "
+                         "RPCs, falling back to single port RPCs")
+                self.bulk_port_rpcs = False
+
+        return [self.create_port_on_subnet(
+            subnet_id=subnet_id, mac_address=None, name=name,
+            fixed_address_count=fixed_address_count) for name in names]
+
     @log_helpers.log_method_call
     def create_port_on_subnet_with_specific_ip(self, subnet_id=None,
                                                mac_address=None,
@@ -390,11 +642,14 @@ class LBaaSv2PluginRPC(object):
             LOG.error("agent->plugin RPC exception caught: "
                       "create_port_on_subnet_with_specific_ip")
 
+        if port and name:
+            self.port_cache.add(name, port)
         return port
 
     @log_helpers.log_method_call
     def delete_port_by_name(self, port_name=None):
         """Delete ports with the given name."""
+        self.port_cache.remove(name=port_name)
         try:
             return self._cast(
                 self.context,
@@ -409,6 +664,7 @@ class LBaaSv2PluginRPC(object):
     @log_helpers.log_method_call
     def delete_port(self, port_id=None, mac_address=None):
         """Delete port with the given port_id."""
+        self.port_cache.remove(port_id=port_id, mac_address=mac_address)
         return self._cast(
             self.context,
             self._make_msg('delete_port',
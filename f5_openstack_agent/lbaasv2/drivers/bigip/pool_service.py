@@ -19,10 +19,19 @@ from oslo_log import log as logging
 from requests import HTTPError
 import urllib
 
+from f5_openstack_agent.lbaasv2.drivers.bigip import utils
 from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
     BigIPResourceHelper
 from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
     ResourceType
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    transaction_params
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    try_delete
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    try_load
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    try_stats
 
 LOG = logging.getLogger(__name__)
 
@@ -54,8 +63,8 @@ class PoolServiceBuilder(object):
         :param bigips: Array of BigIP class instances to create pool.
         """
         pool = self.service_adapter.get_pool(service)
-        ex = None
-        for bigip in bigips:
+
+        def _create_pool(bigip):
             try:
                 self.pool_helper.create(bigip, pool)
                 LOG.info("Pool created: %s", pool['name'])
@@ -66,16 +75,15 @@ class PoolServiceBuilder(object):
                         self.pool_helper.update(bigip, pool)
                         LOG.info("Pool updated: %s", pool['name'])
                     except Exception as err:
-                        ex = err
                         LOG.error("Pool creation/update FAILED for pool %s on %s: %s",
                                   pool['name'], bigip, err.message)
+                        raise
                 else:
-                    ex = err
                     LOG.error("Pool creation FAILED for pool %s on %s: %s",
                               pool['name'], bigip, err.message)
+                    raise
 
-        if ex:
-            raise ex
+        utils.fan_out(bigips, _create_pool)
 
 
     def delete_pool(self, service, bigips):
@@ -88,18 +96,18 @@ class PoolServiceBuilder(object):
         :param bigips: Array of BigIP class instances to delete pool.
         """
         pool = self.service_adapter.get_pool(service)
-        ex = None
-        for bigip in bigips:
+
+        def _delete_pool(bigip):
             try:
                 self.pool_helper.delete(bigip,
                                         name=pool["name"],
                                         partition=pool["partition"])
                 LOG.info("Pool deleted: %s", pool['name'])
-            except HTTPError as err:
+            except HTTPError:
                 LOG.info("Pool deletion FAILED: %s", pool['name'])
-                ex = err
-        if ex:
-            raise ex
+                raise
+
+        utils.fan_out(bigips, _delete_pool)
 
 
     def update_pool(self, service, bigips):
@@ -110,16 +118,16 @@ class PoolServiceBuilder(object):
         :param bigips: Array of BigIP class instances to create pool.
         """
         pool = self.service_adapter.get_pool(service)
-        ex = None
-        for bigip in bigips:
+
+        def _update_pool(bigip):
             try:
                 self.pool_helper.update(bigip, pool)
                 LOG.info("Pool updated DONE: %s", pool['name'])
-            except HTTPError as err:
+            except HTTPError:
                 LOG.debug("Pool update FAILED: %s", pool['name'])
-                ex = err
-        if ex:
-            raise ex
+                raise
+
+        utils.fan_out(bigips, _update_pool)
 
 
     def create_healthmonitor(self, service, bigips):
@@ -130,8 +138,7 @@ class PoolServiceBuilder(object):
         hm_helper = self._get_monitor_helper(service)
         pool = self.service_adapter.get_pool(service)
 
-        ex = None
-        for bigip in bigips:
+        def _create_healthmonitor(bigip):
             try:
                 hm_helper.create(bigip, hm)
                 # update pool with new health monitor
@@ -143,15 +150,15 @@ class PoolServiceBuilder(object):
                         hm_helper.update(bigip, hm)
                         LOG.info("Health Monitor upserted: %s", hm['name'])
                     except Exception as err:
-                        ex = err
                         LOG.error("Failed to upsert monitor %s on %s: %s",
                                   hm['name'], bigip, err.message)
+                        raise
                 else:
-                    ex = err
                     LOG.error("Failed to upsert monitor %s on %s: %s",
                               hm['name'], bigip, err.message)
-        if ex:
-            raise ex
+                    raise
+
+        utils.fan_out(bigips, _create_healthmonitor)
 
 
     def delete_healthmonitor(self, service, bigips):
@@ -163,8 +170,7 @@ class PoolServiceBuilder(object):
         pool = self.service_adapter.get_pool(service)
         pool["monitor"] = ""
 
-        ex = None
-        for bigip in bigips:
+        def _delete_healthmonitor(bigip):
             try:
                 # need to first remove monitor reference from pool
                 self.pool_helper.update(bigip, pool)
@@ -173,29 +179,28 @@ class PoolServiceBuilder(object):
                                  name=hm["name"],
                                  partition=hm["partition"])
                 LOG.info("Health Monitor deleted: %s", hm['name'])
-            except HTTPError as err:
+            except HTTPError:
                 LOG.info("Health Monitor deletion FAILED: %s", hm['name'])
-                ex = err
-        if ex:
-            raise ex
+                raise
+
+        utils.fan_out(bigips, _delete_healthmonitor)
 
     def update_healthmonitor(self, service, bigips):
         hm = self.service_adapter.get_healthmonitor(service)
         hm_helper = self._get_monitor_helper(service)
         pool = self.service_adapter.get_pool(service)
 
-        ex = None
-        for bigip in bigips:
+        def _update_healthmonitor(bigip):
             try:
                 hm_helper.update(bigip, hm)
                 # update pool with new health monitor
                 self.pool_helper.update(bigip, pool)
                 LOG.info("Health Monitor updated: %s", hm['name'])
-            except HTTPError as err:
+            except HTTPError:
                 LOG.info("Health Monitor update FAILED: %s", hm['name'])
-                ex = err
-        if ex:
-            raise ex
+                raise
+
+        utils.fan_out(bigips, _update_healthmonitor)
 
     # Note: can't use BigIPResourceHelper class because members
     # are created within pool objects. Following member methods
@@ -206,23 +211,18 @@ class PoolServiceBuilder(object):
         if '%' not in member['address'] or '%0' in member['address']:
             LOG.error("ccloud: POOL-RDCHECK1 - trying to create member with address: %s", member['address'])
 
-        ex = None
-        for bigip in bigips:
-            try:
-                part = pool["partition"]
-                p = self.pool_helper.load(bigip,
-                                          name=pool["name"],
-                                          partition=part)
-                m = p.members_s.members
-                m.create(**member)
-                LOG.info("Member created: %s", member['address'])
-            except HTTPError as err:
-                # ccloud:   Do not log failure because create is always called and updates are made in case of failure
-                #           create member method logs it's own method in case of failure
-                #LOG.info("Member creation FAILED: %s", member['address'])
-                ex = err
-        if ex:
-            raise ex
+        def _create_member(bigip):
+            # ccloud:   Do not log failure because create is always called and updates are made in case of failure
+            #           create member method logs it's own method in case of failure
+            part = pool["partition"]
+            p = self.pool_helper.load(bigip,
+                                      name=pool["name"],
+                                      partition=part)
+            m = p.members_s.members
+            m.create(**dict(member, **transaction_params(bigip)))
+            LOG.info("Member created: %s", member['address'])
+
+        utils.fan_out(bigips, _create_member)
 
     def delete_member(self, service, bigips):
         pool = self.service_adapter.get_pool(service)
@@ -231,38 +231,32 @@ class PoolServiceBuilder(object):
             LOG.error("ccloud: POOL-RDCHECK2 - trying to create member with address: %s", member['address'])
         part = pool["partition"]
 
-        ex = None
-        for bigip in bigips:
+        def _delete_member(bigip):
             p = self.pool_helper.load(bigip,
                                       name=pool["name"],
                                       partition=part)
 
             m = p.members_s.members
-            member_exists = m.exists(name=urllib.quote(member["name"]),
-                                     partition=part)
-            if member_exists:
-                m = m.load(name=urllib.quote(member["name"]),
-                           partition=part)
-
-                try:
-                    m.delete()
+            node = self.service_adapter.get_member_node(service)
+            try:
+                if try_delete(m, name=urllib.quote(member["name"]),
+                              partition=part, bigip=bigip):
                     LOG.info("Member deleted: %s", member['address'])
 
-                    node = self.service_adapter.get_member_node(service)
                     self.node_helper.delete(bigip,
                                             name=urllib.quote(node["name"]),
                                             partition=node["partition"])
                     LOG.info("Node deleted: %s", node["name"])
-                except HTTPError as err:
-                    # Possilbe error if node is shared with another member.
-                    # If so, ignore the error.
-                    if err.response.status_code == 400:
-                        LOG.debug("ccloud: Node %s not deleted because it's referenced as member somewhere else" % node['name'])
-                    else:
-                        LOG.info("Member or Node deletion FAILED: %s", member['address'])
-                        ex = err
-        if ex:
-            raise ex
+            except HTTPError as err:
+                # Possilbe error if node is shared with another member.
+                # If so, ignore the error.
+                if err.response.status_code == 400:
+                    LOG.debug("ccloud: Node %s not deleted because it's referenced as member somewhere else" % node['name'])
+                else:
+                    LOG.info("Member or Node deletion FAILED: %s", member['address'])
+                    raise
+
+        utils.fan_out(bigips, _delete_member)
 
     def update_member(self, service, bigips):
         pool = self.service_adapter.get_pool(service)
@@ -270,26 +264,19 @@ class PoolServiceBuilder(object):
         if '%' not in member['address'] or '%0' in member['address']:
             LOG.error("ccloud: POOL-RDCHECK3 - trying to create member with address: %s", member['address'])
         part = pool["partition"]
+        name = urllib.quote(member["name"])
+        member.pop("address", None)
 
-        ex = None
-        for bigip in bigips:
-            try:
-                p = self.pool_helper.load(bigip,
-                                          name=pool["name"],
-                                          partition=part)
-
-                m = p.members_s.members
-                if m.exists(name=urllib.quote(member["name"]), partition=part):
-                    m = m.load(name=urllib.quote(member["name"]),
-                               partition=part)
-                    member.pop("address", None)
-                    m.modify(**member)
-                    #LOG.info("Member updated: %s", member['address'])
-            except HTTPError as err:
-                #LOG.info("Member update FAILED: %s", member['address'])
-                ex = err
-        if ex:
-            raise ex
+        def _update_member(bigip):
+            p = self.pool_helper.load(bigip,
+                                      name=pool["name"],
+                                      partition=part)
+
+            m = try_load(p.members_s.members, name=name, partition=part)
+            if m:
+                m.modify(**dict(member, **transaction_params(bigip)))
+
+        utils.fan_out(bigips, _update_member)
 
     def _get_monitor_helper(self, service):
         monitor_type = self.service_adapter.get_monitor_type(service)
@@ -354,11 +341,12 @@ class PoolServiceBuilder(object):
                                       name=pool["name"],
                                       partition=part)
 
-            m = p.members_s.members
-            if m.exists(name=urllib.quote(member["name"]), partition=part):
-                m = m.load(name=urllib.quote(member["name"]), partition=part)
-                member_status = self.pool_helper.collect_stats(
-                    m, stat_keys=status_keys)
+            stat_entries = try_stats(p.members_s.members,
+                                     name=urllib.quote(member["name"]),
+                                     partition=part)
+            if stat_entries is not None:
+                member_status = self.pool_helper.collect_stat_entries(
+                    stat_entries, stat_keys=status_keys)
             else:
                 LOG.warning("Unable to get member status. Member %s does not exist.", member["name"])
 
@@ -367,3 +355,40 @@ class PoolServiceBuilder(object):
             LOG.error("Error getting member status: %s", e.message)
 
         return member_status
+
+    # member config state/session translated to the stats values used by
+    # LBaaSBuilder.convert_operating_status
+    MEMBER_AVAILABILITY = {'up': 'available',
+                           'down': 'offline',
+                           'user-down': 'offline',
+                           'unchecked': 'unknown',
+                           'checking': 'unknown'}
+
+    def get_members_status(self, bigip, partition=None):
+        """Return status values of all pool members with one request.
+
+        Members of all pools within a partition, or of the whole device
+        if no partition is given, are fetched with expanded subcollections.
+
+        :param bigip: BIG-IP to get member status from.
+        :param partition: Partition to restrict the query to.
+        :return: A dict keyed by (pool name, utils.member_key) with
+        status.availabilityState and status.enabledState values.
+        """
+        members_status = {}
+        pools = self.pool_helper.get_resources(
+            bigip, partition=partition, expand_subcollections=True)
+        for pool in pools:
+            members_ref = getattr(pool, 'membersReference', {})
+            for member in members_ref.get('items', []):
+                address, _, port = utils.split_member_name(member['name'])
+                if member.get('session') == 'user-disabled':
+                    enabled = 'disabled'
+                else:
+                    enabled = 'enabled'
+                key = (pool.name, utils.member_key(address, port))
+                members_status[key] = {
+                    'status.availabilityState':
+                        self.MEMBER_AVAILABILITY.get(member.get('state'), ''),
+                    'status.enabledState': enabled}
+        return members_status
@@ -13,13 +13,21 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+from contextlib import contextmanager
+
 from enum import Enum
+from requests import HTTPError
+
+from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5_ex
+from f5_openstack_agent.lbaasv2.drivers.bigip import utils
 from f5_openstack_agent.lbaasv2.drivers.bigip.utils import get_filter
 
 from oslo_log import log as logging
 
 LOG = logging.getLogger(__name__)
 
+TRANSACTION_HEADER = 'X-F5-REST-Coordination-Id'
+
 
 class ResourceType(Enum):
     u"""Defines supported BIG-IP resource types."""
@@ -65,6 +73,164 @@ class ResourceType(Enum):
     fastl4_profile = 39
 
 
+# resources iControl REST does not accept in transactions
+IMMEDIATE_RESOURCE_TYPES = [ResourceType.sys, ResourceType.folder,
+                            ResourceType.ssl_cert_file]
+
+
+class BigIPTransaction(object):
+    u"""REST writes to a BIG-IP queued in one iControl REST transaction.
+
+    The transaction is opened with the first write and the writes are
+    executed by the BIG-IP in their order when it is committed. If a
+    write fails, the BIG-IP rolls back the whole transaction.
+    """
+
+    def __init__(self, bigip):
+        self.bigip = bigip
+        self.transaction = None
+        self.commands = 0
+
+    def requests_params(self):
+        u"""Return the requests_params which queue a write."""
+        if self.transaction is None:
+            self.transaction = \
+                self.bigip.tm.transactions.transaction.create()
+        self.commands += 1
+        return {'headers': {
+            TRANSACTION_HEADER: str(self.transaction.transId)}}
+
+    def commit(self):
+        if self.transaction is not None:
+            try:
+                self.transaction.modify(state='VALIDATING')
+            except Exception as err:
+                raise f5_ex.TransactionCommitException(
+                    "Commit of %d REST writes to %s failed: %s" %
+                    (self.commands, self.bigip.hostname, err))
+            LOG.debug("ccloud: committed %d REST writes to %s in one "
+                      "transaction" % (self.commands, self.bigip.hostname))
+
+    def discard(self):
+        if self.transaction is not None:
+            try:
+                self.transaction.delete()
+            except Exception as err:
+                LOG.debug("ccloud: discarding transaction on %s failed: %s"
+                          % (self.bigip.hostname, err))
+
+
+@contextmanager
+def transaction(bigips):
+    u"""Queue the writes to bigips and commit them once per bigip.
+
+    Create, modify and delete calls of the resource helpers (and of
+    builders using transaction_params) within the context, also those of
+    threads started with utils.fan_out, are queued in one transaction per
+    bigip. Reads are executed immediately, so they must not depend on
+    queued writes. The transactions are committed when the context is
+    left and discarded if it raises. Nested contexts join the outer one.
+    """
+    if getattr(utils.green_context, 'transactions', None) is not None:
+        yield utils.green_context.transactions
+        return
+
+    transactions = dict((bigip.hostname, BigIPTransaction(bigip))
+                        for bigip in bigips)
+    utils.green_context.transactions = transactions
+    try:
+        yield transactions
+    except Exception:
+        for bigip_transaction in transactions.values():
+            bigip_transaction.discard()
+        raise
+    finally:
+        utils.green_context.transactions = None
+
+    utils.fan_out(bigips,
+                  lambda bigip: transactions[bigip.hostname].commit())
+
+
+def in_transaction(bigip):
+    u"""Return True if writes to bigip are queued in a transaction."""
+    transactions = getattr(utils.green_context, 'transactions', None)
+    return bool(transactions) and bigip.hostname in transactions
+
+
+def transaction_params(bigip):
+    u"""Return the kwargs which send a write to the current transaction."""
+    if in_transaction(bigip):
+        return {'requests_params': utils.green_context.transactions[
+            bigip.hostname].requests_params()}
+    return {}
+
+
+def _request(resource, method, name=None, partition=None, **kwargs):
+    # send a request to the URI load() reads, without loading first
+    session = resource._meta_data['bigip']._meta_data['icr_session']
+    base_uri = resource._meta_data['container']._meta_data['uri']
+    return getattr(session, method)(base_uri, name=name, partition=partition,
+                                    uri_as_parts=True, **kwargs)
+
+
+def _is_not_found(err):
+    return err.response is not None and err.response.status_code == 404
+
+
+def try_load(resource, **kwargs):
+    u"""Load a resource with one GET, None if it does not exist.
+
+    resource is an SDK resource factory, e.g. bigip.tm.ltm.pools.pool.
+    Use it instead of exists() followed by load(), which sends the same
+    GET twice.
+    """
+    try:
+        return resource.load(**kwargs)
+    except HTTPError as err:
+        if _is_not_found(err):
+            return None
+        raise
+
+
+def try_delete(resource, name=None, partition=None, bigip=None):
+    u"""Delete a resource with one DELETE, False if it does not exist.
+
+    The resource is neither checked nor loaded before. If bigip is given
+    and its writes are queued in a transaction, the delete is queued as
+    well. Queued deletes only fail when the transaction is committed, so
+    the resource is loaded first then.
+    """
+    if bigip is not None and in_transaction(bigip):
+        obj = try_load(resource, name=name, partition=partition)
+        if obj is None:
+            return False
+        obj.delete(**transaction_params(bigip))
+        return True
+
+    try:
+        _request(resource, 'delete', name=name, partition=partition)
+    except HTTPError as err:
+        if _is_not_found(err):
+            return False
+        raise
+    return True
+
+
+def try_stats(resource, name=None, partition=None):
+    u"""Return the stats entries of a resource with one GET.
+
+    Returns None if the resource does not exist.
+    """
+    try:
+        response = _request(resource, 'get', name=name, partition=partition,
+                            suffix='/stats')
+    except HTTPError as err:
+        if _is_not_found(err):
+            return None
+        raise
+    return response.json().get('entries', {})
+
+
 class BigIPResourceHelper(object):
     u"""Helper class for creating, updating and deleting BIG-IP resources.
 
@@ -95,7 +261,7 @@ class BigIPResourceHelper(object):
         :returns: created or updated resource object.
         """
         resource = self._resource(bigip)
-        obj = resource.create(**model)
+        obj = resource.create(**dict(model, **self._write_params(bigip)))
 
         return obj
 
@@ -107,17 +273,32 @@ class BigIPResourceHelper(object):
     def delete(self, bigip, name=None, partition=None):
         u"""Delete a resource on a BIG-IP system.
 
-        Checks if resource exists and deletes it. Returns without error
+        Deletes the resource if it exists. Returns without error
         if resource does not exist.
 
         :param bigip: BigIP instance to use for creating resource.
         :param name: Name of resource to delete.
         :param partition: Partition name for resou
         """
+        self.try_delete(bigip, name=name, partition=partition)
+
+    def try_delete(self, bigip, name=None, partition=None):
+        u"""Delete a resource with one DELETE, False if it does not exist.
+
+        Deletes join the transaction of the bigip like other writes.
+        """
         resource = self._resource(bigip)
-        if resource.exists(name=name, partition=partition):
-            obj = resource.load(name=name, partition=partition)
+        if self.resource_type == ResourceType.folder:
+            # folder URIs are not built from partition and name
+            obj = try_load(resource, name=name, partition=partition)
+            if obj is None:
+                return False
             obj.delete()
+            return True
+        if self.resource_type in IMMEDIATE_RESOURCE_TYPES:
+            return try_delete(resource, name=name, partition=partition)
+        return try_delete(resource, name=name, partition=partition,
+                          bigip=bigip)
 
     def load(self, bigip, name=None, partition=None):
         u"""Retrieve a BIG-IP resource from a BIG-IP.
@@ -133,7 +314,12 @@ class BigIPResourceHelper(object):
         resource = self._resource(bigip)
         return resource.load(name=name, partition=partition)
 
-    def update(self, bigip, model):
+    def try_load(self, bigip, name=None, partition=None):
+        u"""Load a resource with one GET, None if it does not exist."""
+        return try_load(self._resource(bigip), name=name,
+                        partition=partition)
+
+    def update(self, bigip, model, resource=None):
         u"""Update a resource (e.g., pool) on a BIG-IP system.
 
         Modifies a resource on a BIG-IP system using attributes
@@ -142,12 +328,15 @@ class BigIPResourceHelper(object):
         :param bigip: BigIP instance to use for creating resource.
         :param model: Dictionary of BIG-IP attributes to update resource.
         Must include name and partition in order to identify resource.
+        :param resource: The resource if already loaded, e.g. by try_load.
         """
         partition = None
         if "partition" in model:
             partition = model["partition"]
-        resource = self.load(bigip, name=model["name"], partition=partition)
-        resource.modify(**model)
+        if resource is None:
+            resource = self.load(bigip, name=model["name"],
+                                 partition=partition)
+        resource.modify(**dict(model, **self._write_params(bigip)))
 
         return resource
 
@@ -180,11 +369,42 @@ class BigIPResourceHelper(object):
                 elif expand_subcollections:
                     params['params'] += '&expandSubCollections=true'
                 resources = collection.get_collection(requests_params=params)
+            elif expand_subcollections:
+                resources = collection.get_collection(
+                    requests_params={'params': 'expandSubcollections=true'})
             else:
                 resources = collection.get_collection()
 
         return resources
 
+    def get_selected_resources(self, bigip, select,
+                               expand_subcollections=False, partition=None):
+        u"""Retrieve a collection of resources with selected attributes.
+
+        Only the attributes listed in select are returned, which keeps
+        the payload small for big collections. Items are returned as
+        plain dicts by the SDK as they carry no 'kind' attribute.
+
+        :param bigip: BigIP instance to query.
+        :param select: List of attribute names to retrieve.
+        :param expand_subcollections: Include subcollection items.
+        :param partition: Only retrieve resources of this partition.
+        :returns: list of resources.
+        """
+        collection = self._collection(bigip)
+        params = '$select=%s' % ','.join(select)
+        if expand_subcollections:
+            params += '&expandSubcollections=true'
+        if partition:
+            partition_filter = get_filter(
+                bigip, 'partition', 'eq', partition)
+            if isinstance(partition_filter, dict):
+                params = dict(p.split('=', 1) for p in params.split('&'))
+                params.update(partition_filter)
+            else:
+                params += '&' + partition_filter
+        return collection.get_collection(requests_params={'params': params})
+
     def exists_in_collection(self, bigip, name, partition='Common'):
         collection = self.get_resources(bigip, partition='Common')
         for item in collection:
@@ -193,6 +413,11 @@ class BigIPResourceHelper(object):
 
         return False
 
+    def _write_params(self, bigip):
+        if self.resource_type in IMMEDIATE_RESOURCE_TYPES:
+            return {}
+        return transaction_params(bigip)
+
     def _resource(self, bigip):
         return {
             ResourceType.nat: lambda bigip: bigip.tm.ltm.nats.nat,
@@ -366,19 +591,23 @@ class BigIPResourceHelper(object):
         defined in input array, if present in resource stats, and value
         as the value of resource stats 'value' key.
         """
-        collected_stats = {}
+        return self.try_stats(bigip, name=name, partition=partition,
+                              stat_keys=stat_keys) or {}
 
-        # get resource, then its stats
-        if self.exists(bigip, name=name, partition=partition):
-            resource = self.load(bigip, name=name, partition=partition)
-            collected_stats = self.collect_stats(resource, stat_keys)
-
-        return collected_stats
+    def try_stats(self, bigip, name=None, partition=None, stat_keys=[]):
+        u"""Return stats like get_stats with one GET, None if not found."""
+        stat_entries = try_stats(self._resource(bigip), name=name,
+                                 partition=partition)
+        if stat_entries is None:
+            return None
+        return self.collect_stat_entries(stat_entries, stat_keys)
 
     def collect_stats(self, resource, stat_keys=[]):
-        collected_stats = {}
         resource_stats = resource.stats.load()
-        stat_entries = resource_stats.entries
+        return self.collect_stat_entries(resource_stats.entries, stat_keys)
+
+    def collect_stat_entries(self, stat_entries, stat_keys=[]):
+        collected_stats = {}
 
         # Difference between 11.6 and 12.1. Stats in 12.1 are embedded
         # in nestedStats. In 11.6, they are directly accessible in entries.
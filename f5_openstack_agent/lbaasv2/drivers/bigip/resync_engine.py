@@ -0,0 +1,243 @@
+"""Parallel per-loadbalancer resync engine."""
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import hashlib
+import json
+import math
+from time import time
+
+import eventlet
+
+from oslo_log import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class ResyncEngine(object):
+    """Run resync work for many loadbalancers on a bounded green pool.
+
+    Every loadbalancer id is handled by exactly one green thread per run,
+    so the work for a single loadbalancer stays strictly ordered while
+    different loadbalancers are processed concurrently.  A run only
+    returns after all of its loadbalancers are done, which keeps the
+    phases of a resync (validate, then refresh) ordered as well.
+    """
+
+    # log progress roughly every tenth of a run
+    PROGRESS_STEPS = 10
+    # number of slowest loadbalancers reported after each run
+    SLOWEST_REPORTED = 5
+
+    def __init__(self, concurrency=1):
+        self.concurrency = max(1, int(concurrency or 1))
+        # seconds per loadbalancer of the last run
+        self.timings = {}
+
+    def run(self, name, lb_ids, worker, progress=None):
+        """Call worker(lb_id) for every loadbalancer id.
+
+        Returns a dict mapping each loadbalancer id to the worker result.
+        Exceptions are logged and reported as a result of None, so one
+        broken loadbalancer never aborts the resync of the others.
+
+        If given, progress(lb_id, result, seconds, done, total, eta) is
+        called after every loadbalancer.
+        """
+        # dedupe while keeping the order given by the caller
+        ordered = []
+        seen = set()
+        for lb_id in lb_ids:
+            if lb_id not in seen:
+                seen.add(lb_id)
+                ordered.append(lb_id)
+
+        results = {}
+        timings = {}
+        total = len(ordered)
+        if not total:
+            return results
+
+        step = max(1, total // self.PROGRESS_STEPS)
+        started = time()
+        state = {'done': 0}
+
+        def _run_one(lb_id):
+            ts = time()
+            try:
+                results[lb_id] = worker(lb_id)
+            except Exception as exc:
+                LOG.exception("ccloud: resync %s failed for loadbalancer "
+                              "%s: %s" % (name, lb_id, exc))
+                results[lb_id] = None
+            finally:
+                timings[lb_id] = time() - ts
+                state['done'] += 1
+                done = state['done']
+                elapsed = time() - started
+                eta = elapsed / done * (total - done)
+                if done % step == 0 or done == total:
+                    LOG.info("ccloud: resync %s progress %d/%d "
+                             "(%.1f sec elapsed, ETA %.1f sec)"
+                             % (name, done, total, elapsed, eta))
+                if progress:
+                    progress(lb_id, results.get(lb_id), timings[lb_id],
+                             done, total, eta)
+
+        pool = eventlet.GreenPool(self.concurrency)
+        for lb_id in ordered:
+            pool.spawn_n(_run_one, lb_id)
+        pool.waitall()
+
+        self.timings = timings
+        slowest = sorted(timings.items(), key=lambda t: t[1],
+                         reverse=True)[:self.SLOWEST_REPORTED]
+        LOG.info("ccloud: resync %s of %d loadbalancers with concurrency %d "
+                 "took %.2f sec, slowest: %s"
+                 % (name, total, self.concurrency, time() - started,
+                    ", ".join("%s=%.2fs" % t for t in slowest)))
+        return results
+
+
+class ResyncTracker(object):
+    """Decide which loadbalancers an incremental resync has to validate.
+
+    For every loadbalancer the fingerprint of its service definition, its
+    tenant and the time of its last validation are remembered.  New
+    loadbalancers and those of tenants whose device objects changed are
+    validated right away.  All others are looked at in slices, one slice
+    per cycle_interval, so each of them is looked at once within
+    spread_cycles resync cycles.  A loadbalancer of a slice is validated
+    if its definition changed or its last validation is older than
+    max_age, overdue ones are put into the slice first.  Loadbalancers
+    selected because their tenant changed stay pending until one of
+    their validations succeeds.
+    """
+
+    # keys which change without any need to touch the BIG-IPs
+    VOLATILE_KEYS = frozenset(['operating_status', 'updated_at'])
+
+    def __init__(self, max_age, spread_cycles=1, cycle_interval=0):
+        self.max_age = max_age
+        self.spread_cycles = max(1, int(spread_cycles or 1))
+        self.cycle_interval = cycle_interval
+        self.last_slice = None
+        self.state = {}
+        self.device_fingerprints = {}
+        self.changed_tenants = set()
+        # ids of loadbalancers of changed tenants not validated since
+        self.pending = set()
+
+    @classmethod
+    def fingerprint(cls, service):
+        """Return a hash of the service definition."""
+        def strip(obj):
+            if isinstance(obj, dict):
+                return dict((k, strip(v)) for k, v in obj.items()
+                            if k not in cls.VOLATILE_KEYS)
+            if isinstance(obj, list):
+                return [strip(v) for v in obj]
+            return obj
+
+        data = json.dumps(strip(service), sort_keys=True, default=str)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+    def update_device_fingerprints(self, fingerprints):
+        """Record per tenant fingerprints of the objects on the BIG-IPs.
+
+        Tenants whose fingerprint differs from the last recorded one are
+        validated in the next selection.
+        """
+        tenants = set(fingerprints) | set(self.device_fingerprints)
+        self.changed_tenants = set(
+            tenant_id for tenant_id in tenants
+            if fingerprints.get(tenant_id) !=
+            self.device_fingerprints.get(tenant_id))
+        self.device_fingerprints = dict(fingerprints)
+
+    def reset(self):
+        """Forget everything, so all loadbalancers are validated again."""
+        self.state = {}
+        self.device_fingerprints = {}
+        self.changed_tenants = set()
+        self.pending = set()
+        self.last_slice = None
+
+    def forget(self, lb_id):
+        self.state.pop(lb_id, None)
+        self.pending.discard(lb_id)
+
+    def select(self, lb_ids, now=None):
+        """Return the loadbalancers to look at in this resync cycle."""
+        now = time() if now is None else now
+        lb_ids = set(lb_ids)
+        for lb_id in set(self.state) - lb_ids:
+            self.forget(lb_id)
+
+        selected = set()
+        rest = []
+        for lb_id in lb_ids:
+            state = self.state.get(lb_id)
+            if state is None or lb_id in self.pending:
+                selected.add(lb_id)
+            elif state['tenant_id'] in self.changed_tenants:
+                self.pending.add(lb_id)
+                selected.add(lb_id)
+            else:
+                rest.append(lb_id)
+
+        if self.last_slice is None or \
+                now - self.last_slice >= self.cycle_interval:
+            self.last_slice = now
+            budget = int(math.ceil(float(len(lb_ids)) / self.spread_cycles))
+
+            # overdue first, then the ones not looked at for the longest time
+            def order(lb_id):
+                state = self.state[lb_id]
+                if self._is_due(state, now):
+                    return (0, state['verified'])
+                return (1, state['checked'])
+            rest.sort(key=order)
+            selected.update(rest[:budget])
+        LOG.info("ccloud: incremental resync selected %d of %d "
+                 "loadbalancers (%d tenants changed on device)"
+                 % (len(selected), len(lb_ids), len(self.changed_tenants)))
+        return selected
+
+    def needs_validation(self, lb_id, service, now=None):
+        """Check if a selected loadbalancer has to be validated."""
+        state = self.state.get(lb_id)
+        if state is None or lb_id in self.pending or \
+                self._is_due(state, time() if now is None else now):
+            return True
+        return state['fingerprint'] != self.fingerprint(service)
+
+    def checked(self, lb_id, now=None):
+        """Record that the definition of a loadbalancer was unchanged."""
+        if lb_id in self.state:
+            self.state[lb_id]['checked'] = time() if now is None else now
+
+    def verified(self, lb_id, service, now=None):
+        """Record a successful validation of a loadbalancer."""
+        now = time() if now is None else now
+        self.pending.discard(lb_id)
+        self.state[lb_id] = {
+            'fingerprint': self.fingerprint(service),
+            'tenant_id': service.get('loadbalancer', {}).get('tenant_id'),
+            'verified': now,
+            'checked': now}
+
+    def _is_due(self, state, now):
+        return (state['tenant_id'] in self.changed_tenants or
+                now - state['verified'] > self.max_age)
@@ -0,0 +1,364 @@
+"""Indexed cache of route domains and the subnets placed in them."""
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import bisect
+import json
+import os
+
+import netaddr
+
+from oslo_log import log as logging
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
+    import BigIPResourceHelper
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
+    import ResourceType
+
+LOG = logging.getLogger(__name__)
+
+
+class CidrIndex(object):
+    """Overlap lookups for the subnets of one route domain.
+
+    CIDR blocks either nest or do not overlap at all.  So a block
+    overlaps an indexed one if one of its supernets is indexed, which
+    takes one dict lookup per prefix length, or if an indexed block
+    starts within it, which is found by bisecting the sorted start
+    addresses.
+    """
+
+    def __init__(self):
+        self.subnets = {}
+        self.blocks = {}
+        self.starts = {4: [], 6: []}
+
+    def add(self, subnet_id, cidr):
+        cidr = netaddr.IPNetwork(cidr).cidr
+        self.discard(subnet_id)
+        self.subnets[subnet_id] = cidr
+        self.blocks.setdefault(
+            (cidr.version, cidr.first, cidr.prefixlen), set()).add(subnet_id)
+        bisect.insort(self.starts[cidr.version],
+                      (cidr.first, cidr.prefixlen, subnet_id))
+
+    def discard(self, subnet_id):
+        cidr = self.subnets.pop(subnet_id, None)
+        if cidr is None:
+            return
+        key = (cidr.version, cidr.first, cidr.prefixlen)
+        self.blocks[key].discard(subnet_id)
+        if not self.blocks[key]:
+            del self.blocks[key]
+        self.starts[cidr.version].remove(
+            (cidr.first, cidr.prefixlen, subnet_id))
+
+    def find_overlap(self, cidr, exclude=None):
+        """Return the id of a subnet overlapping cidr or None."""
+        cidr = netaddr.IPNetwork(cidr).cidr
+        bits = 32 if cidr.version == 4 else 128
+        for prefixlen in range(cidr.prefixlen):
+            host_bits = bits - prefixlen
+            first = cidr.first >> host_bits << host_bits
+            for subnet_id in self.blocks.get(
+                    (cidr.version, first, prefixlen), ()):
+                if subnet_id != exclude:
+                    return subnet_id
+
+        starts = self.starts[cidr.version]
+        i = bisect.bisect_left(starts, (cidr.first,))
+        while i < len(starts) and starts[i][0] <= cidr.last:
+            if starts[i][2] != exclude:
+                return starts[i][2]
+            i += 1
+        return None
+
+
+class RouteDomainCache(object):
+    """Route domains of networks and tenants, indexed for lookups.
+
+    Two kinds of route domains are cached.  Route domains named after a
+    network ('rd-<network id>' in /Common) map the network id to the
+    route domain id.  Route domains of tenant partitions map the short
+    name ('<network type>-<segmentation id>') of every network they
+    contain to the route domain id and keep a CidrIndex of the subnets
+    placed in them.
+
+    The cache is built from one route domain, VLAN, tunnel and selfip
+    collection fetch per device and can be persisted to a local file, so
+    a restarted agent does not have to query the devices again.  A
+    persisted cache is only used if the route domains it knows still
+    exist with the same ids on every device, which takes one route domain
+    collection fetch per device.  After invalidate the next update
+    reloads the cache from the devices.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path=None):
+        self.path = path
+        self.loaded = False
+        self.stale = False
+        self.hostnames = []
+        # network id -> route domain id
+        self.named = {}
+        # tenant id -> {route domain id: {net short name: {subnet: cidr}}}
+        self.tenants = {}
+        # net short name -> (tenant id, route domain id)
+        self.networks = {}
+        # (tenant id, route domain id) -> CidrIndex
+        self.cidrs = {}
+
+    def invalidate(self):
+        """Reload the cache from the bigips, e.g. on a full resync."""
+        self.loaded = False
+        self.stale = True
+
+    def get_route_domain(self, net_short_name):
+        """Return the route domain id of a network or None."""
+        entry = self.networks.get(net_short_name)
+        return entry[1] if entry else None
+
+    def get_named_route_domain(self, network_id):
+        return self.named.get(network_id)
+
+    def set_named_route_domain(self, network_id, route_domain_id):
+        self.named[network_id] = route_domain_id
+
+    def discard_named_route_domain(self, network_id):
+        self.named.pop(network_id, None)
+
+    def route_domain_ids(self, tenant_id):
+        return sorted(self.tenants.get(tenant_id, {}))
+
+    def add_route_domain(self, tenant_id, route_domain_id):
+        self.tenants.setdefault(tenant_id, {}).setdefault(
+            route_domain_id, {})
+
+    def add_network(self, tenant_id, route_domain_id, net_short_name):
+        self.add_route_domain(tenant_id, route_domain_id)
+        self.tenants[tenant_id][route_domain_id].setdefault(
+            net_short_name, {})
+        self.networks.setdefault(net_short_name,
+                                 (tenant_id, route_domain_id))
+
+    def add_subnet(self, tenant_id, route_domain_id, net_short_name,
+                   subnet_id, cidr):
+        cidr = netaddr.IPNetwork(cidr).cidr
+        self.add_network(tenant_id, route_domain_id, net_short_name)
+        self.tenants[tenant_id][route_domain_id][net_short_name][
+            subnet_id] = cidr
+        self.cidrs.setdefault((tenant_id, route_domain_id),
+                              CidrIndex()).add(subnet_id, cidr)
+
+    def find_overlap(self, tenant_id, route_domain_id, cidr, exclude=None):
+        """Return the id of a subnet of the route domain overlapping cidr."""
+        index = self.cidrs.get((tenant_id, route_domain_id))
+        if index is None:
+            return None
+        return index.find_overlap(cidr, exclude)
+
+    def remove_subnet(self, net_short_name, subnet_id):
+        """Remove a subnet, its network and route domain once empty."""
+        entry = self.networks.get(net_short_name)
+        if entry is None:
+            return
+        tenant_id, route_domain_id = entry
+        rd_entry = self.tenants[tenant_id][route_domain_id]
+        net_subnets = rd_entry[net_short_name]
+        if subnet_id in net_subnets:
+            del net_subnets[subnet_id]
+            self.cidrs[(tenant_id, route_domain_id)].discard(subnet_id)
+        if not net_subnets:
+            del rd_entry[net_short_name]
+            del self.networks[net_short_name]
+        if not rd_entry:
+            LOG.debug("removing route domain %s from tenant %s" %
+                      (route_domain_id, tenant_id))
+            del self.tenants[tenant_id][route_domain_id]
+            self.cidrs.pop((tenant_id, route_domain_id), None)
+
+    def load(self, bigips, prefix):
+        """Build the cache from the route domains of all bigips."""
+        self.__init__(self.path)
+        for bigip in bigips:
+            self._load_bigip(bigip, prefix)
+            self.hostnames.append(bigip.hostname)
+        self.loaded = True
+        LOG.info("ccloud: route domain cache loaded %d networks of %d "
+                 "tenants and %d network route domains from %d bigips"
+                 % (len(self.networks), len(self.tenants), len(self.named),
+                    len(self.hostnames)))
+
+    @staticmethod
+    def _items(bigip, resource_type, select):
+        items = BigIPResourceHelper(resource_type).get_selected_resources(
+            bigip, select)
+        return [item if isinstance(item, dict) else item.__dict__
+                for item in items]
+
+    def _load_bigip(self, bigip, prefix):
+        def _items(resource_type, select):
+            return self._items(bigip, resource_type, select)
+
+        # vlans and tunnels by path, mapped to the network short name
+        short_names = {}
+        for vlan in _items(ResourceType.vlan, ['name', 'partition', 'tag']):
+            short_names['/%s/%s' % (vlan['partition'], vlan['name'])] = \
+                'vlan-%s' % vlan.get('tag')
+        for tunnel in _items(ResourceType.tunnel,
+                             ['name', 'partition', 'key']):
+            for net_type in ['gre', 'vxlan']:
+                if 'tunnel-%s-' % net_type in tunnel['name']:
+                    short_names['/%s/%s' % (tunnel['partition'],
+                                            tunnel['name'])] = \
+                        '%s-%s' % (net_type, tunnel.get('key'))
+
+        selfips = {}
+        for selfip in _items(ResourceType.selfip,
+                             ['name', 'partition', 'address', 'vlan']):
+            selfips.setdefault(selfip.get('vlan'), []).append(selfip)
+
+        for rd in _items(ResourceType.route_domain,
+                         ['name', 'partition', 'id', 'vlans']):
+            partition = rd.get('partition') or ''
+            route_domain_id = rd['id']
+            if partition == 'Common' and rd['name'].startswith('rd-'):
+                network_id = rd['name'][3:]
+                known_id = self.named.setdefault(network_id, route_domain_id)
+                if known_id != route_domain_id:
+                    LOG.error("ccloud: route domain of network %s has id %s "
+                              "on %s but %s on another bigip"
+                              % (network_id, route_domain_id,
+                                 bigip.hostname, known_id))
+                continue
+            if not partition.startswith(prefix) or not rd.get('vlans'):
+                continue
+
+            tenant_id = partition[len(prefix):]
+            for vlan in rd['vlans']:
+                net_short_name = short_names.get(vlan)
+                if net_short_name is None:
+                    LOG.debug("rds_cache: unknown vlan %s in route domain "
+                              "%s" % (vlan, route_domain_id))
+                    continue
+                self.add_network(tenant_id, route_domain_id, net_short_name)
+                for selfip in selfips.get(vlan, []):
+                    if selfip['partition'] != partition:
+                        continue
+                    if bigip.device_name not in selfip['name']:
+                        LOG.error("rds_cache: Found unexpected selfip %s for "
+                                  "tenant %s" % (selfip['name'], tenant_id))
+                        continue
+                    subnet_id = selfip['name'].split(
+                        bigip.device_name + '-')[1]
+                    # convert 10.1.1.1%1/24 to 10.1.1.1/24
+                    (addr, netbits) = selfip['address'].split('/')
+                    addr = addr.split('%')[0]
+                    self.add_subnet(tenant_id, route_domain_id,
+                                    net_short_name, subnet_id,
+                                    addr + '/' + netbits)
+
+    def save(self):
+        """Persist the cache, errors are logged only."""
+        if not self.path or not self.loaded:
+            return
+        data = {
+            'version': self.VERSION,
+            'hostnames': sorted(self.hostnames),
+            'named': self.named,
+            'tenants': dict(
+                (tenant_id, dict(
+                    (str(route_domain_id), dict(
+                        (net_short_name, dict(
+                            (subnet_id, str(cidr))
+                            for subnet_id, cidr in subnets.items()))
+                        for net_short_name, subnets in rd_entry.items()))
+                    for route_domain_id, rd_entry in tenant.items()))
+                for tenant_id, tenant in self.tenants.items())
+        }
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as cache_file:
+                json.dump(data, cache_file)
+            os.rename(tmp_path, self.path)
+        except (IOError, OSError) as exc:
+            LOG.warning("ccloud: failed to save route domain cache to %s: "
+                        "%s" % (self.path, exc))
+
+    def restore(self, bigips, prefix):
+        """Load the persisted cache if it is still valid for these bigips."""
+        if not self.path or self.stale or not os.path.exists(self.path):
+            return False
+        hostnames = [bigip.hostname for bigip in bigips]
+        try:
+            with open(self.path) as cache_file:
+                data = json.load(cache_file)
+            if data.get('version') != self.VERSION or \
+                    data.get('hostnames') != sorted(hostnames):
+                LOG.info("ccloud: ignoring route domain cache %s saved for "
+                         "other bigips" % self.path)
+                return False
+
+            self.__init__(self.path)
+            self.named = data['named']
+            for tenant_id, tenant in data['tenants'].items():
+                for route_domain_id, rd_entry in tenant.items():
+                    route_domain_id = int(route_domain_id)
+                    self.add_route_domain(tenant_id, route_domain_id)
+                    for net_short_name, subnets in rd_entry.items():
+                        self.add_network(tenant_id, route_domain_id,
+                                         net_short_name)
+                        for subnet_id, cidr in subnets.items():
+                            self.add_subnet(tenant_id, route_domain_id,
+                                            net_short_name, subnet_id, cidr)
+        except (IOError, ValueError, KeyError, TypeError,
+                netaddr.AddrFormatError) as exc:
+            LOG.warning("ccloud: failed to restore route domain cache from "
+                        "%s: %s" % (self.path, exc))
+            self.__init__(self.path)
+            return False
+
+        for bigip in bigips:
+            if not self._matches(bigip, prefix):
+                LOG.info("ccloud: ignoring route domain cache %s, the route "
+                         "domains on %s changed" % (self.path, bigip.hostname))
+                self.__init__(self.path)
+                return False
+
+        self.hostnames = hostnames
+        self.loaded = True
+        LOG.info("ccloud: route domain cache restored from %s" % self.path)
+        return True
+
+    def _matches(self, bigip, prefix):
+        """Check the cached route domain ids against those of a bigip.
+
+        The network route domains have to match exactly, the route
+        domains cached for a tenant have to exist in its partition.
+        """
+        named = {}
+        tenant_rds = set()
+        for rd in self._items(bigip, ResourceType.route_domain,
+                              ['name', 'partition', 'id']):
+            partition = rd.get('partition') or ''
+            if partition == 'Common' and rd['name'].startswith('rd-'):
+                named[rd['name'][3:]] = rd['id']
+            elif partition.startswith(prefix):
+                tenant_rds.add((partition[len(prefix):], rd['id']))
+
+        return named == self.named and all(
+            (tenant_id, route_domain_id) in tenant_rds
+            for tenant_id, tenant in self.tenants.items()
+            for route_domain_id in tenant)
@@ -25,6 +25,10 @@ from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
     import BigIPResourceHelper
 from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
     import ResourceType
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
+    import try_delete
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
+    import try_load
 from f5_openstack_agent.lbaasv2.drivers.bigip.utils import get_filter
 from requests import HTTPError
 
@@ -142,11 +146,16 @@ class BigipSelfIpManager(object):
             self.l3_binding.bind_address(subnet_id=subnet['id'],
                                          ip_address=selfip_address)
 
+    @staticmethod
+    def get_selfip_port_name(bigip, subnet):
+        # Name of the neutron port of a bigip's selfip on the subnet
+        return "local-" + bigip.device_name + "-" + subnet['id']
+
     def _get_bigip_selfip_address(self, bigip, subnet):
         u"""Ensure a selfip address is allocated on Neutron network."""
         # Get ip address for selfip to use on BIG-IP.
         selfip_address = ""
-        selfip_name = "local-" + bigip.device_name + "-" + subnet['id']
+        selfip_name = self.get_selfip_port_name(bigip, subnet)
         ports = self.driver.plugin_rpc.get_port_by_name(port_name=selfip_name)
         if len(ports) > 0:
             port = ports[0]
@@ -295,9 +304,7 @@ class BigipSelfIpManager(object):
         gw_name = "gw-" + subnet['id']
         vs = bigip.tm.ltm.virtuals.virtual
         try:
-            if vs.exists(name=gw_name, partition=network_folder):
-                obj = vs.load(name=gw_name, partition=network_folder)
-                obj.delete()
+            try_delete(vs, name=gw_name, partition=network_folder)
         except Exception as err:
             LOG.exception(err)
             raise f5_ex.VirtualServerDeleteException(
@@ -311,10 +318,9 @@ class BigipSelfIpManager(object):
     def get_selfip_addr(self, bigip, name, partition=const.DEFAULT_PARTITION):
         selfip_addr = ""
         try:
-            s = bigip.tm.net.selfips.selfip
-            if s.exists(name=name, partition=partition):
-                obj = s.load(name=name, partition=partition)
-
+            obj = try_load(bigip.tm.net.selfips.selfip, name=name,
+                           partition=partition)
+            if obj:
                 # The selfip address on BigIP is actually a network,
                 # parse out the address portion.
                 if obj.address:
@@ -362,10 +368,8 @@ class BigipSelfIpManager(object):
     def delete_selfip(self, bigip, name, partition=const.DEFAULT_PARTITION):
         """Delete the selfip if it exists."""
         try:
-            s = bigip.tm.net.selfips.selfip
-            if s.exists(name=name, partition=partition):
-                obj = s.load(name=name, partition=partition)
-                obj.delete()
+            try_delete(bigip.tm.net.selfips.selfip, name=name,
+                       partition=partition)
         except HTTPError as err:
             LOG.exception("Error deleting selfip %s. "
                           "Response status code: %s. Response "
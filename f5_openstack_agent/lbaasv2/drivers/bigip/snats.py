@@ -73,29 +73,36 @@ class BigipSnatManager(object):
     def get_snats(self, bigip, partition=None):
         return self.snatpool_manager.get_resources(bigip, partition)
 
+    def get_snat_port_names(self, subnetinfo, tenant_id, snat_count):
+        # Get the names of the neutron ports of the snat addresses
+        snat_name = self._get_snat_name(subnetinfo['subnet'], tenant_id)
+        return [snat_name + "_" + str(i) for i in range(snat_count)]
+
     def get_snat_addrs(self, subnetinfo, tenant_id, snat_count):
         # Get the ip addresses for snat """
         subnet = subnetinfo['subnet']
         snat_addrs = []
 
-        snat_name = self._get_snat_name(subnet, tenant_id)
-        for i in range(snat_count):
+        rpc = self.driver.plugin_rpc
+        port_names = self.get_snat_port_names(subnetinfo, tenant_id,
+                                              snat_count)
+        ports = rpc.get_ports_by_names(port_names)
+        missing = [name for name in port_names if not ports.get(name)]
+        if missing:
+            new_ports = rpc.create_ports_on_subnet(
+                subnet_id=subnet['id'],
+                names=missing,
+                fixed_address_count=1)
+            for name, new_port in zip(missing, new_ports):
+                if new_port is not None:
+                    ports[name] = [new_port]
+
+        for index_snat_name in port_names:
             ip_address = ""
-            index_snat_name = snat_name + "_" + str(i)
-            ports = self.driver.plugin_rpc.get_port_by_name(
-                port_name=index_snat_name)
-            if len(ports) > 0:
-                first_port = ports[0]
+            if ports.get(index_snat_name):
+                first_port = ports[index_snat_name][0]
                 first_fixed_ip = first_port['fixed_ips'][0]
                 ip_address = first_fixed_ip['ip_address']
-            else:
-                new_port = self.driver.plugin_rpc.create_port_on_subnet(
-                    subnet_id=subnet['id'],
-                    mac_address=None,
-                    name=index_snat_name,
-                    fixed_address_count=1)
-                if new_port is not None:
-                    ip_address = new_port['fixed_ips'][0]['ip_address']
 
             # Push the IP address on the list if the port was acquired.
             if len(ip_address) > 0:
@@ -141,10 +148,8 @@ class BigipSnatManager(object):
             pool_name = "lb_"+lb_id
 
         try:
-            if self.snatpool_manager.exists(bigip,name=pool_name, partition=snat_info['pool_folder']):
-                snatpool = self.snatpool_manager.load(bigip, pool_name, snat_info['pool_folder'])
-                if snatpool is not None:
-                    snatpool.delete()
+            self.snatpool_manager.delete(
+                bigip, name=pool_name, partition=snat_info['pool_folder'])
 
         except Exception as exc:
                 pass
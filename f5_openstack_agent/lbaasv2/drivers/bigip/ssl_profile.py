@@ -14,9 +14,12 @@
 # limitations under the License.
 #
 
+import hashlib
 import os
 from oslo_log import log as logging
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import try_load
+
 LOG = logging.getLogger(__name__)
 
 
@@ -26,29 +29,64 @@ class SSLProfileError(Exception):
 
 class SSLProfileHelper(object):
 
+    # prefix of the certificate fingerprint kept in the profile description
+    FINGERPRINT_PREFIX = 'sha256:'
+
+    @staticmethod
+    def get_fingerprint(cert, key, intermediate=None, key_passphrase=None):
+        """Return a digest of the certificate material of a profile."""
+        digest = hashlib.sha256()
+        for item in (cert, key, intermediate, key_passphrase):
+            item = item or ''
+            if not isinstance(item, bytes):
+                item = item.encode('utf-8')
+            digest.update(hashlib.sha256(item).digest())
+        return SSLProfileHelper.FINGERPRINT_PREFIX + digest.hexdigest()
+
     @staticmethod
     def create_client_ssl_profile(
             bigip, name, cert, key, intermediate=None, sni_default=False, parent_profile=None, caClientTrust=False,
             key_passphrase=None):
+        """Create or update a client ssl profile for a cert/key pair.
+
+        The fingerprint of the certificate material is kept in the
+        description of the profile. Profiles with the same fingerprint
+        are not touched, and the cert/key files shared by both profile
+        variants are only uploaded and installed if neither variant
+        carries the fingerprint yet.
+        """
         uploader = bigip.shared.file_transfer.uploads
         cert_registrar = bigip.tm.sys.crypto.certs
         intermediate_registrar = bigip.tm.sys.crypto.certs
         key_registrar = bigip.tm.sys.crypto.keys
         ssl_client_profile = bigip.tm.ltm.profile.client_ssls.client_ssl
 
+        fingerprint = SSLProfileHelper.get_fingerprint(
+            cert, key, intermediate, key_passphrase)
+
         profilename = name
+        siblingname = name + '_NotDefault'
         if not sni_default:
             profilename = name + '_NotDefault'
-
-        # No need to create if it exists
-        if ssl_client_profile.exists(name=profilename, partition='Common'):
-            return
-
-        # Check that parent profile exists; use default if not.
-        if parent_profile and not ssl_client_profile.exists(
+            siblingname = name
+
+        # No need to deploy unchanged certificates
+        profile = try_load(ssl_client_profile, name=profilename,
+                           partition='Common')
+        if profile:
+            if getattr(profile, 'description', None) == fingerprint:
+                return
+            LOG.info("Certificate of SSL profile %s changed, redeploying",
+                     profilename)
+        elif parent_profile and not ssl_client_profile.exists(
                 name=parent_profile, partition='Common'):
+            # Check that parent profile exists; use default if not.
             parent_profile = None
 
+        if caClientTrust and not intermediate:
+            LOG.error("ERROR: Cannot create a SSL profile WITH caClientTrust and WITHOUT intermediate")
+            raise SSLProfileError("ERROR: Cannot create a SSL profile WITH caClientTrust and WITHOUT intermediate")
+
         certfilename = name + '.crt'
         keyfilename = name + '.key'
         # we need both names because uploader fiddles around with names
@@ -56,79 +94,79 @@ class SSLProfileHelper(object):
         intermediatecrtfilename = intermediatefilename + '.crt'
 
         try:
-            # In-memory upload -- data not written to local file system but
-            # is saved as a file on the BIG-IP.
-            uploader.upload_bytes(cert, certfilename)
-            uploader.upload_bytes(key, keyfilename)
-            if intermediate:
-                uploader.upload_bytes(intermediate, intermediatefilename)
-
-            # import certificate
-            param_set = {}
-            param_set['name'] = certfilename
-            param_set['from-local-file'] = os.path.join(
-                '/var/config/rest/downloads/', certfilename)
-            cert_registrar.exec_cmd('install', **param_set)
-
-            # import key
-            param_set['name'] = keyfilename
-            param_set['from-local-file'] = os.path.join(
-                '/var/config/rest/downloads/', keyfilename)
-            key_registrar.exec_cmd('install', **param_set)
-
-            if intermediate:
-                # import intermediates
+            if SSLProfileHelper._has_fingerprint(
+                    ssl_client_profile, siblingname, fingerprint):
+                LOG.debug("Reusing installed cert/key of SSL profile %s",
+                          siblingname)
+            else:
+                # In-memory upload -- data not written to local file system but
+                # is saved as a file on the BIG-IP.
+                uploader.upload_bytes(cert, certfilename)
+                uploader.upload_bytes(key, keyfilename)
+                if intermediate:
+                    uploader.upload_bytes(intermediate, intermediatefilename)
+
+                # import certificate
                 param_set = {}
-                param_set['name'] = intermediatefilename
+                param_set['name'] = certfilename
                 param_set['from-local-file'] = os.path.join(
-                    '/var/config/rest/downloads/', intermediatefilename)
-                intermediate_registrar.exec_cmd('install', **param_set)
+                    '/var/config/rest/downloads/', certfilename)
+                cert_registrar.exec_cmd('install', **param_set)
+
+                # import key
+                param_set['name'] = keyfilename
+                param_set['from-local-file'] = os.path.join(
+                    '/var/config/rest/downloads/', keyfilename)
+                key_registrar.exec_cmd('install', **param_set)
+
+                if intermediate:
+                    # import intermediates
+                    param_set = {}
+                    param_set['name'] = intermediatefilename
+                    param_set['from-local-file'] = os.path.join(
+                        '/var/config/rest/downloads/', intermediatefilename)
+                    intermediate_registrar.exec_cmd('install', **param_set)
 
             # create ssl-client profile from cert/key pair
-            if intermediate:
-                chain = [{'name': name,
-                      'cert': '/Common/' + certfilename,
-                      'key': '/Common/' + keyfilename,
-                      'chain': '/Common/' + intermediatecrtfilename}]
-            # create ssl-client profile from cert/key pair
-            else:
-                chain = [{'name': name,
+            chain = [{'name': name,
                       'cert': '/Common/' + certfilename,
                       'key': '/Common/' + keyfilename}]
+            if intermediate:
+                chain[0]['chain'] = '/Common/' + intermediatecrtfilename
 
             if key_passphrase:
                 chain[0]['passphrase'] = key_passphrase
 
-            if caClientTrust and intermediate:
-                ssl_client_profile.create(name=profilename,
-                                      partition='Common',
-                                      certKeyChain=chain,
-                                      sniDefault=sni_default,
-                                      defaultsFrom=parent_profile,
-                                      clientCertCa=intermediatecrtfilename,
-                                      caFile=intermediatecrtfilename)
-                LOG.info("Creating SSL profile WITH caClientTrust and WITH intermediate %s", chain)
-            elif (not caClientTrust) and intermediate:
-                ssl_client_profile.create(name=profilename,
-                                      partition='Common',
-                                      certKeyChain=chain,
-                                      sniDefault=sni_default,
-                                      defaultsFrom=parent_profile)
-                LOG.info("Creating SSL profile WITHOUT caClientTrust and WITH intermediate %s", chain)
-            elif (not caClientTrust) and (not intermediate):
+            settings = {'certKeyChain': chain,
+                        'description': fingerprint}
+            if caClientTrust:
+                settings['clientCertCa'] = intermediatecrtfilename
+                settings['caFile'] = intermediatecrtfilename
+
+            if profile:
+                profile.modify(**settings)
+                LOG.info("Updated SSL profile %s (caClientTrust: %s, intermediate: %s)",
+                         profilename, caClientTrust, bool(intermediate))
+            else:
                 ssl_client_profile.create(name=profilename,
                                           partition='Common',
-                                          certKeyChain=chain,
                                           sniDefault=sni_default,
-                                          defaultsFrom=parent_profile)
-                LOG.info("Creating SSL profile WITHOUT caClientTrust and WITHOUT intermediate %s", chain)
-            else:
-                LOG.error("ERROR: Cannot create a SSL profile WITH caClientTrust and WITHOUT intermediate")
-                raise SSLProfileError("ERROR: Cannot create a SSL profile WITH caClientTrust and WITHOUT intermediate")
+                                          defaultsFrom=parent_profile,
+                                          **settings)
+                LOG.info("Created SSL profile %s (caClientTrust: %s, intermediate: %s)",
+                         profilename, caClientTrust, bool(intermediate))
         except Exception as err:
             LOG.error("Error creating SSL profile: %s" % err.message)
             raise SSLProfileError(err.message)
 
+    @staticmethod
+    def _has_fingerprint(ssl_client_profile, profilename, fingerprint):
+        profile = try_load(ssl_client_profile, name=profilename,
+                           partition='Common')
+        if profile is None:
+            return False
+        return getattr(profile, 'description', None) == fingerprint
+
     @staticmethod
     def get_client_ssl_profile_count(bigip):
         return len(
@@ -13,6 +13,7 @@
 # limitations under the License.
 #
 
+import collections
 import re
 
 
@@ -20,8 +21,82 @@ from oslo_log import log as logging
 
 LOG = logging.getLogger(__name__)
 
+# current values of the statistics the capacity score is based on
+CapacityStatistics = collections.namedtuple(
+    'CapacityStatistics',
+    ['active_connections', 'throughput_in', 'throughput_out', 'ssl_tps',
+     'since'])
+
+# (field, section, division, row) of each CapacityStatistics value
+CAPACITY_ROWS = (
+    ('active_connections', 'Sys::Performance Connections',
+     'Active Connections', 'Connections'),
+    ('throughput_in', 'Sys::Performance Throughput',
+     'Throughput(bits)', 'In'),
+    ('throughput_out', 'Sys::Performance Throughput',
+     'Throughput(bits)', 'Out'),
+    ('ssl_tps', 'Sys::Performance Throughput',
+     'SSL Transactions', 'SSL TPS'),
+)
+
+
+def _compile_capacity_grammar():
+    grammar = []
+    for field, section, division, row in CAPACITY_ROWS:
+        grammar.append((
+            field,
+            re.compile(r'^%s' % re.escape(section), re.M),
+            re.compile(r'^%s' % re.escape(division), re.M),
+            re.compile(r'^%s\s{2,}(\S+)' % re.escape(row), re.M)))
+    return grammar
+
+
+CAPACITY_GRAMMAR = _compile_capacity_grammar()
+SECTION_RE = re.compile(r'^Sys::Performance ', re.M)
+SINCE_RE = re.compile(r'since ([^)]*)\)')
+
+
+def parse_capacity_statistics(stats_display):
+    """Extract the CapacityStatistics from the all-stats display text.
+
+    Only the rows the capacity score needs are looked up. Each section,
+    division and row is found with a precompiled pattern searching the
+    text in place, so the display is neither split into lines nor
+    converted into a nested dict.
+    """
+    text = str(stats_display)
+    values = {}
+    for field, section_re, division_re, row_re in CAPACITY_GRAMMAR:
+        values[field] = 0
+        section = section_re.search(text)
+        if not section:
+            continue
+        next_section = SECTION_RE.search(text, section.end())
+        end = next_section.start() if next_section else len(text)
+        division = division_re.search(text, section.end(), end)
+        if not division:
+            continue
+        row = row_re.search(text, division.end(), end)
+        if row:
+            try:
+                values[field] = int(row.group(1))
+            except ValueError:
+                pass
+
+    since = SINCE_RE.search(text)
+    values['since'] = since.group(1) if since else None
+    return CapacityStatistics(**values)
+
 
 class StatHelper(object):
+    def get_capacity_statistics(self, bigip):
+        """Return the CapacityStatistics of a bigip or None."""
+        allstats = bigip.tm.sys.performances.all_stats.load().__dict__
+        if 'apiRawValues' in allstats:
+            return parse_capacity_statistics(
+                allstats['apiRawValues']['apiAnonymous'])
+        return None
+
     def get_global_statistics(self, bigip):
         allstats = bigip.tm.sys.performances.all_stats.load().__dict__
         if 'apiRawValues' in allstats:
@@ -186,7 +261,9 @@ class StatHelper(object):
 
     def get_active_connection_count(self, bigip, global_stats=None):
         if not global_stats:
-            global_stats = self.get_global_statistics(bigip)
+            global_stats = self.get_capacity_statistics(bigip)
+        if isinstance(global_stats, CapacityStatistics):
+            return global_stats.active_connections
         return int(
             global_stats['Sys::Performance Connections'][
                 'Active Connections'][
@@ -195,7 +272,9 @@ class StatHelper(object):
 
     def get_active_SSL_TPS(self, bigip, global_stats=None):
         if not global_stats:
-            global_stats = self.get_global_statistics(bigip)
+            global_stats = self.get_capacity_statistics(bigip)
+        if isinstance(global_stats, CapacityStatistics):
+            return global_stats.ssl_tps
         return int(
             global_stats['Sys::Performance Throughput'][
                 'SSL Transactions'][
@@ -204,7 +283,9 @@ class StatHelper(object):
 
     def get_inbound_throughput(self, bigip, global_stats=None):
         if not global_stats:
-            global_stats = self.get_global_statistics(bigip)
+            global_stats = self.get_capacity_statistics(bigip)
+        if isinstance(global_stats, CapacityStatistics):
+            return global_stats.throughput_in
         return int(
             global_stats['Sys::Performance Throughput']
             ['Throughput(bits)']
@@ -213,7 +294,9 @@ class StatHelper(object):
 
     def get_outbound_throughput(self, bigip, global_stats=None):
         if not global_stats:
-            global_stats = self.get_global_statistics(bigip)
+            global_stats = self.get_capacity_statistics(bigip)
+        if isinstance(global_stats, CapacityStatistics):
+            return global_stats.throughput_out
         return int(
             global_stats['Sys::Performance Throughput']
             ['Throughput(bits)']
@@ -222,7 +305,9 @@ class StatHelper(object):
 
     def get_throughput(self, bigip, global_stats=None):
         if not global_stats:
-            global_stats = self.get_global_statistics(bigip)
+            global_stats = self.get_capacity_statistics(bigip)
+        if isinstance(global_stats, CapacityStatistics):
+            return global_stats.throughput_in + global_stats.throughput_out
         inbound = int(
             global_stats['Sys::Performance Throughput']
             ['Throughput(bits)']
@@ -21,6 +21,8 @@ from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
     import BigIPResourceHelper
 from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
     import ResourceType
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper \
+    import try_load
 
 LOG = logging.getLogger(__name__)
 
@@ -35,9 +37,8 @@ class SystemHelper(object):
         f.create(**folder)
 
     def delete_folder(self, bigip, folder_name):
-        f = bigip.tm.sys.folders.folder
-        if f.exists(name=folder_name):
-            obj = f.load(name=folder_name)
+        obj = try_load(bigip.tm.sys.folders.folder, name=folder_name)
+        if obj:
             obj.delete()
 
     def folder_exists(self, bigip, folder):
@@ -133,7 +134,7 @@ class SystemHelper(object):
     def purge_orphaned_folders_contents(self, bigip, folders):
         LOG.error("method not implemented")
 
-    def purge_folder_contents(self, bigip, folder):
+    def purge_folder_contents(self, bigip, folder, fdb_engine=None):
         network_helper = NetworkHelper()
 
         if folder not in self.exempt_folders:
@@ -178,6 +179,8 @@ class SystemHelper(object):
                     bigip, tunnel.name, folder)
                 network_helper.delete_tunnel(
                     bigip, tunnel.name, folder)
+                if fdb_engine:
+                    fdb_engine.forget(bigip, tunnel.name)
 
     def purge_folder(self, bigip, folder):
         if folder not in self.exempt_folders:
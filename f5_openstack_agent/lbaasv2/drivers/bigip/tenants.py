@@ -147,6 +147,8 @@ class BigipTenantManager(object):
             self.network_helper.delete_route_domain(bigip,
                                                     "Common",
                                                     network_id)
+            if self.driver.network_builder:
+                self.driver.network_builder.forget_route_domain(network_id)
         except Exception as err:
             LOG.info("Failed to delete route domain %s. "
                       "Manual intervention might be required." % (network_id))
@@ -0,0 +1,74 @@
+# coding=utf-8
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Compare the full and the capacity all-stats parsers.
+
+Run with:
+
+    python -m f5_openstack_agent.lbaasv2.drivers.bigip.test.\
+benchmark_stat_helper [iterations]
+
+Both parsers read the all-stats fixture of test_stat_helper. The memory
+column is the deep size of the parsed result kept by the caller.
+"""
+import sys
+import timeit
+
+import mock
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.stat_helper import \
+    parse_capacity_statistics
+from f5_openstack_agent.lbaasv2.drivers.bigip.stat_helper import StatHelper
+from f5_openstack_agent.lbaasv2.drivers.bigip.test.test_stat_helper import \
+    ALL_STATS_1
+from f5_openstack_agent.lbaasv2.drivers.bigip.test.test_stat_helper import \
+    API_ANONYMOUS
+
+
+def deep_size(obj):
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key) + deep_size(value)
+                    for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(item) for item in obj)
+    return size
+
+
+def main(iterations=2000):
+    bigip = mock.MagicMock()
+    bigip.tm.sys.performances.all_stats.load().__dict__ = ALL_STATS_1
+    stat_helper = StatHelper()
+    # the load of the mock is timed separately and subtracted
+    load = bigip.tm.sys.performances.all_stats.load
+
+    results = [
+        ('get_global_statistics',
+         lambda: stat_helper.get_global_statistics(bigip)),
+        ('parse_capacity_statistics',
+         lambda: parse_capacity_statistics(API_ANONYMOUS)),
+    ]
+    load_time = min(timeit.repeat(load, number=iterations, repeat=3))
+    print('%-28s %12s %12s' % ('parser', 'usec/parse', 'result bytes'))
+    for name, func in results:
+        seconds = min(timeit.repeat(func, number=iterations, repeat=3))
+        if name == 'get_global_statistics':
+            seconds = max(0.0, seconds - load_time)
+        print('%-28s %12.1f %12d' % (name, seconds * 1e6 / iterations,
+                                     deep_size(func())))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -13,8 +13,43 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import mock
 import pytest
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    BigIPResourceHelper
+
+
+@pytest.fixture
+def bigip():
+    bigip = mock.MagicMock()
+    bigip.hostname = 'bigip1.example.com'
+    bigip.device_name = 'bigip1'
+    return bigip
+
+
+@pytest.fixture
+def collections():
+    """Items of the collections served by fetched, per resource type."""
+    return {}
+
+
+@pytest.fixture
+def fetched(collections):
+    """Serve get_selected_resources from collections.
+
+    Every fetch is recorded as (resource type, select, partition).
+    """
+    fetched = []
+
+    def get_selected_resources(helper, bigip, select, partition=None):
+        fetched.append((helper.resource_type, tuple(select), partition))
+        return collections.get(helper.resource_type, [])
+
+    with mock.patch.object(BigIPResourceHelper, 'get_selected_resources',
+                           get_selected_resources):
+        yield fetched
+
 
 @pytest.fixture
 def pool_member_service():
@@ -0,0 +1,79 @@
+# coding=utf-8
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.capacity_sampler import \
+    CapacitySampler
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    ResourceType
+
+import mock
+import pytest
+
+COLLECTIONS = {
+    ResourceType.folder: [{'name': '/'}, {'name': 'Common'},
+                          {'name': 'Project_t1'}, {'name': 'Project_t2'}],
+    ResourceType.tunnel: [
+        {'name': 'http-tunnel', 'profile': '/Common/tcp-forward'},
+        {'name': 'tunnel-vxlan-1', 'profile': '/Common/vxlan_ovs'},
+        {'name': 'tunnel-gre-2', 'profile': '/Common/gre_ovs'}],
+    ResourceType.route_domain: [{'name': '0', 'id': 0},
+                                {'name': 'rd-1', 'id': 1}],
+    ResourceType.node: [{'name': '10.0.0.1%1'}, {'name': '10.0.0.2%1'}],
+}
+
+
+@pytest.fixture
+def collections():
+    return COLLECTIONS
+
+
+class TestCapacitySampler(object):
+    def test_counts(self, bigip, fetched):
+        sampler = CapacitySampler()
+        assert sampler.get_count(bigip, 'tenant') == 2
+        assert sampler.get_count(bigip, 'tunnel') == 2
+        assert sampler.get_count(bigip, 'route_domain') == 1
+        assert sampler.get_count(bigip, 'node') == 2
+        assert sampler.get_count(bigip, 'clientssl_profile') == 0
+        assert (ResourceType.node, ('name',), None) in fetched
+        assert (ResourceType.client_ssl_profile, ('name',),
+                'Common') in fetched
+
+    def test_max_age(self, bigip, fetched):
+        stat_helper = mock.MagicMock()
+        sampler = CapacitySampler(max_age=60, stat_helper=stat_helper)
+        sampler.get_global_statistics(bigip)
+        sampler.get_global_statistics(bigip)
+        sampler.get_count(bigip, 'node')
+        sampler.get_count(bigip, 'node')
+        assert stat_helper.get_capacity_statistics.call_count == 1
+        assert len(fetched) == 1
+
+        with mock.patch('f5_openstack_agent.lbaasv2.drivers.bigip.'
+                        'capacity_sampler.time', return_value=2e9):
+            sampler.get_count(bigip, 'node')
+        assert len(fetched) == 2
+
+        sampler.clear()
+        sampler.get_global_statistics(bigip)
+        assert stat_helper.get_capacity_statistics.call_count == 2
+
+    def test_no_max_age(self, bigip, fetched):
+        sampler = CapacitySampler(stat_helper=mock.MagicMock())
+        sampler.get_count(bigip, 'vlan')
+        sampler.get_count(bigip, 'vlan')
+        assert len(fetched) == 2
+        assert sampler.requests == 2
@@ -0,0 +1,137 @@
+# coding=utf-8
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import eventlet
+import mock
+import pytest
+
+from f5_openstack_agent.lbaasv2.drivers.bigip import container_cache
+from f5_openstack_agent.lbaasv2.drivers.bigip.container_cache import \
+    ContainerCache
+
+
+class FakeBarbican(object):
+    """Returns a new container object for every fetch and counts them."""
+
+    def __init__(self, delay=0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.fetched = []
+
+    def get(self, container_ref):
+        self.fetched.append(container_ref)
+        if self.delay:
+            eventlet.sleep(self.delay)
+        if self.fail:
+            raise Exception('barbican unavailable')
+        return {'ref': container_ref, 'fetch': len(self.fetched)}
+
+
+@pytest.fixture
+def clock():
+    with mock.patch.object(container_cache, 'time') as time:
+        time.time.return_value = 1000.0
+        yield time.time
+
+
+class TestContainerCache(object):
+    def test_hit(self, clock):
+        barbican = FakeBarbican()
+        cache = ContainerCache(ttl=60, max_size=10)
+
+        first = cache.get('c1', barbican.get)
+        assert cache.get('c1', barbican.get) is first
+        assert barbican.fetched == ['c1']
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_ttl_expiry(self, clock):
+        barbican = FakeBarbican()
+        cache = ContainerCache(ttl=60, max_size=10)
+        first = cache.get('c1', barbican.get)
+
+        clock.return_value = 1059.0
+        assert cache.get('c1', barbican.get) is first
+        clock.return_value = 1060.0
+        assert cache.get('c1', barbican.get) is not first
+        assert barbican.fetched == ['c1', 'c1']
+
+    def test_disabled_cache_always_fetches(self, clock):
+        barbican = FakeBarbican()
+        for cache in [ContainerCache(ttl=0, max_size=10),
+                      ContainerCache(ttl=60, max_size=0)]:
+            cache.get('c1', barbican.get)
+            cache.get('c1', barbican.get)
+            assert not cache.containers
+        assert len(barbican.fetched) == 4
+
+    def test_lru_eviction(self, clock):
+        barbican = FakeBarbican()
+        cache = ContainerCache(ttl=60, max_size=2)
+        cache.get('c1', barbican.get)
+        cache.get('c2', barbican.get)
+        # c1 is now the most recently used
+        cache.get('c1', barbican.get)
+        cache.get('c3', barbican.get)
+
+        assert list(cache.containers) == ['c1', 'c3']
+        cache.get('c2', barbican.get)
+        assert barbican.fetched == ['c1', 'c2', 'c3', 'c2']
+
+    def test_single_flight(self, clock):
+        barbican = FakeBarbican(delay=0.01)
+        cache = ContainerCache(ttl=60, max_size=10)
+        threads = [eventlet.spawn(cache.get, ref, barbican.get)
+                   for ref in ['c1'] * 10 + ['c2'] * 5]
+        results = [thread.wait() for thread in threads]
+
+        assert sorted(barbican.fetched) == ['c1', 'c2']
+        assert all(result is results[0] for result in results[:10])
+        assert all(result is results[10] for result in results[10:])
+        assert not cache.loading
+
+    def test_failed_fetch_is_not_cached(self, clock):
+        barbican = FakeBarbican(delay=0.01, fail=True)
+        cache = ContainerCache(ttl=60, max_size=10)
+        threads = [eventlet.spawn(cache.get, 'c1', barbican.get)
+                   for _ in range(3)]
+        for thread in threads:
+            with pytest.raises(Exception):
+                thread.wait()
+
+        # waiters fetch again themselves, one at a time
+        assert barbican.fetched == ['c1'] * 3
+        assert not cache.containers
+        assert not cache.loading
+
+        barbican.fail = False
+        assert cache.get('c1', barbican.get)['ref'] == 'c1'
+
+    def test_invalidate(self, clock):
+        barbican = FakeBarbican()
+        cache = ContainerCache(ttl=60, max_size=10)
+        for ref in ['c1', 'c2', 'c3']:
+            cache.get(ref, barbican.get)
+
+        cache.invalidate('c1')
+        cache.invalidate('unknown')
+        assert list(cache.containers) == ['c2', 'c3']
+        cache.get('c1', barbican.get)
+        assert barbican.fetched[-1] == 'c1'
+
+        cache.invalidate()
+        assert not cache.containers
+        cache.get('c2', barbican.get)
+        assert len(barbican.fetched) == 5
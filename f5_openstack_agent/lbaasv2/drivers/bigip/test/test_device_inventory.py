@@ -0,0 +1,106 @@
+# coding=utf-8
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.device_inventory import \
+    DeviceInventory
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    ResourceType
+
+import pytest
+
+
+@pytest.fixture
+def bigip(bigip):
+    bigip.tm.sys.folders.get_collection.return_value = [
+        {'name': '/'}, {'name': 'Common'}, {'name': 'Project_t1'},
+        {'name': 'Project_t2'}]
+    bigip.tm.ltm.pools.get_collection.return_value = [
+        {'name': 'Project_p1', 'partition': 'Project_t1',
+         'monitor': '/Project_t1/Project_m1 '},
+        {'name': 'Project_p2', 'partition': 'Project_t1'},
+        {'name': 'Project_p3', 'partition': 'Project_t2'}]
+    return bigip
+
+
+class TestDeviceInventory(object):
+    def test_collection_fetched_once(self, bigip):
+        inventory = DeviceInventory()
+        for partition in ['Project_t1', 'Project_t2', 'Project_t3']:
+            inventory.get_resources(bigip, ResourceType.pool, partition)
+        inventory.get_folders(bigip)
+        inventory.get_folders(bigip)
+
+        bigip.tm.ltm.pools.get_collection.assert_called_once_with(
+            requests_params={'params': '$select=name,partition,monitor'})
+        assert bigip.tm.sys.folders.get_collection.call_count == 1
+        assert inventory.requests == 2
+
+    def test_expand_subcollections(self, bigip):
+        bigip.tm.ltm.virtuals.get_collection.return_value = []
+        DeviceInventory().get_resources(
+            bigip, ResourceType.virtual, 'Project_t1')
+        bigip.tm.ltm.virtuals.get_collection.assert_called_once_with(
+            requests_params={
+                'params': '$select=name,partition,destination,pool,'
+                          'policiesReference&expandSubcollections=true'})
+
+    def test_index_by_partition(self, bigip):
+        inventory = DeviceInventory()
+        pools = inventory.get_resources(bigip, ResourceType.pool,
+                                        'Project_t1')
+        assert sorted(p['name'] for p in pools) == ['Project_p1',
+                                                    'Project_p2']
+        assert inventory.get_resource(
+            bigip, ResourceType.pool, 'Project_t2', 'Project_p3')
+        assert inventory.get_resource(
+            bigip, ResourceType.pool, 'Project_t2', 'Project_p1') is None
+        assert not inventory.get_resources(bigip, ResourceType.pool,
+                                           'Project_t3')
+
+    def test_discard(self, bigip):
+        inventory = DeviceInventory()
+        inventory.discard(bigip, ResourceType.pool, 'Project_t1',
+                          'Project_p1')
+        inventory.get_resources(bigip, ResourceType.pool, 'Project_t1')
+        inventory.discard(bigip, ResourceType.pool, 'Project_t1',
+                          'Project_p1')
+
+        assert inventory.get_resource(
+            bigip, ResourceType.pool, 'Project_t1', 'Project_p1') is None
+        assert inventory.get_resource(
+            bigip, ResourceType.pool, 'Project_t1', 'Project_p2')
+
+    def test_discard_folder(self, bigip):
+        inventory = DeviceInventory()
+        inventory.get_folders(bigip)
+        inventory.get_resources(bigip, ResourceType.pool, 'Project_t1')
+        inventory.discard_folder(bigip, 'Project_t1')
+
+        assert 'Project_t1' not in inventory.get_folders(bigip)
+        assert not inventory.get_resources(bigip, ResourceType.pool,
+                                           'Project_t1')
+        assert bigip.tm.ltm.pools.get_collection.call_count == 1
+
+    def test_fingerprints(self, bigip):
+        fingerprints = DeviceInventory().get_fingerprints(
+            bigip, [ResourceType.pool])
+        assert sorted(fingerprints) == ['Project_t1', 'Project_t2']
+
+        bigip.tm.ltm.pools.get_collection.return_value[2]['monitor'] = 'm'
+        changed = DeviceInventory().get_fingerprints(
+            bigip, [ResourceType.pool])
+        assert changed['Project_t1'] == fingerprints['Project_t1']
+        assert changed['Project_t2'] != fingerprints['Project_t2']
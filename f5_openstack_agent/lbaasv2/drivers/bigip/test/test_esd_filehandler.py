@@ -14,11 +14,23 @@
 # limitations under the License.
 #
 
+import json
+import os
+import shutil
+import tempfile
 import unittest
 
 from f5_openstack_agent.lbaasv2.drivers.bigip.esd_filehandler import \
     EsdJSONValidation
+from f5_openstack_agent.lbaasv2.drivers.bigip.esd_filehandler import \
+    EsdTagProcessor
 from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5_ex
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    BigIPResourceHelper
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    ResourceType
+
+import mock
 
 
 class TestEsdFileHanlder(unittest.TestCase):
@@ -73,3 +85,119 @@ class TestEsdFileHanlder(unittest.TestCase):
         # verify empty dict is returned
         dict = handler.read_json()
         assert not dict
+
+
+class TestEsdTagProcessor(unittest.TestCase):
+
+    RESOURCES = {
+        ResourceType.tcp_profile: ['tcp-lan', 'tcp-wan'],
+        ResourceType.rule: ['redirect'],
+    }
+
+    def setUp(self):
+        self.esddir = tempfile.mkdtemp()
+        self.bigip = mock.MagicMock()
+        self.bigip.hostname = 'bigip1'
+        self.fetched = []
+
+        def get_selected_resources(helper, bigip, select, partition=None):
+            self.fetched.append(helper.resource_type)
+            return [{'name': name}
+                    for name in self.RESOURCES.get(helper.resource_type, [])]
+        patcher = mock.patch.object(BigIPResourceHelper,
+                                    'get_selected_resources',
+                                    get_selected_resources)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.esddir)
+
+    def _write(self, name, esds, mtime=1000):
+        path = os.path.join(self.esddir, name)
+        with open(path, 'w') as json_file:
+            json.dump(esds, json_file)
+        os.utime(path, (mtime, mtime))
+
+    def test_collections_fetched_once(self):
+        self._write('a.json', {
+            'esd_1': {'lbaas_ctcp': 'tcp-lan', 'lbaas_irule': ['redirect']},
+            'esd_2': {'lbaas_stcp': 'tcp-wan', 'lbaas_irule': ['missing']},
+            'esd_3': {'lbaas_ctcp': 'missing'}})
+        processor = EsdTagProcessor(self.esddir)
+        processor.process_esd([self.bigip])
+
+        self.assertEqual(len(self.fetched), 2)
+        self.assertEqual(set(self.fetched),
+                         set([ResourceType.tcp_profile, ResourceType.rule]))
+        self.assertEqual(processor.get_esd('esd_1'),
+                         {'lbaas_ctcp': 'tcp-lan',
+                          'lbaas_irule': ['redirect']})
+        self.assertEqual(processor.get_esd('esd_2'), {'lbaas_stcp': 'tcp-wan'})
+        self.assertIsNone(processor.get_esd('esd_3'))
+
+    def test_reload_changed_files(self):
+        self._write('a.json', {'esd_1': {'lbaas_ctcp': 'tcp-lan'}})
+        self._write('b.json', {'esd_2': {'lbaas_ctcp': 'tcp-wan'}})
+        processor = EsdTagProcessor(self.esddir)
+        processor.process_esd([self.bigip])
+        self.assertFalse(processor.reload_esd([self.bigip]))
+
+        # touched but unchanged
+        self._write('a.json', {'esd_1': {'lbaas_ctcp': 'tcp-lan'}}, 2000)
+        self.assertFalse(processor.reload_esd([self.bigip]))
+
+        self._write('b.json', {'esd_3': {'lbaas_ctcp': 'tcp-lan'}}, 2000)
+        del self.fetched[:]
+        self.assertTrue(processor.reload_esd([self.bigip]))
+        self.assertEqual(sorted(processor.esd_dict), ['esd_1', 'esd_3'])
+        # all files are validated against one fresh collection fetch
+        self.assertEqual(self.fetched, [ResourceType.tcp_profile])
+
+        os.remove(os.path.join(self.esddir, 'a.json'))
+        self.assertTrue(processor.reload_esd([self.bigip]))
+        self.assertEqual(sorted(processor.esd_dict), ['esd_3'])
+
+    def test_reload_fixed_file(self):
+        self._write('a.json', {'esd_1': {'lbaas_ctcp': 'tcp-lan'}})
+        with open(os.path.join(self.esddir, 'b.json'), 'w') as json_file:
+            json_file.write('{broken')
+        processor = EsdTagProcessor(self.esddir)
+        with self.assertRaises(f5_ex.esdJSONFileInvalidException):
+            processor.process_esd([self.bigip])
+        # the valid file is used nevertheless
+        self.assertEqual(sorted(processor.esd_dict), ['esd_1'])
+
+        self._write('b.json', {'esd_2': {'lbaas_ctcp': 'tcp-wan'}}, 2000)
+        self.assertTrue(processor.reload_esd([self.bigip]))
+        self.assertEqual(sorted(processor.esd_dict), ['esd_1', 'esd_2'])
+
+    def test_reload_revalidates_unchanged_files(self):
+        self._write('a.json', {'esd_1': {'lbaas_ctcp': 'tcp-lan'}})
+        self._write('b.json', {'esd_2': {'lbaas_ctcp': 'tcp-wan'}})
+        processor = EsdTagProcessor(self.esddir)
+        processor.process_esd([self.bigip])
+
+        # the profile esd_1 refers to was deleted
+        self.RESOURCES = {ResourceType.tcp_profile: ['tcp-wan']}
+        self._write('b.json', {'esd_2': {'lbaas_ctcp': 'tcp-wan'},
+                               'esd_3': {'lbaas_ctcp': 'tcp-wan'}}, 2000)
+        self.assertTrue(processor.reload_esd([self.bigip]))
+        self.assertEqual(sorted(processor.esd_dict), ['esd_2', 'esd_3'])
+
+    def test_reload_keeps_esds_of_invalid_file(self):
+        self._write('a.json', {'esd_1': {'lbaas_ctcp': 'tcp-lan'}})
+        processor = EsdTagProcessor(self.esddir)
+        processor.process_esd([self.bigip])
+
+        with open(os.path.join(self.esddir, 'a.json'), 'w') as json_file:
+            json_file.write('{broken')
+        self.assertFalse(processor.reload_esd([self.bigip]))
+        self.assertEqual(sorted(processor.esd_dict), ['esd_1'])
+
+        # the invalid file is not read again until it changes
+        with mock.patch.object(processor, 'read_json_file') as read:
+            self.assertFalse(processor.reload_esd([self.bigip]))
+            self.assertFalse(read.called)
+
+        self._write('a.json', {'esd_2': {'lbaas_ctcp': 'tcp-lan'}}, 2000)
+        self.assertTrue(processor.reload_esd([self.bigip]))
+        self.assertEqual(sorted(processor.esd_dict), ['esd_2'])
@@ -0,0 +1,178 @@
+# coding=utf-8
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import eventlet
+import pytest
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.event_coalescer import \
+    EventCoalescer
+
+
+def service(lb_id, *member_ids):
+    return {'loadbalancer': {'id': lb_id},
+            'members': [{'id': member_id} for member_id in member_ids]}
+
+
+class FakeDriver(object):
+    """Counts service assurances like the driver would run them."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.applied = []
+        self.fetched = []
+        self.members = {}
+
+    def create_member(self, member, service):
+        return self.update_service(service)
+
+    def delete_member(self, member, service):
+        return self.update_service(service, delete_event=True)
+
+    def update_service(self, service, delete_event=False):
+        self.applied.append((service['loadbalancer']['id'],
+                             len(service['members']), delete_event))
+        if self.fail:
+            raise Exception('boom')
+        return service['loadbalancer']['id'] == 'pending'
+
+    def get_service_by_loadbalancer_id(self, lb_id):
+        self.fetched.append(lb_id)
+        return service(lb_id, *self.members.get(lb_id, []))
+
+
+@pytest.fixture
+def driver():
+    return FakeDriver()
+
+
+def coalescer(driver, window=0.01):
+    return EventCoalescer(window, driver.update_service,
+                          driver.get_service_by_loadbalancer_id)
+
+
+def create_members(engine, driver, lb_id, count, deletes=0):
+    """Send a burst of member events and return results and services.
+
+    The last deletes events are member deletes.
+    """
+    driver.members[lb_id] = []
+    threads = []
+    for i in range(count):
+        member = {'id': 'm%d' % i}
+        driver.members[lb_id].append(member['id'])
+        event_service = service(lb_id, *driver.members[lb_id])
+        delete_event = i >= count - deletes
+        if delete_event:
+            call = (lambda m=member, s=event_service:
+                    driver.delete_member(m, s))
+        else:
+            call = (lambda m=member, s=event_service:
+                    driver.create_member(m, s))
+        threads.append(eventlet.spawn(
+            engine.dispatch, event_service, call,
+            delete_event=delete_event))
+    return [thread.wait() for thread in threads]
+
+
+class TestEventCoalescer(object):
+    def test_burst_is_applied_once(self, driver):
+        engine = coalescer(driver)
+        results = create_members(engine, driver, 'lb1', 200)
+        services = [applied for _, applied in results]
+        results = [result for result, _ in results]
+
+        assert driver.applied == [('lb1', 200, False)]
+        assert driver.fetched == ['lb1']
+        assert results == [False] * 200
+        # every event gets the latest service that was applied
+        assert all(len(applied['members']) == 200 for applied in services)
+        assert engine.coalesced == 199
+        assert not engine.batches
+
+    def test_loadbalancers_are_applied_separately(self, driver):
+        engine = coalescer(driver)
+        threads = [eventlet.spawn(create_members, engine, driver, lb_id, 10)
+                   for lb_id in ['lb1', 'pending']]
+        results = [thread.wait() for thread in threads]
+
+        assert sorted(driver.applied) == [('lb1', 10, False),
+                                          ('pending', 10, False)]
+        assert [[result for result, _ in lb_results]
+                for lb_results in results] == [[False] * 10, [True] * 10]
+
+    def test_single_event_uses_its_own_call(self, driver):
+        engine = coalescer(driver)
+        [(result, applied)] = create_members(engine, driver, 'lb1', 1)
+
+        assert applied == service('lb1', 'm0')
+        assert driver.applied == [('lb1', 1, False)]
+        assert driver.fetched == []
+
+    def test_mixed_events_apply_updates_then_deletes(self, driver):
+        engine = coalescer(driver)
+        results = [result for result, _ in
+                   create_members(engine, driver, 'lb1', 5, deletes=1)]
+
+        assert driver.applied == [('lb1', 5, False), ('lb1', 5, True)]
+        assert driver.fetched == ['lb1']
+        assert results == [False] * 5
+
+    def test_delete_events_apply_deletes_only(self, driver):
+        engine = coalescer(driver)
+        create_members(engine, driver, 'lb1', 3, deletes=3)
+
+        assert driver.applied == [('lb1', 3, True)]
+
+    def test_later_events_start_a_new_batch(self, driver):
+        engine = coalescer(driver)
+        create_members(engine, driver, 'lb1', 3)
+        create_members(engine, driver, 'lb1', 3)
+
+        assert driver.applied == [('lb1', 3, False), ('lb1', 3, False)]
+        assert driver.fetched == ['lb1', 'lb1']
+
+    def test_failure_is_raised_for_every_event(self):
+        driver = FakeDriver(fail=True)
+        engine = coalescer(driver)
+        driver.members['lb1'] = ['m0', 'm1']
+        threads = [eventlet.spawn(engine.dispatch, service('lb1'),
+                                  lambda: driver.update_service(
+                                      service('lb1')))
+                   for _ in range(2)]
+
+        for thread in threads:
+            with pytest.raises(Exception):
+                thread.wait()
+        assert len(driver.applied) == 1
+
+    def test_deleted_loadbalancer_applies_events(self, driver):
+        driver.get_service_by_loadbalancer_id = lambda lb_id: {}
+        engine = coalescer(driver)
+        threads = [eventlet.spawn(engine.dispatch, service('lb1', 'm0'),
+                                  lambda: driver.update_service(
+                                      service('lb1', 'm0')))
+                   for _ in range(3)]
+        [thread.wait() for thread in threads]
+
+        assert driver.applied == [('lb1', 1, False)] * 3
+
+    def test_no_window(self, driver):
+        engine = coalescer(driver, window=0)
+        create_members(engine, driver, 'lb1', 3)
+
+        assert driver.applied == [('lb1', 1, False), ('lb1', 2, False),
+                                  ('lb1', 3, False)]
+        assert driver.fetched == []
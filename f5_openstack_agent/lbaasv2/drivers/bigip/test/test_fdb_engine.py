@@ -0,0 +1,145 @@
+# coding=utf-8
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip import fdb_engine
+from f5_openstack_agent.lbaasv2.drivers.bigip.fdb_engine import FdbEngine
+
+import mock
+import pytest
+
+TUNNEL = 'tunnel-vxlan-1008'
+
+
+def fdbs(*records):
+    return {TUNNEL: {'records': dict(
+        (mac, {'endpoint': endpoint, 'ip_address': None})
+        for mac, endpoint in records)}}
+
+
+@pytest.fixture
+def bigip(bigip):
+    collection_tunnel = mock.MagicMock(partition='Common')
+    collection_tunnel.name = TUNNEL
+    bigip.tm.net.fdb.tunnels.get_collection.return_value = [
+        collection_tunnel]
+    tunnel = bigip.tm.net.fdb.tunnels.tunnel.load.return_value
+    tunnel.records = [{'name': 'fa:16:3e:00:00:01', 'endpoint': '10.0.0.1'}]
+    return bigip
+
+
+@pytest.fixture
+def clock():
+    with mock.patch.object(fdb_engine, 'time') as time:
+        time.time.return_value = 1000.0
+        yield time.time
+
+
+def written(bigip):
+    tunnel = bigip.tm.net.fdb.tunnels.tunnel.load.return_value
+    return [c[1]['records'] for c in tunnel.modify.call_args_list]
+
+
+class TestFdbEngine(object):
+    def test_events_coalesced(self, bigip):
+        engine = FdbEngine(window=10)
+        engine.add(bigip, fdbs(('fa:16:3e:00:00:02', '10.0.0.2')))
+        engine.add(bigip, fdbs(('fa:16:3e:00:00:03', '10.0.0.3')))
+        engine.remove(bigip, fdbs(('fa:16:3e:00:00:01', '10.0.0.1')))
+        assert written(bigip) == []
+
+        engine.flush()
+        assert written(bigip) == [
+            [{'name': 'fa:16:3e:00:00:02', 'endpoint': '10.0.0.2'},
+             {'name': 'fa:16:3e:00:00:03', 'endpoint': '10.0.0.3'}]]
+        bigip.tm.net.fdb.tunnels.tunnel.load.assert_called_once_with(
+            name=TUNNEL, partition='Common')
+
+    def test_mirror(self, bigip):
+        engine = FdbEngine()
+        engine.add(bigip, fdbs(('fa:16:3e:00:00:01', '10.0.0.1')))
+        engine.add(bigip, fdbs(('fa:16:3e:00:00:02', '10.0.0.2')))
+        engine.remove(bigip, fdbs(('fa:16:3e:00:00:01', '10.0.0.1'),
+                                  ('fa:16:3e:00:00:02', '10.0.0.2')))
+
+        # the first add matches the device records and is not written
+        assert written(bigip) == [
+            [{'name': 'fa:16:3e:00:00:01', 'endpoint': '10.0.0.1'},
+             {'name': 'fa:16:3e:00:00:02', 'endpoint': '10.0.0.2'}],
+            None]
+        assert engine.writes == 2
+        assert bigip.tm.net.fdb.tunnels.tunnel.load.call_count == 1
+        assert bigip.tm.net.fdb.tunnels.get_collection.call_count == 1
+
+    def test_remove_moved_mac(self, bigip):
+        engine = FdbEngine(window=10)
+        engine.add(bigip, fdbs(('fa:16:3e:00:00:01', '10.0.0.9')))
+        engine.remove(bigip, fdbs(('fa:16:3e:00:00:01', '10.0.0.1')))
+        engine.flush()
+
+        assert written(bigip) == [
+            [{'name': 'fa:16:3e:00:00:01', 'endpoint': '10.0.0.9'}]]
+
+    def test_missing_tunnel(self, bigip):
+        engine = FdbEngine()
+        engine.add(bigip, {'tunnel-vxlan-1': fdbs(
+            ('fa:16:3e:00:00:02', '10.0.0.2'))[TUNNEL]})
+
+        assert not bigip.tm.net.fdb.tunnels.tunnel.load.called
+        assert engine.writes == 0
+
+    def test_failed_write_reloads(self, bigip):
+        engine = FdbEngine()
+        tunnel = bigip.tm.net.fdb.tunnels.tunnel.load.return_value
+        tunnel.modify.side_effect = [Exception('boom'), None]
+        engine.add(bigip, fdbs(('fa:16:3e:00:00:02', '10.0.0.2')))
+        engine.add(bigip, fdbs(('fa:16:3e:00:00:02', '10.0.0.2')))
+
+        assert tunnel.modify.call_count == 2
+        assert bigip.tm.net.fdb.tunnels.tunnel.load.call_count == 2
+
+    def test_invalidate(self, bigip):
+        engine = FdbEngine()
+        engine.add(bigip, fdbs(('fa:16:3e:00:00:02', '10.0.0.2')))
+        engine.invalidate(bigip, TUNNEL)
+        engine.add(bigip, fdbs(('fa:16:3e:00:00:03', '10.0.0.3')))
+        engine.forget(bigip, TUNNEL)
+        engine.add(bigip, fdbs(('fa:16:3e:00:00:04', '10.0.0.4')))
+
+        assert bigip.tm.net.fdb.tunnels.tunnel.load.call_count == 3
+        assert bigip.tm.net.fdb.tunnels.get_collection.call_count == 2
+
+    def test_mirror_ttl(self, bigip, clock):
+        engine = FdbEngine(ttl=60)
+        engine.add(bigip, fdbs(('fa:16:3e:00:00:02', '10.0.0.2')))
+        clock.return_value = 1059.0
+        engine.add(bigip, fdbs(('fa:16:3e:00:00:02', '10.0.0.2')))
+        assert bigip.tm.net.fdb.tunnels.tunnel.load.call_count == 1
+
+        # the device lost the record while it was mirrored
+        clock.return_value = 1060.0
+        engine.add(bigip, fdbs(('fa:16:3e:00:00:02', '10.0.0.2')))
+        assert bigip.tm.net.fdb.tunnels.tunnel.load.call_count == 2
+        assert engine.writes == 2
+
+    def test_clear(self, bigip):
+        engine = FdbEngine()
+        engine.add(bigip, fdbs(('fa:16:3e:00:00:02', '10.0.0.2')))
+        engine.clear()
+        assert not engine.mirror and not engine.folders
+
+        engine.add(bigip, fdbs(('fa:16:3e:00:00:02', '10.0.0.2')))
+        assert bigip.tm.net.fdb.tunnels.tunnel.load.call_count == 2
+        assert bigip.tm.net.fdb.tunnels.get_collection.call_count == 2
@@ -0,0 +1,252 @@
+# coding=utf-8
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import BaseHTTPServer
+import json
+import SocketServer
+import time
+
+import eventlet
+import pytest
+from icontrol.session import iControlRESTSession
+from requests import HTTPError
+from requests.packages.urllib3.util.retry import RequestHistory
+
+from f5_openstack_agent.lbaasv2.drivers.bigip import icontrol_session
+
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=None):
+        payload = json.dumps(body or {})
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self):
+        server = self.server
+        length = int(self.headers.getheader('Content-Length') or 0)
+        body = self.rfile.read(length) if length else ''
+        server.requests.append((self.command, self.path))
+        if server.delay:
+            eventlet.sleep(server.delay)
+
+        statuses = server.statuses.get((self.command, self.path))
+        if statuses:
+            return self._reply(statuses.pop(0))
+        if self.path == icontrol_session.LOGIN_PATH:
+            server.logins += 1
+            token = 'token%d' % server.logins
+            server.tokens.add(token)
+            now = int(time.time() * 1000000)
+            assert json.loads(body)['username'] == 'admin'
+            return self._reply(200, {'token': {
+                'token': token, 'lastUpdateMicros': now,
+                'expirationMicros': now + 1200 * 1000000}})
+        if self.headers.getheader(
+                icontrol_session.TOKEN_HEADER) not in server.tokens:
+            return self._reply(401)
+        self._reply(200, {'kind': 'tm:ltm:pool:poolstate'})
+
+    do_GET = do_PUT = do_POST = do_PATCH = do_DELETE = _handle
+
+
+class StandInServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """Local iControl REST stand-in counting connections and requests.
+
+    statuses maps (method, path) to the statuses answered before the
+    request succeeds.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', 0),
+                                           StandInHandler)
+        self.connections = 0
+        self.logins = 0
+        self.tokens = set()
+        self.requests = []
+        self.statuses = {}
+        self.delay = 0
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self.server_address[1]
+
+
+class FakeBigIP(object):
+    def __init__(self):
+        self._meta_data = {
+            'hostname': '127.0.0.1',
+            'username': 'admin',
+            'password': 'secret',
+            'icr_session': iControlRESTSession('admin', 'secret')}
+
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    thread = eventlet.spawn(server.serve_forever, 0.01)
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.wait()
+
+
+def session(pool_size=4, retries=3):
+    return icontrol_session.configure(FakeBigIP(), pool_size,
+                                      retries=retries, backoff_factor=0.01)
+
+
+def concurrent(count, call, *args):
+    threads = [eventlet.spawn(call, *args) for _ in range(count)]
+    return [thread.wait() for thread in threads]
+
+
+class TestConnectionPool(object):
+    def test_connections_are_kept_alive(self, server):
+        pooled = session()
+        for _ in range(50):
+            assert pooled.get(server.url + '/mgmt/tm/ltm/pool').ok
+
+        assert server.connections == 1
+        assert server.logins == 1
+
+    def test_pool_size_keeps_concurrent_connections(self, server):
+        server.delay = 0.01
+        url = server.url + '/mgmt/tm/ltm/pool'
+        pooled = session(pool_size=20)
+        for _ in range(3):
+            concurrent(20, pooled.get, url)
+        # the login and the first 20 requests open all connections
+        assert server.connections <= 20
+
+        server.connections = 0
+        small = session(pool_size=2)
+        for _ in range(3):
+            concurrent(20, small.get, url)
+        assert server.connections > 40
+
+    def test_one_login_for_concurrent_requests(self, server):
+        server.delay = 0.01
+        results = concurrent(10, session().get,
+                             server.url + '/mgmt/tm/ltm/pool')
+
+        assert all(response.ok for response in results)
+        assert server.logins == 1
+
+
+class TestRetry(object):
+    def test_idempotent_request_is_retried(self, server):
+        server.statuses[('GET', '/mgmt/tm/ltm/pool')] = [503, 502]
+        response = session().get(server.url + '/mgmt/tm/ltm/pool')
+
+        assert response.status_code == 200
+        assert server.requests.count(('GET', '/mgmt/tm/ltm/pool')) == 3
+        assert server.connections == 1
+
+    @pytest.mark.parametrize('method', ['post', 'patch'])
+    def test_non_idempotent_request_is_not_retried(self, server, method):
+        server.statuses[(method.upper(), '/mgmt/tm/ltm/pool')] = [503]
+        response = getattr(session(), method)(
+            server.url + '/mgmt/tm/ltm/pool', json={'name': 'pool1'})
+
+        assert response.status_code == 503
+        assert server.requests.count(
+            (method.upper(), '/mgmt/tm/ltm/pool')) == 1
+
+    def test_statuses_per_method(self, server):
+        path = '/mgmt/tm/ltm/pool/~Project_t1~pool1'
+        server.statuses[('DELETE', path)] = [502]
+        assert session().delete(server.url + path).status_code == 502
+
+        server.statuses[('DELETE', path)] = [503]
+        assert session().delete(server.url + path).status_code == 200
+        assert server.requests.count(('DELETE', path)) == 3
+
+        server.statuses[('GET', path)] = [500]
+        assert session().get(server.url + path).status_code == 500
+
+    def test_retries_are_bounded(self, server):
+        server.statuses[('GET', '/mgmt/tm/sys')] = [503] * 10
+        response = session(retries=2).get(server.url + '/mgmt/tm/sys')
+
+        assert response.status_code == 503
+        assert server.requests.count(('GET', '/mgmt/tm/sys')) == 3
+
+    def test_no_retries(self, server):
+        server.statuses[('GET', '/mgmt/tm/sys')] = [503]
+        response = session(retries=0).get(server.url + '/mgmt/tm/sys')
+
+        assert response.status_code == 503
+        assert server.requests.count(('GET', '/mgmt/tm/sys')) == 1
+
+    def test_backoff_is_jittered_and_capped(self):
+        def backoffs(failures):
+            history = (RequestHistory('GET', '/', None, 503, None),) * \
+                failures
+            retry = icontrol_session.IdempotentRetry(
+                total=20, backoff_factor=1, history=history)
+            return set(retry.get_backoff_time() for _ in range(50))
+
+        assert backoffs(0) == set([0])
+        third = backoffs(3)
+        assert len(third) > 1
+        assert all(2 <= backoff <= 4 for backoff in third)
+        assert all(icontrol_session.MAX_BACKOFF / 2 <= backoff <=
+                   icontrol_session.MAX_BACKOFF for backoff in backoffs(12))
+
+
+class TestTokenAuth(object):
+    def test_dropped_token_logs_in_again(self, server):
+        pooled = session()
+        url = server.url + '/mgmt/tm/ltm/pool'
+        assert pooled.get(url).ok
+        server.tokens.clear()
+
+        response = pooled.get(url)
+        assert response.ok
+        assert [r.status_code for r in response.history] == [401]
+        assert server.logins == 2
+        assert pooled.get(url).ok
+        assert server.logins == 2
+
+    def test_expired_token_is_renewed(self, server):
+        pooled = session()
+        url = server.url + '/mgmt/tm/ltm/pool'
+        assert pooled.get(url).ok
+        assert pooled.auth.expiration > time.time() + 1000
+
+        pooled.auth.expiration = time.time() - 1
+        assert pooled.get(url).ok
+        assert server.logins == 2
+        assert server.connections == 1
+
+    def test_rejected_login_raises(self, server):
+        server.statuses[('POST', icontrol_session.LOGIN_PATH)] = [401]
+        with pytest.raises(HTTPError):
+            session().get(server.url + '/mgmt/tm/ltm/pool')
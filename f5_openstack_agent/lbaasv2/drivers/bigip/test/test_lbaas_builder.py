@@ -25,6 +25,14 @@ import f5_openstack_agent.lbaasv2.drivers.bigip.lbaas_builder
 from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5_ex
 from f5_openstack_agent.lbaasv2.drivers.bigip.lbaas_builder import \
     LBaaSBuilder
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    BigIPResourceHelper
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    ResourceType
+from f5_openstack_agent.lbaasv2.drivers.bigip.service_adapter import \
+    ServiceModelAdapter
+from f5_openstack_agent.lbaasv2.drivers.bigip.test.test_resource_helper \
+    import FakeBigIP
 
 import copy
 import mock
@@ -1000,3 +1008,335 @@ class TestLbaasBuilder(object):
             builder = LBaaSBuilder(mock.MagicMock(), mock.MagicMock())
             builder._assure_members(service, mock.MagicMock())
             assert mock_log.warning.call_args_list == []
+
+
+class TestServicePlan(object):
+    @pytest.fixture
+    def builder(self):
+        builder = LBaaSBuilder(mock.MagicMock(), mock.MagicMock())
+        builder.pool_builder = mock.MagicMock()
+        builder.listener_builder = mock.MagicMock()
+        return builder
+
+    @pytest.fixture
+    def active_service(self, service):
+        service['pools'][0]['provisioning_status'] = 'ACTIVE'
+        service['pools'][0]['listeners'] = []
+        service['members'][1]['id'] = 'missing'
+        return service
+
+    def test_plan(self, builder, active_service):
+        pool_id = active_service['pools'][0]['id']
+        member_id = active_service['members'][0]['id']
+
+        plan = builder.plan_service(active_service, {})
+        assert plan['pool'] == {pool_id: 'skip'}
+        assert plan['member'] == {member_id: 'skip', 'missing': 'skip'}
+        assert plan['listener'] == {}
+
+        active_service['members'][0]['provisioning_status'] = \
+            'PENDING_UPDATE'
+        active_service['pools'][0]['provisioning_status'] = \
+            'PENDING_DELETE'
+        plan = builder.plan_service(
+            active_service, {'member': {'missing': ['bigip1']}})
+        assert plan['pool'] == {pool_id: 'delete'}
+        assert plan['member'] == {member_id: 'update', 'missing': 'create'}
+
+    def test_missing_parents_create_all(self, builder, active_service):
+        pool_id = active_service['pools'][0]['id']
+        for diff in [{'loadbalancer': {'lb': ['bigip1']}},
+                     {'pool': {pool_id: ['bigip1']}}]:
+            plan = builder.plan_service(active_service, diff)
+            assert set(plan['member'].values()) == set(['create'])
+
+    def test_format_plan(self, builder):
+        plan = {'pool': {'p1': 'skip'},
+                'member': {'m2': 'create', 'm1': 'create'}}
+        assert builder.format_plan(plan) == \
+            "skip pool: p1; create member: m1, m2"
+        assert builder.format_plan({}) == "nothing to do"
+
+    def test_no_plan_creates_all(self, builder, active_service):
+        builder._assure_members_created(active_service, {})
+        assert builder.pool_builder.create_member.call_count == 2
+
+    def test_only_planned_members_applied(self, builder, active_service):
+        active_service['members'][0]['provisioning_status'] = \
+            'PENDING_UPDATE'
+        plan = builder.plan_service(
+            active_service, {'member': {'missing': ['bigip1']}})
+        with mock.patch.object(builder, '_update_subnet_hints') as update:
+            builder._assure_members_created(active_service, {}, plan)
+            assert update.call_count == 2
+
+        assert builder.pool_builder.create_member.call_count == 1
+        created = builder.pool_builder.create_member.call_args[0][0]
+        assert created['member']['id'] == 'missing'
+        assert builder.pool_builder.update_member.call_count == 1
+
+    def test_unchanged_pools_not_configured(self, builder, active_service):
+        plan = builder.plan_service(active_service, {})
+        builder._assure_pools_created(active_service, plan)
+        builder._assure_pools_configured(active_service, plan)
+        assert not builder.pool_builder.update_pool.called
+
+        plan = builder.plan_service(
+            active_service, {'member': {'missing': ['bigip1']}})
+        builder._assure_pools_created(active_service, plan)
+        builder._assure_pools_configured(active_service, plan)
+        assert builder.pool_builder.update_pool.call_count == 1
+
+
+class TestUpdateOperatingStatuses(object):
+    @pytest.fixture
+    def bigip(self):
+        bigip = mock.MagicMock()
+        bigip.hostname = 'bigip1'
+        bigip.tmos_version = '12.1.2'
+        pool = mock.MagicMock()
+        pool.name = 'Project_2dbca6cd-30d8-4013-9c9a-df0850fabf52'
+        pool.membersReference = {'items': [
+            {'name': '10.2.2.3%2:8080', 'state': 'up',
+             'session': 'monitor-enabled'},
+            {'name': '10.2.2.4%2:8080', 'state': 'up',
+             'session': 'user-disabled'}]}
+        bigip.tm.ltm.pools.get_collection.return_value = [pool]
+        return bigip
+
+    @pytest.fixture
+    def builder(self, bigip):
+        driver = mock.MagicMock()
+        driver.get_active_bigip.return_value = bigip
+        driver.service_adapter.prefix = 'Project_'
+        driver.service_adapter.get_folder_name.side_effect = \
+            lambda tenant_id: 'Project_' + tenant_id
+        return LBaaSBuilder(mock.MagicMock(), driver)
+
+    def test_single_partition(self, builder, bigip, service):
+        service['members'].append(dict(service['members'][0],
+                                       address='10.2.2.5'))
+        builder.update_operating_statuses([service])
+
+        assert [m['operating_status'] for m in service['members']] == \
+            ['ONLINE', 'DISABLED', None]
+        params = bigip.tm.ltm.pools.get_collection.call_args[1][
+            'requests_params']['params']
+        assert params['$filter'] == \
+            'partition eq Project_d9ed216f67f04a84bf8fd97c155855cd'
+        assert params['expandSubcollections'] == 'true'
+
+    def test_whole_device(self, builder, bigip, service):
+        other = copy.deepcopy(service)
+        other['loadbalancer']['tenant_id'] = 'other'
+        other['members'][0]['provisioning_status'] = 'PENDING_UPDATE'
+        other['members'][0]['operating_status'] = 'OFFLINE'
+        builder.update_operating_statuses([service, other])
+
+        bigip.tm.ltm.pools.get_collection.assert_called_once_with(
+            requests_params={'params': 'expandSubcollections=true'})
+        assert [m['operating_status'] for m in other['members']] == \
+            ['OFFLINE', 'DISABLED']
+
+
+class TestMemberDelta(object):
+    REST_METHODS = ['load', 'create', 'exists', 'modify', 'delete', 'update']
+
+    @pytest.fixture
+    def bigip(self):
+        bigip = mock.MagicMock()
+        bigip.hostname = 'bigip1'
+        return bigip
+
+    @pytest.fixture
+    def builder(self, bigip):
+        driver = mock.MagicMock()
+        driver.service_adapter = ServiceModelAdapter(
+            mock.MagicMock(environment_prefix='Project'))
+        driver.get_config_bigips.return_value = [bigip]
+        return LBaaSBuilder(mock.MagicMock(), driver)
+
+    @staticmethod
+    def active_service(service, member_count):
+        service['pools'][0]['provisioning_status'] = 'ACTIVE'
+        template = service['members'][0]
+        service['members'] = [
+            dict(template, id='member-%d' % i, address='10.2.%d.%d' % (
+                i / 200, i % 200 + 10)) for i in range(member_count)]
+        return service
+
+    def rest_calls(self, bigip):
+        return len([c for c in bigip.mock_calls
+                    if c[0].split('.')[-1] in self.REST_METHODS])
+
+    def full_member_calls(self, builder, bigip, service, status):
+        for member in service['members']:
+            member['provisioning_status'] = status
+        bigip.reset_mock()
+        with mock.patch.object(builder, '_update_subnet_hints'):
+            if status == 'PENDING_DELETE':
+                builder._assure_members_deleted(service, {})
+            else:
+                builder._assure_members_created(service, {})
+        return self.rest_calls(bigip)
+
+    def delta_member_calls(self, builder, bigip, service, status):
+        for member in service['members']:
+            member['provisioning_status'] = 'ACTIVE'
+        service['members'][-1]['provisioning_status'] = status
+        member, pool = builder.get_member_delta(
+            service, service['members'][-1]['id'])
+        bigip.reset_mock()
+        device_member = builder.assure_member(
+            service, member, pool, member['address'] + '%2')
+        assert device_member['address'] == member['address'] + '%2'
+        return self.rest_calls(bigip)
+
+    @pytest.mark.parametrize('status', ['PENDING_CREATE', 'PENDING_UPDATE',
+                                        'PENDING_DELETE'])
+    def test_rest_calls_independent_of_service_size(self, builder, bigip,
+                                                    service, status):
+        small = self.active_service(copy.deepcopy(service), 5)
+        large = self.active_service(copy.deepcopy(service), 500)
+
+        assert self.full_member_calls(builder, bigip, large, status) > \
+            self.full_member_calls(builder, bigip, small, status) * 50
+        delta_calls = self.delta_member_calls(builder, bigip, small, status)
+        assert 0 < delta_calls <= 8
+        assert self.delta_member_calls(builder, bigip, large, status) == \
+            delta_calls
+
+    def test_existing_member_is_updated(self, builder, bigip, service):
+        service = self.active_service(service, 2)
+        service['members'][0]['provisioning_status'] = 'PENDING_CREATE'
+        member, pool = builder.get_member_delta(
+            service, service['members'][0]['id'])
+        members = bigip.tm.ltm.pools.pool.load.return_value.members_s.members
+        members.create.side_effect = MockHTTPError(Mock(status_code=409))
+
+        builder.assure_member(service, member, pool, '10.2.0.10%2')
+        assert members.load.return_value.modify.call_count == 1
+
+    def test_failure_raises(self, builder, bigip, service):
+        service = self.active_service(service, 2)
+        service['members'][0]['provisioning_status'] = 'PENDING_CREATE'
+        member, pool = builder.get_member_delta(
+            service, service['members'][0]['id'])
+        members = bigip.tm.ltm.pools.pool.load.return_value.members_s.members
+        members.create.side_effect = MockHTTPError(Mock(status_code=500))
+
+        with pytest.raises(f5_ex.MemberCreationException):
+            builder.assure_member(service, member, pool, '10.2.0.10%2')
+        assert member['provisioning_status'] == 'PENDING_CREATE'
+
+    def test_no_delta(self, builder, service):
+        service = self.active_service(service, 2)
+        member_id = service['members'][0]['id']
+        # nothing pending
+        assert builder.get_member_delta(service, member_id) is None
+
+        service['members'][0]['provisioning_status'] = 'PENDING_UPDATE'
+        assert builder.get_member_delta(service, member_id) is not None
+        assert builder.get_member_delta(service, 'unknown') is None
+
+        # another object of the service is pending as well
+        service['members'][1]['provisioning_status'] = 'PENDING_CREATE'
+        assert builder.get_member_delta(service, member_id) is None
+        service['members'][1]['provisioning_status'] = 'ACTIVE'
+        service['pools'][0]['provisioning_status'] = 'PENDING_UPDATE'
+        assert builder.get_member_delta(service, member_id) is None
+        service['pools'][0]['provisioning_status'] = 'ACTIVE'
+
+        # the loadbalancer is not deployed yet
+        service['loadbalancer']['provisioning_status'] = 'PENDING_CREATE'
+        assert builder.get_member_delta(service, member_id) is None
+
+
+class TestRestTransactions(object):
+    @pytest.fixture
+    def bigips(self):
+        return [FakeBigIP('bigip1'), FakeBigIP('bigip2')]
+
+    @pytest.fixture
+    def builder(self, bigips):
+        driver = mock.MagicMock()
+        driver.service_adapter = ServiceModelAdapter(
+            mock.MagicMock(environment_prefix='Project'))
+        driver.get_config_bigips.return_value = bigips
+        return LBaaSBuilder(mock.MagicMock(ccloud_rest_transactions=True),
+                            driver)
+
+    @pytest.fixture
+    def pending_service(self, builder, bigips, service):
+        service = TestMemberDelta.active_service(service, 5)
+        for member in service['members']:
+            member['provisioning_status'] = 'PENDING_CREATE'
+        pool = builder.service_adapter.get_pool(
+            {'loadbalancer': service['loadbalancer'],
+             'pool': service['pools'][0]})
+        for bigip in bigips:
+            BigIPResourceHelper(ResourceType.pool).create(
+                bigip, {'name': pool['name'],
+                        'partition': pool['partition']})
+            bigip.commits = 0
+        return service
+
+    @staticmethod
+    def assure_members(builder, service):
+        with mock.patch.object(builder, '_update_subnet_hints'):
+            builder._assure_in_transaction(builder._assure_members_created,
+                                           service, {}, None)
+
+    def test_members_committed_at_once(self, builder, bigips,
+                                       pending_service):
+        self.assure_members(builder, pending_service)
+
+        for bigip in bigips:
+            assert bigip.commits == 1
+            assert len(bigip.objects) == 6
+        assert set(m['provisioning_status'] for m in
+                   pending_service['members']) == set(['ACTIVE'])
+
+    def test_without_transactions(self, builder, bigips, pending_service):
+        builder.conf.ccloud_rest_transactions = False
+        self.assure_members(builder, pending_service)
+
+        for bigip in bigips:
+            assert bigip.commits == 5
+            assert len(bigip.objects) == 6
+
+    def test_failed_commit_applied_without_transaction(
+            self, builder, bigips, pending_service):
+        member = pending_service['members'][0]
+        builder.pool_builder.create_member(
+            {'loadbalancer': pending_service['loadbalancer'],
+             'pool': pending_service['pools'][0],
+             'member': member}, [bigips[1]])
+        bigips[1].commits = 0
+
+        self.assure_members(builder, pending_service)
+
+        # bigip1 committed the transaction, the existing member made it
+        # fail on bigip2. Without transaction all members are created
+        # and, as they exist on bigip1, updated.
+        assert bigips[0].commits == 1 + 5
+        assert bigips[1].commits == 4 + 5
+        for bigip in bigips:
+            assert len(bigip.objects) == 6
+            assert not bigip.transactions
+        assert set(m['provisioning_status'] for m in
+                   pending_service['members']) == set(['ACTIVE'])
+
+    def test_failing_stage_applies_nothing(self, builder, bigips,
+                                           pending_service):
+        pending_service['pools'].append(
+            dict(pending_service['pools'][0], id='missing'))
+        pending_service['members'][3]['pool_id'] = 'missing'
+
+        with pytest.raises(f5_ex.MemberCreationException):
+            self.assure_members(builder, pending_service)
+
+        for bigip in bigips:
+            assert bigip.commits == 0
+            assert len(bigip.objects) == 1
+            assert not bigip.transactions
@@ -0,0 +1,108 @@
+# coding=utf-8
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.network_index import \
+    NetworkIndex
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    ResourceType
+
+import pytest
+
+VIRTUAL_ADDRESSES = [
+    {'name': 'Project_lb1', 'partition': 'Project_t1'},
+    {'name': 'Project_lb2', 'partition': 'Project_t1'},
+    {'name': 'Project_lb3', 'partition': 'Project_t2'},
+    {'name': 'other', 'partition': 'Common'}]
+
+
+def service(lb_id, status='ACTIVE', members=()):
+    return {'loadbalancer': {'id': lb_id, 'tenant_id': 't1',
+                             'network_id': 'net1',
+                             'vip_address': '10.1.0.10%5',
+                             'provisioning_status': status},
+            'members': [{'address': address,
+                         'provisioning_status': member_status}
+                        for address, member_status in members]}
+
+
+@pytest.fixture
+def collections():
+    return {ResourceType.virtual_address: VIRTUAL_ADDRESSES}
+
+
+class TestNetworkIndex(object):
+    def test_last_on_network(self):
+        index = NetworkIndex()
+        index.update(service('lb1'))
+        assert not index.has_network('net1')
+
+        index.add_network('net1', ['lb2'])
+        assert index.networks['net1'] == set(['lb1', 'lb2'])
+        assert not index.is_last_on_network('net1', 'lb1')
+
+        index.update(service('lb2', status='PENDING_DELETE'))
+        assert index.is_last_on_network('net1', 'lb1')
+        index.update(service('lb3'))
+        assert not index.is_last_on_network('net1', 'lb1')
+        index.remove('lb3')
+        assert index.is_last_on_network('net1', 'lb1')
+
+    def test_ips_exist_on_subnet(self, bigip, fetched):
+        index = NetworkIndex()
+        index.load(bigip, 'Project_')
+        index.load(bigip, 'Project_')
+        assert len(fetched) == 1
+        assert index.deployed['t1'] == set(['lb1', 'lb2'])
+
+        index.update(service('lb1', members=[('10.2.0.5%5', 'ACTIVE'),
+                                             ('10.3.0.5%5', 'PENDING_DELETE')]))
+        assert not index.is_complete('t1')
+        index.update(service('lb2'))
+        assert index.is_complete('t1')
+
+        assert index.ips_exist_on_subnet('t1', '10.1.0.0/24', 5)
+        assert index.ips_exist_on_subnet('t1', '10.2.0.0/24', 5)
+        assert not index.ips_exist_on_subnet('t1', '10.2.0.0/24', 6)
+        assert not index.ips_exist_on_subnet('t1', '10.3.0.0/24', 5)
+
+        index.update(service('lb1', members=[('10.2.0.5%5',
+                                              'PENDING_DELETE')]))
+        assert not index.ips_exist_on_subnet('t1', '10.2.0.0/24', 5)
+        index.remove('lb1')
+        index.remove('lb2')
+        assert not index.ips_exist_on_subnet('t1', '10.1.0.0/24', 5)
+
+    def test_update_address(self):
+        index = NetworkIndex()
+        index.update_address('lb1', '10.2.0.5%5')
+        assert 'lb1' not in index.loadbalancers
+
+        index.update(service('lb1'))
+        index.deployed['t1'] = set(['lb1'])
+        index.update_address('lb1', '10.2.0.5%5')
+        assert index.ips_exist_on_subnet('t1', '10.2.0.0/24', 5)
+        index.update_address('lb1', '10.2.0.5%5', present=False)
+        assert not index.ips_exist_on_subnet('t1', '10.2.0.0/24', 5)
+        assert index.ips_exist_on_subnet('t1', '10.1.0.0/24', 5)
+
+    def test_clear(self, bigip, fetched):
+        index = NetworkIndex()
+        index.load(bigip, 'Project_')
+        index.add_network('net1', [])
+        index.clear()
+        assert not index.has_network('net1')
+        index.load(bigip, 'Project_')
+        assert len(fetched) == 2
@@ -0,0 +1,227 @@
+# coding=utf-8
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import oslo_messaging as messaging
+
+from f5_openstack_agent.lbaasv2.drivers.bigip import plugin_rpc
+
+import mock
+import pytest
+
+
+@pytest.fixture
+def rpc():
+    with mock.patch.object(plugin_rpc, 'rpc'):
+        yield plugin_rpc.LBaaSv2PluginRPC(
+            'topic', mock.MagicMock(), 'Project', 1, 'host')
+
+
+def _status(obj_type, obj_id, new, current, destroyed=False):
+    return {'type': obj_type, 'id': obj_id,
+            'provisioning_status': new[0], 'operating_status': new[1],
+            'destroyed': destroyed, 'current_status': current}
+
+
+ACTIVE = ('ACTIVE', 'ONLINE')
+PENDING = ('PENDING_UPDATE', 'ONLINE')
+
+
+class TestUpdateStatuses(object):
+    def test_unchanged_statuses_are_dropped(self, rpc):
+        with mock.patch.object(rpc, '_call') as call:
+            rpc.update_statuses([_status('member', 'm1', ACTIVE, ACTIVE),
+                                 _status('pool', 'p1', ACTIVE, ACTIVE)])
+        assert not call.called
+
+    def test_bulk_update(self, rpc):
+        statuses = [_status('member', 'm1', ACTIVE, ACTIVE),
+                    _status('member', 'm2', ACTIVE, PENDING),
+                    _status('pool', 'p1', ACTIVE, ACTIVE, destroyed=True)]
+        with mock.patch.object(rpc, '_call') as call:
+            rpc.update_statuses(statuses)
+
+        assert call.call_count == 1
+        msg = call.call_args[0][1]
+        assert msg['method'] == 'update_statuses'
+        assert [(s['type'], s['id']) for s in msg['args']['statuses']] == \
+            [('member', 'm2'), ('pool', 'p1')]
+        assert 'current_status' not in msg['args']['statuses'][0]
+        assert rpc.bulk_status_updates
+
+    def test_bulk_update_is_cast_once_supported(self, rpc):
+        statuses = [_status('member', 'm1', ACTIVE, PENDING)]
+        with mock.patch.object(rpc, '_call') as call, \
+                mock.patch.object(rpc, '_cast') as cast:
+            rpc.update_statuses(statuses)
+            rpc.update_statuses(statuses)
+
+        assert call.call_count == 1
+        assert cast.call_count == 1
+        assert cast.call_args[0][1]['method'] == 'update_statuses'
+
+    def test_timeout_falls_back_to_single_updates(self, rpc):
+        statuses = [_status('member', 'm1', ACTIVE, PENDING)]
+        error = messaging.MessagingTimeout()
+        with mock.patch.object(rpc, '_call', side_effect=error) as call, \
+                mock.patch.object(rpc, '_cast') as cast:
+            rpc.update_statuses(statuses)
+            assert [c[0][1]['method'] for c in cast.call_args_list] == \
+                ['update_member_status']
+
+            # the next update probes the plugin again
+            assert rpc.bulk_status_updates is None
+            rpc.update_statuses(statuses)
+            assert call.call_count == 2
+
+    def test_fallback_to_single_updates(self, rpc):
+        statuses = [_status('member', 'm1', ACTIVE, PENDING),
+                    _status('l7rule', 'r1', ACTIVE, PENDING),
+                    _status('pool', 'p1', ACTIVE, ACTIVE, destroyed=True)]
+        statuses[1]['l7policy_id'] = 'po1'
+        error = messaging.RemoteError('NoSuchMethod')
+        with mock.patch.object(rpc, '_call', side_effect=error), \
+                mock.patch.object(rpc, '_cast') as cast:
+            rpc.update_statuses(statuses)
+            assert not rpc.bulk_status_updates
+            assert [c[0][1]['method'] for c in cast.call_args_list] == \
+                ['update_member_status', 'update_l7rule_status',
+                 'pool_destroyed']
+            assert cast.call_args_list[1][0][1]['args']['l7policy_id'] == \
+                'po1'
+
+            # no further bulk attempts
+            rpc.update_statuses(statuses[:1])
+            assert cast.call_count == 4
+
+    def test_other_errors_are_raised(self, rpc):
+        error = messaging.RemoteError('SomethingElse')
+        with mock.patch.object(rpc, '_call', side_effect=error):
+            with pytest.raises(messaging.RemoteError):
+                rpc.update_statuses(
+                    [_status('member', 'm1', ACTIVE, PENDING)])
+        assert rpc.bulk_status_updates is None
+
+
+def _port(name, port_id, ip_address):
+    return {'name': name, 'id': port_id,
+            'fixed_ips': [{'ip_address': ip_address}]}
+
+
+class TestPorts(object):
+    def test_get_ports_by_names(self, rpc):
+        found = [_port('snat_0', 'p0', '10.0.0.10'),
+                 _port('snat_1', 'p1', '10.0.0.11')]
+        with mock.patch.object(rpc, '_call', return_value=found) as call:
+            ports = rpc.get_ports_by_names(['snat_0', 'snat_1', 'snat_2'])
+            assert ports == {'snat_0': [found[0]], 'snat_1': [found[1]],
+                             'snat_2': []}
+            assert call.call_args[0][1]['args']['port_names'] == \
+                ['snat_0', 'snat_1', 'snat_2']
+
+            # found ports are cached, only the missing one is queried
+            call.return_value = []
+            ports = rpc.get_ports_by_names(['snat_0', 'snat_1', 'snat_2'])
+            assert ports['snat_1'] == [found[1]]
+            assert call.call_args[0][1]['args']['port_names'] == ['snat_2']
+            assert rpc.get_port_by_name(port_name='snat_0') == [found[0]]
+            assert call.call_count == 2
+
+    def test_create_ports_on_subnet(self, rpc):
+        created = [_port('snat_1', 'p1', '10.0.0.11'),
+                   _port('snat_0', 'p0', '10.0.0.10')]
+        with mock.patch.object(rpc, '_call', return_value=created) as call:
+            ports = rpc.create_ports_on_subnet(
+                subnet_id='s1', names=['snat_0', 'snat_1', 'snat_2'])
+            assert ports == [created[1], created[0], None]
+            assert call.call_count == 1
+            assert rpc.get_ports_by_names(['snat_0', 'snat_1']) == {
+                'snat_0': [created[1]], 'snat_1': [created[0]]}
+            assert call.call_count == 1
+
+    def test_fallback_to_single_port_rpcs(self, rpc):
+        error = messaging.RemoteError('NoSuchMethod')
+        with mock.patch.object(rpc, '_call', side_effect=error):
+            with mock.patch.object(rpc, 'get_port_by_name',
+                                   return_value=[]) as get_port:
+                assert rpc.get_ports_by_names(['snat_0']) == {'snat_0': []}
+                get_port.assert_called_once_with(port_name='snat_0')
+            assert not rpc.bulk_port_rpcs
+
+            with mock.patch.object(rpc, 'create_port_on_subnet',
+                                   return_value=None) as create_port:
+                assert rpc.create_ports_on_subnet(
+                    subnet_id='s1', names=['snat_0', 'snat_1']) == \
+                    [None, None]
+                assert create_port.call_count == 2
+
+    def test_delete_invalidates_cache(self, rpc):
+        rpc.port_cache.add('snat_0', _port('snat_0', 'p0', '10.0.0.10'))
+        rpc.port_cache.add('snat_1', _port('snat_1', 'p1', '10.0.0.11'))
+        with mock.patch.object(rpc, '_cast'):
+            rpc.delete_port_by_name(port_name='snat_0')
+            rpc.delete_port(port_id='p1')
+        assert not rpc.port_cache
+
+    def test_missing_ports_are_evicted(self, rpc):
+        port = _port('snat_0', 'p0', '10.0.0.10')
+        port['mac_address'] = 'fa:16:3e:00:00:01'
+        rpc.port_cache.add('snat_0', port)
+        with mock.patch.object(rpc, '_call', return_value=[port]):
+            rpc.get_ports_for_mac_addresses(
+                mac_addresses=['fa:16:3e:00:00:01'])
+        assert rpc.port_cache.get('snat_0') == port
+
+        with mock.patch.object(rpc, '_call', return_value=[]):
+            rpc.get_ports_for_mac_addresses(
+                mac_addresses=['fa:16:3e:00:00:01'])
+        assert not rpc.port_cache
+
+        rpc.port_cache.add('snat_0', port)
+        error = messaging.RemoteError('PortNotFound')
+        with mock.patch.object(rpc, '_call', side_effect=error):
+            with pytest.raises(messaging.RemoteError):
+                rpc.add_allowed_address(port_id='p0', ip_address='10.0.0.1')
+        assert not rpc.port_cache
+
+
+class TestPortCache(object):
+    def test_ttl(self):
+        cache = plugin_rpc.PortCache(ttl=60, max_size=10)
+        port = _port('snat_0', 'p0', '10.0.0.10')
+        with mock.patch.object(plugin_rpc, 'time') as time:
+            time.time.return_value = 1000.0
+            cache.add('snat_0', port)
+            time.time.return_value = 1059.0
+            assert cache.get('snat_0') == port
+            time.time.return_value = 1060.0
+            assert cache.get('snat_0') is None
+        assert not cache
+
+    def test_size_bound(self):
+        cache = plugin_rpc.PortCache(ttl=60, max_size=2)
+        for i in range(3):
+            if i == 2:
+                # snat_0 is now the most recently used
+                assert cache.get('snat_0')
+            cache.add('snat_%d' % i, _port('snat_%d' % i, 'p%d' % i,
+                                           '10.0.0.1%d' % i))
+        assert list(cache.ports) == ['snat_0', 'snat_2']
+
+    def test_disabled(self):
+        for cache in [plugin_rpc.PortCache(ttl=0, max_size=10),
+                      plugin_rpc.PortCache(ttl=60, max_size=0)]:
+            cache.add('snat_0', _port('snat_0', 'p0', '10.0.0.10'))
+            assert cache.get('snat_0') is None
@@ -0,0 +1,438 @@
+# coding=utf-8
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import copy
+import json
+import urllib
+import urlparse
+
+from f5.bigip import ManagementRoot
+import mock
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from requests import HTTPError
+
+from f5_openstack_agent.lbaasv2.drivers.bigip import exceptions as f5_ex
+from f5_openstack_agent.lbaasv2.drivers.bigip.network_helper import \
+    NetworkHelper
+from f5_openstack_agent.lbaasv2.drivers.bigip.pool_service import \
+    PoolServiceBuilder
+from f5_openstack_agent.lbaasv2.drivers.bigip import resource_helper
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    BigIPResourceHelper
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    ResourceType
+from f5_openstack_agent.lbaasv2.drivers.bigip import utils
+
+
+def http_error(status_code):
+    return HTTPError(response=mock.Mock(status_code=status_code))
+
+
+class FakeBigIP(object):
+    """Offline iControl REST endpoint with transactions.
+
+    Objects are kept by SDK path, partition and name. Writes without
+    coordination id are committed right away, writes with one are queued
+    in their transaction and applied in order, or not at all, when it is
+    committed. commits counts the configuration commits of the device.
+    """
+
+    def __init__(self, hostname):
+        self.hostname = hostname
+        self.objects = {}
+        self.transactions = {}
+        self.commits = 0
+        self.applied = []
+        self.tm = FakePath(self, 'tm')
+
+    def write(self, command, requests_params=None):
+        headers = (requests_params or {}).get('headers', {})
+        trans_id = headers.get(resource_helper.TRANSACTION_HEADER)
+        if trans_id is None:
+            self._apply(self.objects, [command])
+            self.commits += 1
+        else:
+            self.transactions[int(trans_id)].append(command)
+
+    def commit(self, trans_id):
+        objects = copy.deepcopy(self.objects)
+        self._apply(objects, self.transactions.pop(trans_id))
+        self.objects = objects
+        self.commits += 1
+
+    def _apply(self, objects, commands):
+        for operation, key, attributes in commands:
+            if operation == 'create' and key in objects:
+                raise http_error(409)
+            if operation != 'create' and key not in objects:
+                raise http_error(404)
+            if operation == 'delete':
+                del objects[key]
+            else:
+                objects.setdefault(key, {}).update(attributes)
+        self.applied.extend((operation, key) for operation, key, _ in
+                            commands)
+
+
+class FakePath(object):
+    """A collection or resource factory of the SDK, e.g. tm.ltm.pools.pool"""
+
+    def __init__(self, bigip, path):
+        self.bigip = bigip
+        self.path = path
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return FakePath(self.bigip, self.path + '.' + name)
+
+    def _key(self, name, partition):
+        # names are sent quoted in URIs
+        return (self.path, partition, urllib.unquote(name))
+
+    def create(self, requests_params=None, **attributes):
+        if self.path == 'tm.transactions.transaction':
+            return FakeTransaction(self.bigip)
+        key = self._key(attributes['name'], attributes.get('partition'))
+        self.bigip.write(('create', key, attributes), requests_params)
+        return FakeObject(self.bigip, key)
+
+    def exists(self, name=None, partition=None):
+        return self._key(name, partition) in self.bigip.objects
+
+    def load(self, name=None, partition=None):
+        if not self.exists(name=name, partition=partition):
+            raise http_error(404)
+        return FakeObject(self.bigip, self._key(name, partition))
+
+
+class FakeObject(object):
+    def __init__(self, bigip, key):
+        self.bigip = bigip
+        self.key = key
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return FakePath(self.bigip, '%s/%s/%s.%s' % (
+            self.key[0], self.key[1], self.key[2], name))
+
+    def modify(self, requests_params=None, **attributes):
+        self.bigip.write(('modify', self.key, attributes), requests_params)
+
+    def delete(self, requests_params=None):
+        self.bigip.write(('delete', self.key, {}), requests_params)
+
+
+class FakeTransaction(object):
+    def __init__(self, bigip):
+        self.bigip = bigip
+        self.transId = len(bigip.transactions) + 1000
+        bigip.transactions[self.transId] = []
+
+    def modify(self, state=None):
+        assert state == 'VALIDATING'
+        self.bigip.commit(self.transId)
+
+    def delete(self):
+        self.bigip.transactions.pop(self.transId)
+
+
+@pytest.fixture
+def bigips():
+    return [FakeBigIP('bigip1'), FakeBigIP('bigip2')]
+
+
+def create_pools(bigips, count):
+    helper = BigIPResourceHelper(ResourceType.pool)
+    for i in range(count):
+        utils.fan_out(bigips, helper.create,
+                      {'name': 'pool%d' % i, 'partition': 'Project_t1'})
+
+
+class TestTransaction(object):
+    def test_one_commit_per_bigip(self, bigips):
+        with resource_helper.transaction(bigips) as transactions:
+            create_pools(bigips, 5)
+            assert not bigips[0].objects
+            assert transactions['bigip1'].commands == 5
+
+        for bigip in bigips:
+            assert bigip.commits == 1
+            assert len(bigip.objects) == 5
+            assert not bigip.transactions
+
+        immediate = FakeBigIP('bigip3')
+        create_pools([immediate], 5)
+        assert immediate.commits == 5
+
+    def test_commit_order(self, bigips):
+        helper = BigIPResourceHelper(ResourceType.pool)
+        pool = {'name': 'pool0', 'partition': 'Project_t1'}
+        create_pools(bigips, 1)
+        with resource_helper.transaction(bigips):
+            utils.fan_out(bigips, helper.delete, name='pool0',
+                          partition='Project_t1')
+            create_pools(bigips, 1)
+            utils.fan_out(bigips, helper.update,
+                          dict(pool, description='changed'))
+
+        key = ('tm.ltm.pools.pool', 'Project_t1', 'pool0')
+        for bigip in bigips:
+            assert bigip.applied == [('create', key), ('delete', key),
+                                     ('create', key), ('modify', key)]
+            assert bigip.objects[key]['description'] == 'changed'
+            assert bigip.commits == 2
+
+    def test_rollback_when_raising(self, bigips):
+        with pytest.raises(ValueError):
+            with resource_helper.transaction(bigips):
+                create_pools(bigips, 3)
+                raise ValueError()
+
+        for bigip in bigips:
+            assert not bigip.objects
+            assert not bigip.transactions
+            assert bigip.commits == 0
+        # writes after the context are immediate again
+        create_pools(bigips, 1)
+        assert bigips[0].commits == 1
+
+    def test_rollback_when_commit_fails(self, bigips):
+        create_pools(bigips[1:], 1)
+        with pytest.raises(f5_ex.TransactionCommitException):
+            with resource_helper.transaction(bigips):
+                create_pools(bigips, 3)
+
+        assert len(bigips[0].objects) == 3
+        assert len(bigips[1].objects) == 1
+        assert bigips[1].commits == 1
+
+    def test_immediate_resource_types(self, bigips):
+        folder_helper = BigIPResourceHelper(ResourceType.folder)
+        with resource_helper.transaction(bigips) as transactions:
+            folder_helper.create(bigips[0], {'name': 'Project_t1',
+                                             'partition': '/'})
+            assert len(bigips[0].objects) == 1
+            assert transactions['bigip1'].transaction is None
+        assert bigips[0].commits == 1
+
+    def test_nested_transaction_joins(self, bigips):
+        with resource_helper.transaction(bigips):
+            with resource_helper.transaction(bigips):
+                create_pools(bigips, 2)
+            assert not bigips[0].objects
+            BigIPResourceHelper(ResourceType.pool).create(
+                bigips[0], {'name': 'other', 'partition': 'Project_t1'})
+        assert bigips[0].commits == 1
+        assert len(bigips[0].objects) == 3
+
+    def test_no_writes_no_transaction(self, bigips):
+        with resource_helper.transaction(bigips) as transactions:
+            pass
+        assert transactions['bigip1'].transaction is None
+        assert bigips[0].commits == 0
+
+
+class RecordedDevice(BaseAdapter):
+    """iControl REST device answering from recorded objects.
+
+    objects maps REST paths, e.g. /mgmt/tm/ltm/pool/~Project_t1~pool1, to
+    their attributes and stats entries. Every request sent to the device
+    is recorded as (method, path) in requests.
+    """
+
+    def __init__(self):
+        super(RecordedDevice, self).__init__()
+        self.objects = {}
+        self.requests = []
+
+    def add(self, path, stats=None, **attributes):
+        self.objects[path] = dict(attributes, stats=stats or {})
+
+    def send(self, request, **kwargs):
+        # icontrol appends a slash to some uris
+        path = urlparse.urlsplit(request.url).path.rstrip('/')
+        self.requests.append((request.method, path))
+        status, body = 200, {}
+        if path == '/mgmt/tm/sys':
+            body = {'selfLink': 'https://localhost/mgmt/tm/sys?ver=12.1.2'}
+        elif path.endswith('/stats'):
+            path = path[:-len('/stats')]
+            if path in self.objects:
+                body = {'kind': self._kind(path, 'stats'),
+                        'entries': self.objects[path]['stats']}
+            else:
+                status = 404
+        elif path not in self.objects:
+            status = 404
+        elif request.method == 'DELETE':
+            del self.objects[path]
+        else:
+            if request.method in ['PATCH', 'PUT']:
+                self.objects[path].update(json.loads(request.body))
+            body = dict(self.objects[path], kind=self._kind(path, 'state'),
+                        selfLink='https://localhost%s?ver=12.1.2' % path)
+            body.pop('stats')
+
+        response = requests.Response()
+        response.status_code = status
+        response.reason = 'OK' if status == 200 else 'Not Found'
+        response._content = json.dumps(body)
+        response.headers['Content-Type'] = 'application/json'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _kind(path, suffix):
+        # /mgmt/tm/ltm/pool/~P~p/members/~P~m -> tm:ltm:pool:members:...
+        parts = [part for part in path.split('/')[2:]
+                 if not part.startswith('~')]
+        return ':'.join(parts + [parts[-1] + suffix])
+
+
+POOL = '/mgmt/tm/ltm/pool/~Project_t1~pool1'
+MEMBER = POOL + '/members/~Project_t1~member1'
+STATS = {'https://localhost/mgmt/tm/ltm/pool/~Project_t1~pool1/stats': {
+    'nestedStats': {'entries': {
+        'serverside.curConns': {'value': 7},
+        'status.availabilityState': {'description': 'available'}}}}}
+
+
+@pytest.fixture
+def device():
+    device = RecordedDevice()
+    with mock.patch.object(requests.Session, 'get_adapter',
+                           return_value=device):
+        bigip = ManagementRoot('bigip1', 'admin', 'admin')
+    bigip._meta_data['icr_session'].session.mount('https://', device)
+    device.bigip = bigip
+    device.add(POOL, name='pool1', partition='Project_t1', stats=STATS)
+    device.add(MEMBER, name='member1', partition='Project_t1', stats=STATS)
+    del device.requests[:]
+    return device
+
+
+class TestSingleRoundTrip(object):
+    """Requests of the operations which used exists() before load().
+
+    The comments give the number of requests with exists() and load().
+    """
+
+    def test_try_load(self, device):
+        helper = BigIPResourceHelper(ResourceType.pool)
+        pool = helper.try_load(device.bigip, name='pool1',
+                               partition='Project_t1')
+        assert pool.name == 'pool1'
+        assert helper.try_load(device.bigip, name='pool2',
+                               partition='Project_t1') is None
+        # 2 + 1
+        assert device.requests == [('GET', POOL),
+                                   ('GET', POOL.replace('pool1', 'pool2'))]
+
+    def test_delete(self, device):
+        helper = BigIPResourceHelper(ResourceType.pool)
+        assert helper.try_delete(device.bigip, name='pool1',
+                                 partition='Project_t1')
+        helper.delete(device.bigip, name='pool1', partition='Project_t1')
+        # 3 + 1
+        assert device.requests == [('DELETE', POOL), ('DELETE', POOL)]
+        assert POOL not in device.objects
+
+    def test_delete_folder_loads_it(self, device):
+        folder = '/mgmt/tm/sys/folder/~Project_t1'
+        device.add(folder, name='Project_t1')
+        helper = BigIPResourceHelper(ResourceType.folder)
+        assert helper.try_delete(device.bigip, name='Project_t1')
+        assert device.requests == [('GET', folder), ('DELETE', folder)]
+
+    def test_get_stats(self, device):
+        helper = BigIPResourceHelper(ResourceType.pool)
+        keys = ['serverside.curConns', 'status.availabilityState']
+        assert helper.get_stats(device.bigip, name='pool1',
+                                partition='Project_t1', stat_keys=keys) == {
+            'serverside.curConns': 7,
+            'status.availabilityState': 'available'}
+        assert helper.get_stats(device.bigip, name='pool2',
+                                partition='Project_t1', stat_keys=keys) == {}
+        # 3 + 1
+        assert device.requests == [
+            ('GET', POOL + '/stats'),
+            ('GET', POOL.replace('pool1', 'pool2') + '/stats')]
+
+    def test_errors_are_raised(self, device):
+        device.send = mock.Mock(side_effect=HTTPError(
+            response=mock.Mock(status_code=401)))
+        pool = device.bigip.tm.ltm.pools.pool
+        for call in [resource_helper.try_load, resource_helper.try_delete,
+                     resource_helper.try_stats]:
+            with pytest.raises(HTTPError):
+                call(pool, name='pool1', partition='Project_t1')
+
+    def test_pool_members(self, device):
+        adapter = mock.Mock()
+        adapter.get_pool.return_value = {'name': 'pool1',
+                                         'partition': 'Project_t1'}
+        adapter.get_member.side_effect = lambda service: {
+            'name': 'member1', 'address': '10.0.0.1%2'}
+        adapter.get_member_node.return_value = {'name': 'node1',
+                                                'partition': 'Project_t1'}
+        builder = PoolServiceBuilder(adapter)
+
+        status = builder.get_member_status({}, device.bigip,
+                                           ['status.availabilityState'])
+        assert status == {'status.availabilityState': 'available'}
+        builder.update_member({}, [device.bigip])
+        builder.delete_member({}, [device.bigip])
+        # 4 + 4 + 7
+        assert device.requests == [
+            ('GET', POOL), ('GET', MEMBER + '/stats'),
+            ('GET', POOL), ('GET', MEMBER), ('PATCH', MEMBER),
+            ('GET', POOL), ('DELETE', MEMBER),
+            ('DELETE', '/mgmt/tm/ltm/node/~Project_t1~node1')]
+
+    def test_network_helper(self, device):
+        tunnel = '/mgmt/tm/net/fdb/tunnel/~Project_t1~tunnel1'
+        device.add(tunnel, name='tunnel1', partition='Project_t1',
+                   records=[{'name': 'fa:16:3e:00:00:01',
+                             'endpoint': '10.1.0.1'}])
+        net_tunnel = '/mgmt/tm/net/tunnels/tunnel/~Project_t1~tunnel1'
+        device.add(net_tunnel, name='tunnel1', partition='Project_t1')
+        arp = '/mgmt/tm/net/arp/~Project_t1~10.0.0.1'
+        device.add(arp, name='10.0.0.1', partition='Project_t1')
+        helper = NetworkHelper()
+
+        assert helper.get_fdb_entry(device.bigip, tunnel_name='tunnel1',
+                                    partition='Project_t1') == \
+            device.objects[tunnel]['records']
+        helper.arp_delete(device.bigip, '10.0.0.1%0',
+                          partition='Project_t1')
+        with mock.patch.object(helper, 'arp_delete_by_mac') as by_mac:
+            helper.delete_tunnel(device.bigip, 'tunnel1',
+                                 partition='Project_t1')
+        by_mac.assert_called_once_with(device.bigip, 'fa:16:3e:00:00:01',
+                                       partition='Project_t1')
+        # 2 + 3 + 6
+        assert device.requests == [
+            ('GET', tunnel),
+            ('DELETE', arp),
+            ('GET', tunnel), ('PATCH', tunnel), ('DELETE', net_tunnel)]
@@ -0,0 +1,187 @@
+# coding=utf-8
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import eventlet
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.resync_engine import \
+    ResyncEngine
+from f5_openstack_agent.lbaasv2.drivers.bigip.resync_engine import \
+    ResyncTracker
+
+
+class TestResyncEngine(object):
+    def test_concurrency_is_bounded(self):
+        state = {'running': 0, 'peak': 0}
+
+        def worker(lb_id):
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+            eventlet.sleep(0.01)
+            state['running'] -= 1
+            return lb_id
+
+        engine = ResyncEngine(3)
+        results = engine.run('test', ['lb%d' % i for i in range(10)], worker)
+
+        assert state['peak'] == 3
+        assert results == dict(('lb%d' % i, 'lb%d' % i) for i in range(10))
+        assert len(engine.timings) == 10
+
+    def test_timings_of_last_run_are_kept(self):
+        engine = ResyncEngine(2)
+        engine.run('test', ['lb1', 'lb2'], lambda lb_id: True)
+        engine.run('test', ['lb3'], lambda lb_id: True)
+
+        assert list(engine.timings) == ['lb3']
+
+    def test_each_loadbalancer_runs_once(self):
+        calls = []
+
+        def worker(lb_id):
+            calls.append(lb_id)
+            eventlet.sleep(0)
+
+        ResyncEngine(4).run('test', ['a', 'b', 'a', 'c', 'b'], worker)
+
+        assert sorted(calls) == ['a', 'b', 'c']
+
+    def test_failing_worker_does_not_abort_run(self):
+        def worker(lb_id):
+            if lb_id == 'bad':
+                raise Exception('boom')
+            return True
+
+        results = ResyncEngine(2).run('test', ['good', 'bad', 'other'],
+                                      worker)
+
+        assert results == {'good': True, 'bad': None, 'other': True}
+
+    def test_progress(self):
+        reported = []
+
+        def progress(lb_id, result, seconds, done, total, eta):
+            reported.append((lb_id, result, done, total))
+            assert seconds >= 0 and eta >= 0
+
+        ResyncEngine(1).run('test', ['a', 'b'], lambda lb_id: lb_id.upper(),
+                            progress=progress)
+
+        assert reported == [('a', 'A', 1, 2), ('b', 'B', 2, 2)]
+
+    def test_invalid_concurrency(self):
+        assert ResyncEngine(0).concurrency == 1
+        assert ResyncEngine(None).concurrency == 1
+
+    def test_empty_run(self):
+        assert ResyncEngine(2).run('test', [], lambda lb_id: True) == {}
+
+
+def _service(lb_id, tenant_id='t1', **kwargs):
+    loadbalancer = {'id': lb_id, 'tenant_id': tenant_id,
+                    'provisioning_status': 'ACTIVE',
+                    'operating_status': 'ONLINE'}
+    loadbalancer.update(kwargs)
+    return {'loadbalancer': loadbalancer, 'members': []}
+
+
+class TestResyncTracker(object):
+    @staticmethod
+    def tracker(**kwargs):
+        tracker = ResyncTracker(max_age=1000, spread_cycles=4,
+                                cycle_interval=100, **kwargs)
+        for i in range(8):
+            lb_id = 'lb%d' % i
+            tracker.verified(lb_id, _service(lb_id, 't%d' % (i % 2)),
+                             now=i)
+        tracker.update_device_fingerprints({'t0': 'a', 't1': 'b'})
+        tracker.update_device_fingerprints({'t0': 'a', 't1': 'b'})
+        return tracker
+
+    def test_fingerprint_ignores_volatile_keys(self):
+        assert ResyncTracker.fingerprint(_service('lb1')) == \
+            ResyncTracker.fingerprint(_service('lb1',
+                                               operating_status='OFFLINE'))
+        assert ResyncTracker.fingerprint(_service('lb1')) != \
+            ResyncTracker.fingerprint(_service('lb1', admin_state_up=False))
+
+    def test_unchanged_spread_over_cycles(self):
+        tracker = self.tracker()
+        lb_ids = ['lb%d' % i for i in range(8)] + ['new']
+        seen = set()
+        for cycle in range(4):
+            selected = tracker.select(lb_ids, now=100 + cycle * 100)
+            assert 'new' in selected
+            assert len(selected) == 4
+            for lb_id in selected - set(['new']):
+                assert not tracker.needs_validation(
+                    lb_id, _service(lb_id, 't%d' % (int(lb_id[-1]) % 2)),
+                    now=100 + cycle * 100)
+                tracker.checked(lb_id, now=100 + cycle * 100)
+            seen.update(selected)
+        assert seen == set(lb_ids)
+
+    def test_no_slice_before_cycle_interval(self):
+        tracker = self.tracker()
+        assert len(tracker.select(['lb0', 'lb1'], now=100)) == 1
+        assert tracker.select(['lb0', 'lb1'], now=150) == set()
+
+    def test_changed_definition(self):
+        tracker = self.tracker()
+        assert tracker.needs_validation(
+            'lb0', _service('lb0', 't0', admin_state_up=False), now=100)
+
+    def test_changed_tenant_on_device(self):
+        tracker = self.tracker()
+        tracker.update_device_fingerprints({'t0': 'a', 't1': 'c'})
+        selected = tracker.select(['lb%d' % i for i in range(8)], now=100)
+        assert set(['lb1', 'lb3', 'lb5', 'lb7']) <= selected
+        assert tracker.needs_validation('lb1', _service('lb1', 't1'),
+                                        now=100)
+
+    def test_failed_validation_of_changed_tenant_is_retried(self):
+        tracker = self.tracker()
+        lb_ids = ['lb%d' % i for i in range(8)]
+        tracker.update_device_fingerprints({'t0': 'a', 't1': 'c'})
+        tracker.select(lb_ids, now=100)
+        # lb1 failed, the others of t1 were validated
+        for lb_id in ['lb3', 'lb5', 'lb7']:
+            tracker.verified(lb_id, _service(lb_id, 't1'), now=100)
+
+        # the device is unchanged since
+        tracker.update_device_fingerprints({'t0': 'a', 't1': 'c'})
+        selected = tracker.select(lb_ids, now=150)
+        assert selected == set(['lb1'])
+        assert tracker.needs_validation('lb1', _service('lb1', 't1'),
+                                        now=150)
+
+        tracker.verified('lb1', _service('lb1', 't1'), now=150)
+        assert tracker.select(lb_ids, now=160) == set()
+
+    def test_overdue_first(self):
+        tracker = self.tracker()
+        lb_ids = ['lb%d' % i for i in range(8)]
+        for lb_id in lb_ids:
+            tracker.checked(lb_id, now=500)
+        tracker.verified('lb0', _service('lb0', 't0'), now=900)
+        # lb1 and lb2 are overdue at 1003
+        assert tracker.select(lb_ids, now=1003) == set(['lb1', 'lb2'])
+        assert tracker.needs_validation('lb2', _service('lb2', 't0'),
+                                        now=1003)
+
+    def test_deleted_loadbalancers_are_forgotten(self):
+        tracker = self.tracker()
+        tracker.select(['lb0'], now=100)
+        assert list(tracker.state) == ['lb0']
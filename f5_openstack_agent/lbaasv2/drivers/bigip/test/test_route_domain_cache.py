@@ -0,0 +1,164 @@
+# coding=utf-8
+# Copyright 2017 F5 Networks Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import \
+    ResourceType
+from f5_openstack_agent.lbaasv2.drivers.bigip.route_domain_cache import \
+    CidrIndex
+from f5_openstack_agent.lbaasv2.drivers.bigip.route_domain_cache import \
+    RouteDomainCache
+
+import mock
+import pytest
+
+COLLECTIONS = {
+    ResourceType.route_domain: [
+        {'name': 'rd-net1', 'partition': 'Common', 'id': 3},
+        {'name': 'Project_t1', 'partition': 'Project_t1', 'id': 5,
+         'vlans': ['/Project_t1/vlan-100', '/Project_t1/tunnel-vxlan-7']},
+        {'name': 'Project_t2', 'partition': 'Project_t2', 'id': 6}],
+    ResourceType.vlan: [
+        {'name': 'vlan-100', 'partition': 'Project_t1', 'tag': 100}],
+    ResourceType.tunnel: [
+        {'name': 'tunnel-vxlan-7', 'partition': 'Project_t1', 'key': 7}],
+    ResourceType.selfip: [
+        {'name': 'local-bigip1-subnet1', 'partition': 'Project_t1',
+         'address': '10.1.0.2%5/24', 'vlan': '/Project_t1/vlan-100'},
+        {'name': 'local-bigip1-subnet2', 'partition': 'Project_t1',
+         'address': '10.2.0.2%5/16', 'vlan': '/Project_t1/tunnel-vxlan-7'}],
+}
+
+
+@pytest.fixture
+def collections():
+    return COLLECTIONS
+
+
+class TestCidrIndex(object):
+    def test_find_overlap(self):
+        index = CidrIndex()
+        index.add('a', '10.1.0.0/16')
+        index.add('b', '10.3.4.0/24')
+        index.add('c', 'fd00::/64')
+
+        assert index.find_overlap('10.1.2.0/24') == 'a'
+        assert index.find_overlap('10.0.0.0/8') in ['a', 'b']
+        assert index.find_overlap('10.3.4.128/25') == 'b'
+        assert index.find_overlap('10.3.5.0/24') is None
+        assert index.find_overlap('10.1.0.0/16', exclude='a') is None
+        assert index.find_overlap('fd00::/48') == 'c'
+        assert index.find_overlap('fd01::/64') is None
+
+    def test_discard(self):
+        index = CidrIndex()
+        index.add('a', '10.1.0.0/16')
+        index.add('a', '10.2.0.0/16')
+        assert index.find_overlap('10.1.0.0/24') is None
+        index.discard('a')
+        assert index.find_overlap('10.2.0.0/24') is None
+        assert not index.blocks
+
+
+class TestRouteDomainCache(object):
+    def test_load(self, bigip, fetched):
+        cache = RouteDomainCache()
+        cache.load([bigip], 'Project_')
+
+        assert len(fetched) == 4
+        assert cache.loaded
+        assert cache.get_named_route_domain('net1') == 3
+        assert cache.get_route_domain('vlan-100') == 5
+        assert cache.get_route_domain('vxlan-7') == 5
+        assert cache.get_route_domain('vlan-200') is None
+        assert cache.route_domain_ids('t1') == [5]
+        assert cache.route_domain_ids('t2') == []
+        assert cache.find_overlap('t1', 5, '10.2.3.0/24') == 'subnet2'
+        assert cache.find_overlap('t1', 5, '10.3.0.0/24') is None
+
+    def test_remove_subnet(self, bigip, fetched):
+        cache = RouteDomainCache()
+        cache.load([bigip], 'Project_')
+
+        cache.remove_subnet('vlan-100', 'subnet1')
+        assert cache.get_route_domain('vlan-100') is None
+        assert cache.route_domain_ids('t1') == [5]
+        cache.remove_subnet('vxlan-7', 'subnet2')
+        assert cache.route_domain_ids('t1') == []
+        assert cache.find_overlap('t1', 5, '10.2.3.0/24') is None
+
+    def test_save_restore(self, bigip, fetched, tmpdir):
+        path = str(tmpdir.join('rds.json'))
+        cache = RouteDomainCache(path)
+        cache.load([bigip], 'Project_')
+        cache.add_subnet('t1', 5, 'vlan-300', 'subnet3', '10.9.0.0/24')
+        cache.save()
+
+        other = mock.MagicMock(hostname='bigip2.example.com')
+        restored = RouteDomainCache(path)
+        assert not restored.restore([other], 'Project_')
+        assert restored.restore([bigip], 'Project_')
+        assert restored.loaded
+        assert restored.get_named_route_domain('net1') == 3
+        assert restored.get_route_domain('vlan-300') == 5
+        assert restored.find_overlap('t1', 5, '10.9.0.0/16') == 'subnet3'
+        assert restored.find_overlap('t1', 5, '10.1.0.0/24') == 'subnet1'
+        # only the route domains are fetched to check the restored cache
+        assert len(fetched) == 5
+        assert fetched[-1] == (ResourceType.route_domain,
+                               ('name', 'partition', 'id'), None)
+
+    @pytest.mark.parametrize('named, tenant_rd', [
+        # a tenant route domain which is gone
+        ({'net1': 3}, ('t3', 9)),
+        # a network route domain with another id
+        ({'net1': 4}, ('t1', 5)),
+        # a network route domain which is gone
+        ({'net1': 3, 'net2': 4}, ('t1', 5)),
+    ])
+    def test_restore_changed_route_domains(self, bigip, fetched, tmpdir,
+                                           named, tenant_rd):
+        path = str(tmpdir.join('rds.json'))
+        cache = RouteDomainCache(path)
+        cache.load([bigip], 'Project_')
+        for network_id, route_domain_id in named.items():
+            cache.set_named_route_domain(network_id, route_domain_id)
+        cache.add_subnet(tenant_rd[0], tenant_rd[1], 'vlan-300', 'subnet3',
+                         '10.9.0.0/24')
+        cache.save()
+
+        restored = RouteDomainCache(path)
+        assert not restored.restore([bigip], 'Project_')
+        assert not restored.loaded
+        assert restored.get_route_domain('vlan-300') is None
+
+    def test_invalidate(self, bigip, fetched, tmpdir):
+        path = str(tmpdir.join('rds.json'))
+        cache = RouteDomainCache(path)
+        cache.load([bigip], 'Project_')
+        cache.save()
+
+        cache.invalidate()
+        assert not cache.loaded
+        assert not cache.restore([bigip], 'Project_')
+        cache.load([bigip], 'Project_')
+        assert cache.loaded and not cache.stale
+
+    def test_restore_invalid_file(self, bigip, tmpdir):
+        path = tmpdir.join('rds.json')
+        path.write('{broken')
+        cache = RouteDomainCache(str(path))
+        assert not cache.restore([bigip], 'Project_')
+        assert not cache.loaded
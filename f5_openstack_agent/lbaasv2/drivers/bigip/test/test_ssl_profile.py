@@ -22,6 +22,11 @@ from f5_openstack_agent.lbaasv2.drivers.bigip.ssl_profile import \
 
 import mock
 import pytest
+from requests import HTTPError
+
+
+def not_found(*args, **kwargs):
+    raise HTTPError(response=mock.Mock(status_code=404))
 
 
 class TestSSLProfileHelper(object):
@@ -43,6 +48,8 @@ class TestSSLProfileHelper(object):
         bigip = mock.MagicMock()
         bigip.tm.ltm.profile.client_ssls.client_ssl = mock.MagicMock()
         bigip.tm.ltm.profile.client_ssls.client_ssl.exists.return_value = False
+        bigip.tm.ltm.profile.client_ssls.client_ssl.load.side_effect = \
+            not_found
         SSLProfileHelper.create_client_ssl_profile(
             bigip, 'testprofile', 'testcert', 'testkey', parent_profile=None)
         bigip.tm.ltm.profile.client_ssls.client_ssl.create.assert_called_with(
@@ -68,6 +75,8 @@ class TestSSLProfileHelper(object):
         bigip = mock.MagicMock()
         bigip.tm.ltm.profile.client_ssls.client_ssl = mock.MagicMock()
         bigip.tm.ltm.profile.client_ssls.client_ssl.exists.return_value = False
+        bigip.tm.ltm.profile.client_ssls.client_ssl.load.side_effect = \
+            not_found
         SSLProfileHelper.create_client_ssl_profile(
             bigip, 'testprofile', 'testcert', 'testkey',
             parent_profile="testparentprofile"
@@ -110,6 +119,8 @@ class TestSSLProfileHelper(object):
         bigip = mock.MagicMock()
         bigip.tm.ltm.profile.client_ssls.client_ssl = mock.MagicMock()
         bigip.tm.ltm.profile.client_ssls.client_ssl.exists.return_value = False
+        bigip.tm.ltm.profile.client_ssls.client_ssl.load.side_effect = \
+            not_found
         bigip.tm.ltm.profile.client_ssls.client_ssl.create =\
             mock.MagicMock(side_effect=err)
         with pytest.raises(SSLProfileError):
@@ -117,3 +128,74 @@ class TestSSLProfileHelper(object):
                 bigip, 'testprofile', 'testcert', 'testkey',
                 parent_profile="parentprofile"
             )
+
+    def _bigip(self, descriptions):
+        # descriptions maps existing profile names to their description
+        bigip = mock.MagicMock()
+        client_ssl = bigip.tm.ltm.profile.client_ssls.client_ssl
+        client_ssl.exists.side_effect = \
+            lambda name, partition: name in descriptions
+
+        bigip.profiles = {}
+        for name, description in descriptions.items():
+            bigip.profiles[name] = mock.MagicMock(description=description)
+
+        def load(name, partition):
+            if name not in bigip.profiles:
+                not_found()
+            return bigip.profiles[name]
+        client_ssl.load.side_effect = load
+        return bigip
+
+    def test_fingerprint(self):
+        fingerprint = SSLProfileHelper.get_fingerprint('cert', 'key')
+        assert fingerprint.startswith('sha256:')
+        assert fingerprint == SSLProfileHelper.get_fingerprint(
+            u'cert', 'key', None, '')
+        assert fingerprint != SSLProfileHelper.get_fingerprint(
+            'cert', 'key', 'chain')
+        assert fingerprint != SSLProfileHelper.get_fingerprint('key', 'cert')
+
+    def test_unchanged_profile_is_skipped(self):
+        fingerprint = SSLProfileHelper.get_fingerprint('cert', 'key')
+        bigip = self._bigip({'testprofile': fingerprint})
+        SSLProfileHelper.create_client_ssl_profile(
+            bigip, 'testprofile', 'cert', 'key', sni_default=True)
+        assert not bigip.shared.file_transfer.uploads.upload_bytes.called
+        assert not bigip.tm.ltm.profile.client_ssls.client_ssl.create.called
+
+    def test_installed_cert_is_reused(self):
+        fingerprint = SSLProfileHelper.get_fingerprint('cert', 'key')
+        bigip = self._bigip({'testprofile': fingerprint})
+        SSLProfileHelper.create_client_ssl_profile(
+            bigip, 'testprofile', 'cert', 'key', sni_default=False)
+        assert not bigip.shared.file_transfer.uploads.upload_bytes.called
+        bigip.tm.ltm.profile.client_ssls.client_ssl.create.assert_called_with(
+            name='testprofile_NotDefault',
+            partition='Common',
+            certKeyChain=[
+                {'name': 'testprofile',
+                 'cert': '/Common/testprofile.crt',
+                 'key': '/Common/testprofile.key'}
+            ],
+            description=fingerprint,
+            sniDefault=False,
+            defaultsFrom=None,
+        )
+
+    def test_rotated_cert_is_redeployed(self):
+        old = SSLProfileHelper.get_fingerprint('old', 'key')
+        bigip = self._bigip({'testprofile': old,
+                             'testprofile_NotDefault': old})
+        SSLProfileHelper.create_client_ssl_profile(
+            bigip, 'testprofile', 'new', 'key', sni_default=True)
+
+        uploads = bigip.shared.file_transfer.uploads.upload_bytes
+        assert uploads.call_args_list[0] == \
+            mock.call('new', 'testprofile.crt')
+        assert bigip.tm.sys.crypto.certs.exec_cmd.call_count == 1
+        assert not bigip.tm.ltm.profile.client_ssls.client_ssl.create.called
+        modify = bigip.profiles['testprofile'].modify
+        assert modify.call_args[1]['description'] == \
+            SSLProfileHelper.get_fingerprint('new', 'key')
+        assert not bigip.profiles['testprofile_NotDefault'].modify.called
@@ -14,6 +14,10 @@
 # limitations under the License.
 #
 
+from f5_openstack_agent.lbaasv2.drivers.bigip.stat_helper import \
+    CapacityStatistics
+from f5_openstack_agent.lbaasv2.drivers.bigip.stat_helper import \
+    parse_capacity_statistics
 from f5_openstack_agent.lbaasv2.drivers.bigip.stat_helper import StatHelper
 
 import mock
@@ -332,3 +336,31 @@ class TestStatHelper(object):
         sh = StatHelper()
         conns = sh.get_throughput(bigip)
         assert(conns == 24820)
+
+    def test_parse_capacity_statistics(self):
+        stats = parse_capacity_statistics(API_ANONYMOUS)
+        assert stats == CapacityStatistics(
+            active_connections=0, throughput_in=16995, throughput_out=7825,
+            ssl_tps=0, since="2016-09-01T14:53:10Z")
+
+    def test_parse_capacity_statistics_missing_rows(self):
+        stats = parse_capacity_statistics(
+            API_ANONYMOUS.split('Sys::Performance Throughput')[0])
+        assert stats.throughput_in == 0
+        assert stats.ssl_tps == 0
+        assert parse_capacity_statistics('') == CapacityStatistics(
+            0, 0, 0, 0, None)
+
+    def test_get_capacity_statistics(self):
+        bigip = mock.MagicMock()
+        bigip.tm.sys.performances.all_stats.load().__dict__ = ALL_STATS_1
+        sh = StatHelper()
+        stats = sh.get_capacity_statistics(bigip)
+        assert sh.get_throughput(bigip, global_stats=stats) == 24820
+        assert sh.get_active_SSL_TPS(bigip, global_stats=stats) == 0
+
+    def test_get_capacity_statistics_no_api_raw_values(self):
+        bigip = mock.MagicMock()
+        bigip.tm.sys.performances.all_stats.load().__dict__ = {}
+        sh = StatHelper()
+        assert sh.get_capacity_statistics(bigip) is None
@@ -14,6 +14,8 @@
 # limitations under the License.
 #
 
+import eventlet
+
 import f5_openstack_agent.lbaasv2.drivers.bigip.utils as utils
 from f5_openstack_agent.lbaasv2.drivers.bigip.utils import IpNotInCidrNotation
 
@@ -30,33 +32,6 @@ class TestUtils(object):
         domain = utils.strip_domain_address('192.168.1.1%20/24')
         assert domain == "192.168.1.1/24"
 
-    def test_request_index_0(self):
-        request_q = [
-            [1, 2, 3],
-            [2, 4, 6],
-            [3, 6, 9]
-        ]
-        index = utils.request_index(request_q, 1)
-        assert index == 0
-
-    def test_request_index_1(self):
-        request_q = [
-            [1, 2, 3],
-            [2, 4, 6],
-            [3, 6, 9]
-        ]
-        index = utils.request_index(request_q, 2)
-        assert index == 1
-
-    def test_request_index_none(self):
-        request_q = [
-            [1, 2, 3],
-            [2, 4, 6],
-            [3, 6, 9]
-        ]
-        index = utils.request_index(request_q, 99)
-        assert index == len(request_q)
-
     def test_get_filter_v11_5(self):
         bigip = mock.MagicMock()
         bigip.tmos_version = "11.5"
@@ -92,6 +67,23 @@ class TestUtils(object):
             utils.strip_cidr_netmask('10.1.1.1')
         assert '' in ex.value.message
 
+    def test_split_member_name(self):
+        assert utils.split_member_name('10.0.0.1%2:80') == \
+            ('10.0.0.1', '2', '80')
+        assert utils.split_member_name('10.0.0.1:8080') == \
+            ('10.0.0.1', None, '8080')
+        assert utils.split_member_name('2001:db8::1%2.80') == \
+            ('2001:db8::1', '2', '80')
+        assert utils.split_member_name('2001:db8::1.443') == \
+            ('2001:db8::1', None, '443')
+
+    def test_member_key(self):
+        assert utils.member_key('10.0.0.1', 80) == '10.0.0.1:80'
+        assert utils.member_key('2001:DB8:0::1', '80') == \
+            utils.member_key('2001:db8::1', 80)
+        assert utils.member_key('10.0.0.1', 80) != \
+            utils.member_key('10.0.0.1', 8080)
+
     def test_get_device_info(self):
         bigip = mock.MagicMock()
         device = mock.MagicMock()
@@ -99,3 +91,146 @@ class TestUtils(object):
         bigip.tm.cm.devices.get_collection.return_value = [device]
         ret = utils.get_device_info(bigip)
         assert ret is device
+
+
+class FakeDriver(object):
+    def __init__(self, scope='tenant'):
+        self.conf = mock.MagicMock()
+        self.conf.ccloud_serialize_scope = scope
+        self.scheduler = utils.RequestScheduler()
+        self.events = []
+
+    @utils.serialized('create_member')
+    def create_member(self, member, service):
+        self.events.append(('start', member))
+        eventlet.sleep(0.01)
+        self.events.append(('end', member))
+
+    @utils.serialized('delete_member')
+    def delete_member(self, member, service):
+        raise Exception('boom')
+
+    @utils.serialized('backup_configuration')
+    def backup_configuration(self):
+        self.events.append(('start', 'backup'))
+        eventlet.sleep(0.01)
+        self.events.append(('end', 'backup'))
+
+
+def _service(lb_id, tenant_id):
+    return {'loadbalancer': {'id': lb_id, 'tenant_id': tenant_id}}
+
+
+class TestSerialized(object):
+    def _run(self, driver, calls):
+        pool = eventlet.GreenPool()
+        for call in calls:
+            pool.spawn(*call)
+        pool.waitall()
+        return driver.events
+
+    def test_same_tenant_is_serialized_in_order(self):
+        driver = FakeDriver()
+        events = self._run(driver, [
+            (driver.create_member, 'm1', _service('lb1', 't1')),
+            (driver.create_member, 'm2', _service('lb2', 't1')),
+            (driver.create_member, 'm3', _service('lb1', 't1'))])
+        assert events == [('start', 'm1'), ('end', 'm1'),
+                          ('start', 'm2'), ('end', 'm2'),
+                          ('start', 'm3'), ('end', 'm3')]
+
+    def test_different_tenants_run_in_parallel(self):
+        driver = FakeDriver()
+        events = self._run(driver, [
+            (driver.create_member, 'm1', _service('lb1', 't1')),
+            (driver.create_member, 'm2', _service('lb2', 't2'))])
+        assert events[:2] == [('start', 'm1'), ('start', 'm2')]
+
+    def test_loadbalancer_scope(self):
+        driver = FakeDriver(scope='loadbalancer')
+        events = self._run(driver, [
+            (driver.create_member, 'm1', _service('lb1', 't1')),
+            (driver.create_member, 'm2', _service('lb2', 't1'))])
+        assert events[:2] == [('start', 'm1'), ('start', 'm2')]
+
+    def test_global_scope(self):
+        driver = FakeDriver(scope='global')
+        events = self._run(driver, [
+            (driver.create_member, 'm1', _service('lb1', 't1')),
+            (driver.create_member, 'm2', _service('lb2', 't2'))])
+        assert events[:2] == [('start', 'm1'), ('end', 'm1')]
+
+    def test_request_without_service_is_exclusive(self):
+        driver = FakeDriver()
+        events = self._run(driver, [
+            (driver.create_member, 'm1', _service('lb1', 't1')),
+            (driver.backup_configuration,),
+            (driver.create_member, 'm2', _service('lb2', 't2'))])
+        assert events == [('start', 'm1'), ('end', 'm1'),
+                          ('start', 'backup'), ('end', 'backup'),
+                          ('start', 'm2'), ('end', 'm2')]
+
+    def test_failed_request_releases_key(self):
+        driver = FakeDriver()
+        service = _service('lb1', 't1')
+        with pytest.raises(Exception):
+            driver.delete_member('m1', service)
+        driver.create_member('m2', service)
+        assert driver.events == [('start', 'm2'), ('end', 'm2')]
+        assert driver.scheduler.queue_depth() == 0
+        assert driver.scheduler.get_metrics()['delete_member']['failed'] == 1
+
+    def test_metrics(self):
+        driver = FakeDriver()
+        self._run(driver, [
+            (driver.create_member, 'm1', _service('lb1', 't1')),
+            (driver.create_member, 'm2', _service('lb1', 't1'))])
+        metrics = driver.scheduler.get_metrics()['create_member']
+        assert metrics['requests'] == 2
+        assert metrics['failed'] == 0
+        assert metrics['max_queue_depth'] == 1
+        assert metrics['max_wait_time'] > 0
+        assert metrics['avg_service_time'] > 0
+
+
+def _bigip(hostname):
+    bigip = mock.MagicMock()
+    bigip.hostname = hostname
+    return bigip
+
+
+class TestFanOut(object):
+    def test_devices_run_in_parallel(self):
+        events = []
+
+        def assure(bigip, name):
+            events.append(('start', bigip.hostname))
+            eventlet.sleep(0.01)
+            events.append(('end', bigip.hostname))
+            return name + bigip.hostname
+
+        results = utils.fan_out([_bigip('b1'), _bigip('b2')], assure, 'x-')
+        assert results == {'b1': 'x-b1', 'b2': 'x-b2'}
+        assert events[:2] == [('start', 'b1'), ('start', 'b2')]
+
+    def test_first_error_raised_after_all_devices(self):
+        done = []
+
+        def assure(bigip):
+            eventlet.sleep(0.01)
+            done.append(bigip.hostname)
+            if bigip.hostname != 'b2':
+                raise ValueError(bigip.hostname)
+
+        with pytest.raises(ValueError) as ex:
+            utils.fan_out([_bigip('b1'), _bigip('b2'), _bigip('b3')],
+                          assure)
+        assert str(ex.value) == 'b1'
+        assert sorted(done) == ['b1', 'b2', 'b3']
+
+    def test_single_device(self):
+        bigip = _bigip('b1')
+        func = mock.MagicMock(return_value='ok')
+        assert utils.fan_out([bigip], func, delete=True) == {'b1': 'ok'}
+        func.assert_called_once_with(bigip, delete=True)
+        assert utils.fan_out([], func) == {}
@@ -303,7 +303,7 @@ def test_assoc_vlan_with_vcmp_guest_already_assoc(setup_vcmp_method_test):
 @mock.patch('f5_openstack_agent.lbaasv2.drivers.bigip.vcmp.LOG', mock_log)
 def test_assoc_vlan_with_vcmp_guest_create_exception(setup_vcmp_method_test):
     vcmp, mock_bigip = setup_vcmp_method_test
-    mock_bigip.tm.net.vlans.vlan.exists.side_effect = Exception('test')
+    mock_bigip.tm.net.vlans.vlan.load.side_effect = Exception('test')
     vcmp._is_vlan_assoc_with_vcmp_guest = mock.MagicMock(return_value=False)
     vcmp.assoc_vlan_with_vcmp_guest(mock_bigip, VLAN)
     assert vcmp.vcmp_hosts[0]['guests'][0].modify.call_args == mock.call(
@@ -318,7 +318,8 @@ def test_assoc_vlan_with_vcmp_guest_create_exception(setup_vcmp_method_test):
 def test_assoc_vlan_with_vcmp_guest_vlan_not_created(
         mock_time, setup_vcmp_method_test):
     vcmp, mock_bigip = setup_vcmp_method_test
-    mock_bigip.tm.net.vlans.vlan.exists.return_value = False
+    mock_bigip.tm.net.vlans.vlan.load.side_effect = \
+        iControlUnexpectedHTTPError(response=mock.Mock(status_code=404))
     vcmp._is_vlan_assoc_with_vcmp_guest = mock.MagicMock(return_value=False)
     vcmp.assoc_vlan_with_vcmp_guest(mock_bigip, VLAN)
     assert vcmp.vcmp_hosts[0]['guests'][0].modify.call_args == mock.call(
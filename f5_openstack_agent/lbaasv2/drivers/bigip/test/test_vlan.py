@@ -21,6 +21,11 @@ from f5.bigip.tm.net.vlan import TagModeDisallowedForTMOSVersion
 
 import mock
 import pytest
+from requests import HTTPError
+
+
+def not_found(*args, **kwargs):
+    raise HTTPError(response=mock.Mock(status_code=404))
 
 
 class TestVLANCreate(object):
@@ -65,8 +70,6 @@ class TestVLANCreate(object):
 
         assert(v is not None)
 
-        bigip.tm.net.vlans.vlan.exists.assert_called_once_with(
-            name='test_vlan', partition='Project_123456789')
         bigip.tm.net.vlans.vlan.load.assert_called_once_with(
             name='test_vlan', partition='Project_123456789')
         bigip.tm.net.vlans.vlan.create.assert_not_called
@@ -82,7 +85,7 @@ class TestVLANCreate(object):
                               'partition': "Project_123456789",
                               'tag': 1000}
 
-        bigip.tm.net.vlans.vlan.exists.return_value = False
+        bigip.tm.net.vlans.vlan.load.side_effect = not_found
 
         v = network_helper.create_vlan(bigip, tagged_vlan_no_int)
 
@@ -103,7 +106,7 @@ class TestVLANCreate(object):
                                   'partition': "Project_123456789",
                                   'interface': "1.3"}
 
-        bigip.tm.net.vlans.vlan.exists.return_value = False
+        bigip.tm.net.vlans.vlan.load.side_effect = not_found
         bigip.tm.net.vlans.vlan.create.return_value = (
             bigip.tm.net.vlans.vlan)
 
@@ -131,7 +134,7 @@ class TestVLANCreate(object):
                                   'tag': 1000,
                                   'interface': "1.3"}
 
-        bigip.tm.net.vlans.vlan.exists.return_value = False
+        bigip.tm.net.vlans.vlan.load.side_effect = not_found
         bigip.tm.net.vlans.vlan.create.return_value = (
             bigip.tm.net.vlans.vlan)
 
@@ -163,7 +166,7 @@ class TestVLANCreate(object):
                                   'tag': 1000,
                                   'interface': "1.3"}
 
-        bigip.tm.net.vlans.vlan.exists.return_value = False
+        bigip.tm.net.vlans.vlan.load.side_effect = not_found
         bigip.tm.net.vlans.vlan.create.return_value = (
             bigip.tm.net.vlans.vlan)
         bigip.tm.net.vlans.vlan.interfaces_s.interfaces.create.side_effect = (
@@ -14,11 +14,14 @@
 # limitations under the License.
 #
 from time import time
+import collections
 import uuid
 import eventlet
+import eventlet.corolocal
+import eventlet.event
+import netaddr
 
 from distutils.version import LooseVersion
-from eventlet import greenthread
 
 from oslo_log import log as logging
 from neutron_lbaas.services.loadbalancer import constants as lb_const
@@ -28,6 +31,9 @@ from threading import Thread, current_thread
 LOG = logging.getLogger(__name__)
 OBJ_PREFIX = 'uuid_'
 
+# state of a green thread which is handed down to the threads of fan_out
+green_context = eventlet.corolocal.local()
+
 
 class IpNotInCidrNotation(Exception):
     pass
@@ -88,152 +94,236 @@ def strip_domain_address(ip_address):
     else:
         return ip_address.split('%')[0]
 
-def serialized(method_name):
-    """Outer wrapper in order to specify method name."""
-    def real_serialized(method):
-        """Decorator to serialize calls to configure via iControl."""
-        def wrapper(*args, **kwargs):
-            """Necessary wrapper."""
-            # args[0] must be an instance of iControlDriver
-            service_queue = args[0].service_queue
-            my_request_id = uuid.uuid4()
 
-            # service = None
-            # if len(args) > 0:
-            #     last_arg = args[-1]
-            #     if isinstance(last_arg, dict) and ('loadbalancer' in last_arg):
-            #         service = last_arg
-            # if 'service' in kwargs:
-            #     service = kwargs['service']
-
-            # Consolidate create_member requests for the same pool.
-            #
-            # NOTE: The following block of code alters the state of
-            # a queue that other greenthreads are waiting behind.
-            # This code assumes it will not be preempted by another
-            # greenthread while running. It does not do I/O or call any
-            # other monkey-patched code which might cause a context switch.
-            # To avoid race conditions, DO NOT add logging to this code
-            # block.
-
-            #req = (my_request_id, method_name, service)
-            req = my_request_id
-            service_queue.append(req)
-            reqs_ahead_of_us = request_index(service_queue, my_request_id)
-            while reqs_ahead_of_us != 0:
-                if reqs_ahead_of_us == 1:
-                    # it is almost our turn. get ready
-                    waitsecs = .01
-                else:
-                    waitsecs = reqs_ahead_of_us * .5
-                if waitsecs > .01:
-                    LOG.debug('%s request %s is blocking'
-                              ' for %.2f secs - queue depth: %d'
-                              % (str(method_name), my_request_id,
-                                 waitsecs, len(service_queue)))
-                greenthread.sleep(waitsecs)
-                reqs_ahead_of_us = request_index(service_queue, my_request_id)
-            try:
-                LOG.debug('%s request %s is running with queue depth: %d'
-                          % (str(method_name), my_request_id,
-                             len(service_queue)))
-                start_time = time()
-                result = method(*args, **kwargs)
-                LOG.debug('%s request %s took %.5f secs'
-                          % (str(method_name), my_request_id,
-                             time() - start_time))
-            except Exception:
-                LOG.error('%s request %s FAILED'
-                          % (str(method_name), my_request_id))
-                raise
-            finally:
-                service_queue.pop(0)
-            return result
-        return wrapper
-    return real_serialized
+def split_member_name(name):
+    """Split a pool member name into address, route domain and port.
 
+    IPv6 members use a dot to separate the port.
 
-def request_index(request_queue, request_id):
-    """Get index of request in request queue.
-    If we are not in the queue return the length of the list.
+    Examples:
+        10.0.0.1%2:80 ==> ('10.0.0.1', '2', '80')
+        10.0.0.1:80 ==> ('10.0.0.1', None, '80')
+        2001:db8::1%2.80 ==> ('2001:db8::1', '2', '80')
     """
+    sep = '.' if name.count(':') > 1 else ':'
+    address, _, port = name.rpartition(sep)
+    address, _, route_domain = address.partition('%')
+    return address, route_domain or None, port
+
+
+def member_key(address, port):
+    """Return a normalized address:port key for pool member comparison."""
     try:
-        return request_queue.index(request_id)
-    except Exception:
-        return len(request_queue)
+        address = str(netaddr.IPAddress(address))
+    except (netaddr.AddrFormatError, ValueError, TypeError):
+        address = str(address).lower()
+    return '%s:%s' % (address, port)
+
+
+class RequestScheduler(object):
+    """Serialize driver requests per scheduling key without polling.
+
+    Requests which carry a service are keyed by loadbalancer or tenant
+    (see ccloud_serialize_scope) and only run one at a time per key, while
+    requests for different keys run in parallel.  Requests without a
+    service (orphan cleanup, device wide queries, config backups) run
+    exclusively, i.e. they wait for all running requests and hold back
+    every request queued after them.
 
-def request_index_xxx(request_queue, request_id):
-    """Get index of request in request queue.
-    If we are not in the queue return the length of the list.
+    Waiters block on an event which is sent by the request that completes
+    before them, so there is no polling.  Admission is strictly FIFO per
+    key.
     """
-    for request in request_queue:
-        if request[0] == request_id:
-            return request_queue.index(request)
-    return len(request_queue)
 
+    EXCLUSIVE = None
+
+    def __init__(self):
+        self.waiting = collections.deque()
+        self.running = set()
+        self.exclusive_running = False
+        self.metrics = {}
+
+    def queue_depth(self):
+        """Return number of requests waiting or running."""
+        running = len(self.running) + (1 if self.exclusive_running else 0)
+        return len(self.waiting) + running
+
+    def acquire(self, key):
+        """Block until a request for key is allowed to run."""
+        req = (key, eventlet.event.Event())
+        self.waiting.append(req)
+        self._dispatch()
+        try:
+            req[1].wait()
+        except BaseException:
+            # killed while waiting, don't leave a stale entry behind
+            if req in self.waiting:
+                self.waiting.remove(req)
+            elif req[1].ready():
+                self.release(key)
+            raise
+
+    def release(self, key):
+        """Mark the request for key as done and wake up next requests."""
+        if key is self.EXCLUSIVE:
+            self.exclusive_running = False
+        else:
+            self.running.discard(key)
+        self._dispatch()
+
+    def _dispatch(self):
+        # NOTE: this block must not yield to other greenthreads, so
+        # DO NOT add logging or any other I/O here.
+        if self.exclusive_running:
+            return
+        blocked = set()
+        for req in list(self.waiting):
+            key, event = req
+            if key is self.EXCLUSIVE:
+                if not self.running and not blocked:
+                    self.waiting.remove(req)
+                    self.exclusive_running = True
+                    event.send(True)
+                # nothing queued behind an exclusive request may overtake it
+                return
+            if key in self.running or key in blocked:
+                blocked.add(key)
+                continue
+            self.waiting.remove(req)
+            self.running.add(key)
+            event.send(True)
+            blocked.add(key)
+
+    def record(self, method_name, depth, wait_time, service_time, failed):
+        """Account queue depth, wait and service time of a request."""
+        m = self.metrics.get(method_name)
+        if m is None:
+            m = {'requests': 0, 'failed': 0, 'max_queue_depth': 0,
+                 'wait_time': 0.0, 'max_wait_time': 0.0,
+                 'service_time': 0.0, 'max_service_time': 0.0}
+            self.metrics[method_name] = m
+        m['requests'] += 1
+        if failed:
+            m['failed'] += 1
+        m['max_queue_depth'] = max(m['max_queue_depth'], depth)
+        m['wait_time'] += wait_time
+        m['max_wait_time'] = max(m['max_wait_time'], wait_time)
+        m['service_time'] += service_time
+        m['max_service_time'] = max(m['max_service_time'], service_time)
+
+    def get_metrics(self):
+        """Return per method request metrics including averages."""
+        metrics = {}
+        for method_name, m in self.metrics.items():
+            m = dict(m)
+            m['avg_wait_time'] = m['wait_time'] / m['requests']
+            m['avg_service_time'] = m['service_time'] / m['requests']
+            metrics[method_name] = m
+        return metrics
+
+
+def get_serialize_key(instance, args, kwargs):
+    """Return the scheduling key of a driver request.
+
+    None means the request has no service and has to run exclusively.
+    """
+    service = kwargs.get('service')
+    if service is None and len(args) > 1:
+        last_arg = args[-1]
+        if isinstance(last_arg, dict) and ('loadbalancer' in last_arg):
+            service = last_arg
+    if not service:
+        return RequestScheduler.EXCLUSIVE
+    lb = service.get('loadbalancer') or {}
+
+    conf = getattr(instance, 'conf', None)
+    scope = getattr(conf, 'ccloud_serialize_scope', 'tenant')
+    if scope == 'global':
+        return 'global'
+    elif scope == 'loadbalancer' and lb.get('id'):
+        return lb['id']
+    elif lb.get('tenant_id'):
+        return lb['tenant_id']
+    return lb.get('id', 'generic')
 
-def serialized_ccloud (method_name):
-    """Outer wrapper in order to specify method name."""
 
+def serialized(method_name):
+    """Outer wrapper in order to specify method name."""
     def real_serialized(method):
         """Decorator to serialize calls to configure via iControl."""
         def wrapper(*args, **kwargs):
-            # args[0] must be an instance of iControlDriver
+            """Necessary wrapper."""
+            # args[0] must be an instance of LBaaSBaseDriver
+            scheduler = args[0].scheduler
+            key = get_serialize_key(args[0], args, kwargs)
             my_request_id = uuid.uuid4()
 
-            service = None
-            if len(args) > 0:
-                last_arg = args[-1]
-                if isinstance(last_arg, dict) and ('loadbalancer' in last_arg):
-                    service = last_arg
-            if 'service' in kwargs:
-                service = kwargs['service']
-
-            lb_id = 'generic'
-
-            if service is not None:
-                lb = service.get('loadbalancer')
-                if lb is not None:
-                    lb_id = lb.get('id')
-
-            queue = args[0].queues.get(lb_id)
-            if queue is None:
-                queue = eventlet.queue.Queue(1)
-                args[0].queues[lb_id] = queue
-
+            depth = scheduler.queue_depth()
             wait_start = time()
-            queue.put(my_request_id)
-            LOG.debug('Waited %.2f secs to put request %s on to queue %s %s'
-                      % (time() - wait_start, my_request_id, lb_id, queue))
-
-
+            scheduler.acquire(key)
+            wait_time = time() - wait_start
+            LOG.debug('%s request %s for %s waited %.2f secs with queue '
+                      'depth: %d' % (str(method_name), my_request_id,
+                                     key or 'all', wait_time, depth))
+            failed = False
+            start_time = time()
             try:
-
-                start_time = time()
-
                 result = method(*args, **kwargs)
-                LOG.debug('%s request %s took %.5f secs'
-                          % (str(method_name), my_request_id,
-                             time() - start_time))
-
             except Exception:
+                failed = True
                 LOG.error('%s request %s FAILED'
                           % (str(method_name), my_request_id))
                 raise
             finally:
-                wait_start = time()
-                wait_request = queue.get()
-                LOG.debug('Waited %.2f secs to get request %s'
-                          % (time() - wait_start,wait_request))
-
-
+                service_time = time() - start_time
+                scheduler.release(key)
+                scheduler.record(method_name, depth, wait_time,
+                                 service_time, failed)
+                LOG.debug('%s request %s took %.5f secs'
+                          % (str(method_name), my_request_id, service_time))
             return result
-
         return wrapper
-
     return real_serialized
 
 
+def fan_out(bigips, func, *args, **kwargs):
+    """Call func(bigip, *args, **kwargs) for all bigips concurrently.
+
+    Every bigip gets its own green thread, so the REST calls of a
+    configuration change are sent to all devices at the same time. The
+    threads inherit the green_context of the caller.
+    Returns the results as dict keyed by bigip hostname. Failures are
+    logged per bigip and, once all bigips are done, the error of the
+    first failing bigip in the given order is raised.
+    """
+    bigips = list(bigips)
+    if len(bigips) < 2:
+        return dict((bigip.hostname, func(bigip, *args, **kwargs))
+                    for bigip in bigips)
+
+    context = dict(green_context.__dict__)
+
+    def _func(bigip):
+        for key, value in context.items():
+            setattr(green_context, key, value)
+        return func(bigip, *args, **kwargs)
+
+    pool = eventlet.GreenPool(len(bigips))
+    threads = [(bigip, pool.spawn(_func, bigip)) for bigip in bigips]
+    results = {}
+    errors = []
+    for bigip, thread in threads:
+        try:
+            results[bigip.hostname] = thread.wait()
+        except Exception as err:
+            LOG.error("ccloud: %s failed on %s: %s" %
+                      (getattr(func, '__name__', func), bigip.hostname, err))
+            errors.append(err)
+    if errors:
+        raise errors[0]
+    return results
+
+
 def get_filter(bigip, key, op, value):
     if LooseVersion(bigip.tmos_version) < LooseVersion('11.6.0'):
         return '$filter=%s+%s+%s' % (key, op, value)
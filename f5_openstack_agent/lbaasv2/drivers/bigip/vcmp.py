@@ -17,6 +17,7 @@
 from f5.bigip import ManagementRoot
 from f5_openstack_agent.lbaasv2.drivers.bigip.exceptions import \
     BigIPNotLicensedForVcmp
+from f5_openstack_agent.lbaasv2.drivers.bigip.resource_helper import try_load
 from f5_openstack_agent.lbaasv2.drivers.bigip import utils
 from icontrol.exceptions import iControlUnexpectedHTTPError
 from oslo_log import log
@@ -222,8 +223,8 @@ class VcmpManager(object):
         try:
             for _ in range(0, 30):
                 time.sleep(1)
-                if vf.exists(name=vlan['name'], partition='Common'):
-                    v = vf.load(name=vlan['name'], partition='Common')
+                v = try_load(vf, name=vlan['name'], partition='Common')
+                if v:
                     vlan_created = True
                     break
                 LOG.debug(('{0} Wait for VLAN {1} to be created on vCMP '
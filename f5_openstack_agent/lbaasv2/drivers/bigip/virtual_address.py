@@ -99,11 +99,12 @@ class VirtualAddress(object):
             name=self.name,
             partition=self.partition)
 
-    def update(self, bigip):
+    def update(self, bigip, remote=None):
 
 
         model = self.model()
-        remote = self.load(bigip)
+        if remote is None:
+            remote = self.load(bigip)
         if remote.address != model["address"]:
             # could be route domain or IP has changed
             try:
@@ -114,14 +115,16 @@ class VirtualAddress(object):
         else:
             # pop immutables and update
             model.pop("address")
-            return  self.virtual_address.update(bigip, model)
+            return self.virtual_address.update(bigip, model, resource=remote)
 
     def assure(self, bigip, delete=False):
 
         if delete:
             self.delete(bigip)
         else:
-            if self.exists(bigip):
-                self.update(bigip)
+            remote = self.virtual_address.try_load(
+                bigip, name=self.name, partition=self.partition)
+            if remote:
+                self.update(bigip, remote)
             else:
                 self.create(bigip)